@@ -51,7 +51,15 @@ class BookGenerationModel(Base, MappedAsDataclass):
     user_id: Mapped[int | None] = mapped_column(
         Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, default=None
     )
-    status: Mapped[str] = mapped_column(String(32), default="generating")  # generating / completed / failed
+    status: Mapped[str] = mapped_column(String(32), default="generating")  # queued / generating / completed / failed
+    # job — фоновая задача BookJobManager, stream — генерация внутри SSE-ответа (её не восстанавливают)
+    kind: Mapped[str] = mapped_column(String(16), default="stream", server_default="stream")
+    stage: Mapped[str | None] = mapped_column(String(64), nullable=True, default=None)
+    progress: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    request_params: Mapped[dict | None] = mapped_column(JSON, nullable=True, default=None)
+    # Структура, тексты глав и отпечатки входных данных для обновления книги (см. src.book.artifacts);
+    # загружается только явно — списки книг её не читают
+    artifacts: Mapped[dict | None] = mapped_column(JSON, nullable=True, default=None, deferred=True)
     filename: Mapped[str | None] = mapped_column(String(255), nullable=True, default=None)
     s3_key: Mapped[str | None] = mapped_column(String(512), nullable=True, default=None)
     s3_url: Mapped[str | None] = mapped_column(String(1024), nullable=True, default=None)
@@ -60,6 +68,9 @@ class BookGenerationModel(Base, MappedAsDataclass):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, default=None
+    )
     completed_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), nullable=True, default=None
     )
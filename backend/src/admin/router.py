@@ -1,5 +1,5 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import Optional, List
 from datetime import datetime
 
@@ -24,6 +24,8 @@ from src.admin.schemas import (
 from src.users.models import UserModel
 from src.storage.s3.dependencies import get_s3_manager
 from src.storage.s3.manager import S3Manager
+from src.book.downloads import book_spool
+from src.subscription.entitlements import entitlements_cache
 from src.subscription.dependencies import (
     get_subscription_repository,
     get_payment_repository,
@@ -73,12 +75,13 @@ async def get_users_list(
     date_from: Optional[datetime] = Query(default=None),
     date_to: Optional[datetime] = Query(default=None),
     sort_by: str = Query(default="created_at", pattern="^(created_at|relatives_count)$"),
+    cursor: Optional[str] = Query(default=None),
     service: AdminService = Depends(get_admin_service),
 ):
-    """Список пользователей с поиском и фильтрацией"""
+    """Список пользователей с поиском и фильтрацией (cursor из next_cursor вместо skip)"""
     return await service.get_users_list(
         skip=skip, limit=limit, search=search, only_active=only_active,
-        date_from=date_from, date_to=date_to, sort_by=sort_by,
+        date_from=date_from, date_to=date_to, sort_by=sort_by, cursor=cursor,
     )
 
 
@@ -147,13 +150,20 @@ async def get_all_relatives(
 
 @router.get("/stories", response_model=List[AdminStoryItemSchema])
 async def get_all_stories(
+    response: Response,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=100),
     user_id: Optional[int] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
     service: AdminService = Depends(get_admin_service),
 ):
-    """Все истории на платформе"""
-    return await service.get_all_stories(skip=skip, limit=limit, user_id=user_id)
+    """Все истории на платформе (курсор следующей страницы — в заголовке X-Next-Cursor)"""
+    stories, cursor_value = await service.get_all_stories(
+        skip=skip, limit=limit, user_id=user_id, cursor=cursor,
+    )
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
+    return stories
 
 
 @router.delete("/relatives/{relative_id}/stories/{story_key}")
@@ -199,11 +209,13 @@ async def get_audit_logs(
     action: Optional[str] = Query(default=None),
     date_from: Optional[datetime] = Query(default=None),
     date_to: Optional[datetime] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
     service: AdminService = Depends(get_admin_service),
 ):
     """Просмотр логов аудита"""
     return await service.get_audit_logs(
         skip=skip, limit=limit, action=action, date_from=date_from, date_to=date_to,
+        cursor=cursor,
     )
 
 
@@ -217,12 +229,14 @@ async def get_ai_usage(
     endpoint_type: Optional[str] = Query(default=None),
     date_from: Optional[datetime] = Query(default=None),
     date_to: Optional[datetime] = Query(default=None),
+    cursor: Optional[str] = Query(default=None),
     service: AdminService = Depends(get_admin_service),
 ):
     """Логи использования AI"""
     return await service.get_ai_usage(
         skip=skip, limit=limit, user_id=user_id,
         endpoint_type=endpoint_type, date_from=date_from, date_to=date_to,
+        cursor=cursor,
     )
 
 
@@ -266,6 +280,9 @@ async def delete_book(
             await s3_manager.delete(s3_url)
         except Exception as e:
             logger.error(f"Ошибка удаления книги из S3: {e}")
+    else:
+        # Книга без S3 могла остаться в локальном spool
+        await book_spool.remove(book_id)
 
     await log_admin_action(
         session=service.session,
@@ -398,6 +415,7 @@ async def admin_set_user_plan(
         expires_at=now + relativedelta(years=10) if plan_type == PlanType.FREE else now + relativedelta(months=1),
         auto_renew=False,
     )
+    entitlements_cache.invalidate_on_commit(sub_repo.session, user_id)
 
     await log_admin_action(
         session=service.session,
@@ -23,6 +23,7 @@ class AdminUserListResponseSchema(BaseModel):
     total: int
     skip: int
     limit: int
+    next_cursor: str | None = None
 
 
 class AdminDashboardStatsSchema(BaseModel):
@@ -102,6 +103,7 @@ class AdminAuditLogResponseSchema(BaseModel):
     total: int
     skip: int
     limit: int
+    next_cursor: str | None = None
 
 
 # --- Сброс пароля ---
@@ -136,6 +138,7 @@ class AIUsageLogResponseSchema(BaseModel):
     total: int
     skip: int
     limit: int
+    next_cursor: str | None = None
 
 
 class AIUsageStatsSchema(BaseModel):
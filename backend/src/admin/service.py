@@ -1,11 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_, and_
-from sqlalchemy.orm.attributes import flag_modified
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from src.users.models import UserModel
-from src.family.models import FamilyRelationModel, FamilyRelationshipModel
+from src.family.models import (
+    FamilyRelationModel, FamilyRelationshipModel, StoryModel, InterviewMessageModel
+)
+from src.family.graph import family_graph_cache
+from src.storage.s3.thumbnails import thumbnail_urls
+from src.core.pagination import apply_keyset, next_cursor
 from src.admin.models import AdminAuditLogModel, AIUsageLogModel, BookGenerationModel
 from src.admin.schemas import (
     AdminUserListItemSchema,
@@ -101,21 +105,8 @@ class AdminService:
         )
         total_invitations = total_invitations_q.scalar() or 0
 
-        # Истории - загружаем context и считаем ключи (без interview_messages)
-        contexts_q = await self.session.execute(
-            select(FamilyRelationModel.context).where(
-                FamilyRelationModel.is_active == True,
-                FamilyRelationModel.context.isnot(None)
-            )
-        )
-        total_stories = 0
-        for (context,) in contexts_q.all():
-            if context and isinstance(context, dict):
-                for key, value in context.items():
-                    if key == 'interview_messages':
-                        continue
-                    if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                        total_stories += 1
+        # Истории активных родственников
+        total_stories = await self._count_stories()
 
         # Среднее кол-во родственников на юзера
         avg_relatives = round(total_relatives / active_users, 1) if active_users > 0 else 0
@@ -185,8 +176,9 @@ class AdminService:
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         sort_by: str = "created_at",
+        cursor: Optional[str] = None,
     ) -> AdminUserListResponseSchema:
-        """Список юзеров с поиском и фильтрацией"""
+        """Список юзеров с поиском и фильтрацией (keyset-пагинация по cursor, иначе skip)"""
         # Подзапросы для подсчёта
         relatives_sub = (
             select(
@@ -221,6 +213,17 @@ class AdminService:
             .subquery()
         )
 
+        stories_sub = (
+            select(
+                StoryModel.user_id,
+                func.count(StoryModel.id).label('stories_count')
+            )
+            .join(FamilyRelationModel, FamilyRelationModel.id == StoryModel.relative_id)
+            .where(FamilyRelationModel.is_active == True)
+            .group_by(StoryModel.user_id)
+            .subquery()
+        )
+
         # Базовый запрос
         base_filter = []
         if search:
@@ -254,28 +257,30 @@ class AdminService:
                 relatives_sub.c.relatives_count,
                 relationships_sub.c.relationships_count,
                 activated_sub.c.activated_count,
+                stories_sub.c.stories_count,
             )
             .outerjoin(relatives_sub, UserModel.id == relatives_sub.c.user_id)
             .outerjoin(relationships_sub, UserModel.id == relationships_sub.c.user_id)
             .outerjoin(activated_sub, UserModel.id == activated_sub.c.user_id)
+            .outerjoin(stories_sub, UserModel.id == stories_sub.c.user_id)
         )
         if base_filter:
             query = query.where(*base_filter)
 
-        # Сортировка
+        # Сортировка: ключ всегда заканчивается id, чтобы курсор был однозначным
         if sort_by == "relatives_count":
-            query = query.order_by(relatives_sub.c.relatives_count.desc().nullslast())
+            sort_key = (func.coalesce(relatives_sub.c.relatives_count, 0), UserModel.id)
         else:
-            query = query.order_by(UserModel.created_at.desc())
+            sort_key = (UserModel.created_at, UserModel.id)
+        query = apply_keyset(query, sort_key, cursor, scope=f"users:{sort_by}")
 
-        query = query.offset(skip).limit(limit)
-        result = await self.session.execute(query)
+        if not cursor:
+            query = query.offset(skip)
+        result = await self.session.execute(query.limit(limit))
         rows = result.all()
 
         users = []
-        for user, rel_count, rels_count, act_count in rows:
-            # Подсчёт историй для этого юзера - загрузим контексты
-            stories_count = await self._count_user_stories(user.id)
+        for user, rel_count, rels_count, act_count, stories_count in rows:
             users.append(AdminUserListItemSchema(
                 id=user.id,
                 username=user.username,
@@ -285,33 +290,41 @@ class AdminService:
                 is_superuser=user.is_superuser,
                 created_at=user.created_at,
                 relatives_count=rel_count or 0,
-                stories_count=stories_count,
+                stories_count=stories_count or 0,
                 relationships_count=rels_count or 0,
                 activated_relatives_count=act_count or 0,
             ))
 
+        if sort_by == "relatives_count":
+            cursor_key = lambda u: (u.relatives_count, u.id)
+        else:
+            cursor_key = lambda u: (u.created_at, u.id)
         return AdminUserListResponseSchema(
-            users=users, total=total, skip=skip, limit=limit
+            users=users, total=total, skip=skip, limit=limit,
+            next_cursor=next_cursor(users, limit, cursor_key, scope=f"users:{sort_by}"),
         )
 
-    async def _count_user_stories(self, user_id: int) -> int:
-        """Подсчёт историй юзера из context JSON"""
-        contexts_q = await self.session.execute(
-            select(FamilyRelationModel.context).where(
-                FamilyRelationModel.user_id == user_id,
-                FamilyRelationModel.is_active == True,
-                FamilyRelationModel.context.isnot(None)
+    async def _count_stories(self, *extra_filter) -> int:
+        """Количество историй активных родственников (с дополнительными условиями)"""
+        query = (
+            select(func.count(StoryModel.id))
+            .join(FamilyRelationModel, FamilyRelationModel.id == StoryModel.relative_id)
+            .where(FamilyRelationModel.is_active == True, *extra_filter)
+        )
+        result = await self.session.execute(query)
+        return result.scalar() or 0
+
+    @staticmethod
+    def _stories_count_subquery():
+        """Подзапрос: количество историй по relative_id"""
+        return (
+            select(
+                StoryModel.relative_id,
+                func.count(StoryModel.id).label('stories_count')
             )
+            .group_by(StoryModel.relative_id)
+            .subquery()
         )
-        count = 0
-        for (context,) in contexts_q.all():
-            if context and isinstance(context, dict):
-                for key, value in context.items():
-                    if key == 'interview_messages':
-                        continue
-                    if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                        count += 1
-        return count
 
     # ==================== РОДСТВЕННИКИ ====================
 
@@ -319,9 +332,11 @@ class AdminService:
         self, user_id: int
     ) -> List[AdminRelativeListItemSchema]:
         """Родственники конкретного юзера"""
+        stories_sub = self._stories_count_subquery()
         query = (
-            select(FamilyRelationModel, UserModel.username)
+            select(FamilyRelationModel, UserModel.username, stories_sub.c.stories_count)
             .join(UserModel, FamilyRelationModel.user_id == UserModel.id)
+            .outerjoin(stories_sub, FamilyRelationModel.id == stories_sub.c.relative_id)
             .where(FamilyRelationModel.user_id == user_id)
             .order_by(FamilyRelationModel.created_at.desc())
         )
@@ -329,15 +344,7 @@ class AdminService:
         rows = result.all()
 
         items = []
-        for relative, owner_username in rows:
-            stories_count = 0
-            if relative.context and isinstance(relative.context, dict):
-                for key, value in relative.context.items():
-                    if key == 'interview_messages':
-                        continue
-                    if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                        stories_count += 1
-
+        for relative, owner_username, stories_count in rows:
             items.append(AdminRelativeListItemSchema(
                 id=relative.id,
                 user_id=relative.user_id,
@@ -348,7 +355,7 @@ class AdminService:
                 is_active=relative.is_active,
                 is_activated=relative.is_activated,
                 telegram_user_id=relative.telegram_user_id,
-                stories_count=stories_count,
+                stories_count=stories_count or 0,
                 created_at=relative.created_at,
             ))
         return items
@@ -372,56 +379,32 @@ class AdminService:
         if is_activated is not None:
             base_filter.append(FamilyRelationModel.is_activated == is_activated)
 
-        # Подсчёт total (без has_stories фильтра, т.к. он пост-фильтр)
-        count_q = select(func.count()).select_from(FamilyRelationModel).where(*base_filter)
+        stories_sub = self._stories_count_subquery()
+        if has_stories is True:
+            base_filter.append(stories_sub.c.stories_count > 0)
+        elif has_stories is False:
+            base_filter.append(stories_sub.c.stories_count.is_(None))
+
+        count_q = (
+            select(func.count())
+            .select_from(FamilyRelationModel)
+            .outerjoin(stories_sub, FamilyRelationModel.id == stories_sub.c.relative_id)
+            .where(*base_filter)
+        )
         total_result = await self.session.execute(count_q)
+        total = total_result.scalar() or 0
 
         query = (
-            select(FamilyRelationModel, UserModel.username)
+            select(FamilyRelationModel, UserModel.username, stories_sub.c.stories_count)
             .join(UserModel, FamilyRelationModel.user_id == UserModel.id)
+            .outerjoin(stories_sub, FamilyRelationModel.id == stories_sub.c.relative_id)
             .where(*base_filter)
             .order_by(FamilyRelationModel.created_at.desc())
+            .offset(skip)
+            .limit(limit)
         )
-
-        # Если has_stories фильтр — загружаем всё и фильтруем в Python
-        if has_stories is not None:
-            result = await self.session.execute(query)
-            all_rows = result.all()
-
-            filtered = []
-            for relative, owner_username in all_rows:
-                stories_count = 0
-                if relative.context and isinstance(relative.context, dict):
-                    for key, value in relative.context.items():
-                        if key == 'interview_messages':
-                            continue
-                        if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                            stories_count += 1
-
-                if has_stories and stories_count == 0:
-                    continue
-                if not has_stories and stories_count > 0:
-                    continue
-
-                filtered.append((relative, owner_username, stories_count))
-
-            total = len(filtered)
-            page_items = filtered[skip:skip + limit]
-        else:
-            total = (total_result.scalar() or 0)
-            query = query.offset(skip).limit(limit)
-            result = await self.session.execute(query)
-            rows = result.all()
-            page_items = []
-            for relative, owner_username in rows:
-                stories_count = 0
-                if relative.context and isinstance(relative.context, dict):
-                    for key, value in relative.context.items():
-                        if key == 'interview_messages':
-                            continue
-                        if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                            stories_count += 1
-                page_items.append((relative, owner_username, stories_count))
+        result = await self.session.execute(query)
+        page_items = result.all()
 
         items = []
         for relative, owner_username, stories_count in page_items:
@@ -435,7 +418,7 @@ class AdminService:
                 is_active=relative.is_active,
                 is_activated=relative.is_activated,
                 telegram_user_id=relative.telegram_user_id,
-                stories_count=stories_count,
+                stories_count=stories_count or 0,
                 created_at=relative.created_at,
             ))
 
@@ -450,87 +433,69 @@ class AdminService:
         skip: int = 0,
         limit: int = 20,
         user_id: Optional[int] = None,
-    ) -> List[AdminStoryItemSchema]:
-        """Все истории на платформе"""
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[AdminStoryItemSchema], Optional[str]]:
+        """Все истории на платформе и курсор следующей страницы"""
         query = (
-            select(FamilyRelationModel, UserModel.username)
-            .join(UserModel, FamilyRelationModel.user_id == UserModel.id)
-            .where(
-                FamilyRelationModel.is_active == True,
-                FamilyRelationModel.context.isnot(None),
-            )
+            select(StoryModel, FamilyRelationModel, UserModel.username)
+            .join(FamilyRelationModel, FamilyRelationModel.id == StoryModel.relative_id)
+            .join(UserModel, StoryModel.user_id == UserModel.id)
+            .where(FamilyRelationModel.is_active == True)
         )
         if user_id is not None:
-            query = query.where(FamilyRelationModel.user_id == user_id)
+            query = query.where(StoryModel.user_id == user_id)
 
-        query = query.order_by(FamilyRelationModel.updated_at.desc())
-        result = await self.session.execute(query)
+        query = apply_keyset(query, (StoryModel.updated_at, StoryModel.id), cursor, scope="stories")
+        if not cursor:
+            query = query.offset(skip)
+        result = await self.session.execute(query.limit(limit))
         rows = result.all()
 
         stories = []
-        for relative, owner_username in rows:
-            if not relative.context or not isinstance(relative.context, dict):
-                continue
-            for key, value in relative.context.items():
-                if key == 'interview_messages':
-                    continue
-
-                text = ''
-                media_count = 0
-                media_urls = []
-                created_at = None
-
-                if isinstance(value, str):
-                    text = value
-                elif isinstance(value, dict) and 'text' in value:
-                    text = value['text']
-                    media_list = value.get('media', [])
-                    media_count = len(media_list)
-                    for media_item in media_list:
-                        if isinstance(media_item, dict) and media_item.get('url'):
-                            media_urls.append(media_item['url'])
-                        elif isinstance(media_item, str):
-                            media_urls.append(media_item)
-                    created_at = value.get('created_at')
-                else:
-                    continue
-
-                relative_name = ' '.join(
-                    filter(None, [relative.first_name, relative.last_name])
-                ) or f'Родственник #{relative.id}'
-
-                stories.append(AdminStoryItemSchema(
-                    relative_id=relative.id,
-                    relative_name=relative_name,
-                    owner_username=owner_username,
-                    user_id=relative.user_id,
-                    story_key=key,
-                    story_text=text[:200] if text else '',
-                    media_count=media_count,
-                    media_urls=media_urls,
-                    created_at=created_at,
-                ))
-
-        # Ручная пагинация (т.к. истории вложены в JSON)
-        return stories[skip:skip + limit]
+        for story, relative, owner_username in rows:
+            media_urls = []
+            for media_item in story.media or []:
+                if isinstance(media_item, dict) and media_item.get('url'):
+                    media_urls.append(media_item['url'])
+                elif isinstance(media_item, str):
+                    media_urls.append(media_item)
+
+            relative_name = ' '.join(
+                filter(None, [relative.first_name, relative.last_name])
+            ) or f'Родственник #{relative.id}'
+
+            stories.append(AdminStoryItemSchema(
+                relative_id=relative.id,
+                relative_name=relative_name,
+                owner_username=owner_username,
+                user_id=relative.user_id,
+                story_key=story.title,
+                story_text=story.text[:200] if story.text else '',
+                media_count=len(story.media or []),
+                media_urls=media_urls,
+                created_at=story.created_at.isoformat() if story.created_at else None,
+            ))
+
+        return stories, next_cursor(
+            rows, limit, lambda row: (row[0].updated_at, row[0].id), scope="stories"
+        )
 
     async def delete_story(self, relative_id: int, story_key: str) -> bool:
         """Удалить историю по ключу"""
         result = await self.session.execute(
-            select(FamilyRelationModel).where(FamilyRelationModel.id == relative_id)
+            select(StoryModel).where(
+                StoryModel.relative_id == relative_id,
+                StoryModel.title == story_key
+            )
         )
-        relative = result.scalar_one_or_none()
-        if not relative:
-            return False
-
-        context = relative.context or {}
-        if story_key not in context:
+        story = result.scalar_one_or_none()
+        if not story:
             return False
 
-        del context[story_key]
-        relative.context = context
-        flag_modified(relative, 'context')
+        user_id = story.user_id
+        await self.session.delete(story)
         await self.session.flush()
+        family_graph_cache.invalidate_on_commit(self.session, user_id)
         return True
 
     # ==================== ДЕРЕВО ====================
@@ -575,6 +540,7 @@ class AdminService:
                 "birth_date": r.birth_date.isoformat() if r.birth_date else None,
                 "death_date": r.death_date.isoformat() if r.death_date else None,
                 "image_url": r.image_url,
+                "thumbnails": thumbnail_urls(r.image_url),
                 "generation": r.generation,
                 "is_activated": r.is_activated,
                 "is_active": r.is_active,
@@ -642,75 +608,55 @@ class AdminService:
         )
         total_pending = pending_q.scalar() or 0
 
-        # Загружаем всех с context для подсчёта интервью и историй
+        # Интервью: количество сообщений и время последнего по каждому родственнику
+        interviews_sub = (
+            select(
+                InterviewMessageModel.relative_id,
+                func.count(InterviewMessageModel.id).label('messages_count'),
+                func.max(InterviewMessageModel.created_at).label('last_message_at'),
+            )
+            .group_by(InterviewMessageModel.relative_id)
+            .subquery()
+        )
         interviews_q = await self.session.execute(
-            select(FamilyRelationModel, UserModel.username)
-            .join(UserModel, FamilyRelationModel.user_id == UserModel.id)
-            .where(
-                FamilyRelationModel.is_activated == True,
-                FamilyRelationModel.context.isnot(None),
+            select(
+                FamilyRelationModel.id,
+                FamilyRelationModel.first_name,
+                FamilyRelationModel.last_name,
+                UserModel.username,
+                interviews_sub.c.messages_count,
+                interviews_sub.c.last_message_at,
             )
+            .join(interviews_sub, FamilyRelationModel.id == interviews_sub.c.relative_id)
+            .join(UserModel, FamilyRelationModel.user_id == UserModel.id)
+            .where(FamilyRelationModel.is_activated == True)
+            .order_by(interviews_sub.c.messages_count.desc())
         )
         rows = interviews_q.all()
 
-        total_with_interviews = 0
-        stories_via_bot = 0
+        total_with_interviews = len(rows)
         active_interviews = []
-
-        for relative, owner_username in rows:
-            context = relative.context or {}
-            messages = context.get('interview_messages', [])
-
-            has_interview = bool(messages)
-            if has_interview:
-                total_with_interviews += 1
-
-            # Считаем истории через бот: если есть interview_messages И есть другие story-ключи
-            for key, value in context.items():
-                if key == 'interview_messages':
-                    continue
-                if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                    if has_interview:
-                        stories_via_bot += 1
-
-            if not messages:
-                continue
-
+        for relative_id, first_name, last_name, owner_username, messages_count, last_message_at in rows[:20]:
             relative_name = ' '.join(
-                filter(None, [relative.first_name, relative.last_name])
-            ) or f'Родственник #{relative.id}'
-
-            last_message_at = None
-            if messages and isinstance(messages[-1], dict):
-                last_message_at = messages[-1].get('timestamp')
+                filter(None, [first_name, last_name])
+            ) or f'Родственник #{relative_id}'
+            if isinstance(last_message_at, datetime):
+                last_message_at = last_message_at.isoformat()
 
             active_interviews.append(AdminActiveInterviewSchema(
-                relative_id=relative.id,
+                relative_id=relative_id,
                 name=relative_name,
                 owner_username=owner_username,
-                messages_count=len(messages),
+                messages_count=messages_count,
                 last_message_at=last_message_at,
             ))
 
-        # Сортируем по кол-ву сообщений
-        active_interviews.sort(key=lambda x: x.messages_count, reverse=True)
-
-        # Общее количество историй для вычисления stories_manually
-        all_contexts_q = await self.session.execute(
-            select(FamilyRelationModel.context).where(
-                FamilyRelationModel.is_active == True,
-                FamilyRelationModel.context.isnot(None)
-            )
+        # Истории через бот: истории активированных родственников, у которых есть интервью
+        stories_via_bot = await self._count_stories(
+            FamilyRelationModel.is_activated == True,
+            StoryModel.relative_id.in_(select(interviews_sub.c.relative_id)),
         )
-        total_stories = 0
-        for (ctx,) in all_contexts_q.all():
-            if ctx and isinstance(ctx, dict):
-                for key, value in ctx.items():
-                    if key == 'interview_messages':
-                        continue
-                    if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                        total_stories += 1
-
+        total_stories = await self._count_stories()
         stories_manually = max(0, total_stories - stories_via_bot)
 
         return AdminTelegramStatsSchema(
@@ -720,7 +666,7 @@ class AdminService:
             total_pending_invitations=total_pending,
             stories_via_bot=stories_via_bot,
             stories_manually=stories_manually,
-            active_interviews=active_interviews[:20],
+            active_interviews=active_interviews,
         )
 
     # ==================== АУДИТ ====================
@@ -732,8 +678,9 @@ class AdminService:
         action: Optional[str] = None,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
     ) -> AdminAuditLogResponseSchema:
-        """Просмотр аудит-логов"""
+        """Просмотр аудит-логов (keyset-пагинация по cursor, иначе skip)"""
         filters = []
         if action:
             filters.append(AdminAuditLogModel.action == action)
@@ -750,9 +697,13 @@ class AdminService:
         query = select(AdminAuditLogModel)
         if filters:
             query = query.where(*filters)
-        query = query.order_by(AdminAuditLogModel.created_at.desc()).offset(skip).limit(limit)
+        query = apply_keyset(
+            query, (AdminAuditLogModel.created_at, AdminAuditLogModel.id), cursor, scope="audit"
+        )
+        if not cursor:
+            query = query.offset(skip)
 
-        result = await self.session.execute(query)
+        result = await self.session.execute(query.limit(limit))
         logs = result.scalars().all()
 
         items = [
@@ -769,7 +720,10 @@ class AdminService:
             for log in logs
         ]
 
-        return AdminAuditLogResponseSchema(items=items, total=total, skip=skip, limit=limit)
+        return AdminAuditLogResponseSchema(
+            items=items, total=total, skip=skip, limit=limit,
+            next_cursor=next_cursor(items, limit, lambda i: (i.created_at, i.id), scope="audit"),
+        )
 
     # ==================== AI USAGE ====================
 
@@ -781,8 +735,9 @@ class AdminService:
         endpoint_type: Optional[str] = None,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
     ) -> AIUsageLogResponseSchema:
-        """Получить логи использования AI"""
+        """Получить логи использования AI (keyset-пагинация по cursor, иначе skip)"""
         filters = []
         if user_id:
             filters.append(AIUsageLogModel.user_id == user_id)
@@ -801,9 +756,13 @@ class AdminService:
         query = select(AIUsageLogModel)
         if filters:
             query = query.where(*filters)
-        query = query.order_by(AIUsageLogModel.created_at.desc()).offset(skip).limit(limit)
+        query = apply_keyset(
+            query, (AIUsageLogModel.created_at, AIUsageLogModel.id), cursor, scope="ai_usage"
+        )
+        if not cursor:
+            query = query.offset(skip)
 
-        result = await self.session.execute(query)
+        result = await self.session.execute(query.limit(limit))
         logs = result.scalars().all()
 
         items = [
@@ -821,7 +780,10 @@ class AdminService:
             for log in logs
         ]
 
-        return AIUsageLogResponseSchema(items=items, total=total, skip=skip, limit=limit)
+        return AIUsageLogResponseSchema(
+            items=items, total=total, skip=skip, limit=limit,
+            next_cursor=next_cursor(items, limit, lambda i: (i.created_at, i.id), scope="ai_usage"),
+        )
 
     async def get_ai_stats(self) -> AIUsageStatsSchema:
         """Агрегированная статистика AI usage"""
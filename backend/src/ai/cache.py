@@ -0,0 +1,150 @@
+"""
+Кэш ответов LLM с адресацией по содержимому.
+
+Ключ — sha256 от (модель, температура, лимит токенов, полный текст промпта). Промпт уже
+содержит шаблон и контекст семьи, поэтому любое изменение дерева, историй, стиля или
+самого шаблона даёт новый ключ, а повторная генерация с теми же данными (например,
+после смены только темы оформления PDF) обходится без обращений к OpenRouter.
+
+Записи хранятся в таблице llm_response_cache. Устаревшие (старше ttl) не отдаются;
+prune() удаляет их и, если общий объём больше max_bytes, вытесняет давно не использованные.
+Ошибки кэша не ломают генерацию — запрос просто уходит в LLM.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.ai.models import LLMResponseCacheModel
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+PRUNE_BATCH_SIZE = 500
+
+
+class LLMResponseCache:
+    """Кэш ответов LLM в БД с TTL и ограничением объёма"""
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        max_bytes: int,
+        enabled: bool = True,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def session_factory(self) -> Callable[[], AsyncSession]:
+        if self._session_factory is None:
+            from src.database.client import async_session
+            self._session_factory = async_session
+        return self._session_factory
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        payload = json.dumps([model, temperature, max_tokens, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Ответ по ключу или None (нет, устарел или кэш недоступен)"""
+        if not self.enabled:
+            return None
+        now = datetime.now(timezone.utc)
+        try:
+            async with self.session_factory() as session:
+                entry = await session.get(LLMResponseCacheModel, key)
+                if entry is None or self._as_utc(entry.created_at) < now - timedelta(seconds=self.ttl_seconds):
+                    self.misses += 1
+                    return None
+                entry.hits += 1
+                entry.last_used_at = now
+                await session.commit()
+                self.hits += 1
+                return entry.response
+        except Exception as e:
+            logger.warning(f"Кэш LLM недоступен (чтение): {type(e).__name__}: {e}")
+            return None
+
+    async def put(self, key: str, model: str, response: str) -> None:
+        """Сохранить ответ (перезаписывает существующую запись)"""
+        if not self.enabled or not response:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            async with self.session_factory() as session:
+                entry = await session.get(LLMResponseCacheModel, key)
+                if entry is None:
+                    session.add(LLMResponseCacheModel(
+                        key=key,
+                        model=model,
+                        response=response,
+                        size_bytes=len(response.encode("utf-8")),
+                        created_at=now,
+                        last_used_at=now,
+                    ))
+                else:
+                    entry.response = response
+                    entry.size_bytes = len(response.encode("utf-8"))
+                    entry.created_at = now
+                    entry.last_used_at = now
+                await session.commit()
+        except Exception as e:
+            # В том числе гонка двух одинаковых запросов — достаточно одной записи
+            logger.warning(f"Кэш LLM недоступен (запись): {type(e).__name__}: {e}")
+
+    async def prune(self) -> int:
+        """Удалить устаревшие записи и вытеснить давно не использованные сверх max_bytes"""
+        expired_before = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(LLMResponseCacheModel).where(LLMResponseCacheModel.created_at < expired_before)
+            )
+            removed = result.rowcount or 0
+
+            total = await session.scalar(select(func.coalesce(func.sum(LLMResponseCacheModel.size_bytes), 0)))
+            excess = (total or 0) - self.max_bytes
+            while excess > 0:
+                rows = (await session.execute(
+                    select(LLMResponseCacheModel.key, LLMResponseCacheModel.size_bytes)
+                    .order_by(LLMResponseCacheModel.last_used_at)
+                    .limit(PRUNE_BATCH_SIZE)
+                )).all()
+                if not rows:
+                    break
+                keys = []
+                for key, size in rows:
+                    keys.append(key)
+                    excess -= size
+                    if excess <= 0:
+                        break
+                await session.execute(delete(LLMResponseCacheModel).where(LLMResponseCacheModel.key.in_(keys)))
+                removed += len(keys)
+
+            await session.commit()
+        return removed
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _as_utc(value: datetime) -> datetime:
+        # SQLite возвращает naive datetime
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+llm_response_cache = LLMResponseCache(
+    ttl_seconds=settings.llm_cache_ttl_seconds,
+    max_bytes=settings.llm_cache_max_bytes,
+    enabled=settings.llm_cache_enabled,
+)
@@ -5,8 +5,7 @@ from typing import Dict, Any, Optional, List
 from src.family.schemas import (
     FamilyRelationCreateSchema,
     FamilyRelationshipCreateSchema,
-    FamilyRelationUpdateSchema,
-    FamilyRelationContextUpdateSchema
+    FamilyRelationUpdateSchema
 )
 from src.family.enums import RelationshipType, GenderType
 from src.ai.utils import parse_date, AIExecutionError
@@ -180,8 +179,7 @@ class TreeActionExecutor:
         if not key or not value:
             return {'success': False, 'error': 'Требуется ключ и значение'}
 
-        schema = FamilyRelationContextUpdateSchema(key=key, value=value)
-        await self.family_service.update_relative_context(self.user_id, relative_id, schema)
+        await self.family_service.save_story_text(self.user_id, relative_id, key, str(value))
         return {'success': True, 'id': relative_id}
 
     async def _delete_story(self, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -194,20 +192,9 @@ class TreeActionExecutor:
         if not key:
             return {'success': False, 'error': 'Требуется ключ истории'}
 
-        # Получаем родственника
-        relative = await self.family_service.get_relative_by_id(self.user_id, relative_id)
-        if not relative:
-            return {'success': False, 'error': 'Родственник не найден'}
-
-        # Проверяем есть ли такая история
-        context = relative.context or {}
-        if key not in context:
+        deleted = await self.family_service.delete_story_by_title(self.user_id, relative_id, key)
+        if not deleted:
             return {'success': False, 'error': f'История "{key}" не найдена'}
-
-        # Удаляем историю (устанавливаем пустое значение или используем delete)
-        # В зависимости от реализации service можно либо установить None, либо удалить ключ
-        schema = FamilyRelationContextUpdateSchema(key=key, value=None)
-        await self.family_service.update_relative_context(self.user_id, relative_id, schema)
         return {'success': True, 'id': relative_id, 'deleted_key': key}
 
     async def _resolve_relative_id(self, identifier) -> Optional[int]:
@@ -266,6 +253,7 @@ class TreeActionExecutor:
 
         try:
             relative = await self.family_service.get_relative_by_id(self.user_id, relative_id)
+            stories = await self.family_service.get_stories(relative_id)
             return {
                 'success': True,
                 'data': {
@@ -277,7 +265,8 @@ class TreeActionExecutor:
                     'birth_date': str(relative.birth_date) if relative.birth_date else None,
                     'death_date': str(relative.death_date) if relative.death_date else None,
                     'generation': relative.generation,
-                    'context': relative.context or {}
+                    'context': relative.context or {},
+                    'stories': {story['title']: story['text'] for story in stories}
                 }
             }
         except Exception as e:
@@ -289,6 +278,7 @@ class TreeActionExecutor:
 
         try:
             relatives = await self.family_service.get_user_relatives(self.user_id, only_active)
+            story_titles = await self.family_service.get_story_titles(self.user_id)
             return {
                 'success': True,
                 'count': len(relatives),
@@ -302,7 +292,7 @@ class TreeActionExecutor:
                         'birth_date': str(r.birth_date) if r.birth_date else None,
                         'death_date': str(r.death_date) if r.death_date else None,
                         'generation': r.generation,
-                        'has_stories': bool(r.context)
+                        'has_stories': bool(story_titles.get(r.id))
                     }
                     for r in relatives
                 ]
@@ -4,7 +4,7 @@
 from __future__ import annotations
 
 from src.database.base import Base
-from sqlalchemy import Integer, DateTime, ForeignKey, JSON
+from sqlalchemy import Integer, BigInteger, String, Text, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import Mapped, mapped_column, MappedAsDataclass
 from datetime import datetime, timezone
 
@@ -21,3 +21,20 @@ class AIChatSessionModel(Base, MappedAsDataclass):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+
+
+class LLMResponseCacheModel(Base, MappedAsDataclass):
+    """Кэш ответов LLM по хэшу (модель, температура, лимит токенов, полный текст промпта)"""
+    __tablename__ = "llm_response_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String(128))
+    response: Mapped[str] = mapped_column(Text)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, default=0)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True
+    )
+    last_used_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True
+    )
@@ -129,11 +129,12 @@ def format_tree_context(relatives: list, relationships: list) -> str:
         rel_id = rel.get('id', 'N/A')
         birth = rel.get('birth_date', 'not specified')
 
-        # Add stories info
-        context = rel.get('context', {})
+        # Add stories info (graph snapshot passes titles, raw relatives pass context)
+        stories = rel.get('stories')
+        if stories is None:
+            stories = list((rel.get('context') or {}).keys())
         stories_str = ""
-        if context:
-            stories = [f"{k}" for k in context.keys()]
+        if stories:
             stories_str = f" | Stories: {', '.join(stories)}"
 
         generation = rel.get('generation')
@@ -44,8 +44,7 @@ async def generate_tree_stream(
     Генерация семейного дерева из текстового описания (стриминг).
     Возвращает Server-Sent Events (SSE).
     """
-    await quota_service.enforce_quota(user_id, QuotaResource.TREE_GENERATIONS)
-    await quota_service.increment_quota(user_id, QuotaResource.TREE_GENERATIONS)
+    await quota_service.consume_quota(user_id, QuotaResource.TREE_GENERATIONS)
     return StreamingResponse(
         ai_service.generate_tree_stream(request, user_id=user_id),
         media_type="text/event-stream",
@@ -73,41 +72,13 @@ async def unified_stream(
     """
     # Проверка квот AI
     if request.mode == "smart":
-        await quota_service.enforce_quota(user_id, QuotaResource.AI_SMART_REQUESTS)
-        await quota_service.increment_quota(user_id, QuotaResource.AI_SMART_REQUESTS)
+        await quota_service.consume_quota(user_id, QuotaResource.AI_SMART_REQUESTS)
     else:
-        await quota_service.enforce_quota(user_id, QuotaResource.AI_REQUESTS)
-        await quota_service.increment_quota(user_id, QuotaResource.AI_REQUESTS)
-
-    # Получаем текущее дерево пользователя
-    relatives = await family_service.get_user_relatives(user_id)
-    relationships = await relationship_service.get_user_relationships(user_id)
-
-    # Преобразуем в словари для ИИ
-    relatives_data = [
-        {
-            "id": r.id,
-            "first_name": r.first_name,
-            "last_name": r.last_name,
-            "middle_name": r.middle_name,
-            "gender": r.gender.value if r.gender else "other",
-            "birth_date": r.birth_date.isoformat() if r.birth_date else None,
-            "death_date": r.death_date.isoformat() if r.death_date else None,
-            "generation": r.generation,
-            "context": r.context or {},
-        }
-        for r in relatives
-    ]
-
-    relationships_data = [
-        {
-            "id": r.id,
-            "from_relative_id": r.from_relative_id,
-            "to_relative_id": r.to_relative_id,
-            "relationship_type": r.relationship_type.value if r.relationship_type else None,
-        }
-        for r in relationships
-    ]
+        await quota_service.consume_quota(user_id, QuotaResource.AI_REQUESTS)
+
+    # Текущее дерево пользователя из кэша графов (без загрузки context из БД)
+    graph = await relationship_service.get_family_graph(user_id)
+    relatives_data, relationships_data = graph.to_ai_context()
 
     return StreamingResponse(
         ai_service.unified_stream(
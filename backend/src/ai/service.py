@@ -21,6 +21,7 @@ from src.ai.utils import (
 from src.ai.executor import TreeActionExecutor
 from src.ai.validator import ActionValidator
 from src.ai.tool_definitions import TOOL_DEFINITIONS
+from src.ai.usage import ai_usage_recorder
 
 logger = logging.getLogger(__name__)
 
@@ -34,25 +35,20 @@ async def _save_ai_usage(
     endpoint_type: str,
     error_message: Optional[str] = None,
 ) -> None:
-    """Сохранить лог использования AI в отдельной сессии (не зависит от транзакции роутера)"""
-    try:
-        from src.database.client import async_session
-        from src.admin.models import AIUsageLogModel
-
-        async with async_session() as session:
-            log_entry = AIUsageLogModel(
-                user_id=user_id,
-                model=model,
-                prompt_tokens=prompt_tokens,
-                completion_tokens=completion_tokens,
-                total_tokens=total_tokens,
-                endpoint_type=endpoint_type,
-                error_message=error_message[:512] if error_message else None,
-            )
-            session.add(log_entry)
-            await session.commit()
-    except Exception as e:
-        logger.error(f"Ошибка сохранения AI usage: {e}")
+    """
+    Записать лог использования AI (не зависит от транзакции роутера).
+
+    Не ждёт коммита: событие уходит в буфер и пишется в БД пакетом (src/ai/usage.py).
+    """
+    ai_usage_recorder.record(
+        user_id=user_id,
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=total_tokens,
+        endpoint_type=endpoint_type,
+        error_message=error_message,
+    )
 
 
 class AIService:
@@ -0,0 +1,172 @@
+"""
+Отложенная пакетная запись логов использования AI (ai_usage_logs).
+
+Раньше на каждый вызов LLM открывалась отдельная сессия и коммитилась одна строка —
+книга даёт 10+ таких коммитов, ассистент — по одному на итерацию цикла инструментов.
+Теперь record() только кладёт событие в буфер процесса и сразу возвращает управление,
+а фоновая задача пишет накопленное одним multi-row INSERT: как только набралось
+batch_size событий или прошло flush_interval_ms с прошлой записи.
+
+Буфер ограничен max_events: при переполнении новые события отбрасываются и считаются
+в dropped (лог использования — статистика, он не должен съедать память при недоступной
+БД). При остановке приложения stop() дописывает остаток.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.admin.models import AIUsageLogModel
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AIUsageRecorder:
+    """Буфер событий использования AI с пакетной записью в БД"""
+
+    def __init__(
+        self,
+        max_events: int,
+        batch_size: int,
+        flush_interval_ms: int,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
+        self.max_events = max(1, max_events)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000
+        self._session_factory = session_factory
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def session_factory(self) -> Callable[[], AsyncSession]:
+        if self._session_factory is None:
+            from src.database.client import async_session
+            self._session_factory = async_session
+        return self._session_factory
+
+    def record(
+        self,
+        user_id: Optional[int],
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        total_tokens: int,
+        endpoint_type: str,
+        error_message: Optional[str] = None,
+    ) -> bool:
+        """Поставить событие в очередь на запись; False — буфер переполнен, событие отброшено"""
+        if len(self._buffer) >= self.max_events:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Буфер логов AI переполнен, отброшено событий: {self.dropped}")
+            return False
+        self._buffer.append({
+            "user_id": user_id,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+            "endpoint_type": endpoint_type,
+            "error_message": error_message[:512] if error_message else None,
+            "created_at": datetime.now(timezone.utc),
+        })
+        self.recorded += 1
+        self._ensure_started()
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        """Запустить фоновую запись (вызывается при старте приложения; record() запускает её сам)"""
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # нет event loop — событие запишется при следующем запуске задачи или в stop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        wakeup = self._wakeup
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Записать всё накопленное пакетами по batch_size; возвращает число записанных строк"""
+        written = 0
+        while self._buffer:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+            written += await self._write(batch)
+        return written
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> int:
+        try:
+            async with self.session_factory() as session:
+                await session.execute(insert(AIUsageLogModel.__table__), rows)
+                await session.commit()
+            self.batches += 1
+            self.written += len(rows)
+            return len(rows)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if len(rows) == 1:
+                self.failed += 1
+                logger.error(f"Ошибка сохранения AI usage: {e}")
+                return 0
+            logger.warning(f"Ошибка пакетной записи AI usage ({len(rows)} строк), пишем по одной: {e}")
+
+        # Одна плохая строка (например, пользователь уже удалён) не должна терять весь пакет
+        written = 0
+        for row in rows:
+            written += await self._write([row])
+        return written
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу и дописать остаток буфера (при остановке приложения)"""
+        task, self._task = self._task, None
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            # Без cancel: пакет, который задача сейчас пишет, не должен потеряться
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(task, return_exceptions=True)
+            self._stopping = False
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+ai_usage_recorder = AIUsageRecorder(
+    max_events=settings.ai_usage_buffer_max_events,
+    batch_size=settings.ai_usage_flush_batch_size,
+    flush_interval_ms=settings.ai_usage_flush_interval_ms,
+)
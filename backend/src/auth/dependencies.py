@@ -4,6 +4,7 @@ from src.auth.security import security
 from src.users.service import UserService
 from src.users.dependencies import get_user_service
 from src.users.models import UserModel
+from src.users.cache import principal_cache
 import logging
 
 # Payload dependencies
@@ -61,10 +62,22 @@ async def get_current_user_id(payload: TokenPayload = Depends(get_current_payloa
 
 
 async def get_current_user(
+    request: Request,
     user_id: int = Depends(get_current_user_id),
     user_service: UserService = Depends(get_user_service),
 ) -> UserModel:
-    user = await user_service.get_user_by_id(user_id=user_id)
+    """
+    Текущий пользователь: один раз за запрос (request.state) и из короткого
+    TTL-кэша между запросами (src/users/cache.py), иначе из БД.
+    """
+    user = getattr(request.state, "current_user", None)
+    if user is not None and user.id == user_id:
+        principal_cache.request_hits += 1
+    else:
+        user = await principal_cache.get_or_load(
+            user_id, lambda: user_service.get_user_by_id(user_id=user_id)
+        )
+        request.state.current_user = user
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Пользователь деактивирован")
     return user
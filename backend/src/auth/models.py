@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Модели модуля авторизации"""
+
+from __future__ import annotations
+
+from src.database.base import Base
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column, MappedAsDataclass
+from datetime import datetime, timezone
+
+
+class RevokedTokenModel(Base, MappedAsDataclass):
+    """Отозванный токен (по JTI); строка удаляется после истечения срока токена"""
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = mapped_column(String(64), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    revoked_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True
+    )
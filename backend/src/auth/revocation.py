@@ -0,0 +1,323 @@
+"""
+Хранилище отозванных токенов (logout).
+
+Токены отзываются по JTI и хранятся только до истечения их срока: после exp токен и так
+не пройдёт проверку, поэтому запись больше не нужна. Проверка в колбэке authx
+(set_callback_token_blocklist) синхронная и выполняется на каждый запрос — это всегда
+поиск в словаре процесса, O(1), без обращений к БД.
+
+Бэкенды (token_revocation_backend):
+- memory — словарь процесса; подходит для одного воркера и тестов, после перезапуска
+  отзывы теряются;
+- database — таблица revoked_tokens, общая для всех воркеров. Отзыв сразу пишется в БД
+  и в локальную копию, а остальные воркеры подтягивают новые строки каждые
+  sync_interval секунд. Истёкшие строки удаляются пакетами.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+import jwt
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.auth.models import RevokedTokenModel
+from src.core.dates import as_utc
+
+logger = logging.getLogger(__name__)
+
+# Срок хранения отзыва для токена без exp
+DEFAULT_REVOCATION_TTL_SECONDS = 24 * 3600
+
+# Длина ключа в revoked_tokens.jti (hex sha256)
+MAX_JTI_LENGTH = RevokedTokenModel.__table__.c.jti.type.length
+
+
+def token_revocation_key(token: str) -> Optional[Tuple[str, float]]:
+    """
+    JTI и срок действия (unix time) токена или None, если токен не разбирается.
+
+    Подпись не проверяется: результат используется только как ключ поиска,
+    сам токен проверяет authx. Токены без jti (и со слишком длинным jti) отзываются
+    по sha256 строки — ключ помещается в revoked_tokens.jti.
+    """
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False, "verify_exp": False})
+    except jwt.PyJWTError:
+        return None
+    jti = str(claims.get("jti") or "")
+    if not jti or len(jti) > MAX_JTI_LENGTH:
+        jti = hashlib.sha256((jti or token).encode()).hexdigest()
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)):
+        exp = time.time() + DEFAULT_REVOCATION_TTL_SECONDS
+    return jti, float(exp)
+
+
+class RevocationStore(ABC):
+    """Базовое хранилище: синхронная проверка O(1), асинхронный отзыв и фоновое обслуживание"""
+
+    def __init__(self, sync_interval: float = 5.0, cleanup_interval: float = 600.0, cleanup_batch_size: int = 1000):
+        self.sync_interval = sync_interval
+        self.cleanup_interval = cleanup_interval
+        self.cleanup_batch_size = max(1, cleanup_batch_size)
+        self._task: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    def is_revoked(self, jti: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        ...
+
+    async def sync(self) -> int:
+        """Подтянуть отзывы других воркеров; возвращает число новых записей"""
+        return 0
+
+    @abstractmethod
+    async def cleanup(self) -> int:
+        """Удалить истёкшие записи; возвращает число удалённых"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        ...
+
+    async def start(self) -> None:
+        """Первичная загрузка и запуск фоновой синхронизации и очистки"""
+        if self._task is not None:
+            return
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.error(f"Не удалось загрузить отозванные токены: {type(e).__name__}: {e}")
+        self._task = asyncio.create_task(self._maintenance())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _maintenance(self) -> None:
+        interval = max(0.1, min(self.sync_interval, self.cleanup_interval))
+        last_cleanup = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+                if time.monotonic() - last_cleanup >= self.cleanup_interval:
+                    last_cleanup = time.monotonic()
+                    await self.cleanup()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Обслуживание отозванных токенов: {type(e).__name__}: {e}")
+
+
+class MemoryRevocationStore(RevocationStore):
+    """
+    Отзывы в словаре процесса: JTI -> exp в порядке добавления.
+
+    Истёкшие записи удаляются при проверке и пакетной очисткой. max_entries — мягкий
+    предел: при его превышении удаляются истёкшие записи, а действующие отзывы не
+    вытесняются никогда — иначе отозванный токен снова стал бы действительным.
+    Если действующих отзывов больше предела, хранилище растёт дальше (с предупреждением);
+    следующая полная очистка — только после удвоения размера, так что добавление
+    остаётся O(1) в среднем.
+    """
+
+    def __init__(self, max_entries: int = 100_000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max(1, max_entries)
+        self._entries: OrderedDict[str, float] = OrderedDict()
+        self._prune_at = self.max_entries
+        self.overflows = 0
+        self.removed = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_revoked(self, jti: str) -> bool:
+        expires_at = self._entries.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            self._entries.pop(jti, None)
+            self.removed += 1
+            return False
+        return True
+
+    def add(self, jti: str, expires_at: float) -> bool:
+        """Добавить отзыв; False, если он уже был или срок токена прошёл"""
+        if expires_at <= time.time():
+            return False
+        known = self._entries.get(jti)
+        if known is not None and known >= expires_at:
+            return False
+        self._entries[jti] = expires_at
+        self._entries.move_to_end(jti)
+        if len(self._entries) > self._prune_at:
+            self._prune_expired()
+        return True
+
+    def _prune_expired(self) -> None:
+        now = time.time()
+        expired = [jti for jti, expires_at in self._entries.items() if expires_at <= now]
+        for jti in expired:
+            del self._entries[jti]
+        self.removed += len(expired)
+        if len(self._entries) > self.max_entries:
+            self.overflows += 1
+            logger.warning(
+                f"Действующих отзывов токенов больше token_revocation_max_entries "
+                f"({len(self._entries)} > {self.max_entries}), хранилище не вытесняет их"
+            )
+        self._prune_at = max(self.max_entries, 2 * len(self._entries))
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        self.add(jti, expires_at)
+
+    async def cleanup(self) -> int:
+        now = time.time()
+        removed = 0
+        expired = [jti for jti, expires_at in self._entries.items() if expires_at <= now]
+        for start in range(0, len(expired), self.cleanup_batch_size):
+            for jti in expired[start:start + self.cleanup_batch_size]:
+                if self._entries.pop(jti, None) is not None:
+                    removed += 1
+            # Между пакетами отдаём управление event loop
+            await asyncio.sleep(0)
+        self.removed += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "overflows": self.overflows, "removed": self.removed}
+
+
+class DatabaseRevocationStore(RevocationStore):
+    """Отзывы в таблице revoked_tokens с локальной копией для проверки без запросов к БД"""
+
+    # Перекрытие окна синхронизации: строки, закоммиченные с задержкой или с расхождением
+    # часов между воркерами, подтянутся при следующей синхронизации
+    SYNC_OVERLAP_SECONDS = 60
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        max_entries: int = 100_000,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._session_factory = session_factory
+        self._local = MemoryRevocationStore(max_entries=max_entries, cleanup_batch_size=self.cleanup_batch_size)
+        self._synced_until: Optional[datetime] = None
+        self.synced = 0
+        self.write_errors = 0
+        self.deleted = 0
+
+    @property
+    def session_factory(self) -> Callable[[], AsyncSession]:
+        if self._session_factory is None:
+            from src.database.client import async_session
+            self._session_factory = async_session
+        return self._session_factory
+
+    def is_revoked(self, jti: str) -> bool:
+        return self._local.is_revoked(jti)
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        """Отзыв действует в этом воркере сразу, в остальных — после их синхронизации"""
+        if not self._local.add(jti, expires_at):
+            return
+        try:
+            async with self.session_factory() as session:
+                await session.merge(RevokedTokenModel(
+                    jti=jti,
+                    expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc),
+                    revoked_at=datetime.now(timezone.utc),
+                ))
+                await session.commit()
+        except Exception as e:
+            self.write_errors += 1
+            logger.error(f"Не удалось сохранить отзыв токена {jti}: {type(e).__name__}: {e}")
+
+    async def sync(self) -> int:
+        now = datetime.now(timezone.utc)
+        query = select(
+            RevokedTokenModel.jti, RevokedTokenModel.expires_at, RevokedTokenModel.revoked_at
+        ).where(RevokedTokenModel.expires_at > now)
+        if self._synced_until is not None:
+            query = query.where(
+                RevokedTokenModel.revoked_at > self._synced_until - timedelta(seconds=self.SYNC_OVERLAP_SECONDS)
+            )
+        async with self.session_factory() as session:
+            rows = (await session.execute(query)).all()
+
+        added = 0
+        for jti, expires_at, revoked_at in rows:
+            if self._local.add(jti, as_utc(expires_at).timestamp()):
+                added += 1
+            revoked_at = as_utc(revoked_at)
+            if self._synced_until is None or revoked_at > self._synced_until:
+                self._synced_until = revoked_at
+        if self._synced_until is None:
+            self._synced_until = now
+        self.synced += added
+        return added
+
+    async def cleanup(self) -> int:
+        """Удалить истёкшие строки пакетами по cleanup_batch_size (короткие транзакции)"""
+        deleted = 0
+        while True:
+            now = datetime.now(timezone.utc)
+            async with self.session_factory() as session:
+                batch = (await session.execute(
+                    select(RevokedTokenModel.jti)
+                    .where(RevokedTokenModel.expires_at <= now)
+                    .limit(self.cleanup_batch_size)
+                )).scalars().all()
+                if batch:
+                    await session.execute(delete(RevokedTokenModel).where(RevokedTokenModel.jti.in_(batch)))
+                    await session.commit()
+            deleted += len(batch)
+            if len(batch) < self.cleanup_batch_size:
+                break
+        self.deleted += deleted
+        await self._local.cleanup()
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self._local.stats(),
+            "synced": self.synced,
+            "deleted": self.deleted,
+            "write_errors": self.write_errors,
+        }
+
+
+def create_revocation_store(
+    backend: str,
+    max_entries: int = 100_000,
+    sync_interval: float = 5.0,
+    cleanup_interval: float = 600.0,
+    cleanup_batch_size: int = 1000,
+) -> RevocationStore:
+    """Хранилище по имени бэкенда: memory или database"""
+    options = dict(
+        max_entries=max_entries,
+        sync_interval=sync_interval,
+        cleanup_interval=cleanup_interval,
+        cleanup_batch_size=cleanup_batch_size,
+    )
+    if backend == "memory":
+        return MemoryRevocationStore(**options)
+    if backend == "database":
+        return DatabaseRevocationStore(**options)
+    raise ValueError(f"Неизвестный бэкенд отзыва токенов: {backend}")
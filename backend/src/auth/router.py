@@ -57,6 +57,9 @@ async def login(request: Request, payload: LoginSchema, user_service: UserServic
     if not user.is_active:
         raise HTTPException(status_code=403, detail='Пользователь деактивирован')
 
+    # Хеш со старым числом итераций обновляется прозрачно для пользователя
+    await user_service.rehash_password_if_needed(user, payload.password)
+
     access_token = create_access_token_for_user(user_id=user.id)
     refresh_token = create_refresh_token_for_user(user_id=user.id)
 
@@ -171,7 +174,7 @@ async def telegram_auth(
     dependencies=[Depends(get_current_user)],
 )
 async def logout(token = Depends(get_access_token)) -> JSONResponse:
-    revoke_token(token.token)
+    await revoke_token(token.token)
     response = JSONResponse(content={'status': 'OK'})
     try:
         # Уберем куки, если они использовались
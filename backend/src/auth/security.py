@@ -8,6 +8,7 @@ from src.config import (
     settings,
 
 )
+from src.auth.revocation import create_revocation_store, token_revocation_key
 
 authx_config = AuthXConfig()
 authx_config.JWT_SECRET_KEY = settings.jwt_secret_key
@@ -21,15 +22,25 @@ authx_config.JWT_COOKIE_CSRF_PROTECT = False
 
 security = AuthX(config=authx_config)
 
-# In-memory blocklist
-REVOKED_TOKENS: set[str] = set()
+# Отозванные токены по JTI (см. src/auth/revocation.py)
+revocation_store = create_revocation_store(
+    settings.token_revocation_backend,
+    max_entries=settings.token_revocation_max_entries,
+    sync_interval=settings.token_revocation_sync_interval_seconds,
+    cleanup_interval=settings.token_revocation_cleanup_interval_seconds,
+    cleanup_batch_size=settings.token_revocation_cleanup_batch_size,
+)
 
-@security.set_callback_token_blocklist
 def is_token_revoked(token: str) -> bool:
-    return token in REVOKED_TOKENS
+    key = token_revocation_key(token)
+    return key is not None and revocation_store.is_revoked(key[0])
+
+security.set_callback_token_blocklist(is_token_revoked)
 
-def revoke_token(token: str) -> None:
-    REVOKED_TOKENS.add(token)
+async def revoke_token(token: str) -> None:
+    key = token_revocation_key(token)
+    if key is not None:
+        await revocation_store.revoke(*key)
 
 def create_access_token_for_user(user_id: int, **extra: Any) -> str:
     return security.create_access_token(uid=str(user_id), **extra)
@@ -0,0 +1,76 @@
+"""
+Сохранённые артефакты книги для инкрементального обновления.
+
+Вместе с готовой книгой в BookGenerationModel.artifacts сохраняются структура (outline),
+тексты глав с ключами фото, хронология, заключение и отпечаток входных данных каждой части.
+В режиме обновления (refresh_book_id в запросе) структура берётся из исходной книги,
+отпечатки пересчитываются по текущему дереву, и AI переписывает только части, чьи
+входные данные изменились — например, главу, в которую входит родственник с новой историей.
+
+Новые родственники, не попавшие ни в одну главу, в обновлённую книгу не добавляются —
+для изменения структуры книгу нужно сгенерировать заново.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from src.admin.models import BookGenerationModel
+from src.book.exceptions import BookRefreshUnavailableError
+from src.exceptions import ResourceNotFoundError
+
+ARTIFACTS_VERSION = 1
+
+
+def fingerprint(*parts: Any) -> str:
+    """Отпечаток входных данных части книги"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_artifacts(
+    outline: Dict[str, Any],
+    chapters: List[Dict[str, Any]],
+    timeline: Optional[List[Dict]],
+    timeline_fingerprint: Optional[str],
+    conclusion: str,
+    conclusion_fingerprint: str,
+) -> Dict[str, Any]:
+    """chapters — элементы {title, content, photo_keys, fingerprint}"""
+    return {
+        "version": ARTIFACTS_VERSION,
+        "outline": outline,
+        "chapters": chapters,
+        "timeline": timeline,
+        "timeline_fingerprint": timeline_fingerprint,
+        "conclusion": conclusion,
+        "conclusion_fingerprint": conclusion_fingerprint,
+    }
+
+
+def reusable_chapter(artifacts: Optional[Dict[str, Any]], index: int, chapter_fingerprint: str) -> Optional[str]:
+    """Сохранённый текст главы, если её входные данные не изменились"""
+    if not artifacts:
+        return None
+    chapters = artifacts.get("chapters") or []
+    if index < len(chapters) and chapters[index].get("fingerprint") == chapter_fingerprint:
+        return chapters[index].get("content")
+    return None
+
+
+async def load_refresh_source(session: AsyncSession, book_id: int, user_id: int) -> Dict[str, Any]:
+    """Артефакты готовой книги пользователя для обновления"""
+    book = await session.scalar(
+        select(BookGenerationModel)
+        .where(BookGenerationModel.id == book_id)
+        .options(undefer(BookGenerationModel.artifacts))
+    )
+    if book is None or book.user_id != user_id or book.status != "completed":
+        raise ResourceNotFoundError("Book", book_id)
+    artifacts = book.artifacts
+    if not artifacts or artifacts.get("version") != ARTIFACTS_VERSION or not artifacts.get("outline"):
+        raise BookRefreshUnavailableError(book_id)
+    return artifacts
@@ -0,0 +1,166 @@
+"""
+Скачивание готовых книг.
+
+PDF не передаётся в SSE: base64 раздувал файл на треть и держал всю строку в памяти.
+Событие result содержит только download_url. Файл отдаётся потоком из S3, а если
+загрузка в S3 не удалась — из локального spool-каталога; поддерживается HTTP Range
+(докачка и просмотр PDF по частям).
+
+Spool — временное хранилище: sync_book_spool периодически догружает книги из него
+в S3, а книги, которые не удалось загрузить за book_spool_ttl_seconds, помечает
+failed и удаляет. При нескольких экземплярах приложения book_spool_dir должен быть
+общим (сетевым) каталогом, иначе книга скачивается только с хоста, который её создал.
+"""
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.admin.models import BookGenerationModel
+from src.config import settings
+from src.core.ranges import CHUNK_SIZE, parse_range, read_file_range
+from src.exceptions import ResourceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+def book_download_url(book_id: int) -> str:
+    """Путь скачивания книги (относительно API)"""
+    return f"/api/v1/book/{book_id}/download"
+
+
+class BookSpool:
+    """Каталог для PDF, которые не удалось загрузить в S3 (очищается через sync_book_spool)"""
+
+    def __init__(self, directory: str, ttl_seconds: int):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+
+    def path(self, book_id: int) -> Path:
+        return self.directory / f"{book_id}.pdf"
+
+    def size(self, book_id: int) -> Optional[int]:
+        try:
+            return self.path(book_id).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    async def write(self, book_id: int, data: bytes) -> None:
+        await asyncio.to_thread(self._write, book_id, data)
+
+    async def read(self, book_id: int) -> bytes:
+        return await asyncio.to_thread(self.path(book_id).read_bytes)
+
+    async def remove(self, book_id: int) -> None:
+        await asyncio.to_thread(self.path(book_id).unlink, missing_ok=True)
+
+    def entries(self) -> List[Tuple[int, float]]:
+        """(book_id, mtime) файлов spool"""
+        result = []
+        for path in self.directory.glob("*.pdf"):
+            try:
+                result.append((int(path.stem), path.stat().st_mtime))
+            except (ValueError, FileNotFoundError):
+                pass
+        return result
+
+    def _write(self, book_id: int, data: bytes) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Запись через временный файл — параллельное скачивание не увидит недописанный PDF
+        tmp_path = self.path(book_id).with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, self.path(book_id))
+
+    async def stream(
+        self,
+        book_id: int,
+        start: int,
+        end: int,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Читать байты [start, end] файла порциями"""
+        handle = await asyncio.to_thread(open, self.path(book_id), "rb")
+        async for chunk in read_file_range(handle, start, end, chunk_size):
+            yield chunk
+
+
+book_spool = BookSpool(settings.book_spool_dir, settings.book_spool_ttl_seconds)
+
+
+async def sync_book_spool(session: AsyncSession, s3_manager, spool: BookSpool = book_spool) -> None:
+    """
+    Догрузить книги из spool в S3 и очистить spool.
+
+    После загрузки запись книги получает s3_key и файл удаляется. Если S3 так и не
+    принял книгу за ttl, запись помечается failed — иначе она оставалась бы completed
+    без файла и скачивание отвечало бы 404. Файлы без записи или уже загруженные удаляются.
+    """
+    expired_before = time.time() - spool.ttl_seconds
+    for book_id, mtime in await asyncio.to_thread(spool.entries):
+        expired = mtime < expired_before
+        book = await session.get(BookGenerationModel, book_id)
+        if book is None or book.s3_key:
+            await spool.remove(book_id)
+            continue
+        if book.status != "completed":
+            # Запись ещё не обновлена после записи в spool (или книга удалена из оборота)
+            if expired:
+                await spool.remove(book_id)
+            continue
+
+        filename = book.filename or f"family_book_{book_id}.pdf"
+        try:
+            data = await spool.read(book_id)
+            s3_key, s3_url, _ = await s3_manager.upload_bytes(data, filename, "application/pdf")
+        except Exception as e:
+            logger.warning(f"Книга {book_id} из spool не загружена в S3: {e}")
+            if expired:
+                book.status = "failed"
+                book.error_message = "Файл книги не удалось сохранить в S3"
+                await session.commit()
+                await spool.remove(book_id)
+            continue
+
+        book.s3_key = s3_key
+        book.s3_url = s3_url
+        await session.commit()
+        await spool.remove(book_id)
+
+
+async def get_downloadable_book(session: AsyncSession, book_id: int, user_id: int) -> BookGenerationModel:
+    """Готовая книга пользователя; чужие, несуществующие и незавершённые — ResourceNotFoundError"""
+    book = await session.get(BookGenerationModel, book_id)
+    if book is None or book.user_id != user_id or book.status != "completed":
+        raise ResourceNotFoundError("Book", book_id)
+    return book
+
+
+def range_response(
+    open_stream: Callable[[int, int], AsyncIterator[bytes]],
+    size: int,
+    range_header: Optional[str],
+    filename: str,
+) -> StreamingResponse:
+    """Потоковый ответ 200/206 по источнику open_stream(start, end)"""
+    byte_range = parse_range(range_header, size)
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "private, no-cache",
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    return StreamingResponse(
+        open_stream(start, end),
+        status_code=206 if byte_range else 200,
+        media_type="application/pdf",
+        headers=headers,
+    )
@@ -0,0 +1,66 @@
+from fastapi import status
+from src.exceptions import BaseAppException
+
+
+class BookException(BaseAppException):
+    """Базовое исключение модуля генерации книги"""
+    pass
+
+
+class BookRenderTimeoutError(BookException):
+    """Рендеринг PDF не уложился в отведённое время"""
+    def __init__(self, timeout: float):
+        super().__init__(
+            message=f"Рендеринг книги превысил {timeout:g} с",
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            details={
+                "error_type": "book_render_timeout",
+                "timeout_seconds": timeout,
+            }
+        )
+
+
+class BookNoRelativesError(BookException):
+    """В дереве нет родственников — книгу не из чего собрать"""
+    def __init__(self):
+        super().__init__(
+            message="Нет родственников для создания книги",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            details={"error_type": "book_no_relatives"}
+        )
+
+
+class BookJobLimitError(BookException):
+    """У пользователя уже выполняется максимум задач генерации"""
+    def __init__(self, limit: int):
+        super().__init__(
+            message=f"Уже выполняется генерация книги (не более {limit} одновременно)",
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            details={
+                "error_type": "book_job_limit",
+                "limit": limit,
+            }
+        )
+
+
+class BookTextNotCachedError(BookException):
+    """Режим reuse: текста для этих данных нет в кэше"""
+    def __init__(self):
+        super().__init__(
+            message="Текст книги для текущих данных не найден в кэше — сгенерируйте его заново",
+            status_code=status.HTTP_409_CONFLICT,
+            details={"error_type": "book_text_not_cached"}
+        )
+
+
+class BookRefreshUnavailableError(BookException):
+    """Книгу нельзя обновить: у неё нет сохранённой структуры и текстов глав"""
+    def __init__(self, book_id: int):
+        super().__init__(
+            message="Эту книгу нельзя обновить — сгенерируйте её заново",
+            status_code=status.HTTP_409_CONFLICT,
+            details={
+                "error_type": "book_refresh_unavailable",
+                "book_id": book_id,
+            }
+        )
@@ -0,0 +1,214 @@
+"""
+Предзагрузка изображений для PDF-книги.
+
+Все URL фотографий (профили и истории) собираются до рендеринга и скачиваются
+параллельно асинхронным клиентом; PDFBookGenerator получает готовые байты и
+во время вёрстки не делает ни одного сетевого запроса.
+ImageByteCache — LRU-кэш байтов по URL с ограничением суммарного объёма:
+одно и то же фото профиля не скачивается заново для каждой книги.
+
+Перед вёрсткой каждое фото уменьшается под своё место в книге (миниатюра в карточке
+древа или фото в главе) с разрешением settings.book_image_dpi и перекодируется в
+прогрессивный JPEG: снимки с телефона по 8–12 Мп иначе попадают в PDF целиком.
+Уменьшенные копии кэшируются по (url, размер). Форматы, которые Pillow не декодирует
+(например, HEIC), в книгу не попадают.
+"""
+import asyncio
+import logging
+import math
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Hashable, Iterable, Optional
+
+import httpx
+from PIL import Image, ImageOps
+
+from reportlab.lib.units import cm
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Размер места под фото в PDF (в пунктах, по большей стороне)
+CARD_PHOTO_POINTS = 30
+INLINE_PHOTO_POINTS = 14 * cm
+
+
+class ImageByteCache:
+    """LRU-кэш изображений (url или (url, размер) -> bytes) с ограничением суммарного объёма"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: Hashable) -> Optional[bytes]:
+        data = self._entries.get(url)
+        if data is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(url)
+        self.hits += 1
+        return data
+
+    def put(self, url: Hashable, data: bytes) -> None:
+        """Положить изображение, вытесняя самые давно использованные при превышении лимита"""
+        if len(data) > self.max_bytes:
+            return
+        self._drop(url)
+        self._entries[url] = data
+        self._total_bytes += len(data)
+        while self._total_bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики кэша"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _drop(self, url: Hashable) -> None:
+        data = self._entries.pop(url, None)
+        if data is not None:
+            self._total_bytes -= len(data)
+
+
+book_image_cache = ImageByteCache(settings.book_image_cache_max_bytes)
+book_derived_image_cache = ImageByteCache(settings.book_derived_image_cache_max_bytes)
+
+
+async def _download(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, url: str) -> Optional[bytes]:
+    async with semaphore:
+        try:
+            response = await client.get(url)
+        except Exception as e:
+            logger.error(f"Исключение при скачивании изображения {url[:100]}: {type(e).__name__}: {e}")
+            return None
+    if response.status_code == 200 and response.content:
+        return response.content
+    logger.warning(f"Ошибка скачивания изображения: status={response.status_code}, size={len(response.content)}, url={url[:100]}")
+    return None
+
+
+async def prefetch_images(
+    urls: Iterable[str],
+    cache: ImageByteCache = book_image_cache,
+    concurrency: Optional[int] = None,
+    timeout: float = 15.0,
+) -> Dict[str, bytes]:
+    """
+    Скачать изображения параллельно (с учётом кэша).
+
+    Возвращает url -> bytes только для успешно полученных изображений;
+    недоступные фото в книге заменяются иконкой/пропускаются, как и раньше.
+    """
+    images: Dict[str, bytes] = {}
+    missing = []
+    for url in dict.fromkeys(u for u in urls if u):
+        data = cache.get(url)
+        if data is not None:
+            images[url] = data
+        else:
+            missing.append(url)
+
+    if not missing:
+        return images
+
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.book_image_prefetch_concurrency))
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+        results = await asyncio.gather(*(_download(client, semaphore, url) for url in missing))
+
+    downloaded = 0
+    for url, data in zip(missing, results):
+        if data is not None:
+            cache.put(url, data)
+            images[url] = data
+            downloaded += 1
+
+    logger.info(f"Предзагрузка изображений: скачано {downloaded} из {len(missing)}, из кэша {len(images) - downloaded}")
+    return images
+
+
+def slot_pixels(points: float, dpi: Optional[int] = None) -> int:
+    """Размер в пикселях для места в points при заданном разрешении"""
+    return math.ceil(points / 72 * (dpi or settings.book_image_dpi))
+
+
+def downscale_image(data: bytes, max_pixels: int, quality: Optional[int] = None) -> Optional[bytes]:
+    """
+    Уменьшить изображение до max_pixels по большей стороне и перекодировать в прогрессивный JPEG.
+
+    Маленькие JPEG возвращаются как есть (повторное сжатие только ухудшит качество);
+    None — изображение не декодируется.
+    """
+    try:
+        with Image.open(BytesIO(data)) as source:
+            if source.format == "JPEG" and max(source.size) <= max_pixels:
+                return data
+            image = ImageOps.exif_transpose(source)
+            image.thumbnail((max_pixels, max_pixels), Image.Resampling.LANCZOS)
+            if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+                # В JPEG нет прозрачности — кладём на белый фон, как её и показывает PDF
+                rgba = image.convert("RGBA")
+                image = Image.new("RGB", rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel("A"))
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            output = BytesIO()
+            image.save(
+                output, "JPEG",
+                quality=quality or settings.book_image_jpeg_quality,
+                progressive=True,
+                optimize=True,
+            )
+            return output.getvalue()
+    except Exception as e:
+        logger.warning(f"Не удалось уменьшить изображение: {type(e).__name__}: {e}")
+        return None
+
+
+async def prepare_images(
+    images: Dict[str, bytes],
+    points: float,
+    cache: ImageByteCache = book_derived_image_cache,
+) -> Dict[str, bytes]:
+    """
+    Уменьшенные копии изображений (url -> bytes) для места размером points.
+
+    Пересжатие выполняется в потоках (Pillow отпускает GIL); изображения, которые
+    не удалось обработать, возвращаются без изменений.
+    """
+    max_pixels = slot_pixels(points)
+    prepared: Dict[str, bytes] = {}
+    missing = []
+    for url, data in images.items():
+        derived = cache.get((url, max_pixels))
+        if derived is not None:
+            prepared[url] = derived
+        else:
+            missing.append(url)
+
+    results = await asyncio.gather(*(
+        asyncio.to_thread(downscale_image, images[url], max_pixels) for url in missing
+    ))
+    for url, derived in zip(missing, results):
+        if derived is None:
+            prepared[url] = images[url]
+            continue
+        cache.put((url, max_pixels), derived)
+        prepared[url] = derived
+
+    if missing:
+        original = sum(len(images[url]) for url in missing)
+        reduced = sum(len(prepared[url]) for url in missing)
+        logger.info(f"Уменьшение изображений до {max_pixels}px: {len(missing)} шт, {original} -> {reduced} байт")
+    return prepared
@@ -0,0 +1,419 @@
+"""
+Фоновые задачи генерации книг.
+
+Генерация идёт минуты, поэтому вместо выполнения внутри HTTP-ответа запрос
+только ставит задачу в очередь (запись BookGenerationModel со статусом queued),
+а пул воркеров выполняет её в своих сессиях БД и сохраняет stage/progress.
+Клиент может отключиться и переподключиться к SSE задачи или опрашивать её состояние.
+
+- Лимит активных задач на пользователя — settings.book_jobs_per_user (проверяется
+  под блокировкой строки пользователя), всего одновременных задач на процесс —
+  settings.book_job_workers.
+- Задача попадает в очередь только после коммита транзакции запроса.
+- Воркер «захватывает» задачу условным UPDATE queued -> generating, поэтому одна задача
+  не выполнится дважды даже при нескольких процессах приложения.
+- При старте задачи queued и брошенные generating (без прогресса дольше
+  book_job_stale_seconds) ставятся в очередь заново; при остановке текущие задачи
+  возвращаются в queued. Восстанавливаются и учитываются в лимите только записи
+  kind="job": записи SSE-генерации принадлежат потоку, который их создал.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.admin.models import BookGenerationModel
+from src.book.artifacts import load_refresh_source
+from src.book.downloads import BookSpool, book_download_url, book_spool
+from src.book.exceptions import BookException, BookJobLimitError
+from src.book.schemas import BookGenerateRequestSchema, BookJobSchema
+from src.book.service import BookService
+from src.config import settings
+from src.database.hooks import on_commit
+from src.exceptions import ResourceNotFoundError
+from src.family.repository import FamilyRelationRepository, FamilyRelationshipRepository
+from src.family.service import FamilyRelationService, FamilyRelationshipService
+from src.family.story_repository import InterviewMessageRepository, StoryRepository
+from src.users.models import UserModel
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "generating")
+# kind записей фоновых задач; записи генерации через SSE (kind="stream") ведёт сам поток
+JOB_KIND = "job"
+TERMINAL_EVENT_TYPES = ("result", "error")
+
+
+def job_to_schema(job: BookGenerationModel) -> BookJobSchema:
+    return BookJobSchema(
+        id=job.id,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress or 0,
+        filename=job.filename,
+        download_url=book_download_url(job.id) if job.status == "completed" else None,
+        s3_url=job.s3_url,
+        error_message=job.error_message,
+        created_at=job.created_at,
+        completed_at=job.completed_at,
+    )
+
+
+def job_events(job: BookGenerationModel) -> List[Dict[str, Any]]:
+    """События SSE, описывающие сохранённое состояние задачи"""
+    if job.status == "completed":
+        return [{
+            "type": "result",
+            "job_id": job.id,
+            "filename": job.filename,
+            "download_url": book_download_url(job.id),
+            "s3_url": job.s3_url,
+        }]
+    if job.status == "failed":
+        return [{"type": "error", "job_id": job.id, "message": job.error_message or "Ошибка генерации"}]
+    return [{
+        "type": "progress",
+        "job_id": job.id,
+        "stage": job.stage or job.status,
+        "progress": job.progress or 0,
+    }]
+
+
+@dataclass
+class _LiveJob:
+    """Задача, выполняемая (или ожидающая) в этом процессе: последнее событие и подписчики SSE"""
+    user_id: int
+    last_event: Dict[str, Any]
+    listeners: Set[asyncio.Queue] = field(default_factory=set)
+
+
+class BookJobManager:
+    """Очередь и пул воркеров фоновой генерации книг"""
+
+    def __init__(
+        self,
+        workers: int,
+        per_user_limit: int,
+        stale_seconds: int,
+        poll_interval: float,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        s3_manager_factory: Optional[Callable[[], Any]] = None,
+        book_service_factory: Callable[[], BookService] = BookService,
+        spool: BookSpool = book_spool,
+    ):
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+        self._session_factory = session_factory
+        self._s3_manager_factory = s3_manager_factory
+        self.book_service_factory = book_service_factory
+        self.spool = spool
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._live: Dict[int, _LiveJob] = {}
+
+    @property
+    def session_factory(self) -> Callable[[], AsyncSession]:
+        if self._session_factory is None:
+            from src.database.client import async_session
+            self._session_factory = async_session
+        return self._session_factory
+
+    @session_factory.setter
+    def session_factory(self, factory: Callable[[], AsyncSession]) -> None:
+        self._session_factory = factory
+
+    def _create_s3_manager(self):
+        if self._s3_manager_factory is None:
+            from src.storage.s3.dependencies import get_s3_manager
+            self._s3_manager_factory = get_s3_manager
+        return self._s3_manager_factory()
+
+    # ==================== ЖИЗНЕННЫЙ ЦИКЛ ====================
+
+    async def start(self) -> None:
+        """Вернуть в очередь незавершённые задачи и запустить воркеры"""
+        if self._tasks:
+            return
+        try:
+            await self._recover()
+        except Exception as e:
+            logger.error(f"Не удалось восстановить очередь задач генерации книг: {e}")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def stop(self) -> None:
+        """Остановить воркеры; выполняемые задачи возвращаются в queued"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _recover(self) -> None:
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=self.stale_seconds)
+        async with self.session_factory() as session:
+            await session.execute(
+                update(BookGenerationModel)
+                .where(
+                    BookGenerationModel.kind == JOB_KIND,
+                    BookGenerationModel.status == "generating",
+                    or_(
+                        BookGenerationModel.updated_at.is_(None),
+                        BookGenerationModel.updated_at < stale_before,
+                    ),
+                )
+                .values(status="queued", stage=None, progress=0)
+            )
+            result = await session.execute(
+                select(BookGenerationModel.id, BookGenerationModel.user_id)
+                .where(BookGenerationModel.kind == JOB_KIND, BookGenerationModel.status == "queued")
+                .order_by(BookGenerationModel.created_at, BookGenerationModel.id)
+            )
+            jobs = result.all()
+            await session.commit()
+
+        for job_id, user_id in jobs:
+            self._enqueue(job_id, user_id)
+        if jobs:
+            logger.info(f"Возвращено в очередь задач генерации книг: {len(jobs)}")
+
+    # ==================== ПОСТАНОВКА И ЧТЕНИЕ ====================
+
+    async def submit(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        request: BookGenerateRequestSchema,
+    ) -> BookGenerationModel:
+        """
+        Создать задачу генерации в транзакции запроса.
+
+        В очередь она попадает после коммита этой транзакции — воркер не увидит
+        незакоммиченную запись, а при откате запроса задача не запустится.
+        Строка пользователя блокируется (FOR UPDATE) до коммита: параллельные
+        запросы одного пользователя проверяют лимит по очереди и не превышают его.
+        """
+        await session.execute(select(UserModel.id).where(UserModel.id == user_id).with_for_update())
+        active = await session.scalar(
+            select(func.count())
+            .select_from(BookGenerationModel)
+            .where(
+                BookGenerationModel.user_id == user_id,
+                BookGenerationModel.kind == JOB_KIND,
+                BookGenerationModel.status.in_(ACTIVE_STATUSES),
+            )
+        )
+        if (active or 0) >= self.per_user_limit:
+            raise BookJobLimitError(self.per_user_limit)
+        if request.refresh_book_id:
+            # Исходная книга проверяется сразу, а не после постановки в очередь
+            await load_refresh_source(session, request.refresh_book_id, user_id)
+
+        now = datetime.now(timezone.utc)
+        job = BookGenerationModel(
+            user_id=user_id,
+            status="queued",
+            kind=JOB_KIND,
+            filename=f"family_book_{user_id}.pdf",
+            request_params=request.model_dump(mode="json"),
+            created_at=now,
+            updated_at=now,
+        )
+        session.add(job)
+        await session.flush()
+
+        job_id = job.id
+        on_commit(session, lambda: self._enqueue(job_id, user_id))
+        return job
+
+    async def get_job(self, session: AsyncSession, job_id: int, user_id: int) -> BookGenerationModel:
+        """Задача пользователя; чужие и несуществующие — ResourceNotFoundError"""
+        job = await session.get(BookGenerationModel, job_id)
+        if job is None or job.user_id != user_id:
+            raise ResourceNotFoundError("BookJob", job_id)
+        return job
+
+    async def check_access(self, job_id: int, user_id: int) -> None:
+        """
+        Проверка владельца перед SSE.
+
+        Для задач этого процесса — по памяти, иначе короткой отдельной сессией:
+        сессия запроса не должна оставаться открытой на всё время потока.
+        """
+        live = self._live.get(job_id)
+        if live is not None:
+            if live.user_id != user_id:
+                raise ResourceNotFoundError("BookJob", job_id)
+            return
+        async with self.session_factory() as session:
+            await self.get_job(session, job_id, user_id)
+
+    async def stream_events(self, job_id: int) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        События задачи для SSE: текущее состояние, затем обновления до результата или ошибки.
+
+        Задачи этого процесса транслируются из памяти; выполняемые другим процессом
+        (или уже завершённые) — опросом БД раз в poll_interval.
+        """
+        live = self._live.get(job_id)
+        if live is None:
+            async for item in self._poll_events(job_id):
+                yield item
+            return
+
+        listener: asyncio.Queue = asyncio.Queue()
+        live.listeners.add(listener)
+        try:
+            yield live.last_event
+            if live.last_event["type"] in TERMINAL_EVENT_TYPES:
+                return
+            while True:
+                item = await listener.get()
+                yield item
+                if item["type"] in TERMINAL_EVENT_TYPES:
+                    return
+        finally:
+            live.listeners.discard(listener)
+
+    async def _poll_events(self, job_id: int) -> AsyncGenerator[Dict[str, Any], None]:
+        last = None
+        while True:
+            async with self.session_factory() as session:
+                job = await session.get(BookGenerationModel, job_id)
+            if job is None:
+                return
+            for item in job_events(job):
+                if item != last:
+                    yield item
+                    last = item
+            if job.status not in ACTIVE_STATUSES:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    # ==================== ВЫПОЛНЕНИЕ ====================
+
+    def _enqueue(self, job_id: int, user_id: int) -> None:
+        self._live[job_id] = _LiveJob(
+            user_id=user_id,
+            last_event={"type": "progress", "job_id": job_id, "stage": "queued", "progress": 0},
+        )
+        self._queue.put_nowait(job_id)
+
+    def _publish(self, job_id: int, item: Dict[str, Any]) -> None:
+        live = self._live.get(job_id)
+        if live is None:
+            return
+        item = {**item, "job_id": job_id}
+        live.last_event = item
+        for listener in live.listeners:
+            listener.put_nowait(item)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self.run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка фоновой задачи книги {job_id}: {type(e).__name__}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _update_job(self, session: AsyncSession, job_id: int, **values) -> None:
+        values.setdefault("updated_at", datetime.now(timezone.utc))
+        await session.execute(
+            update(BookGenerationModel)
+            .where(BookGenerationModel.id == job_id)
+            .values(**values)
+        )
+        await session.commit()
+
+    async def run_job(self, job_id: int) -> None:
+        """Выполнить задачу: захватить, сгенерировать книгу, сохранять прогресс после каждого этапа"""
+        async with self.session_factory() as session:
+            claimed = await session.execute(
+                update(BookGenerationModel)
+                .where(BookGenerationModel.id == job_id, BookGenerationModel.status == "queued")
+                .values(status="generating", updated_at=datetime.now(timezone.utc))
+            )
+            if claimed.rowcount != 1:
+                # Задачу уже выполняет другой процесс или она удалена
+                await session.rollback()
+                self._live.pop(job_id, None)
+                return
+            job = await session.get(BookGenerationModel, job_id)
+            await session.commit()
+
+            try:
+                await self._generate(session, job)
+            except asyncio.CancelledError:
+                # Остановка приложения — задача продолжится после перезапуска
+                await session.rollback()
+                await self._update_job(session, job_id, status="queued", stage=None, progress=0)
+                raise
+            except Exception as e:
+                await session.rollback()
+                message = e.message if isinstance(e, BookException) else f"Ошибка генерации: {e}"
+                await self._update_job(session, job_id, status="failed", error_message=message[:512])
+                self._publish(job_id, {"type": "error", "message": message})
+            finally:
+                self._live.pop(job_id, None)
+
+    async def _generate(self, session: AsyncSession, job: BookGenerationModel) -> None:
+        s3_manager = self._create_s3_manager()
+        relation_repository = FamilyRelationRepository(session)
+        story_repository = StoryRepository(session)
+        family_service = FamilyRelationService(
+            relation_repository, s3_manager, story_repository, InterviewMessageRepository(session)
+        )
+        relationship_service = FamilyRelationshipService(
+            FamilyRelationshipRepository(session), relation_repository, story_repository
+        )
+        request = BookGenerateRequestSchema(**(job.request_params or {}))
+        previous_artifacts = None
+        if request.refresh_book_id:
+            previous_artifacts = await load_refresh_source(session, request.refresh_book_id, job.user_id)
+
+        async for item in self.book_service_factory().generate_book_events(
+            job.user_id, request, family_service, relationship_service, s3_manager, previous_artifacts
+        ):
+            if item["type"] != "result":
+                await self._update_job(session, job.id, stage=item.get("stage"), progress=item.get("progress", 0))
+                self._publish(job.id, item)
+                continue
+
+            if not item["s3_key"]:
+                # S3 недоступен — книга будет отдаваться из локального spool
+                await self.spool.write(job.id, item["pdf_bytes"])
+            now = datetime.now(timezone.utc)
+            await self._update_job(
+                session, job.id,
+                status="completed",
+                stage="done",
+                progress=100,
+                s3_key=item["s3_key"],
+                s3_url=item["s3_url"],
+                file_size_bytes=len(item["pdf_bytes"]),
+                artifacts=item.get("artifacts"),
+                completed_at=now,
+                updated_at=now,
+            )
+            self._publish(job.id, {
+                "type": "result",
+                "filename": item["filename"],
+                "download_url": book_download_url(job.id),
+                "s3_url": item["s3_url"],
+            })
+
+
+book_job_manager = BookJobManager(
+    workers=settings.book_job_workers,
+    per_user_limit=settings.book_jobs_per_user,
+    stale_seconds=settings.book_job_stale_seconds,
+    poll_interval=settings.book_job_poll_interval_seconds,
+)
@@ -4,8 +4,10 @@
 import os
 import re
 import logging
+import threading
+from dataclasses import dataclass
 from io import BytesIO
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import date
 from pathlib import Path
 
@@ -22,6 +24,7 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.graphics.shapes import Drawing, Line, Circle, Rect
 from reportlab.graphics import renderPDF
+from reportlab.lib.utils import ImageReader
 
 from src.book.schemas import BookStyle, BookTheme
 
@@ -31,6 +34,154 @@ logger = logging.getLogger(__name__)
 PHOTO_MARKER_RE = re.compile(r'\[PHOTO:(\d+):([^:]+):(\d+)\]')
 
 
+@dataclass(frozen=True)
+class BookFonts:
+    """Зарегистрированные в ReportLab шрифты книги"""
+    base_font: str
+    bold_font: str
+    fonts_available: bool
+
+
+_book_fonts: Optional[BookFonts] = None
+_book_fonts_lock = threading.Lock()
+
+
+def get_book_fonts() -> BookFonts:
+    """
+    Шрифты книги; поиск файлов и регистрация выполняются один раз на процесс.
+
+    Вызывается при старте процесса рендеринга (initializer пула) или при первой книге.
+    """
+    global _book_fonts
+    if _book_fonts is None:
+        with _book_fonts_lock:
+            if _book_fonts is None:
+                _book_fonts = _register_fonts()
+    return _book_fonts
+
+
+def _register_fonts() -> BookFonts:
+    """Поиск и регистрация шрифтов с поддержкой кириллицы"""
+    import platform
+
+    registered_fonts = {}
+
+    # Проверяем, какие шрифты уже зарегистрированы
+    def is_font_registered(font_name):
+        try:
+            pdfmetrics.getFont(font_name)
+            return True
+        except:
+            return False
+
+    # Определяем систему
+    system = platform.system()
+    windows_fonts_dir = "C:/Windows/Fonts/"
+
+    # Список шрифтов для поиска (в порядке приоритета)
+    font_candidates = []
+
+    # Локальные папки для шрифтов (приоритет выше системных)
+    local_fonts_dir = os.path.join(os.path.dirname(__file__), "fonts/")
+    backend_fonts_dir = os.path.join(os.path.dirname(__file__), "../../../fonts/")
+
+    if system == "Windows":
+        # Сначала проверяем локальные папки проекта (DejaVu)
+        dejavu_files = {
+            "DejaVuSans": "DejaVuSans.ttf",
+            "DejaVuSans-Bold": "DejaVuSans-Bold.ttf",
+        }
+        for font_name, font_file in dejavu_files.items():
+            font_candidates.append((font_name, font_file, local_fonts_dir))
+            font_candidates.append((font_name, font_file, backend_fonts_dir))
+
+        # Затем системные Windows шрифты с поддержкой кириллицы
+        font_candidates.extend([
+            ("DejaVuSans", "arial.ttf", windows_fonts_dir),
+            ("DejaVuSans-Bold", "arialbd.ttf", windows_fonts_dir),
+            ("DejaVuSans", "calibri.ttf", windows_fonts_dir),
+            ("DejaVuSans-Bold", "calibrib.ttf", windows_fonts_dir),
+            ("DejaVuSans", "times.ttf", windows_fonts_dir),
+            ("DejaVuSans-Bold", "timesbd.ttf", windows_fonts_dir),
+        ])
+    else:
+        # Linux/Mac - ищем DejaVu
+        possible_paths = [
+            "/usr/share/fonts/truetype/dejavu/",
+            "/usr/share/fonts/dejavu/",
+            "/usr/share/fonts/TTF/",
+            os.path.join(os.path.dirname(__file__), "fonts/"),
+            os.path.join(os.path.dirname(__file__), "../../../fonts/"),
+        ]
+
+        dejavu_files = {
+            "DejaVuSans": "DejaVuSans.ttf",
+            "DejaVuSans-Bold": "DejaVuSans-Bold.ttf",
+        }
+
+        for font_name, font_file in dejavu_files.items():
+            for path in possible_paths:
+                font_candidates.append((font_name, font_file, path))
+
+    # Регистрируем шрифты
+    for font_name, font_file, base_path in font_candidates:
+        if font_name in registered_fonts:
+            continue
+
+        if is_font_registered(font_name):
+            registered_fonts[font_name] = True
+            logger.info(f"Шрифт {font_name} уже зарегистрирован")
+            continue
+
+        font_path = os.path.join(base_path, font_file)
+        if os.path.exists(font_path):
+            try:
+                pdfmetrics.registerFont(TTFont(font_name, font_path))
+                registered_fonts[font_name] = True
+                logger.info(f"Успешно зарегистрирован шрифт {font_name} из {font_path}")
+            except Exception as e:
+                logger.warning(f"Не удалось зарегистрировать {font_name} из {font_path}: {e}")
+                continue
+
+    # Если не нашли шрифты, пробуем зарегистрировать любые доступные Windows шрифты
+    if not registered_fonts and system == "Windows":
+        windows_fonts = [
+            ("DejaVuSans", "arial.ttf"),
+            ("DejaVuSans-Bold", "arialbd.ttf"),
+            ("DejaVuSans", "calibri.ttf"),
+            ("DejaVuSans-Bold", "calibrib.ttf"),
+            ("DejaVuSans", "tahoma.ttf"),
+            ("DejaVuSans-Bold", "tahomabd.ttf"),
+        ]
+
+        for font_name, font_file in windows_fonts:
+            if font_name in registered_fonts:
+                continue
+            font_path = os.path.join(windows_fonts_dir, font_file)
+            if os.path.exists(font_path):
+                try:
+                    pdfmetrics.registerFont(TTFont(font_name, font_path))
+                    registered_fonts[font_name] = True
+                    logger.info(f"Зарегистрирован {font_name} из {font_path}")
+                    break
+                except Exception as e:
+                    logger.warning(f"Ошибка регистрации {font_name}: {e}")
+
+    # Устанавливаем доступные шрифты
+    if registered_fonts.get("DejaVuSans"):
+        fonts = BookFonts(
+            base_font="DejaVuSans",
+            bold_font="DejaVuSans-Bold" if registered_fonts.get("DejaVuSans-Bold") else "DejaVuSans",
+            fonts_available=True,
+        )
+    else:
+        logger.warning("Кириллические шрифты не найдены! Используется Times-Roman (может не поддерживать все символы)")
+        fonts = BookFonts(base_font="Times-Roman", bold_font="Times-Bold", fonts_available=bool(registered_fonts))
+
+    logger.info(f"Итоговые шрифты: base_font={fonts.base_font}, bold_font={fonts.bold_font}, fonts_available={fonts.fonts_available}")
+    return fonts
+
+
 class TreeBranchLine(Flowable):
     """Декоративная линия-ветка для семейного древа"""
     def __init__(self, width, color, style='solid'):
@@ -106,14 +257,14 @@ class DecorativeHeader(Flowable):
 
 
 class RelativeCard(Flowable):
-    """Карточка родственника для семейного древа"""
-    def __init__(self, name, dates, gender, color_scheme, photo_url=None, bold_font="Helvetica-Bold", regular_font="Helvetica"):
+    """Карточка родственника для семейного древа (photo — уже декодированный ImageReader)"""
+    def __init__(self, name, dates, gender, color_scheme, photo=None, bold_font="Helvetica-Bold", regular_font="Helvetica"):
         Flowable.__init__(self)
         self.name = name
         self.dates = dates
         self.gender = gender
         self.color_scheme = color_scheme
-        self.photo_url = photo_url
+        self.photo = photo
         self.bold_font = bold_font
         self.regular_font = regular_font
         self.width = 180
@@ -140,32 +291,26 @@ class RelativeCard(Flowable):
         self.canv.setLineWidth(2)
         self.canv.roundRect(0, 0, self.width, self.height, 10, fill=1, stroke=1)
 
-        # Пытаемся загрузить и отобразить фото
+        # Отображаем фото, если оно было предзагружено
         photo_drawn = False
-        if self.photo_url:
+        if self.photo is not None:
             try:
-                import httpx
-                from reportlab.lib.utils import ImageReader
-
-                response = httpx.get(self.photo_url, timeout=5, follow_redirects=True)
-                if response.status_code == 200:
-                    img = ImageReader(BytesIO(response.content))
-                    # Фото в круглой области слева
-                    self.canv.saveState()
-                    # Создаем круглую маску через clip
-                    path = self.canv.beginPath()
-                    path.circle(25, self.height - 25, 15)
-                    self.canv.clipPath(path, stroke=0)
-                    # Рисуем изображение (немного больше чтобы заполнить круг)
-                    self.canv.drawImage(img, 10, self.height - 40, width=30, height=30, mask='auto')
-                    self.canv.restoreState()
-                    # Рисуем границу круга
-                    self.canv.setStrokeColor(border_color)
-                    self.canv.setLineWidth(2)
-                    self.canv.circle(25, self.height - 25, 15, fill=0, stroke=1)
-                    photo_drawn = True
+                # Фото в круглой области слева
+                self.canv.saveState()
+                # Создаем круглую маску через clip
+                path = self.canv.beginPath()
+                path.circle(25, self.height - 25, 15)
+                self.canv.clipPath(path, stroke=0)
+                # Рисуем изображение (немного больше чтобы заполнить круг)
+                self.canv.drawImage(self.photo, 10, self.height - 40, width=30, height=30, mask='auto')
+                self.canv.restoreState()
+                # Рисуем границу круга
+                self.canv.setStrokeColor(border_color)
+                self.canv.setLineWidth(2)
+                self.canv.circle(25, self.height - 25, 15, fill=0, stroke=1)
+                photo_drawn = True
             except Exception:
-                pass  # Fallback на иконку если фото недоступно
+                pass  # Fallback на иконку если фото не декодируется
 
         if not photo_drawn:
             # Иконка пола (если фото не загружено)
@@ -189,12 +334,12 @@ class RelativeCard(Flowable):
 
 
 class InlinePhoto(Flowable):
-    """Фотография, встроенная в текст главы — центрированная с тенью и подписью"""
-    def __init__(self, image_data, caption="", max_width=14*cm, border_width=0,
+    """Фотография, встроенная в текст главы — центрированная с тенью и подписью (image — ImageReader)"""
+    def __init__(self, image, caption="", max_width=14*cm, border_width=0,
                  border_color=None, caption_style="italic", base_font="DejaVuSans",
                  shadow=True, bg_color=None, caption_color=None, page_width=17*cm):
         Flowable.__init__(self)
-        self.image_data = image_data
+        self.image = image
         self.caption = caption
         self.max_width = max_width
         self.border_width = border_width
@@ -207,10 +352,8 @@ class InlinePhoto(Flowable):
         self.page_width = page_width
 
         # Calculate dimensions
-        from reportlab.lib.utils import ImageReader
         try:
-            img_reader = ImageReader(BytesIO(image_data))
-            iw, ih = img_reader.getSize()
+            iw, ih = image.getSize()
             aspect = ih / iw
             self.img_width = min(max_width, iw)
             self.img_height = self.img_width * aspect
@@ -234,8 +377,6 @@ class InlinePhoto(Flowable):
         if not self.valid:
             return
 
-        from reportlab.lib.utils import ImageReader
-
         padding = 12
         shadow_pad = 6 if self.shadow else 0
 
@@ -269,9 +410,8 @@ class InlinePhoto(Flowable):
         )
 
         # Image
-        img_reader = ImageReader(BytesIO(self.image_data))
         self.canv.drawImage(
-            img_reader,
+            self.image,
             x_frame + padding,
             y_frame + padding,
             width=self.img_width, height=self.img_height,
@@ -497,16 +637,22 @@ class PDFBookGenerator:
         },
     }
 
+    # (style, theme) -> (config, styles)
+    _style_sheets: Dict[Tuple[BookStyle, BookTheme], Tuple[Dict[str, Any], Dict[str, ParagraphStyle]]] = {}
+
     def __init__(self, style: BookStyle = BookStyle.CLASSIC, theme: BookTheme = BookTheme.LIGHT):
         self.style = style
         self.theme = theme
-        # Build config: start with light, overlay dark if needed
-        self.config = dict(self.STYLE_CONFIGS_LIGHT[style])
-        if theme == BookTheme.DARK:
-            self.config.update(self.DARK_THEME_OVERRIDES.get(style, {}))
-        self._register_fonts()
-        self.styles = self._create_styles()
+        fonts = get_book_fonts()
+        self.base_font = fonts.base_font
+        self.bold_font = fonts.bold_font
+        self.fonts_available = fonts.fonts_available
+        # Конфигурация и стили общие для всех книг с тем же (style, theme) — только для чтения
+        self.config, self.styles = self._style_sheet(style, theme)
         self.story_photos: Optional[Dict[str, str]] = None
+        self.images: Dict[str, bytes] = {}
+        self.card_images: Dict[str, bytes] = {}
+        self._image_readers: Dict[tuple, Optional[ImageReader]] = {}
 
     def _prepare_text(self, text: str) -> str:
         """Подготовка текста для корректного отображения в PDF"""
@@ -522,166 +668,60 @@ class PDFBookGenerator:
         text = text.replace('\ufeff', '')  # BOM
         return text.strip()
 
-    def _register_fonts(self):
-        """Регистрация шрифтов с поддержкой кириллицы"""
-        import platform
-
-        registered_fonts = {}
-
-        # Проверяем, какие шрифты уже зарегистрированы
-        def is_font_registered(font_name):
-            try:
-                pdfmetrics.getFont(font_name)
-                return True
-            except:
-                return False
-
-        # Определяем систему
-        system = platform.system()
-        windows_fonts_dir = "C:/Windows/Fonts/"
-
-        # Список шрифтов для поиска (в порядке приоритета)
-        font_candidates = []
-
-        # Локальные папки для шрифтов (приоритет выше системных)
-        local_fonts_dir = os.path.join(os.path.dirname(__file__), "fonts/")
-        backend_fonts_dir = os.path.join(os.path.dirname(__file__), "../../../fonts/")
-
-        if system == "Windows":
-            # Сначала проверяем локальные папки проекта (DejaVu)
-            dejavu_files = {
-                "DejaVuSans": "DejaVuSans.ttf",
-                "DejaVuSans-Bold": "DejaVuSans-Bold.ttf",
-            }
-            for font_name, font_file in dejavu_files.items():
-                font_candidates.append((font_name, font_file, local_fonts_dir))
-                font_candidates.append((font_name, font_file, backend_fonts_dir))
-
-            # Затем системные Windows шрифты с поддержкой кириллицы
-            font_candidates.extend([
-                ("DejaVuSans", "arial.ttf", windows_fonts_dir),
-                ("DejaVuSans-Bold", "arialbd.ttf", windows_fonts_dir),
-                ("DejaVuSans", "calibri.ttf", windows_fonts_dir),
-                ("DejaVuSans-Bold", "calibrib.ttf", windows_fonts_dir),
-                ("DejaVuSans", "times.ttf", windows_fonts_dir),
-                ("DejaVuSans-Bold", "timesbd.ttf", windows_fonts_dir),
-            ])
-        else:
-            # Linux/Mac - ищем DejaVu
-            possible_paths = [
-                "/usr/share/fonts/truetype/dejavu/",
-                "/usr/share/fonts/dejavu/",
-                "/usr/share/fonts/TTF/",
-                os.path.join(os.path.dirname(__file__), "fonts/"),
-                os.path.join(os.path.dirname(__file__), "../../../fonts/"),
-            ]
-
-            dejavu_files = {
-                "DejaVuSans": "DejaVuSans.ttf",
-                "DejaVuSans-Bold": "DejaVuSans-Bold.ttf",
-            }
-
-            for font_name, font_file in dejavu_files.items():
-                for path in possible_paths:
-                    font_candidates.append((font_name, font_file, path))
-
-        # Регистрируем шрифты
-        for font_name, font_file, base_path in font_candidates:
-            if font_name in registered_fonts:
-                continue
-
-            if is_font_registered(font_name):
-                registered_fonts[font_name] = True
-                logger.info(f"Шрифт {font_name} уже зарегистрирован")
-                continue
-
-            font_path = os.path.join(base_path, font_file)
-            if os.path.exists(font_path):
-                try:
-                    pdfmetrics.registerFont(TTFont(font_name, font_path))
-                    registered_fonts[font_name] = True
-                    logger.info(f"Успешно зарегистрирован шрифт {font_name} из {font_path}")
-                except Exception as e:
-                    logger.warning(f"Не удалось зарегистрировать {font_name} из {font_path}: {e}")
-                    continue
-
-        # Если не нашли шрифты, пробуем зарегистрировать любые доступные Windows шрифты
-        if not registered_fonts and system == "Windows":
-            windows_fonts = [
-                ("DejaVuSans", "arial.ttf"),
-                ("DejaVuSans-Bold", "arialbd.ttf"),
-                ("DejaVuSans", "calibri.ttf"),
-                ("DejaVuSans-Bold", "calibrib.ttf"),
-                ("DejaVuSans", "tahoma.ttf"),
-                ("DejaVuSans-Bold", "tahomabd.ttf"),
-            ]
-
-            for font_name, font_file in windows_fonts:
-                if font_name in registered_fonts:
-                    continue
-                font_path = os.path.join(windows_fonts_dir, font_file)
-                if os.path.exists(font_path):
-                    try:
-                        pdfmetrics.registerFont(TTFont(font_name, font_path))
-                        registered_fonts[font_name] = True
-                        logger.info(f"Зарегистрирован {font_name} из {font_path}")
-                        break
-                    except Exception as e:
-                        logger.warning(f"Ошибка регистрации {font_name}: {e}")
-
-        # Устанавливаем доступные шрифты
-        if registered_fonts.get("DejaVuSans"):
-            self.base_font = "DejaVuSans"
-            self.bold_font = "DejaVuSans-Bold" if registered_fonts.get("DejaVuSans-Bold") else "DejaVuSans"
-        else:
-            logger.warning("Кириллические шрифты не найдены! Используется Times-Roman (может не поддерживать все символы)")
-            self.base_font = "Times-Roman"
-            self.bold_font = "Times-Bold"
-
-        self.fonts_available = bool(registered_fonts)
-
-        logger.info(f"Итоговые шрифты: base_font={self.base_font}, bold_font={self.bold_font}, fonts_available={self.fonts_available}")
-
-    def _create_styles(self) -> Dict[str, ParagraphStyle]:
+    @classmethod
+    def _style_sheet(cls, style: BookStyle, theme: BookTheme) -> Tuple[Dict[str, Any], Dict[str, ParagraphStyle]]:
+        """Конфигурация и стили для (style, theme), создаются один раз на процесс"""
+        key = (style, theme)
+        sheet = cls._style_sheets.get(key)
+        if sheet is None:
+            # Build config: start with light, overlay dark if needed
+            config = dict(cls.STYLE_CONFIGS_LIGHT[style])
+            if theme == BookTheme.DARK:
+                config.update(cls.DARK_THEME_OVERRIDES.get(style, {}))
+            sheet = cls._style_sheets.setdefault(key, (config, cls._create_styles(config, get_book_fonts())))
+        return sheet
+
+    @staticmethod
+    def _create_styles(config: Dict[str, Any], fonts: BookFonts) -> Dict[str, ParagraphStyle]:
         """Создание стилей с кириллическими шрифтами"""
-        base_font = self.base_font
-        bold_font = self.bold_font
+        base_font = fonts.base_font
+        bold_font = fonts.bold_font
 
         return {
             "title": ParagraphStyle(
                 "BookTitle",
                 fontName=bold_font,
-                fontSize=self.config["title_font_size"],
-                textColor=self.config["primary"],
+                fontSize=config["title_font_size"],
+                textColor=config["primary"],
                 alignment=TA_CENTER,
                 spaceAfter=20,
                 spaceBefore=40,
-                leading=self.config["title_font_size"] * 1.3,
+                leading=config["title_font_size"] * 1.3,
             ),
             "subtitle": ParagraphStyle(
                 "BookSubtitle",
                 fontName=base_font,
                 fontSize=16,
-                textColor=self.config["secondary"],
+                textColor=config["secondary"],
                 alignment=TA_CENTER,
                 spaceAfter=40,
             ),
             "chapter_title": ParagraphStyle(
                 "ChapterTitle",
                 fontName=bold_font,
-                fontSize=self.config["heading_font_size"],
-                textColor=self.config["primary"],
+                fontSize=config["heading_font_size"],
+                textColor=config["primary"],
                 alignment=TA_LEFT,
                 spaceBefore=30,
                 spaceAfter=20,
-                leading=self.config["heading_font_size"] * 1.4,
+                leading=config["heading_font_size"] * 1.4,
                 borderPadding=10,
             ),
             "section_title": ParagraphStyle(
                 "SectionTitle",
                 fontName=bold_font,
                 fontSize=14,
-                textColor=self.config["accent"],
+                textColor=config["accent"],
                 alignment=TA_LEFT,
                 spaceBefore=20,
                 spaceAfter=12,
@@ -690,19 +730,19 @@ class PDFBookGenerator:
             "body": ParagraphStyle(
                 "BookBody",
                 fontName=base_font,
-                fontSize=self.config["body_font_size"],
-                textColor=self.config["text"],
-                alignment=self.config.get("body_alignment", TA_JUSTIFY),
+                fontSize=config["body_font_size"],
+                textColor=config["text"],
+                alignment=config.get("body_alignment", TA_JUSTIFY),
                 spaceBefore=6,
                 spaceAfter=8,
-                leading=self.config["body_font_size"] * 1.6,
-                firstLineIndent=self.config.get("body_first_indent", 25),
+                leading=config["body_font_size"] * 1.6,
+                firstLineIndent=config.get("body_first_indent", 25),
             ),
             "intro": ParagraphStyle(
                 "Introduction",
                 fontName=base_font,
                 fontSize=12,
-                textColor=self.config["text"],
+                textColor=config["text"],
                 alignment=TA_JUSTIFY,
                 spaceBefore=10,
                 spaceAfter=12,
@@ -714,7 +754,7 @@ class PDFBookGenerator:
                 "TOCEntry",
                 fontName=base_font,
                 fontSize=12,
-                textColor=self.config["text"],
+                textColor=config["text"],
                 alignment=TA_LEFT,
                 spaceBefore=10,
                 spaceAfter=10,
@@ -724,7 +764,7 @@ class PDFBookGenerator:
                 "TOCChapter",
                 fontName=bold_font,
                 fontSize=12,
-                textColor=self.config["primary"],
+                textColor=config["primary"],
                 alignment=TA_LEFT,
                 spaceBefore=8,
                 spaceAfter=8,
@@ -734,7 +774,7 @@ class PDFBookGenerator:
                 "TimelineYear",
                 fontName=bold_font,
                 fontSize=14,
-                textColor=self.config["accent"],
+                textColor=config["accent"],
                 alignment=TA_LEFT,
                 spaceBefore=12,
             ),
@@ -742,7 +782,7 @@ class PDFBookGenerator:
                 "TimelineEvent",
                 fontName=base_font,
                 fontSize=11,
-                textColor=self.config["text"],
+                textColor=config["text"],
                 alignment=TA_LEFT,
                 leftIndent=40,
                 spaceAfter=8,
@@ -752,7 +792,7 @@ class PDFBookGenerator:
                 "GenerationTitle",
                 fontName=bold_font,
                 fontSize=14,
-                textColor=self.config.get("gen_title_color", white),
+                textColor=config.get("gen_title_color", white),
                 alignment=TA_CENTER,
                 spaceBefore=15,
                 spaceAfter=15,
@@ -761,20 +801,20 @@ class PDFBookGenerator:
                 "RelativeName",
                 fontName=bold_font,
                 fontSize=12,
-                textColor=self.config["primary"],
+                textColor=config["primary"],
             ),
             "relative_info": ParagraphStyle(
                 "RelativeInfo",
                 fontName=base_font,
                 fontSize=10,
-                textColor=self.config["secondary"],
+                textColor=config["secondary"],
                 leftIndent=15,
             ),
             "quote": ParagraphStyle(
                 "Quote",
                 fontName=base_font,
                 fontSize=11,
-                textColor=self.config["secondary"],
+                textColor=config["secondary"],
                 alignment=TA_CENTER,
                 leftIndent=40,
                 rightIndent=40,
@@ -786,7 +826,7 @@ class PDFBookGenerator:
                 "Footer",
                 fontName=base_font,
                 fontSize=9,
-                textColor=self.config["secondary"],
+                textColor=config["secondary"],
                 alignment=TA_CENTER,
             ),
         }
@@ -802,9 +842,21 @@ class PDFBookGenerator:
         relationships: Optional[List] = None,
         relative_photos: Optional[Dict[int, str]] = None,
         story_photos: Optional[Dict[str, str]] = None,
+        images: Optional[Dict[str, bytes]] = None,
+        card_images: Optional[Dict[str, bytes]] = None,
     ) -> bytes:
-        """Генерация PDF книги"""
+        """
+        Генерация PDF книги.
+
+        images — предзагруженные изображения (url -> bytes, см. src.book.images.prefetch_images).
+        card_images — миниатюры для карточек древа (src.book.images.prepare_images);
+        если миниатюры нет, карточка использует изображение из images.
+        Во время рендеринга сеть не используется: фото, которых нет в images, пропускаются.
+        """
         self.story_photos = story_photos
+        self.images = images or {}
+        self.card_images = card_images or {}
+        self._image_readers = {}
         self.used_photo_keys = set()  # Отслеживание вставленных фото (без повторов)
 
         buffer = BytesIO()
@@ -1050,7 +1102,8 @@ class PDFBookGenerator:
                 elif hasattr(r, 'image_url') and r.image_url:
                     photo_url = r.image_url
 
-                card = RelativeCard(name, dates, gender, self.config, photo_url, self.bold_font, self.base_font)
+                photo = self._image_reader(photo_url, card=True) if photo_url else None
+                card = RelativeCard(name, dates, gender, self.config, photo, self.bold_font, self.base_font)
                 row.append(card)
 
                 if len(row) == 2:
@@ -1135,20 +1188,23 @@ class PDFBookGenerator:
         elements.append(PageBreak())
         return elements
 
-    def _download_image(self, url: str) -> Optional[bytes]:
-        """Скачивание изображения по URL с обработкой ошибок"""
-        try:
-            import httpx
-            logger.info(f"Скачивание изображения: {url[:100]}...")
-            response = httpx.get(url, timeout=15, follow_redirects=True)
-            if response.status_code == 200 and len(response.content) > 0:
-                logger.info(f"Изображение скачано: {len(response.content)} байт")
-                return response.content
-            else:
-                logger.warning(f"Ошибка скачивания изображения: status={response.status_code}, size={len(response.content)}, url={url[:100]}")
-        except Exception as e:
-            logger.error(f"Исключение при скачивании изображения {url[:100]}: {type(e).__name__}: {e}")
-        return None
+    def _image_reader(self, url: str, card: bool = False) -> Optional[ImageReader]:
+        """Декодированное изображение по URL — один раз на книгу (отдельно миниатюра для карточек)"""
+        thumbnail = card and url in self.card_images
+        key = (url, thumbnail)
+        if key in self._image_readers:
+            return self._image_readers[key]
+        reader = None
+        data = self.card_images[url] if thumbnail else self.images.get(url)
+        if data:
+            try:
+                reader = ImageReader(BytesIO(data))
+                reader.getSize()
+            except Exception as e:
+                logger.warning(f"Не удалось декодировать изображение {url[:100]}: {type(e).__name__}: {e}")
+                reader = None
+        self._image_readers[key] = reader
+        return reader
 
     def _create_inline_photo(self, photo_key: str, caption: str = "") -> Optional[Flowable]:
         """Создание встроенной фотографии из маркера"""
@@ -1160,16 +1216,16 @@ class PDFBookGenerator:
             return None
 
         url = self.story_photos[photo_key]
-        image_data = self._download_image(url)
-        if not image_data:
-            logger.warning(f"Не удалось скачать изображение для key='{photo_key}', url={url[:80]}")
+        image = self._image_reader(url)
+        if image is None:
+            logger.warning(f"Изображение не предзагружено для key='{photo_key}', url={url[:80]}")
             return None
 
         # Calculate available page width (A4 width minus margins)
         page_content_width = A4[0] - 4 * cm  # 2cm margin each side
 
         photo = InlinePhoto(
-            image_data=image_data,
+            image=image,
             caption=caption,
             max_width=self.config.get("photo_max_width", 14 * cm),
             border_width=self.config.get("photo_border_width", 0.5),
@@ -0,0 +1,162 @@
+"""
+Рендеринг PDF-книги вне event loop.
+
+Вёрстка ReportLab, декодирование изображений и регистрация шрифтов — чисто CPU-работа
+на секунды; выполненная прямо в generate_book_stream, она блокирует все запросы
+uvicorn-воркера. BookRenderer отправляет её в пул процессов: на вход — BookSpec,
+сериализуемый снимок всего, что нужно генератору (главы, хронология, родственники,
+предзагруженные байты изображений), на выходе — готовые байты PDF.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from src.book.exceptions import BookRenderTimeoutError
+from src.book.pdf_generator import PDFBookGenerator, get_book_fonts
+from src.book.schemas import BookStyle, BookTheme
+from src.config import settings
+from src.family.enums import Gender
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RelativeSnapshot:
+    """Поля родственника, используемые в семейном древе книги (без ORM-состояния)"""
+    id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    middle_name: Optional[str] = None
+    gender: Optional[Gender] = None
+    birth_date: Optional[date] = None
+    death_date: Optional[date] = None
+    generation: Optional[int] = None
+    image_url: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, relative) -> "RelativeSnapshot":
+        return cls(
+            id=relative.id,
+            first_name=relative.first_name,
+            last_name=relative.last_name,
+            middle_name=relative.middle_name,
+            gender=relative.gender,
+            birth_date=relative.birth_date,
+            death_date=relative.death_date,
+            generation=relative.generation,
+            image_url=relative.image_url,
+        )
+
+
+@dataclass
+class BookSpec:
+    """Всё, что нужно для вёрстки книги; передаётся в процесс-рендерер через pickle"""
+    title: str
+    introduction: str
+    chapters: List[Dict[str, Any]]
+    conclusion: str
+    style: BookStyle = BookStyle.CLASSIC
+    theme: BookTheme = BookTheme.LIGHT
+    timeline: Optional[List[Dict]] = None
+    relatives: List[RelativeSnapshot] = field(default_factory=list)
+    relative_photos: Optional[Dict[int, str]] = None
+    story_photos: Optional[Dict[str, str]] = None
+    images: Dict[str, bytes] = field(default_factory=dict)
+    card_images: Dict[str, bytes] = field(default_factory=dict)
+
+
+def render_book(spec: BookSpec) -> bytes:
+    """Собрать PDF по спецификации (выполняется в процессе пула)"""
+    generator = PDFBookGenerator(style=spec.style, theme=spec.theme)
+    return generator.generate(
+        title=spec.title,
+        introduction=spec.introduction,
+        chapters=spec.chapters,
+        conclusion=spec.conclusion,
+        timeline=spec.timeline,
+        relatives=spec.relatives or None,
+        relative_photos=spec.relative_photos,
+        story_photos=spec.story_photos,
+        images=spec.images,
+        card_images=spec.card_images,
+    )
+
+
+class BookRenderer:
+    """
+    Пул процессов для рендеринга книг.
+
+    workers=0 — рендеринг в потоке текущего процесса (event loop всё равно не блокируется);
+    пул создаётся лениво при первой книге и пересоздаётся, если процесс-воркер упал
+    или рендеринг не уложился в timeout.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                # spawn, а не fork: форк процесса с запущенным event loop и потоками небезопасен
+                # Шрифты регистрируются при старте процесса, а не при первой книге
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=get_book_fonts,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="book-render", initializer=get_book_fonts
+                )
+        return self._executor
+
+    async def render(self, spec: BookSpec) -> bytes:
+        """Отрендерить книгу в пуле; BookRenderTimeoutError если дольше timeout"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        future = loop.run_in_executor(executor, render_book, spec)
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Рендеринг книги превысил {self.timeout} с, пул будет пересоздан")
+            self._discard(executor, terminate=True)
+            raise BookRenderTimeoutError(self.timeout)
+        except BrokenProcessPool:
+            logger.error("Процесс рендеринга книги аварийно завершился, пул будет пересоздан")
+            self._discard(executor)
+            raise
+
+    def _discard(self, executor: Executor, terminate: bool = False) -> None:
+        """
+        Вывести пул из работы: следующие книги рендерятся уже в новом пуле.
+
+        Задачи пула не отменяются — CancelledError у чужих рендеров выглядела бы как
+        остановка приложения. При terminate зависшие процессы завершаются, и остальные
+        рендеры этого пула получают BrokenProcessPool. Потоки завершить нельзя: в режиме
+        workers=0 зависший рендер дорабатывает в фоне.
+        """
+        if self._executor is executor:
+            self._executor = None
+        if terminate and isinstance(executor, ProcessPoolExecutor):
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        """Остановить пул, не дожидаясь текущих задач (вызывается при остановке приложения)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+book_renderer = BookRenderer(
+    workers=settings.book_render_workers,
+    timeout=settings.book_render_timeout_seconds,
+)
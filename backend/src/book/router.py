@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 """API роутер для генерации семейной книги"""
 
-from fastapi import APIRouter, Depends, Body
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Body, Header, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -10,7 +12,11 @@ from src.book.service import BookService
 from src.subscription.dependencies import get_quota_service
 from src.subscription.quota_service import QuotaService
 from src.subscription.enums import QuotaResource
-from src.book.schemas import BookGenerateRequestSchema
+from src.ai.utils import format_sse
+from src.book.downloads import book_spool, get_downloadable_book, range_response
+from src.book.jobs import book_job_manager, job_to_schema
+from src.exceptions import ResourceNotFoundError
+from src.book.schemas import BookGenerateRequestSchema, BookJobSchema
 from src.family.dependencies import get_family_relation_service, get_family_relationship_service
 from src.family.service import FamilyRelationService, FamilyRelationshipService
 from src.storage.s3.dependencies import get_s3_manager
@@ -43,12 +49,11 @@ async def generate_book_stream(
 
     События:
     - type: "progress" - обновление прогресса (0-100%)
-    - type: "result" - готовый PDF в base64
+    - type: "result" - ссылка на скачивание PDF (download_url)
     - type: "error" - ошибка генерации
     - type: "done" - завершение потока
     """
-    await quota_service.enforce_quota(user_id, QuotaResource.BOOK_GENERATIONS)
-    await quota_service.increment_quota(user_id, QuotaResource.BOOK_GENERATIONS)
+    await quota_service.consume_quota(user_id, QuotaResource.BOOK_GENERATIONS)
     return StreamingResponse(
         book_service.generate_book_stream(
             user_id=user_id,
@@ -65,3 +70,93 @@ async def generate_book_stream(
             "X-Accel-Buffering": "no",
         }
     )
+
+
+@router.post("/jobs", response_model=BookJobSchema, status_code=status.HTTP_202_ACCEPTED)
+async def submit_book_job(
+    request: BookGenerateRequestSchema = Body(...),
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_database_session),
+    quota_service: QuotaService = Depends(get_quota_service),
+):
+    """
+    Поставить генерацию книги в фоновую очередь.
+
+    Возвращает задачу со статусом queued; прогресс — GET /jobs/{id} или SSE /jobs/{id}/events.
+    Готовая задача содержит только ссылку на скачивание PDF (download_url).
+    """
+    # Списание откатится вместе с транзакцией запроса, если задачу не удастся поставить
+    await quota_service.consume_quota(user_id, QuotaResource.BOOK_GENERATIONS)
+    job = await book_job_manager.submit(session, user_id, request)
+    return job_to_schema(job)
+
+
+@router.get("/jobs/{job_id}", response_model=BookJobSchema)
+async def get_book_job(
+    job_id: int,
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_database_session),
+):
+    """Текущее состояние задачи генерации (для опроса)"""
+    job = await book_job_manager.get_job(session, job_id, user_id)
+    return job_to_schema(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def book_job_events(
+    job_id: int,
+    user_id: int = Depends(get_current_user_id),
+):
+    """
+    SSE с прогрессом задачи; к выполняющейся задаче можно переподключиться в любой момент.
+
+    События: progress (stage, progress), result (download_url), error, done.
+    """
+    await book_job_manager.check_access(job_id, user_id)
+
+    async def stream():
+        async for item in book_job_manager.stream_events(job_id):
+            yield format_sse(item)
+        yield format_sse({"type": "done"})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+@router.get("/{book_id}/download")
+async def download_book(
+    book_id: int,
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+    user_id: int = Depends(get_current_user_id),
+    session: AsyncSession = Depends(get_database_session),
+    s3_manager: S3Manager = Depends(get_s3_manager),
+):
+    """
+    Потоковое скачивание готовой книги (из S3 или локального spool).
+
+    Поддерживает Range: bytes=start-end для докачки; PDF не загружается в память целиком.
+    """
+    book = await get_downloadable_book(session, book_id, user_id)
+    filename = book.filename or f"family_book_{book_id}.pdf"
+
+    if book.s3_key:
+        size = await s3_manager.get_size(book.s3_key)
+        return range_response(
+            lambda start, end: s3_manager.stream(book.s3_key, start, end),
+            size, range_header, filename,
+        )
+
+    size = book_spool.size(book_id)
+    if size is None:
+        raise ResourceNotFoundError("Book", book_id)
+    return range_response(
+        lambda start, end: book_spool.stream(book_id, start, end),
+        size, range_header, filename,
+    )
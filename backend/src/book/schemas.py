@@ -3,6 +3,7 @@
 
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 from enum import Enum
 
 
@@ -20,6 +21,13 @@ class BookTheme(str, Enum):
     DARK = "dark"
 
 
+class BookTextMode(str, Enum):
+    """Использование кэша ответов AI при генерации текста"""
+    CACHED = "cached"  # брать из кэша, недостающее — запросить у AI
+    FRESH = "fresh"    # всегда запрашивать у AI (кэш перезаписывается)
+    REUSE = "reuse"    # только кэш: перевёрстка без обращений к AI
+
+
 class BookGenerateRequestSchema(BaseModel):
     """Запрос на генерацию книги"""
     style: BookStyle = Field(default=BookStyle.CLASSIC, description="Стиль оформления книги")
@@ -29,6 +37,8 @@ class BookGenerateRequestSchema(BaseModel):
     include_stories: bool = Field(default=True, description="Включить семейные истории")
     include_timeline: bool = Field(default=True, description="Включить хронологию")
     language: str = Field(default="ru", description="Язык книги (ru/en)")
+    text_mode: BookTextMode = Field(default=BookTextMode.CACHED, description="Режим кэша текста (cached/fresh/reuse)")
+    refresh_book_id: Optional[int] = Field(None, description="Обновить готовую книгу: переписать только главы с изменившимися данными")
 
 
 class BookChapterInfoSchema(BaseModel):
@@ -64,13 +74,29 @@ class BookProgressSchema(BaseModel):
 
 
 class BookResultSchema(BaseModel):
-    """Результат генерации книги"""
+    """Результат генерации книги: ссылка на потоковое скачивание PDF"""
     type: str = "result"
-    pdf_base64: str
+    book_id: Optional[int] = None
+    download_url: Optional[str] = None
     filename: str
+    s3_url: Optional[str] = None
 
 
 class BookErrorSchema(BaseModel):
     """Ошибка генерации"""
     type: str = "error"
     message: str
+
+
+class BookJobSchema(BaseModel):
+    """Состояние фоновой задачи генерации книги"""
+    id: int
+    status: str  # queued, generating, completed, failed
+    stage: Optional[str] = None
+    progress: int = 0
+    filename: Optional[str] = None
+    download_url: Optional[str] = None
+    s3_url: Optional[str] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
@@ -1,19 +1,21 @@
 # -*- coding: utf-8 -*-
 """Сервис для генерации семейной книги"""
 
+import asyncio
 import logging
-from typing import AsyncGenerator, List, Dict, Any, Optional
+import re
+from typing import AsyncGenerator, Callable, List, Dict, Any, Optional, Set
 from openai import AsyncOpenAI
 import json
-import base64
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
 from src.config import settings
 from src.ai.utils import format_sse, extract_json_from_response
+from src.ai.cache import llm_response_cache
 from src.ai.service import _save_ai_usage
-from src.book.schemas import BookGenerateRequestSchema, BookStyle
+from src.book.schemas import BookGenerateRequestSchema, BookStyle, BookTextMode
 from src.book.prompts import (
     BOOK_OUTLINE_PROMPT,
     CHAPTER_WRITING_PROMPT,
@@ -24,7 +26,11 @@ from src.book.prompts import (
     GROUNDING_RULES,
     PHOTO_INSTRUCTIONS,
 )
-from src.book.pdf_generator import PDFBookGenerator
+from src.book.artifacts import build_artifacts, fingerprint, load_refresh_source, reusable_chapter
+from src.book.downloads import book_download_url, book_spool
+from src.book.exceptions import BookException, BookNoRelativesError, BookTextNotCachedError
+from src.book.images import CARD_PHOTO_POINTS, INLINE_PHOTO_POINTS, prefetch_images, prepare_images
+from src.book.renderer import BookSpec, RelativeSnapshot, book_renderer
 from src.family.service import FamilyRelationService, FamilyRelationshipService
 
 
@@ -52,7 +58,7 @@ class BookService:
         """Получение температуры для стиля"""
         return STYLE_TEMPERATURES.get(style.value, 0.7)
 
-    def _build_photo_catalog(self, relatives: List, include_stories: bool) -> Dict:
+    def _build_photo_catalog(self, relatives: List, stories_by_relative: Dict[int, List], include_stories: bool) -> Dict:
         """
         Строит каталог всех доступных фотографий.
         Returns:
@@ -78,17 +84,16 @@ class BookService:
             if r.image_url:
                 entry["profile_photo"] = r.image_url
 
-            if include_stories and r.context:
-                for key, value in r.context.items():
-                    if isinstance(value, dict) and value.get("media"):
-                        media_urls = []
-                        for media_item in value["media"]:
-                            if isinstance(media_item, dict) and media_item.get("type") == "image" and media_item.get("url"):
-                                media_urls.append(media_item["url"])
-                            elif isinstance(media_item, str):
-                                media_urls.append(media_item)
-                        if media_urls:
-                            entry["story_photos"][key] = media_urls
+            if include_stories:
+                for story in stories_by_relative.get(r.id, []):
+                    media_urls = []
+                    for media_item in story.media or []:
+                        if isinstance(media_item, dict) and media_item.get("type") == "image" and media_item.get("url"):
+                            media_urls.append(media_item["url"])
+                        elif isinstance(media_item, str):
+                            media_urls.append(media_item)
+                    if media_urls:
+                        entry["story_photos"][story.title] = media_urls
 
             # Only include if there's at least one photo
             if entry["profile_photo"] or entry["story_photos"]:
@@ -141,295 +146,482 @@ class BookService:
                     result[f"{rid}:{story_key}:{idx}"] = url
         return result
 
-    async def generate_book_stream(
+    def _chapter_relatives(self, chapter_info: Dict, relatives: List) -> List:
+        """Родственники главы; если AI их не указал — первые 10"""
+        relative_ids = chapter_info.get('relatives_to_include', [])
+        return [r for r in relatives if r.id in relative_ids] or relatives[:10]
+
+    def _photo_keys_for(self, photo_catalog: Dict, relative_ids: List[int]) -> List[str]:
+        """Все ключи фото указанных родственников в порядке каталога"""
+        keys = []
+        for rid in relative_ids:
+            info = photo_catalog.get(rid)
+            if not info:
+                continue
+            if info["profile_photo"]:
+                keys.append(f"{rid}:profile:0")
+            for story_key, urls in info["story_photos"].items():
+                keys.extend(f"{rid}:{story_key}:{idx}" for idx in range(len(urls)))
+        return keys
+
+    def _reserve_chapter_photos(self, chapters: List[Dict], relatives: List, photo_catalog: Dict) -> List[Set[str]]:
+        """
+        Для каждой главы — ключи фото, которые ей НЕ предлагаются.
+
+        Фото закрепляется за первой по порядку главой, где есть его родственник;
+        последующим главам оно недоступно. Так главы можно писать параллельно,
+        а результат не зависит от того, какая из них завершится раньше.
+        """
+        reserved: Set[str] = set()
+        excluded_per_chapter = []
+        for chapter_info in chapters:
+            excluded_per_chapter.append(set(reserved))
+            chapter_ids = [r.id for r in self._chapter_relatives(chapter_info, relatives)]
+            reserved.update(self._photo_keys_for(photo_catalog, chapter_ids))
+        return excluded_per_chapter
+
+    def _assemble_chapters(
+        self,
+        chapters: List[Dict],
+        chapter_texts: List[Optional[str]],
+        relatives: List,
+        photo_catalog: Dict,
+    ) -> List[Dict]:
+        """Собрать главы в порядке структуры и вычислить fallback-фото (не вставленные AI)"""
+        used_photo_keys: Set[str] = set()
+        chapters_content = []
+        for i, chapter_info in enumerate(chapters):
+            content = chapter_texts[i]
+            for rid, skey, midx in re.findall(r'\[PHOTO:(\d+):([^:]+):(\d+)\]', content or ""):
+                used_photo_keys.add(f"{rid}:{skey}:{midx}")
+
+            fallback_keys = []
+            if photo_catalog:
+                chapter_ids = [r.id for r in self._chapter_relatives(chapter_info, relatives)]
+                fallback_keys = [
+                    k for k in self._photo_keys_for(photo_catalog, chapter_ids)
+                    if k not in used_photo_keys
+                ]
+
+            chapters_content.append({
+                'title': chapter_info.get('title', f'Глава {i + 1}'),
+                'content': content,
+                'photo_keys': fallback_keys,
+            })
+        return chapters_content
+
+    async def generate_book_events(
         self,
         user_id: int,
         request: BookGenerateRequestSchema,
         family_service: FamilyRelationService,
         relationship_service: FamilyRelationshipService,
         s3_manager=None,
-        session=None,
-    ) -> AsyncGenerator[str, None]:
-        """
-        Генерация семейной книги с потоковыми обновлениями прогресса.
-        Возвращает SSE события с прогрессом и в конце PDF в base64.
+        previous_artifacts: Optional[Dict[str, Any]] = None,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
         """
-        book_record_id = None
-        try:
-            # Создаём запись трекинга если есть сессия
-            if session:
-                try:
-                    from src.admin.models import BookGenerationModel
-                    book_record = BookGenerationModel(
-                        user_id=user_id,
-                        status="generating",
-                        filename=f"family_book_{user_id}.pdf",
-                    )
-                    session.add(book_record)
-                    await session.flush()
-                    book_record_id = book_record.id
-                except Exception as e:
-                    logger.error(f"Ошибка создания записи книги: {e}")
+        Этапы генерации книги как поток событий.
 
-            # Этап 1: Загрузка данных семьи (0-10%)
-            yield format_sse({
-                "type": "progress",
-                "stage": "fetching_data",
-                "progress": 0,
-                "message": "Загрузка данных семьи..."
-            })
+        Отдаёт progress-события, последним — событие type=result с байтами PDF (pdf_bytes),
+        ключами S3 (если загрузка удалась) и артефактами книги для будущих обновлений.
+        previous_artifacts — артефакты исходной книги в режиме обновления (src.book.artifacts).
+        Ошибки пробрасываются исключениями — их обрабатывает вызывающий:
+        SSE-поток (generate_book_stream) или фоновая задача.
+        """
+        # Этап 1: Загрузка данных семьи (0-10%)
+        yield {
+            "type": "progress",
+            "stage": "fetching_data",
+            "progress": 0,
+            "message": "Загрузка данных семьи..."
+        }
 
-            relatives = await family_service.get_user_relatives(user_id)
-            relationships = await relationship_service.get_user_relationships(user_id, with_details=False)
+        relatives = await family_service.get_user_relatives(user_id)
+        relationships = await relationship_service.get_user_relationships(user_id, with_details=False)
+        stories_by_relative = await family_service.get_user_stories(user_id)
 
-            if not relatives:
-                yield format_sse({
-                    "type": "error",
-                    "message": "Нет родственников для создания книги"
-                })
-                yield format_sse({"type": "done"})
-                return
+        if not relatives:
+            raise BookNoRelativesError()
 
-            yield format_sse({
-                "type": "progress",
-                "stage": "fetching_data",
-                "progress": 10,
-                "message": f"Найдено {len(relatives)} родственников"
-            })
-
-            # Построение каталога фотографий
-            photo_catalog = {}
-            if request.include_photos:
-                photo_catalog = self._build_photo_catalog(relatives, request.include_stories)
+        yield {
+            "type": "progress",
+            "stage": "fetching_data",
+            "progress": 10,
+            "message": f"Найдено {len(relatives)} родственников"
+        }
 
-            # Подготовка контекста для AI
-            family_context = self._format_family_context(relatives, relationships, request.include_stories)
-            style_instructions = self._get_style_instructions(request.style, request.custom_style_description)
+        # Построение каталога фотографий
+        photo_catalog = {}
+        if request.include_photos:
+            photo_catalog = self._build_photo_catalog(relatives, stories_by_relative, request.include_stories)
+
+        # Подготовка контекста для AI
+        family_context = self._format_family_context(relatives, relationships, stories_by_relative, request.include_stories)
+        style_instructions = self._get_style_instructions(request.style, request.custom_style_description)
+
+        # Режим обновления: структура книги сохраняется, части с прежними входными данными не переписываются
+        previous = previous_artifacts
+        temperature = self._get_temperature(request.style)
+
+        # Хронология зависит только от данных семьи — запускаем её сразу, параллельно со структурой
+        pending_tasks: List[asyncio.Task] = []
+        timeline_task = None
+        timeline_fingerprint = None
+        timeline = []
+        if request.include_timeline:
+            timeline_fingerprint = fingerprint(family_context, request.language)
+            if previous and previous.get("timeline_fingerprint") == timeline_fingerprint:
+                timeline = previous.get("timeline") or []
+            else:
+                timeline_task = asyncio.create_task(
+                    self._generate_timeline(family_context, request.language, user_id=user_id, text_mode=request.text_mode)
+                )
+                pending_tasks.append(timeline_task)
 
+        try:
             # Этап 2: Генерация структуры книги (10-25%)
-            yield format_sse({
-                "type": "progress",
-                "stage": "generating_outline",
-                "progress": 15,
-                "message": "Создание структуры книги..."
-            })
+            if previous:
+                outline = previous["outline"]
+            else:
+                yield {
+                    "type": "progress",
+                    "stage": "generating_outline",
+                    "progress": 15,
+                    "message": "Создание структуры книги..."
+                }
 
-            outline = await self._generate_outline(family_context, request.language, request.style, style_instructions, user_id=user_id)
+                outline = await self._generate_outline(
+                    family_context, request.language, request.style, style_instructions,
+                    user_id=user_id, text_mode=request.text_mode,
+                )
+            outline_chapters = outline.get('chapters', [])
 
-            chapters_count = len(outline.get('chapters', []))
-            yield format_sse({
+            total_chapters = len(outline_chapters)
+            yield {
                 "type": "progress",
                 "stage": "generating_outline",
                 "progress": 25,
-                "message": f"Структура готова: {chapters_count} глав"
-            })
-
-            # Этап 3: Генерация хронологии если нужно (25-30%)
-            timeline = []
-            if request.include_timeline:
-                yield format_sse({
-                    "type": "progress",
-                    "stage": "generating_timeline",
-                    "progress": 27,
-                    "message": "Создание хронологии событий..."
-                })
-                timeline = await self._generate_timeline(family_context, request.language, user_id=user_id)
-                yield format_sse({
-                    "type": "progress",
-                    "stage": "generating_timeline",
-                    "progress": 30,
-                    "message": f"Хронология: {len(timeline)} событий"
-                })
-
-            # Этап 4: Написание глав (30-80%)
-            chapters_content = []
-            total_chapters = len(outline.get('chapters', []))
-            used_photo_keys = set()  # Отслеживаем использованные фото между главами
-
-            for i, chapter_info in enumerate(outline.get('chapters', [])):
-                progress = 30 + int(((i + 1) / total_chapters) * 50) if total_chapters > 0 else 80
-                chapter_title = chapter_info.get('title', f'Глава {i + 1}')
-
-                yield format_sse({
-                    "type": "progress",
-                    "stage": "writing_chapters",
-                    "progress": progress - 5,
-                    "current_chapter": chapter_title,
-                    "message": f"Написание: {chapter_title} ({i + 1}/{total_chapters})..."
-                })
+                "message": (
+                    f"Структура из исходной книги: {total_chapters} глав" if previous
+                    else f"Структура готова: {total_chapters} глав"
+                )
+            }
 
-                chapter_content = await self._write_chapter(
-                    chapter_info,
-                    relatives,
-                    relationships,
+            # Этап 3: Главы, хронология и заключение параллельно (25-85%)
+            conclusion_theme = outline.get('conclusion_theme', 'Семейные ценности и традиции')
+            conclusion_fingerprint = fingerprint(
+                conclusion_theme, family_context[:1000], request.language, style_instructions, temperature
+            )
+            conclusion_task = None
+            if previous and previous.get("conclusion_fingerprint") == conclusion_fingerprint:
+                conclusion = previous.get("conclusion") or ""
+            else:
+                conclusion_task = asyncio.create_task(self._write_conclusion(
+                    conclusion_theme,
+                    family_context[:1000],
                     request.language,
                     request.style,
                     style_instructions,
-                    photo_catalog,
-                    used_photo_keys,
                     user_id=user_id,
-                )
+                    text_mode=request.text_mode,
+                ))
+                pending_tasks.append(conclusion_task)
+
+            # Фото резервируются за главами заранее, чтобы параллельные главы не дублировали их
+            reserved_photo_keys = self._reserve_chapter_photos(outline_chapters, relatives, photo_catalog)
+            semaphore = asyncio.Semaphore(max(1, settings.book_chapter_concurrency))
+
+            # Отпечаток главы — её промпт (все входные данные) и температура стиля
+            chapter_fingerprints = [
+                fingerprint(self._chapter_prompt(
+                    chapter_info, relatives, relationships, stories_by_relative,
+                    request.language, style_instructions, photo_catalog, reserved_photo_keys[index],
+                )[0], temperature)
+                for index, chapter_info in enumerate(outline_chapters)
+            ]
+            chapter_texts: List[Optional[str]] = [
+                reusable_chapter(previous, index, chapter_fingerprints[index])
+                for index in range(total_chapters)
+            ]
+
+            async def write_chapter(index: int, chapter_info: Dict) -> tuple:
+                async with semaphore:
+                    content = await self._write_chapter(
+                        chapter_info,
+                        relatives,
+                        relationships,
+                        stories_by_relative,
+                        request.language,
+                        request.style,
+                        style_instructions,
+                        photo_catalog,
+                        reserved_photo_keys[index],
+                        user_id=user_id,
+                        text_mode=request.text_mode,
+                    )
+                return index, content
 
-                # Собираем фото-ключи, которые AI вставил в эту главу
-                import re
-                markers_in_chapter = re.findall(r'\[PHOTO:(\d+):([^:]+):(\d+)\]', chapter_content or "")
-                chapter_photo_keys = []
-                for rid, skey, midx in markers_in_chapter:
-                    key = f"{rid}:{skey}:{midx}"
-                    chapter_photo_keys.append(key)
-                    used_photo_keys.add(key)
-
-                # Также добавляем доступные для fallback (не использованные ещё)
-                fallback_keys = []
-                if photo_catalog:
-                    chapter_relative_ids_for_photos = [r.id for r in ([r for r in relatives if r.id in chapter_info.get('relatives_to_include', [])] or relatives[:10])]
-                    for rid in chapter_relative_ids_for_photos:
-                        if rid in photo_catalog:
-                            info = photo_catalog[rid]
-                            if info["profile_photo"]:
-                                k = f"{rid}:profile:0"
-                                if k not in used_photo_keys:
-                                    fallback_keys.append(k)
-                            for story_key, urls in info["story_photos"].items():
-                                for idx in range(len(urls)):
-                                    k = f"{rid}:{story_key}:{idx}"
-                                    if k not in used_photo_keys:
-                                        fallback_keys.append(k)
-
-                chapters_content.append({
-                    'title': chapter_title,
-                    'content': chapter_content,
-                    'photo_keys': fallback_keys,
-                })
+            chapter_tasks = [
+                asyncio.create_task(write_chapter(i, chapter_info))
+                for i, chapter_info in enumerate(outline_chapters)
+                if chapter_texts[i] is None
+            ]
+            pending_tasks.extend(chapter_tasks)
+            reused_count = total_chapters - len(chapter_tasks)
 
-                yield format_sse({
+            yield {
+                "type": "progress",
+                "stage": "writing_chapters",
+                "progress": 30,
+                "chapters_total": total_chapters,
+                "chapters_done": reused_count,
+                "message": (
+                    f"Обновление глав: {len(chapter_tasks)} из {total_chapters}..." if previous
+                    else f"Написание глав (0/{total_chapters})..."
+                )
+            }
+
+            for done_count, finished in enumerate(asyncio.as_completed(chapter_tasks), start=reused_count + 1):
+                index, content = await finished
+                chapter_texts[index] = content
+                chapter_title = outline_chapters[index].get('title', f'Глава {index + 1}')
+                yield {
                     "type": "progress",
                     "stage": "writing_chapters",
-                    "progress": progress,
+                    "progress": 30 + int(done_count / total_chapters * 50),
                     "current_chapter": chapter_title,
-                    "message": f"Глава готова: {chapter_title}"
-                })
+                    "chapter_index": index,
+                    "chapters_done": done_count,
+                    "chapters_total": total_chapters,
+                    "message": f"Глава готова: {chapter_title} ({done_count}/{total_chapters})"
+                }
 
-            # Этап 5: Написание заключения (80-85%)
-            yield format_sse({
-                "type": "progress",
-                "stage": "writing_conclusion",
-                "progress": 82,
-                "message": "Написание заключения..."
-            })
+            chapters_content = self._assemble_chapters(outline_chapters, chapter_texts, relatives, photo_catalog)
 
-            conclusion = await self._write_conclusion(
-                outline.get('conclusion_theme', 'Семейные ценности и традиции'),
-                family_context[:1000],
-                request.language,
-                request.style,
-                style_instructions,
-                user_id=user_id,
-            )
+            if timeline_task:
+                timeline = await timeline_task
+                yield {
+                    "type": "progress",
+                    "stage": "generating_timeline",
+                    "progress": 82,
+                    "message": f"Хронология: {len(timeline)} событий"
+                }
 
-            yield format_sse({
-                "type": "progress",
-                "stage": "writing_conclusion",
-                "progress": 85,
-                "message": "Заключение готово"
-            })
+            if conclusion_task:
+                conclusion = await conclusion_task
+                yield {
+                    "type": "progress",
+                    "stage": "writing_conclusion",
+                    "progress": 85,
+                    "message": "Заключение готово"
+                }
+        finally:
+            # Ошибка или разрыв SSE-соединения — не оставляем висящих запросов к LLM
+            cancelled = [task for task in pending_tasks if not task.done()]
+            for task in cancelled:
+                task.cancel()
+            # Дожидаемся отмены, чтобы запросы к LLM завершились и исключения задач были получены
+            await asyncio.gather(*cancelled, return_exceptions=True)
+
+        artifacts = build_artifacts(
+            outline=outline,
+            chapters=[
+                {**chapter, "fingerprint": chapter_fingerprints[index]}
+                for index, chapter in enumerate(chapters_content)
+            ],
+            timeline=timeline if request.include_timeline else None,
+            timeline_fingerprint=timeline_fingerprint,
+            conclusion=conclusion,
+            conclusion_fingerprint=conclusion_fingerprint,
+        )
 
-            # Этап 6: Генерация PDF (85-100%)
-            yield format_sse({
-                "type": "progress",
-                "stage": "generating_pdf",
-                "progress": 88,
-                "message": "Генерация PDF документа..."
-            })
+        # Этап 6: Генерация PDF (85-100%)
+        yield {
+            "type": "progress",
+            "stage": "generating_pdf",
+            "progress": 88,
+            "message": "Генерация PDF документа..."
+        }
 
-            # Подготовка фотографий профилей для семейного древа
-            profile_photos = {}
-            if request.include_photos:
-                profile_photos = {r.id: r.image_url for r in relatives if r.image_url}
-
-            # Подготовка фотографий историй для глав
-            story_photos = self._build_story_photos_for_pdf(photo_catalog) if photo_catalog else None
-            logger.info(f"story_photos для PDF: {len(story_photos) if story_photos else 0} фото")
-            if story_photos:
-                for key, url in story_photos.items():
-                    logger.info(f"  story_photo key='{key}' -> {url[:80]}...")
-
-            pdf_generator = PDFBookGenerator(style=request.style, theme=request.theme)
-            pdf_bytes = pdf_generator.generate(
-                title=outline.get('title', 'Семейная история'),
-                introduction=outline.get('introduction', ''),
-                chapters=chapters_content,
-                conclusion=conclusion,
-                timeline=timeline if request.include_timeline else None,
-                relatives=relatives,
-                relationships=relationships,
-                relative_photos=profile_photos if request.include_photos else None,
-                story_photos=story_photos,
-            )
+        # Подготовка фотографий профилей для семейного древа
+        profile_photos = {}
+        if request.include_photos:
+            profile_photos = {r.id: r.image_url for r in relatives if r.image_url}
+
+        # Подготовка фотографий историй для глав
+        story_photos = self._build_story_photos_for_pdf(photo_catalog) if photo_catalog else None
+        logger.info(f"story_photos для PDF: {len(story_photos) if story_photos else 0} фото")
+        if story_photos:
+            for key, url in story_photos.items():
+                logger.info(f"  story_photo key='{key}' -> {url[:80]}...")
+
+        # Все изображения скачиваются параллельно до рендеринга — PDF собирается без сетевых запросов
+        card_urls = [r.image_url for r in relatives if r.image_url]
+        image_urls = card_urls + list(story_photos.values() if story_photos else [])
+        downloaded = await prefetch_images(image_urls)
+
+        # Каждое фото уменьшается под своё место в книге: миниатюра карточки и фото в главе
+        card_images = await prepare_images(
+            {url: downloaded[url] for url in card_urls if url in downloaded},
+            CARD_PHOTO_POINTS,
+        )
+        images = await prepare_images(
+            {url: downloaded[url] for url in (story_photos or {}).values() if url in downloaded},
+            INLINE_PHOTO_POINTS,
+        )
 
-            yield format_sse({
-                "type": "progress",
-                "stage": "generating_pdf",
-                "progress": 100,
-                "message": "Книга готова!"
-            })
+        # Вёрстка PDF — CPU-работа, выполняется в пуле процессов, не блокируя event loop
+        pdf_bytes = await book_renderer.render(BookSpec(
+            title=outline.get('title', 'Семейная история'),
+            introduction=outline.get('introduction', ''),
+            chapters=chapters_content,
+            conclusion=conclusion,
+            style=request.style,
+            theme=request.theme,
+            timeline=timeline if request.include_timeline else None,
+            relatives=[RelativeSnapshot.from_model(r) for r in relatives],
+            relative_photos=profile_photos if request.include_photos else None,
+            story_photos=story_photos,
+            images=images,
+            card_images=card_images,
+        ))
+
+        yield {
+            "type": "progress",
+            "stage": "generating_pdf",
+            "progress": 100,
+            "message": "Книга готова!"
+        }
 
-            # Загрузка в S3 если доступен
-            s3_url = None
-            s3_key = None
-            filename = f"family_book_{user_id}.pdf"
-            if s3_manager:
-                try:
-                    s3_key, s3_url, _ = await s3_manager.upload_bytes(
-                        pdf_bytes, filename, 'application/pdf'
-                    )
-                except Exception as e:
-                    logger.error(f"Ошибка загрузки книги в S3: {e}")
+        # Загрузка в S3 если доступен
+        s3_url = None
+        s3_key = None
+        filename = f"family_book_{user_id}.pdf"
+        if s3_manager:
+            try:
+                s3_key, s3_url, _ = await s3_manager.upload_bytes(
+                    pdf_bytes, filename, 'application/pdf'
+                )
+            except Exception as e:
+                logger.error(f"Ошибка загрузки книги в S3: {e}")
+
+        yield {
+            "type": "result",
+            "filename": filename,
+            "pdf_bytes": pdf_bytes,
+            "s3_key": s3_key,
+            "s3_url": s3_url,
+            "artifacts": artifacts,
+        }
 
-            # Обновляем запись книги
-            if session and book_record_id:
+    async def _update_book_record(self, session, book_record_id: int, **values) -> None:
+        """Обновить запись трекинга книги"""
+        from src.admin.models import BookGenerationModel
+        from sqlalchemy import update
+        values.setdefault("updated_at", datetime.now(timezone.utc))
+        await session.execute(
+            update(BookGenerationModel)
+            .where(BookGenerationModel.id == book_record_id)
+            .values(**values)
+        )
+        await session.flush()
+
+    async def generate_book_stream(
+        self,
+        user_id: int,
+        request: BookGenerateRequestSchema,
+        family_service: FamilyRelationService,
+        relationship_service: FamilyRelationshipService,
+        s3_manager=None,
+        session=None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Генерация семейной книги с потоковыми обновлениями прогресса.
+        Возвращает SSE события с прогрессом и в конце ссылку на скачивание PDF.
+        """
+        book_record_id = None
+        try:
+            # Создаём запись трекинга если есть сессия
+            if session:
                 try:
                     from src.admin.models import BookGenerationModel
-                    from sqlalchemy import select
-                    result = await session.execute(
-                        select(BookGenerationModel).where(BookGenerationModel.id == book_record_id)
+                    now = datetime.now(timezone.utc)
+                    book_record = BookGenerationModel(
+                        user_id=user_id,
+                        status="generating",
+                        kind="stream",
+                        filename=f"family_book_{user_id}.pdf",
+                        created_at=now,
+                        updated_at=now,
                     )
-                    book_record = result.scalar_one_or_none()
-                    if book_record:
-                        book_record.status = "completed"
-                        book_record.s3_key = s3_key
-                        book_record.s3_url = s3_url
-                        book_record.file_size_bytes = len(pdf_bytes)
-                        book_record.completed_at = datetime.now(timezone.utc)
-                        await session.flush()
+                    session.add(book_record)
+                    await session.flush()
+                    book_record_id = book_record.id
                 except Exception as e:
-                    logger.error(f"Ошибка обновления записи книги: {e}")
+                    logger.error(f"Ошибка создания записи книги: {e}")
 
-            # Отправка PDF в base64
-            pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-            yield format_sse({
-                "type": "result",
-                "pdf_base64": pdf_base64,
-                "filename": filename,
-                **({"s3_url": s3_url} if s3_url else {}),
-            })
+            previous_artifacts = None
+            if session and request.refresh_book_id:
+                previous_artifacts = await load_refresh_source(session, request.refresh_book_id, user_id)
+
+            async for event in self.generate_book_events(
+                user_id, request, family_service, relationship_service, s3_manager, previous_artifacts
+            ):
+                if event["type"] != "result":
+                    yield format_sse(event)
+                    continue
+
+                pdf_bytes = event["pdf_bytes"]
+
+                # Обновляем запись книги
+                if session and book_record_id:
+                    try:
+                        if not event["s3_key"]:
+                            # S3 недоступен — книга будет отдаваться из локального spool
+                            await book_spool.write(book_record_id, pdf_bytes)
+                        await self._update_book_record(
+                            session, book_record_id,
+                            status="completed",
+                            s3_key=event["s3_key"],
+                            s3_url=event["s3_url"],
+                            file_size_bytes=len(pdf_bytes),
+                            artifacts=event["artifacts"],
+                            completed_at=datetime.now(timezone.utc),
+                        )
+                        # Клиент запросит скачивание сразу после события result — запись должна быть видна
+                        await session.commit()
+                    except Exception as e:
+                        logger.error(f"Ошибка обновления записи книги: {e}")
+
+                # Сам PDF в поток не передаётся — только ссылка на потоковое скачивание
+                yield format_sse({
+                    "type": "result",
+                    "filename": event["filename"],
+                    **({
+                        "book_id": book_record_id,
+                        "download_url": book_download_url(book_record_id),
+                    } if book_record_id else {}),
+                    **({"s3_url": event["s3_url"]} if event["s3_url"] else {}),
+                })
 
             yield format_sse({"type": "done"})
 
+        except BookException as e:
+            if session and book_record_id:
+                try:
+                    await self._update_book_record(session, book_record_id, status="failed", error_message=e.message)
+                except Exception as inner_e:
+                    logger.error(f"Ошибка обновления записи при ошибке: {inner_e}")
+            yield format_sse({"type": "error", "message": e.message})
+            yield format_sse({"type": "done"})
+
         except Exception as e:
             # Обновляем запись при ошибке
             if session and book_record_id:
                 try:
-                    from src.admin.models import BookGenerationModel
-                    from sqlalchemy import select
-                    result = await session.execute(
-                        select(BookGenerationModel).where(BookGenerationModel.id == book_record_id)
+                    await self._update_book_record(
+                        session, book_record_id, status="failed", error_message=str(e)[:512]
                     )
-                    book_record = result.scalar_one_or_none()
-                    if book_record:
-                        book_record.status = "failed"
-                        book_record.error_message = str(e)[:512]
-                        await session.flush()
                 except Exception as inner_e:
                     logger.error(f"Ошибка обновления записи при ошибке: {inner_e}")
 
@@ -443,6 +635,7 @@ class BookService:
         self,
         relatives: List,
         relationships: List,
+        stories_by_relative: Dict[int, List],
         include_stories: bool = True
     ) -> str:
         """Форматирование данных семьи для AI промптов"""
@@ -456,8 +649,8 @@ class BookService:
             gen = r.generation if r.generation is not None else 'неизвестно'
 
             stories = ""
-            if include_stories and r.context:
-                story_keys = list(r.context.keys())[:3]  # Макс 3 истории на человека для промпта
+            if include_stories and stories_by_relative.get(r.id):
+                story_keys = [story.title for story in stories_by_relative[r.id][:3]]  # Макс 3 истории на человека для промпта
                 if story_keys:
                     stories = f" | Истории: {story_keys}"
 
@@ -473,18 +666,14 @@ class BookService:
         if include_stories:
             lines.append("\nИСТОРИИ:")
             for r in relatives:
-                if r.context:
-                    name = f"{r.first_name} {r.last_name}"
-                    for key, value in list(r.context.items())[:2]:  # Макс 2 истории на человека
-                        if isinstance(value, str) and len(value) > 10:
-                            lines.append(f"- {name} ({key}): {value[:500]}...")
-                        elif isinstance(value, dict) and value.get("text"):
-                            text = value["text"]
-                            lines.append(f"- {name} ({key}): {text[:500]}...")
+                name = f"{r.first_name} {r.last_name}"
+                for story in stories_by_relative.get(r.id, [])[:2]:  # Макс 2 истории на человека
+                    if story.text and len(story.text) > 10:
+                        lines.append(f"- {name} ({story.title}): {story.text[:500]}...")
 
         return "\n".join(lines)
 
-    async def _generate_outline(self, family_context: str, language: str, style: BookStyle, style_instructions: str, user_id: int | None = None) -> Dict[str, Any]:
+    async def _generate_outline(self, family_context: str, language: str, style: BookStyle, style_instructions: str, user_id: int | None = None, text_mode: BookTextMode = BookTextMode.CACHED) -> Dict[str, Any]:
         """Генерация структуры книги через AI"""
         prompt = BOOK_OUTLINE_PROMPT.format(
             family_context=family_context,
@@ -495,18 +684,10 @@ class BookService:
 
         temperature = self._get_temperature(style)
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=2500,
-        )
-
-        if response.usage:
-            await _save_ai_usage(user_id, self.model, response.usage.prompt_tokens or 0, response.usage.completion_tokens or 0, response.usage.total_tokens or 0, "book")
+        content = await self._complete(prompt, temperature, 2500, text_mode, user_id, validate=_is_json)
 
         try:
-            return extract_json_from_response(response.choices[0].message.content)
+            return extract_json_from_response(content)
         except Exception:
             # Возвращаем базовую структуру если AI не смог сгенерировать валидный JSON
             return {
@@ -531,7 +712,7 @@ class BookService:
                 "conclusion_theme": "Наследие и будущее семьи"
             }
 
-    async def _generate_timeline(self, family_context: str, language: str, user_id: int | None = None) -> List[Dict]:
+    async def _generate_timeline(self, family_context: str, language: str, user_id: int | None = None, text_mode: BookTextMode = BookTextMode.CACHED) -> List[Dict]:
         """Генерация хронологии семейных событий"""
         prompt = TIMELINE_PROMPT.format(
             family_context=family_context,
@@ -539,18 +720,10 @@ class BookService:
             grounding_rules=GROUNDING_RULES,
         )
 
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=1500,
-        )
-
-        if response.usage:
-            await _save_ai_usage(user_id, self.model, response.usage.prompt_tokens or 0, response.usage.completion_tokens or 0, response.usage.total_tokens or 0, "book")
+        content = await self._complete(prompt, 0.3, 1500, text_mode, user_id, validate=_is_json)
 
         try:
-            result = extract_json_from_response(response.choices[0].message.content)
+            result = extract_json_from_response(content)
             if isinstance(result, list):
                 return result
             elif isinstance(result, dict) and 'events' in result:
@@ -564,24 +737,52 @@ class BookService:
         chapter_info: Dict,
         relatives: List,
         relationships: List,
+        stories_by_relative: Dict[int, List],
         language: str,
         style: BookStyle,
         style_instructions: str,
         photo_catalog: Dict,
         used_photo_keys: set = None,
         user_id: int | None = None,
+        text_mode: BookTextMode = BookTextMode.CACHED,
     ) -> str:
         """Написание одной главы"""
+        prompt, available_photos = self._chapter_prompt(
+            chapter_info, relatives, relationships, stories_by_relative,
+            language, style_instructions, photo_catalog, used_photo_keys,
+        )
+        temperature = self._get_temperature(style)
+
+        chapter_text = await self._complete(prompt, temperature, 2000, text_mode, user_id)
+
+        # Логирование маркеров фото в ответе AI
+        photo_markers = re.findall(r'\[PHOTO:[^\]]+\]', chapter_text or "")
+        logger.info(f"Глава '{chapter_info.get('title', '?')}': AI вернул {len(photo_markers)} маркеров фото")
+        if photo_markers:
+            for m in photo_markers:
+                logger.info(f"  Маркер: {m}")
+        else:
+            logger.warning(f"Глава '{chapter_info.get('title', '?')}': AI НЕ вставил маркеры фото. available_photos: {available_photos[:200]}")
+
+        return chapter_text
+
+    def _chapter_prompt(
+        self,
+        chapter_info: Dict,
+        relatives: List,
+        relationships: List,
+        stories_by_relative: Dict[int, List],
+        language: str,
+        style_instructions: str,
+        photo_catalog: Dict,
+        used_photo_keys: set = None,
+    ) -> tuple:
+        """Промпт главы и список доступных ей фото; промпт — это и все входные данные главы"""
         if used_photo_keys is None:
             used_photo_keys = set()
 
         # Получаем родственников для этой главы
-        relative_ids = chapter_info.get('relatives_to_include', [])
-        chapter_relatives = [r for r in relatives if r.id in relative_ids]
-
-        if not chapter_relatives:
-            # Используем первых 10 родственников если не указаны конкретные
-            chapter_relatives = relatives[:10]
+        chapter_relatives = self._chapter_relatives(chapter_info, relatives)
 
         chapter_relative_ids = [r.id for r in chapter_relatives]
 
@@ -594,17 +795,13 @@ class BookService:
             data = f"- {name}, род. {birth}, пол: {gender}"
             relatives_data.append(data)
 
-        # Форматируем истории (поддержка и строк и dict формата)
+        # Форматируем истории
         stories_context = []
         for r in chapter_relatives:
-            if r.context:
-                for key, value in r.context.items():
-                    name = f"{r.first_name} {r.last_name}"
-                    if isinstance(value, str):
-                        stories_context.append(f"- История '{key}' о {name}: {value[:300]}")
-                    elif isinstance(value, dict) and value.get("text"):
-                        text = value["text"]
-                        stories_context.append(f"- История '{key}' о {name}: {text[:300]}")
+            name = f"{r.first_name} {r.last_name}"
+            for story in stories_by_relative.get(r.id, []):
+                if story.text:
+                    stories_context.append(f"- История '{story.title}' о {name}: {story.text[:300]}")
 
         # Форматируем связи
         rel_ids = {r.id for r in chapter_relatives}
@@ -615,12 +812,10 @@ class BookService:
             rel_type = r.relationship_type.value if hasattr(r.relationship_type, 'value') else str(r.relationship_type)
             relationships_context.append(f"- ID:{r.from_relative_id} является {rel_type} для ID:{r.to_relative_id}")
 
-        # Форматируем доступные фото для главы (исключаем уже использованные)
+        # Форматируем доступные фото для главы (без закреплённых за предыдущими главами)
         available_photos = self._format_available_photos(photo_catalog, chapter_relative_ids, used_photo_keys)
         photo_instructions = PHOTO_INSTRUCTIONS.format(available_photos=available_photos) if photo_catalog and available_photos != "Нет доступных фотографий." else ""
 
-        temperature = self._get_temperature(style)
-
         prompt = CHAPTER_WRITING_PROMPT.format(
             chapter_theme=chapter_info.get('theme', ''),
             chapter_title=chapter_info.get('title', ''),
@@ -632,30 +827,7 @@ class BookService:
             style_instructions=style_instructions,
             photo_instructions=photo_instructions,
         )
-
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=2000,
-        )
-
-        if response.usage:
-            await _save_ai_usage(user_id, self.model, response.usage.prompt_tokens or 0, response.usage.completion_tokens or 0, response.usage.total_tokens or 0, "book")
-
-        chapter_text = response.choices[0].message.content
-
-        # Логирование маркеров фото в ответе AI
-        import re
-        photo_markers = re.findall(r'\[PHOTO:[^\]]+\]', chapter_text or "")
-        logger.info(f"Глава '{chapter_info.get('title', '?')}': AI вернул {len(photo_markers)} маркеров фото")
-        if photo_markers:
-            for m in photo_markers:
-                logger.info(f"  Маркер: {m}")
-        else:
-            logger.warning(f"Глава '{chapter_info.get('title', '?')}': AI НЕ вставил маркеры фото. available_photos: {available_photos[:200]}")
-
-        return chapter_text
+        return prompt, available_photos
 
     async def _write_conclusion(
         self,
@@ -665,6 +837,7 @@ class BookService:
         style: BookStyle,
         style_instructions: str,
         user_id: int | None = None,
+        text_mode: BookTextMode = BookTextMode.CACHED,
     ) -> str:
         """Написание заключения книги"""
         temperature = self._get_temperature(style)
@@ -677,14 +850,50 @@ class BookService:
             style_instructions=style_instructions,
         )
 
+        return await self._complete(prompt, temperature, 600, text_mode, user_id)
+
+    async def _complete(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        text_mode: BookTextMode = BookTextMode.CACHED,
+        user_id: int | None = None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Запрос к AI через кэш ответов (src.ai.cache).
+
+        validate — ответ, не прошедший проверку (например, битый JSON структуры), не кэшируется,
+        чтобы повторная генерация не воспроизводила запасной вариант.
+        """
+        key = llm_response_cache.make_key(self.model, prompt, temperature, max_tokens)
+        if text_mode != BookTextMode.FRESH:
+            cached = await llm_response_cache.get(key)
+            if cached is not None:
+                return cached
+        if text_mode == BookTextMode.REUSE:
+            raise BookTextNotCachedError()
+
         response = await self.client.chat.completions.create(
             model=self.model,
             messages=[{"role": "user", "content": prompt}],
             temperature=temperature,
-            max_tokens=600,
+            max_tokens=max_tokens,
         )
 
         if response.usage:
             await _save_ai_usage(user_id, self.model, response.usage.prompt_tokens or 0, response.usage.completion_tokens or 0, response.usage.total_tokens or 0, "book")
 
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        if content and (validate is None or validate(content)):
+            await llm_response_cache.put(key, self.model, content)
+        return content
+
+
+def _is_json(content: str) -> bool:
+    try:
+        extract_json_from_response(content)
+        return True
+    except Exception:
+        return False
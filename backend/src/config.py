@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -26,6 +29,98 @@ class Settings(BaseSettings):
     yookassa_secret_key: str | None = Field(default=None)
     yookassa_webhook_secret: str | None = Field(default=None)
 
+    # Кэш графов семейных деревьев (in-memory, на процесс)
+    family_graph_cache_max_bytes: int = Field(default=64 * 1024 * 1024)
+    family_graph_cache_ttl_seconds: int = Field(default=300)
+
+    # Генерация книги: сколько глав пишется параллельно (одновременных запросов к LLM)
+    book_chapter_concurrency: int = Field(default=4)
+
+    # Изображения для PDF: параллельная предзагрузка и LRU-кэш байтов (на процесс)
+    book_image_prefetch_concurrency: int = Field(default=8)
+    book_image_cache_max_bytes: int = Field(default=128 * 1024 * 1024)
+    # Уменьшение фото под размер в книге: разрешение, качество JPEG, LRU-кэш уменьшенных копий
+    book_image_dpi: int = Field(default=150)
+    book_image_jpeg_quality: int = Field(default=82)
+    book_derived_image_cache_max_bytes: int = Field(default=64 * 1024 * 1024)
+
+    # Рендеринг PDF в пуле процессов (0 — в потоке текущего процесса) и лимит времени на книгу
+    book_render_workers: int = Field(default=2)
+    book_render_timeout_seconds: float = Field(default=120.0)
+
+    # Фоновые задачи генерации книг: воркеры на процесс, лимит активных задач на пользователя,
+    # через сколько секунд без прогресса задача считается брошенной и перезапускается
+    book_job_workers: int = Field(default=2)
+    book_jobs_per_user: int = Field(default=1)
+    book_job_stale_seconds: int = Field(default=600)
+    book_job_poll_interval_seconds: float = Field(default=2.0)
+
+    # Каталог для PDF, которые не удалось загрузить в S3, и срок, за который их нужно догрузить в S3.
+    # При нескольких экземплярах приложения каталог должен быть общим (сетевым)
+    book_spool_dir: str = Field(default=os.path.join(tempfile.gettempdir(), "genetic_tree_books"))
+    book_spool_ttl_seconds: int = Field(default=24 * 3600)
+
+    # Кэш ответов LLM (таблица llm_response_cache): срок жизни и общий объём
+    llm_cache_enabled: bool = Field(default=True)
+    llm_cache_ttl_seconds: int = Field(default=30 * 24 * 3600)
+    llm_cache_max_bytes: int = Field(default=256 * 1024 * 1024)
+
+    # Потоковая загрузка в S3: размер части multipart (не меньше 5 МБ) и сколько частей передаётся параллельно
+    s3_multipart_part_size: int = Field(default=8 * 1024 * 1024)
+    s3_multipart_concurrency: int = Field(default=4)
+    # Размер пула соединений долгоживущего S3-клиента
+    s3_max_pool_connections: int = Field(default=20)
+    # Срок действия подписанной формы прямой загрузки в S3 (медиа историй)
+    s3_presign_expires_seconds: int = Field(default=900)
+    # Через сколько секунд неподтверждённый объект прямой загрузки считается брошенным и удаляется
+    s3_orphan_upload_seconds: int = Field(default=24 * 3600)
+
+    # Прокси /storage/proxy: пул соединений к S3, таймаут и дисковый LRU-кэш небольших объектов
+    storage_proxy_max_connections: int = Field(default=50)
+    storage_proxy_timeout_seconds: float = Field(default=30.0)
+    storage_proxy_cache_dir: str = Field(default=os.path.join(tempfile.gettempdir(), "genetic_tree_proxy"))
+    # Лимит кэша на воркер: каталог общий, при N воркерах он занимает до N × max_bytes
+    storage_proxy_cache_max_bytes: int = Field(default=512 * 1024 * 1024)
+    storage_proxy_cache_max_object_bytes: int = Field(default=16 * 1024 * 1024)
+    storage_proxy_cache_ttl_seconds: int = Field(default=7 * 24 * 3600)
+
+    # Миниатюры фото (WebP 64/256/1024): процессы пула (0 — поток текущего процесса),
+    # сколько фото обрабатывается одновременно, качество WebP
+    thumbnail_workers: int = Field(default=2)
+    thumbnail_concurrency: int = Field(default=4)
+    thumbnail_webp_quality: int = Field(default=80)
+
+    # Хеширование паролей: итерации PBKDF2 (при изменении старые хеши обновляются при входе),
+    # потоки пула и сколько запросов может ждать в очереди (сверх — 503)
+    password_hash_iterations: int = Field(default=310000)
+    password_hash_workers: int = Field(default=4)
+    password_hash_max_queue: int = Field(default=64)
+
+    # Кэш текущего пользователя для auth-зависимостей (на процесс): срок жизни записи
+    # (0 — кэш выключен) и лимит числа записей
+    principal_cache_ttl_seconds: float = Field(default=30.0)
+    principal_cache_max_entries: int = Field(default=10_000)
+
+    # Права пользователей по тарифу (план + расход за месяц) и тарифные планы: кэш на процесс
+    entitlements_cache_ttl_seconds: float = Field(default=10.0)
+    entitlements_cache_max_entries: int = Field(default=10_000)
+    plan_cache_ttl_seconds: float = Field(default=300.0)
+
+    # Логи использования AI: буфер событий на процесс (сверх — отбрасываются),
+    # запись пакетом при batch_size событиях или раз в flush_interval_ms
+    ai_usage_buffer_max_events: int = Field(default=10_000)
+    ai_usage_flush_batch_size: int = Field(default=100)
+    ai_usage_flush_interval_ms: int = Field(default=1000)
+
+    # Отзыв токенов при выходе: memory (на процесс) или database (общая таблица для всех воркеров),
+    # мягкий лимит записей в памяти (действующие отзывы не вытесняются), период синхронизации
+    # между воркерами и очистки истёкших записей
+    token_revocation_backend: str = Field(default="database")
+    token_revocation_max_entries: int = Field(default=100_000)
+    token_revocation_sync_interval_seconds: float = Field(default=5.0)
+    token_revocation_cleanup_interval_seconds: float = Field(default=600.0)
+    token_revocation_cleanup_batch_size: int = Field(default=1000)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8"
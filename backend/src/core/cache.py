@@ -0,0 +1,134 @@
+"""
+Общий LRU-кэш процесса с TTL и версиями ключей.
+
+Основа кэшей графа семьи, текущего пользователя и прав подписки. Объём ограничивается
+max_size: по умолчанию это число записей, подкласс может считать размер иначе
+(_size, например в байтах). Сбросы после записи в БД — через invalidate_on_commit.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.hooks import on_commit
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class VersionedTTLCache(Generic[K, V]):
+    """
+    LRU-кэш с TTL и ограничением суммарного размера записей.
+
+    invalidate() увеличивает версию ключа: значение, загрузка которого
+    началась до инвалидации, в кэш уже не попадет.
+
+    Подкласс задаёт ключ значения для put (_key) и при необходимости его размер (_size),
+    проверку актуальности (_is_valid) и форму хранения (_pack/_unpack).
+    None не кэшируется.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[K, Tuple[Any, int, float]]" = OrderedDict()
+        self._versions: Dict[K, int] = {}
+        self._total_size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def _key(self, value: V) -> K:
+        raise NotImplementedError
+
+    def _size(self, value: V) -> int:
+        return 1
+
+    def _is_valid(self, value: V) -> bool:
+        return True
+
+    def _pack(self, value: V) -> Any:
+        return value
+
+    def _unpack(self, stored: Any) -> V:
+        return stored
+
+    def get(self, key: K) -> Optional[V]:
+        """Значение из кэша (None при промахе, истекшем TTL или неактуальном значении)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored, _, expires_at = entry
+        value = self._unpack(stored) if expires_at > time.monotonic() else None
+        if value is None or not self._is_valid(value):
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, value: V) -> None:
+        """Запомнить значение, вытесняя давно не использованные при превышении лимита"""
+        self._store(self._key(value), value)
+
+    def _store(self, key: K, value: V) -> None:
+        size = self._size(value)
+        if not self.enabled or size > self.max_size:
+            return
+        self._drop(key)
+        self._entries[key] = (self._pack(value), size, time.monotonic() + self.ttl_seconds)
+        self._total_size += size
+        while self._total_size > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    async def get_or_load(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        """Значение из кэша или из loader (ошибки loader и None не кэшируются)"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        version = self._versions.get(key, 0)
+        value = await loader()
+        if value is not None and self._versions.get(key, 0) == version:
+            self._store(key, value)
+        return value
+
+    def invalidate(self, key: K) -> None:
+        """Сбросить значение после изменения данных"""
+        self._versions[key] = self._versions.get(key, 0) + 1
+        self._drop(key)
+
+    def invalidate_on_commit(self, session: AsyncSession, key: K) -> None:
+        """
+        Сбросить значение сейчас и ещё раз после коммита сессии.
+
+        Значение, загруженное между записью и коммитом, ещё не видит изменений —
+        повторный сброс после коммита не даёт ему остаться в кэше.
+        """
+        self.invalidate(key)
+        on_commit(session, lambda: self.invalidate(key))
+
+    def clear(self) -> None:
+        """Очистить кэш полностью"""
+        self._entries.clear()
+        self._versions.clear()
+        self._total_size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики кэша"""
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def _peek(self, key: K) -> Optional[Any]:
+        """Хранимое значение без учёта TTL и метрик (для обновления на месте)"""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def _drop(self, key: K) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_size -= entry[1]
@@ -19,4 +19,6 @@ def setup_cors(app: FastAPI):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Курсор следующей страницы для списков без обёртки (keyset-пагинация)
+        expose_headers=["X-Next-Cursor"],
     )
\ No newline at end of file
@@ -0,0 +1,7 @@
+"""Работа с датами из БД"""
+from datetime import datetime, timezone
+
+
+def as_utc(value: datetime) -> datetime:
+    """Datetime с часовым поясом: SQLite возвращает значения без него, а в БД они всегда в UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
@@ -0,0 +1,90 @@
+"""
+Keyset-пагинация с непрозрачными курсорами.
+
+Курсор — base64url от JSON-списка значений ключа сортировки последней строки страницы
+(например, [created_at, id]) с меткой scope, чтобы курсор одного списка или одной сортировки
+нельзя было подставить в другой. Следующая страница выбирается условием «строго после курсора»,
+поэтому стоимость запроса не зависит от глубины страницы, в отличие от OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.exceptions import InvalidCursorError
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(*values: Any, scope: str = "") -> str:
+    """Упаковать значения ключа сортировки в непрозрачный курсор"""
+    payload = json.dumps([scope, *(_encode_value(v) for v in values)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int, scope: str = "") -> List[Any]:
+    """Распаковать курсор; InvalidCursorError если он повреждён или от другого списка"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size + 1 or payload[0] != scope:
+            raise ValueError("cursor mismatch")
+        return [_decode_value(v) for v in payload[1:]]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursorError(cursor)
+
+
+def keyset_condition(columns: Sequence[Any], values: Sequence[Any], descending: bool = True) -> ColumnElement:
+    """
+    Условие «строка идёт после курсора» для сортировки по columns.
+
+    (a, b) после (x, y) при DESC: a < x OR (a = x AND b < y).
+    Записано через OR/AND, а не сравнением кортежей, чтобы планировщик использовал индекс
+    по первой колонке и в PostgreSQL, и в SQLite.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [c == v for c, v in zip(columns[:i], values[:i])]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def apply_keyset(
+    query,
+    columns: Sequence[Any],
+    cursor: Optional[str],
+    descending: bool = True,
+    scope: str = ""
+):
+    """Добавить к запросу сортировку по columns и, если передан курсор, условие keyset"""
+    if cursor:
+        values = decode_cursor(cursor, len(columns), scope)
+        query = query.where(keyset_condition(columns, values, descending))
+    order = [c.desc() if descending else c.asc() for c in columns]
+    return query.order_by(*order)
+
+
+def next_cursor(
+    items: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], Sequence[Any]],
+    scope: str = ""
+) -> Optional[str]:
+    """Курсор следующей страницы: есть, только если страница заполнена целиком"""
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(*key(items[-1]), scope=scope)
@@ -0,0 +1,77 @@
+"""
+HTTP Range для потоковой отдачи файлов (скачивание книг, прокси S3).
+
+Поддерживается один диапазон в байтах (RFC 9110): нет заголовка, несколько
+диапазонов, другие единицы или некорректный диапазон (last < first) — отдаётся
+весь объект; диапазон за пределами объекта — 416.
+"""
+import asyncio
+import re
+from typing import AsyncIterator, BinaryIO, Optional, Tuple
+
+from fastapi import HTTPException
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiableError(HTTPException):
+    """Диапазон за пределами объекта (HTTP 416)"""
+
+    def __init__(self, size: int):
+        super().__init__(
+            status_code=416,
+            detail="Запрошенный диапазон недоступен",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разобрать заголовок Range в (start, end) включительно для объекта размера size.
+
+    None — отдать объект целиком; RangeNotSatisfiableError — диапазон вне объекта.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Суффиксный диапазон: последние N байт
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiableError(size)
+        if size == 0:
+            return None
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError(size)
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+async def read_file_range(
+    file: BinaryIO,
+    start: int,
+    end: int,
+    chunk_size: int = CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Читать байты [start, end] открытого файла порциями (чтение с диска — в потоке); файл закрывается"""
+    try:
+        await asyncio.to_thread(file.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(file.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(file.close)
@@ -26,15 +26,21 @@ async def get_session():
             await session.close()
 
 
-async def setup_db():
+def import_models():
+    """Импорт всех моделей, чтобы их таблицы попали в Base.metadata"""
     from src.users.models import UserModel  # noqa: F401
-    from src.family.models import FamilyRelationModel, FamilyRelationshipModel  # noqa: F401
+    from src.family.models import FamilyRelationModel, FamilyRelationshipModel, StoryModel, InterviewMessageModel  # noqa: F401
     from src.admin.models import AdminAuditLogModel, AIUsageLogModel, BookGenerationModel  # noqa: F401
-    from src.ai.models import AIChatSessionModel  # noqa: F401
+    from src.ai.models import AIChatSessionModel, LLMResponseCacheModel  # noqa: F401
+    from src.auth.models import RevokedTokenModel  # noqa: F401
     from src.subscription.models import (  # noqa: F401
         SubscriptionPlanModel, UserSubscriptionModel, PaymentModel, UsageQuotaModel
     )
-    
+
+
+async def setup_db():
+    import_models()
+
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
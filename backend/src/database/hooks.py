@@ -0,0 +1,20 @@
+"""Действия, привязанные к завершению транзакции сессии"""
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def on_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    Выполнить callback после коммита транзакции сессии.
+
+    Нужен для сброса кэшей процесса: сброс до коммита позволяет параллельному
+    запросу загрузить ещё не изменённые данные и положить их в кэш на весь TTL.
+    Без сессии SQLAlchemy (например, mock в тестах) callback выполняется сразу.
+    """
+    sync_session = getattr(session, "sync_session", None)
+    if not isinstance(session, AsyncSession) or sync_session is None:
+        callback()
+        return
+    event.listen(sync_session, "after_commit", lambda _session: callback(), once=True)
@@ -0,0 +1,67 @@
+"""
+Обновление схемы БД при старте приложения.
+
+setup_db пересоздаёт все таблицы и годится только для пустой БД. При старте
+приложения вызывается ensure_schema: она создаёт недостающие таблицы
+(checkfirst), добавляет в существующие таблицы новые колонки и индексы моделей
+и не трогает существующие данные. Изменение или удаление колонок так не
+выполняется — только добавление.
+
+Перенос данных в новые таблицы выполняется отдельно, например
+python -m src.family.backfill для историй из context.
+"""
+import logging
+
+from sqlalchemy import Connection, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn
+
+from src.database.base import Base
+from src.database.client import import_models
+
+logger = logging.getLogger(__name__)
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """
+    ALTER TABLE ... ADD COLUMN для колонок моделей, которых нет в существующих таблицах.
+
+    Новая колонка должна быть nullable или иметь server_default — иначе добавить её
+    в непустую таблицу нельзя.
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}"))
+            logger.info(f"Схема БД: добавлена колонка {table.name}.{column.name}")
+
+
+def _add_missing_indexes(conn: Connection) -> None:
+    """Индексы моделей для существующих таблиц (create_all создаёт их только вместе с таблицей)"""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(conn)
+                logger.info(f"Схема БД: создан индекс {index.name}")
+
+
+async def ensure_schema(engine: AsyncEngine) -> None:
+    """Создать недостающие таблицы, колонки и индексы"""
+    import_models()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, checkfirst=True)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_add_missing_indexes)
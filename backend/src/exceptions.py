@@ -144,6 +144,19 @@ class ResourceInactiveError(ResourceException):
 
 
 
+class InvalidCursorError(BaseAppException):
+    def __init__(self, cursor: str):
+        super().__init__(
+            message="Invalid pagination cursor",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            details={
+                "error_type": "invalid_cursor",
+                "cursor": cursor[:100]
+            }
+        )
+
+
+
 class BulkOperationError(BaseAppException):
     def __init__(self, operation: str, failed_count: int, total_count: int, errors: list):
         super().__init__(
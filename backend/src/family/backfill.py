@@ -0,0 +1,181 @@
+"""
+Перенос историй и сообщений интервью из JSON-поля context в таблицы stories / interview_messages.
+
+Родственники обрабатываются пачками по id (keyset), каждая пачка — отдельная транзакция,
+поэтому скрипт можно безопасно прерывать и запускать повторно: уже перенесённые
+ключи удаляются из context, а истории с существующим названием пропускаются.
+
+Использование:
+    cd backend
+    python -m src.family.backfill [--batch-size 500]
+"""
+import asyncio
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.client import async_engine, async_session
+from src.database.schema import ensure_schema
+from src.users.models import UserModel  # noqa: F401 — нужен для SQLAlchemy mapper
+from src.family.models import (
+    FamilyRelationModel, FamilyRelationshipModel, StoryModel, InterviewMessageModel  # noqa: F401
+)
+from src.family.utils import INTERVIEW_MESSAGES_KEY, STORY_TITLE_MAX_LENGTH, is_context_story
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    """ISO-строка из context -> datetime (UTC), None если не распознана"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+async def _backfill_relative(
+    session: AsyncSession,
+    relative_id: int,
+    user_id: int,
+    context: Dict[str, Any],
+    stats: Dict[str, int],
+) -> Dict[str, Any]:
+    """Перенести данные одного родственника, вернуть очищенный context"""
+    now = datetime.now(timezone.utc)
+    existing = await session.execute(
+        select(StoryModel.title).where(StoryModel.relative_id == relative_id)
+    )
+    titles = set(existing.scalars().all())
+
+    remaining = {}
+    for key, value in context.items():
+        if key == INTERVIEW_MESSAGES_KEY:
+            for message in value or []:
+                if not isinstance(message, dict):
+                    continue
+                session.add(InterviewMessageModel(
+                    relative_id=relative_id,
+                    user_message=str(message.get('user') or ''),
+                    ai_response=str(message.get('ai') or ''),
+                    created_at=_parse_datetime(message.get('timestamp')) or now,
+                ))
+                stats['interview_messages'] += 1
+            continue
+
+        if not is_context_story(key, value):
+            remaining[key] = value
+            continue
+
+        title = key[:STORY_TITLE_MAX_LENGTH]
+        if title in titles:
+            stats['skipped'] += 1
+            continue
+        titles.add(title)
+
+        if isinstance(value, str):
+            text, media, created_at, updated_at = value, [], None, None
+        else:
+            text = value.get('text') or ''
+            media = value.get('media') or []
+            created_at = _parse_datetime(value.get('created_at'))
+            updated_at = _parse_datetime(value.get('updated_at'))
+
+        session.add(StoryModel(
+            user_id=user_id,
+            relative_id=relative_id,
+            title=title,
+            text=text,
+            media=list(media),
+            created_at=created_at or now,
+            updated_at=updated_at or created_at or now,
+        ))
+        stats['stories'] += 1
+
+    return remaining
+
+
+async def backfill_stories_from_context(
+    session: AsyncSession,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    commit: bool = True,
+) -> Dict[str, int]:
+    """
+    Перенести истории и интервью всех родственников из context в отдельные таблицы.
+
+    Загружаются только id, user_id и context — без ORM-объектов родственников,
+    так что память ограничена размером одной пачки.
+    """
+    stats = {'relatives': 0, 'stories': 0, 'interview_messages': 0, 'skipped': 0}
+    last_id = 0
+
+    while True:
+        result = await session.execute(
+            select(FamilyRelationModel.id, FamilyRelationModel.user_id, FamilyRelationModel.context)
+            .where(
+                FamilyRelationModel.id > last_id,
+                FamilyRelationModel.context.isnot(None)
+            )
+            .order_by(FamilyRelationModel.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        for relative_id, user_id, context in rows:
+            last_id = relative_id
+            if not isinstance(context, dict):
+                continue
+            if INTERVIEW_MESSAGES_KEY not in context and not any(
+                is_context_story(key, value) for key, value in context.items()
+            ):
+                continue
+
+            remaining = await _backfill_relative(session, relative_id, user_id, context, stats)
+            await session.execute(
+                update(FamilyRelationModel)
+                .where(FamilyRelationModel.id == relative_id)
+                .values(context=remaining)
+            )
+            stats['relatives'] += 1
+
+        await session.flush()
+        if commit:
+            await session.commit()
+
+    return stats
+
+
+async def run(batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    """Создать новые таблицы (если их нет) и выполнить перенос"""
+    await ensure_schema(async_engine)
+
+    async with async_session() as session:
+        return await backfill_stories_from_context(session, batch_size=batch_size)
+
+
+def main():
+    batch_size = DEFAULT_BATCH_SIZE
+    if "--batch-size" in sys.argv:
+        batch_size = int(sys.argv[sys.argv.index("--batch-size") + 1])
+
+    stats = asyncio.run(run(batch_size))
+    print(
+        f"Родственников обработано: {stats['relatives']}, "
+        f"историй перенесено: {stats['stories']}, "
+        f"сообщений интервью: {stats['interview_messages']}, "
+        f"пропущено дубликатов: {stats['skipped']}."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -97,3 +97,15 @@ class RelationshipType(str, Enum):
     GUARDIAN = "guardian"  # Опекун
     WARD = "ward"  # Подопечный
     UNKNOWN = "unknown"
+
+
+class KinshipType(str, Enum):
+    """Вид родства, вычисляемый по графу связей"""
+
+    ANCESTOR = "ancestor"      # Предки: родители, бабушки и дедушки...
+    DESCENDANT = "descendant"  # Потомки: дети, внуки...
+    SIBLING = "sibling"        # Братья и сестры (общий родитель)
+    COUSIN = "cousin"          # Двоюродные, троюродные...
+    COLLATERAL = "collateral"  # Тети, дяди, племянники
+    SPOUSE = "spouse"          # Супруги
+    IN_LAW = "in_law"          # Родственники супругов и супруги родственников
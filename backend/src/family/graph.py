@@ -0,0 +1,283 @@
+"""
+In-memory граф семейного дерева пользователя.
+
+FamilyGraph — компактный снимок родственников и связей со списками смежности;
+FamilyGraphCache — LRU-кэш графов с ограничением по памяти и TTL.
+Кэш локален для процесса: сервисы сбрасывают граф пользователя при каждой
+записи, а TTL ограничивает устаревание при нескольких воркерах.
+"""
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.core.cache import VersionedTTLCache
+from src.family.enums import GenderType, KinshipType, RelationshipType
+from src.family.utils import (
+    classify_kinship, kinship_rank, kinship_walk_rules,
+    PARENT_RELATIONSHIP_TYPES, SPOUSE_RELATIONSHIP_TYPES
+)
+
+# Грубая оценка накладных расходов Python на один узел/ребро (объект + словари смежности)
+_NODE_OVERHEAD_BYTES = 512
+_EDGE_OVERHEAD_BYTES = 256
+
+
+@dataclass(slots=True)
+class GraphRelative:
+    """Родственник в графе (без тяжелого context и текстов — только названия историй)"""
+    id: int
+    first_name: Optional[str]
+    middle_name: Optional[str]
+    last_name: Optional[str]
+    gender: Optional[GenderType]
+    birth_date: Optional[datetime]
+    death_date: Optional[datetime]
+    generation: Optional[int]
+    image_url: Optional[str]
+    is_activated: bool
+    story_titles: Tuple[str, ...]
+
+
+@dataclass(slots=True)
+class GraphRelationship:
+    """Связь в графе; поля совпадают с FamilyRelationshipOutputSchema"""
+    id: int
+    user_id: int
+    from_relative_id: int
+    to_relative_id: int
+    relationship_type: RelationshipType
+    created_at: datetime
+    is_active: bool
+
+
+class FamilyGraph:
+    """Снимок семейного дерева пользователя со списками смежности"""
+
+    def __init__(self, user_id: int, relatives: List[GraphRelative], relationships: List[GraphRelationship]):
+        self.user_id = user_id
+        self.relatives: Dict[int, GraphRelative] = {r.id: r for r in relatives}
+        self.relationships: List[GraphRelationship] = relationships
+
+        # Ребра для обхода: up — к родителям, down — к детям, spouse — к супругам
+        self.parents: Dict[int, List[int]] = defaultdict(list)
+        self.children: Dict[int, List[int]] = defaultdict(list)
+        self.spouses: Dict[int, List[int]] = defaultdict(list)
+        for rel in relationships:
+            rel_type = rel.relationship_type.value if rel.relationship_type else None
+            if rel_type in PARENT_RELATIONSHIP_TYPES:
+                self.parents[rel.to_relative_id].append(rel.from_relative_id)
+                self.children[rel.from_relative_id].append(rel.to_relative_id)
+            elif rel_type in SPOUSE_RELATIONSHIP_TYPES:
+                self.spouses[rel.from_relative_id].append(rel.to_relative_id)
+                self.spouses[rel.to_relative_id].append(rel.from_relative_id)
+
+        self.size_bytes = self._estimate_size()
+
+    @classmethod
+    def from_models(
+        cls,
+        user_id: int,
+        relatives: List[Any],
+        relationships: List[Any],
+        story_titles: Dict[int, List[str]]
+    ) -> "FamilyGraph":
+        """Построить граф из ORM-моделей (активные родственники и связи) и названий историй"""
+        return cls(
+            user_id,
+            [
+                GraphRelative(
+                    id=r.id,
+                    first_name=r.first_name,
+                    middle_name=r.middle_name,
+                    last_name=r.last_name,
+                    gender=r.gender,
+                    birth_date=r.birth_date,
+                    death_date=r.death_date,
+                    generation=r.generation,
+                    image_url=r.image_url,
+                    is_activated=bool(r.is_activated),
+                    story_titles=tuple(story_titles.get(r.id, ())),
+                )
+                for r in relatives
+            ],
+            [
+                GraphRelationship(
+                    id=r.id,
+                    user_id=r.user_id,
+                    from_relative_id=r.from_relative_id,
+                    to_relative_id=r.to_relative_id,
+                    relationship_type=r.relationship_type,
+                    created_at=r.created_at,
+                    is_active=r.is_active,
+                )
+                for r in relationships
+            ],
+        )
+
+    def _estimate_size(self) -> int:
+        """Приблизительный объем памяти графа в байтах"""
+        size = 0
+        for r in self.relatives.values():
+            size += _NODE_OVERHEAD_BYTES
+            size += sum(len(s) for s in (r.first_name, r.middle_name, r.last_name, r.image_url) if s)
+            size += sum(len(title) + 64 for title in r.story_titles)
+        return size + _EDGE_OVERHEAD_BYTES * len(self.relationships)
+
+    def kinship(
+        self,
+        relative_id: int,
+        kinship: Optional[KinshipType] = None,
+        max_depth: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Найти родственников заданного вида до max_depth поколений обходом в ширину.
+
+        Путь идёт сначала вверх к предкам, затем вниз к потомкам, с не более чем одним
+        переходом через супруга (в начале или в конце пути). Если человек достижим
+        несколькими путями, берётся путь через ближайшего общего предка; правила
+        обхода и классификации — в src.family.utils.
+        """
+        if relative_id not in self.relatives:
+            return []
+
+        rules = kinship_walk_rules(kinship, max_depth)
+        start = (relative_id, 0, 0, 0)
+        paths: Dict[Tuple[int, int, int, int], List[int]] = {start: [relative_id]}
+        queue = deque([start])
+
+        while queue:
+            state = queue.popleft()
+            node, up, down, spouse = state
+            steps = []
+            if spouse != 2:
+                if rules.walk_up and down == 0 and up < rules.max_up:
+                    steps.extend((parent, up + 1, down, spouse) for parent in self.parents.get(node, ()))
+                if rules.walk_down and down < rules.max_down:
+                    steps.extend((child, up, down + 1, spouse) for child in self.children.get(node, ()))
+            if rules.walk_spouse and spouse == 0 and (down > 0 or up == 0):
+                at_start = up == 0 and down == 0
+                steps.extend((partner, up, down, 1 if at_start else 2) for partner in self.spouses.get(node, ()))
+
+            for next_state in steps:
+                if next_state not in paths:
+                    paths[next_state] = paths[state] + [next_state[0]]
+                    queue.append(next_state)
+
+        best: Dict[int, Tuple[int, int, int, int]] = {}
+        for state in paths:
+            node, up, down, spouse = state
+            if node == relative_id or node not in self.relatives:
+                continue
+            current = best.get(node)
+            if current is None or kinship_rank(up, down, spouse) < kinship_rank(*current[1:]):
+                best[node] = state
+
+        hits = []
+        for node, (_, up, down, spouse) in best.items():
+            kind = classify_kinship(up, down, spouse)
+            if kind is None or (kinship is not None and kind != kinship):
+                continue
+            relative = self.relatives[node]
+            hits.append({
+                'relative_id': node,
+                'first_name': relative.first_name,
+                'middle_name': relative.middle_name,
+                'last_name': relative.last_name,
+                'gender': relative.gender,
+                'image_url': relative.image_url,
+                'kinship': kind,
+                'degree': up + down,
+                'generations_up': up,
+                'generations_down': down,
+                'path': paths[(node, up, down, spouse)],
+            })
+
+        hits.sort(key=lambda hit: (hit['degree'], hit['relative_id']))
+        return hits
+
+    def to_ai_context(self) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Родственники и связи в виде словарей для контекста ИИ-ассистента"""
+        relatives_data = [
+            {
+                "id": r.id,
+                "first_name": r.first_name,
+                "last_name": r.last_name,
+                "middle_name": r.middle_name,
+                "gender": r.gender.value if r.gender else "other",
+                "birth_date": r.birth_date.isoformat() if r.birth_date else None,
+                "death_date": r.death_date.isoformat() if r.death_date else None,
+                "generation": r.generation,
+                "stories": list(r.story_titles),
+            }
+            for r in self.relatives.values()
+        ]
+        relationships_data = [
+            {
+                "id": r.id,
+                "from_relative_id": r.from_relative_id,
+                "to_relative_id": r.to_relative_id,
+                "relationship_type": r.relationship_type.value if r.relationship_type else None,
+            }
+            for r in self.relationships
+        ]
+        return relatives_data, relationships_data
+
+    def relatives_statistics(self) -> Dict[str, Any]:
+        """Статистика по родственникам (формат FamilyRelationRepository.get_statistics)"""
+        gender_distribution = {'male': 0, 'female': 0, 'other': 0}
+        for r in self.relatives.values():
+            gender = r.gender.value if r.gender else 'other'
+            gender_distribution[gender] = gender_distribution.get(gender, 0) + 1
+
+        total_relatives = len(self.relatives)
+        alive_relatives = sum(1 for r in self.relatives.values() if r.death_date is None)
+        return {
+            'total_relatives': total_relatives,
+            'alive_relatives': alive_relatives,
+            'deceased_relatives': total_relatives - alive_relatives,
+            'activated_relatives': sum(1 for r in self.relatives.values() if r.is_activated),
+            'gender_distribution': gender_distribution,
+            'generations_count': len({r.generation for r in self.relatives.values() if r.generation is not None}),
+            'total_stories': sum(len(r.story_titles) for r in self.relatives.values()),
+        }
+
+    def relationships_statistics(self) -> Dict[str, Any]:
+        """Статистика по связям (формат FamilyRelationshipRepository.get_statistics)"""
+        type_counts: Dict[str, int] = {}
+        for r in self.relationships:
+            rel_type = str(r.relationship_type.value) if r.relationship_type else 'unknown'
+            type_counts[rel_type] = type_counts.get(rel_type, 0) + 1
+        return {
+            'total_relationships': len(self.relationships),
+            'relationship_types_count': len(type_counts),
+            'relationship_types': [{'type': t, 'count': c} for t, c in type_counts.items()],
+        }
+
+
+class FamilyGraphCache(VersionedTTLCache[int, FamilyGraph]):
+    """Кэш графов по user_id с ограничением суммарного объема (size_bytes) и TTL"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        super().__init__(ttl_seconds=ttl_seconds, max_size=max_bytes)
+
+    @property
+    def max_bytes(self) -> int:
+        return self.max_size
+
+    def _key(self, graph: FamilyGraph) -> int:
+        return graph.user_id
+
+    def _size(self, graph: FamilyGraph) -> int:
+        return graph.size_bytes
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики кэша"""
+        return {**super().stats(), 'bytes': self._total_size}
+
+
+family_graph_cache = FamilyGraphCache(
+    max_bytes=settings.family_graph_cache_max_bytes,
+    ttl_seconds=settings.family_graph_cache_ttl_seconds,
+)
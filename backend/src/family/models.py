@@ -2,7 +2,7 @@ from __future__ import annotations
 from typing import Dict, Any
 
 from src.database.base import Base
-from sqlalchemy import String, Boolean, Integer, BigInteger, DateTime, ForeignKey, Enum as SQLEnum, JSON
+from sqlalchemy import String, Text, Boolean, Integer, BigInteger, DateTime, ForeignKey, Enum as SQLEnum, JSON, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, MappedAsDataclass, relationship
 from datetime import datetime, timezone
 from src.family.enums import Gender, RelationshipType
@@ -57,6 +57,21 @@ class FamilyRelationModel(Base, MappedAsDataclass):
         cascade="all, delete-orphan"
     )
 
+    # Истории и сообщения интервью (отдельные таблицы, не грузятся вместе с родственником)
+    stories: Mapped[list["StoryModel"]] = relationship(
+        "StoryModel",
+        back_populates="relative",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+    interview_messages: Mapped[list["InterviewMessageModel"]] = relationship(
+        "InterviewMessageModel",
+        back_populates="relative",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
 
 class FamilyRelationshipModel(Base, MappedAsDataclass):
     """Связи между родственниками"""
@@ -87,4 +102,45 @@ class FamilyRelationshipModel(Base, MappedAsDataclass):
         "FamilyRelationModel",
         foreign_keys=[to_relative_id],
         back_populates="relationships_to"
-    )
\ No newline at end of file
+    )
+
+
+class StoryModel(Base, MappedAsDataclass):
+    """Истории родственников (ранее хранились ключами в user_relatives.context)"""
+    __tablename__ = "stories"
+    __table_args__ = (
+        UniqueConstraint("relative_id", "title", name="uq_story_relative_title"),
+        Index("ix_stories_user_created", "user_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    relative_id: Mapped[int] = mapped_column(Integer, ForeignKey("user_relatives.id", ondelete="CASCADE"), index=True)
+
+    title: Mapped[str] = mapped_column(String(512))
+    text: Mapped[str] = mapped_column(Text, default="")
+    # Список медиа: [{"type", "url", "filename", "content_type", "size", "duration"}]
+    media: Mapped[list] = mapped_column(JSON, default=list)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    relative: Mapped["FamilyRelationModel"] = relationship("FamilyRelationModel", back_populates="stories")
+
+
+class InterviewMessageModel(Base, MappedAsDataclass):
+    """Пары сообщений из интервью Telegram бота с родственником"""
+    __tablename__ = "interview_messages"
+    __table_args__ = (
+        Index("ix_interview_messages_relative_created", "relative_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    relative_id: Mapped[int] = mapped_column(Integer, ForeignKey("user_relatives.id", ondelete="CASCADE"))
+
+    user_message: Mapped[str] = mapped_column(Text)
+    ai_response: Mapped[str] = mapped_column(Text)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+    relative: Mapped["FamilyRelationModel"] = relationship("FamilyRelationModel", back_populates="interview_messages")
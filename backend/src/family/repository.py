@@ -1,13 +1,21 @@
-from src.family.models import FamilyRelationModel, FamilyRelationshipModel
+from src.family.models import FamilyRelationModel, FamilyRelationshipModel, StoryModel
 from src.family.repository_abstract import FamilyRelationRepositoryAbstract, FamilyRelationshipRepositoryAbstract
 from src.exceptions import handle_database_errors
+from src.core.pagination import apply_keyset
 from src.family.exceptions import RelativeNotFoundError, RelationshipNotFoundError, RelationshipSelfReferenceError
 from typing import Optional, List, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, and_, distinct, update
+from sqlalchemy import select, func, or_, and_, distinct, update, Row
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.attributes import flag_modified
-from src.family.utils import validate_date_range
+from src.family.utils import validate_date_range, PARENT_RELATIONSHIP_TYPES
+
+
+# Строка списка родственников: кортеж колонок модели (context — только по запросу) и stories_count
+RelativeListItem = Row
+
+# Тяжёлые колонки, которые в списках загружаются только по явному запросу
+HEAVY_RELATIVE_COLUMNS = frozenset({"context"})
 
 
 class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationModel]):
@@ -15,6 +23,35 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
 
     def __init__(self, session: AsyncSession):
         super().__init__(FamilyRelationModel, session)
+        self._light_columns = [
+            getattr(self.model, attr.key)
+            for attr in self.model.__mapper__.column_attrs
+            if attr.key not in HEAVY_RELATIVE_COLUMNS
+        ]
+        self._heavy_columns = [getattr(self.model, key) for key in sorted(HEAVY_RELATIVE_COLUMNS)]
+        self._stories_count = (
+            select(func.count(StoryModel.id))
+            .where(StoryModel.relative_id == self.model.id)
+            .correlate(self.model)
+            .scalar_subquery()
+            .label("stories_count")
+        )
+
+    def _list_select(self, include_context: bool):
+        """
+        select для списков родственников.
+
+        Результат — строки (Row) с теми же атрибутами, что у модели, и числом историй
+        stories_count, без ORM-объектов в сессии. context выбирается только при include_context.
+        """
+        columns = list(self._light_columns)
+        if include_context:
+            columns.extend(self._heavy_columns)
+        return select(*columns, self._stories_count)
+
+    async def _fetch_list(self, query, include_context: bool) -> List[RelativeListItem]:
+        result = await self.session.execute(query)
+        return list(result.all())
 
     # Базовые CRUD операции
     @handle_database_errors
@@ -39,15 +76,16 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
         return result.scalar_one_or_none()
 
     @handle_database_errors
-    async def get_all(self, skip: int = 0, limit: int = 100) -> List[FamilyRelationModel]:
-        """Получить всех родственников с пагинацией"""
-        result = await self.session.execute(
-            select(self.model)
-            .where(self.model.is_active == True)
-            .offset(skip)
-            .limit(limit)
-            .order_by(self.model.created_at.desc())
+    async def get_all(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[FamilyRelationModel]:
+        """Получить всех родственников с пагинацией (keyset по курсору, если он передан)"""
+        query = apply_keyset(
+            select(self.model).where(self.model.is_active == True),
+            (self.model.created_at, self.model.id),
+            cursor
         )
+        if not cursor:
+            query = query.offset(skip)
+        result = await self.session.execute(query.limit(limit))
         return list(result.scalars().all())
 
     @handle_database_errors
@@ -111,13 +149,12 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
 
     # Специфичные методы для родственников
     @handle_database_errors
-    async def get_by_user_id(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_by_user_id(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить всех родственников пользователя"""
-        query = select(self.model).where(self.model.user_id == user_id)
+        query = self._list_select(include_context).where(self.model.user_id == user_id)
         if only_active:
             query = query.where(self.model.is_active == True)
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
     async def get_by_relationship_type(self, user_id: int, relationship_type: str) -> List[FamilyRelationModel]:
@@ -132,11 +169,11 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
         return list(result.scalars().all())
 
     @handle_database_errors
-    async def search_by_name(self, user_id: int, search_term: str) -> List[FamilyRelationModel]:
+    async def search_by_name(self, user_id: int, search_term: str, include_context: bool = False) -> List[RelativeListItem]:
         """Поиск родственников по имени, фамилии или отчеству"""
         search_pattern = f"%{search_term}%"
-        result = await self.session.execute(
-            select(self.model)
+        query = (
+            self._list_select(include_context)
             .where(
                 self.model.user_id == user_id,
                 self.model.is_active == True,
@@ -147,7 +184,7 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
                 )
             )
         )
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
     async def count_by_user(self, user_id: int, only_active: bool = True) -> int:
@@ -280,16 +317,15 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
 
     # Специфичные методы родственников
     @handle_database_errors
-    async def get_by_gender(self, user_id: int, gender: str, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_by_gender(self, user_id: int, gender: str, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить родственников по полу"""
-        query = select(self.model).where(
+        query = self._list_select(include_context).where(
             self.model.user_id == user_id,
             self.model.gender == gender
         )
         if only_active:
             query = query.where(self.model.is_active == True)
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
     async def get_by_birth_date_range(
@@ -297,10 +333,11 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
         user_id: int,
         start_date: Optional[Any] = None,
         end_date: Optional[Any] = None,
-        only_active: bool = True
-    ) -> List[FamilyRelationModel]:
+        only_active: bool = True,
+        include_context: bool = False
+    ) -> List[RelativeListItem]:
         """Получить родственников по диапазону дат рождения"""
-        query = select(self.model).where(self.model.user_id == user_id)
+        query = self._list_select(include_context).where(self.model.user_id == user_id)
 
         if start_date:
             query = query.where(self.model.birth_date >= start_date)
@@ -309,56 +346,51 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
         if only_active:
             query = query.where(self.model.is_active == True)
 
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
-    async def get_deceased(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_deceased(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить умерших родственников"""
-        query = select(self.model).where(
+        query = self._list_select(include_context).where(
             self.model.user_id == user_id,
             self.model.death_date.isnot(None)
         )
         if only_active:
             query = query.where(self.model.is_active == True)
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
-    async def get_alive(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_alive(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить живых родственников"""
-        query = select(self.model).where(
+        query = self._list_select(include_context).where(
             self.model.user_id == user_id,
             self.model.death_date.is_(None)
         )
         if only_active:
             query = query.where(self.model.is_active == True)
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
-    async def get_activated(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_activated(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить активированных (подключённых к Telegram) родственников"""
-        query = select(self.model).where(
+        query = self._list_select(include_context).where(
             self.model.user_id == user_id,
             self.model.is_activated == True
         )
         if only_active:
             query = query.where(self.model.is_active == True)
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
-    async def get_not_activated(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_not_activated(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить не активированных (не подключённых к Telegram) родственников"""
-        query = select(self.model).where(
+        query = self._list_select(include_context).where(
             self.model.user_id == user_id,
             self.model.is_activated == False
         )
         if only_active:
             query = query.where(self.model.is_active == True)
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
     async def get_relatives_by_ids(self, ids: List[int], user_id: Optional[int] = None) -> List[FamilyRelationModel]:
@@ -421,18 +453,17 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
         generations_result = await self.session.execute(generations_query)
         generations_count = generations_result.scalar() or 0
 
-        # Stories count (count all keys in context JSON for all relatives)
-        relatives_with_context = await self.session.execute(
-            select(self.model.context).where(
-                self.model.user_id == user_id,
-                self.model.is_active == True,
-                self.model.context.isnot(None)
+        # Stories count
+        stories_query = (
+            select(func.count(StoryModel.id))
+            .join(self.model, self.model.id == StoryModel.relative_id)
+            .where(
+                StoryModel.user_id == user_id,
+                self.model.is_active == True
             )
         )
-        total_stories = 0
-        for (context,) in relatives_with_context.all():
-            if context and isinstance(context, dict):
-                total_stories += len(context)
+        stories_result = await self.session.execute(stories_query)
+        total_stories = stories_result.scalar() or 0
 
         return {
             'total_relatives': total_relatives,
@@ -547,16 +578,14 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
         return result.scalar_one_or_none()
 
     @handle_database_errors
-    async def get_all_telegram_users(self) -> List[FamilyRelationModel]:
+    async def get_all_telegram_users(self, include_context: bool = False) -> List[RelativeListItem]:
         """Получить всех родственников с привязанным Telegram (для рассылки)"""
-        result = await self.session.execute(
-            select(self.model).where(
-                self.model.telegram_user_id.isnot(None),
-                self.model.is_activated == True,
-                self.model.is_active == True
-            )
+        query = self._list_select(include_context).where(
+            self.model.telegram_user_id.isnot(None),
+            self.model.is_activated == True,
+            self.model.is_active == True
         )
-        return list(result.scalars().all())
+        return await self._fetch_list(query, include_context)
 
     @handle_database_errors
     async def get_related_relatives_with_stories(
@@ -593,34 +622,30 @@ class FamilyRelationRepository(FamilyRelationRepositoryAbstract[FamilyRelationMo
         if not related_ids:
             return []
 
-        # Получаем родственников с историями
+        # Получаем родственников и их истории (двумя запросами на всех)
         related_relatives = await self.get_relatives_by_ids(list(related_ids), user_id)
+        stories_result = await self.session.execute(
+            select(StoryModel.relative_id, StoryModel.title, StoryModel.text)
+            .where(
+                StoryModel.relative_id.in_(related_ids),
+                StoryModel.user_id == user_id
+            )
+            .order_by(StoryModel.created_at, StoryModel.id)
+        )
+        stories_by_relative: Dict[int, List[Dict[str, str]]] = {}
+        for story_relative_id, title, story_text in stories_result.all():
+            if not story_text:
+                continue
+            # Берём только первые 500 символов для контекста
+            preview = story_text[:500] + "..." if len(story_text) > 500 else story_text
+            stories_by_relative.setdefault(story_relative_id, []).append({
+                "title": title,
+                "preview": preview
+            })
 
         result = []
         for relative in related_relatives:
-            if not relative.context:
-                continue
-
-            # Извлекаем истории (исключая interview_messages)
-            stories = []
-            for key, value in relative.context.items():
-                if key == 'interview_messages':
-                    continue
-
-                story_text = ""
-                if isinstance(value, str):
-                    story_text = value
-                elif isinstance(value, dict) and 'text' in value:
-                    story_text = value['text']
-
-                if story_text:
-                    # Берём только первые 500 символов для контекста
-                    preview = story_text[:500] + "..." if len(story_text) > 500 else story_text
-                    stories.append({
-                        "title": key,
-                        "preview": preview
-                    })
-
+            stories = stories_by_relative.get(relative.id)
             if stories:
                 full_name = f"{relative.first_name}"
                 if relative.middle_name:
@@ -669,19 +694,21 @@ class FamilyRelationshipRepository(FamilyRelationshipRepositoryAbstract[FamilyRe
         return result.scalar_one_or_none()
 
     @handle_database_errors
-    async def get_all(self, user_id: int, skip: int = 0, limit: int = 100) -> List[FamilyRelationshipModel]:
-        """Получить все связи с пагинацией"""
-        result = await self.session.execute(
+    async def get_all(self, user_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[FamilyRelationshipModel]:
+        """Получить все связи с пагинацией (keyset по курсору, если он передан)"""
+        query = apply_keyset(
             select(self.model)
             .options(
                 selectinload(self.model.from_relative),
                 selectinload(self.model.to_relative)
             )
-            .where(self.model.is_active == True, self.model.user_id == user_id)
-            .offset(skip)
-            .limit(limit)
-            .order_by(self.model.created_at.desc())
+            .where(self.model.is_active == True, self.model.user_id == user_id),
+            (self.model.created_at, self.model.id),
+            cursor
         )
+        if not cursor:
+            query = query.offset(skip)
+        result = await self.session.execute(query.limit(limit))
         return list(result.scalars().all())
 
     @handle_database_errors
@@ -781,9 +808,13 @@ class FamilyRelationshipRepository(FamilyRelationshipRepositoryAbstract[FamilyRe
         return list(result.scalars().all())
 
     @handle_database_errors
-    async def get_with_details(self, user_id: int, skip: int = 0, limit: int = 100) -> List[FamilyRelationshipModel]:
-        """Получить связи с предзагруженными деталями родственников"""
-        result = await self.session.execute(
+    async def get_with_details(self, user_id: int, skip: int = 0, limit: Optional[int] = 100, cursor: Optional[str] = None) -> List[FamilyRelationshipModel]:
+        """
+        Получить связи с предзагруженными деталями родственников (keyset по курсору, если он передан).
+
+        limit=None возвращает все связи пользователя — так дерево загружается одним запросом.
+        """
+        query = apply_keyset(
             select(self.model)
             .options(
                 selectinload(self.model.from_relative),
@@ -792,8 +823,15 @@ class FamilyRelationshipRepository(FamilyRelationshipRepositoryAbstract[FamilyRe
             .where(
                 self.model.user_id == user_id,
                 self.model.is_active == True
-            )
+            ),
+            (self.model.created_at, self.model.id),
+            cursor
         )
+        if not cursor:
+            query = query.offset(skip)
+        if limit is not None:
+            query = query.limit(limit)
+        result = await self.session.execute(query)
         return list(result.scalars().all())
 
     # ===== НОВЫЕ МЕТОДЫ =====
@@ -943,26 +981,32 @@ class FamilyRelationshipRepository(FamilyRelationshipRepositoryAbstract[FamilyRe
         )
         return list(result.scalars().all())
 
-    @handle_database_errors
-    async def get_siblings(self, user_id: int, relative_id: int) -> List[FamilyRelationshipModel]:
-        """Получить братьев и сестер родственника"""
-        # Сначала находим родителей
-        parents = await self.get_parents(user_id, relative_id)
-        if not parents:
-            return []
+    def _parent_ids_subquery(self, user_id: int, child_id: int):
+        """Подзапрос ID родителей ребенка (для однозапросных обходов)"""
+        return select(self.model.from_relative_id).where(
+            self.model.to_relative_id == child_id,
+            self.model.relationship_type.in_(PARENT_RELATIONSHIP_TYPES),
+            self.model.is_active == True,
+            self.model.user_id == user_id
+        )
 
-        parent_ids = [p.from_relative_id for p in parents]
+    def _children_ids_subquery(self, user_id: int, parent_id: int):
+        """Подзапрос ID детей родителя (для однозапросных обходов)"""
+        return select(self.model.to_relative_id).where(
+            self.model.from_relative_id == parent_id,
+            self.model.relationship_type.in_(PARENT_RELATIONSHIP_TYPES),
+            self.model.is_active == True,
+            self.model.user_id == user_id
+        )
 
-        # Затем находим всех детей этих родителей
+    @handle_database_errors
+    async def get_siblings(self, user_id: int, relative_id: int) -> List[FamilyRelationshipModel]:
+        """Получить братьев и сестер родственника (связи родителей с другими детьми)"""
         result = await self.session.execute(
             select(self.model)
-            .options(
-                selectinload(self.model.from_relative),
-                selectinload(self.model.to_relative)
-            )
             .where(
-                self.model.from_relative_id.in_(parent_ids),
-                self.model.relationship_type.in_(['parent', 'father', 'mother']),
+                self.model.from_relative_id.in_(self._parent_ids_subquery(user_id, relative_id)),
+                self.model.relationship_type.in_(PARENT_RELATIONSHIP_TYPES),
                 self.model.to_relative_id != relative_id,  # Исключаем самого себя
                 self.model.is_active == True,
                 self.model.user_id == user_id
@@ -972,24 +1016,12 @@ class FamilyRelationshipRepository(FamilyRelationshipRepositoryAbstract[FamilyRe
 
     @handle_database_errors
     async def get_grandparents(self, user_id: int, relative_id: int) -> List[FamilyRelationshipModel]:
-        """Получить бабушек и дедушек родственника"""
-        # Находим родителей
-        parents = await self.get_parents(user_id, relative_id)
-        if not parents:
-            return []
-
-        parent_ids = [p.from_relative_id for p in parents]
-
-        # Находим родителей родителей (бабушек и дедушек)
+        """Получить бабушек и дедушек родственника (связи с родителями родителей)"""
         result = await self.session.execute(
             select(self.model)
-            .options(
-                selectinload(self.model.from_relative),
-                selectinload(self.model.to_relative)
-            )
             .where(
-                self.model.to_relative_id.in_(parent_ids),
-                self.model.relationship_type.in_(['parent', 'father', 'mother']),
+                self.model.to_relative_id.in_(self._parent_ids_subquery(user_id, relative_id)),
+                self.model.relationship_type.in_(PARENT_RELATIONSHIP_TYPES),
                 self.model.is_active == True,
                 self.model.user_id == user_id
             )
@@ -998,25 +1030,14 @@ class FamilyRelationshipRepository(FamilyRelationshipRepositoryAbstract[FamilyRe
 
     @handle_database_errors
     async def get_grandchildren(self, user_id: int, relative_id: int) -> List[FamilyRelationshipModel]:
-        """Получить внуков родственника"""
-        # Находим детей
-        children = await self.get_children(user_id, relative_id)
-        if not children:
-            return []
-
-        children_ids = [c.to_relative_id for c in children]
-
-        # Находим детей детей (внуков)
+        """Получить внуков родственника (связи детей с их детьми)"""
         result = await self.session.execute(
             select(self.model)
-            .options(
-                selectinload(self.model.from_relative),
-                selectinload(self.model.to_relative)
-            )
             .where(
-                self.model.from_relative_id.in_(children_ids),
-                self.model.relationship_type.in_(['parent', 'father', 'mother']),
-                self.model.is_active == True
+                self.model.from_relative_id.in_(self._children_ids_subquery(user_id, relative_id)),
+                self.model.relationship_type.in_(PARENT_RELATIONSHIP_TYPES),
+                self.model.is_active == True,
+                self.model.user_id == user_id
             )
         )
         return list(result.scalars().all())
@@ -1069,13 +1090,9 @@ class FamilyRelationshipRepository(FamilyRelationshipRepositoryAbstract[FamilyRe
 
     @handle_database_errors
     async def get_all_relationships_graph(self, user_id: int) -> List[FamilyRelationshipModel]:
-        """Получить полный граф связей пользователя для визуализации"""
+        """Получить полный граф связей пользователя для визуализации (только ребра, без родственников)"""
         result = await self.session.execute(
             select(self.model)
-            .options(
-                selectinload(self.model.from_relative),
-                selectinload(self.model.to_relative)
-            )
             .where(
                 self.model.user_id == user_id,
                 self.model.is_active == True
@@ -103,8 +103,8 @@ class FamilyRelationRepositoryAbstract(RepositoryAbstract[ModelType]):
     """Абстрактный репозиторий для работы с родственниками"""
 
     @abstractmethod
-    async def get_by_user_id(self, user_id: int, only_active: bool = True) -> List[ModelType]:
-        """Получить всех родственников пользователя"""
+    async def get_by_user_id(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[ModelType]:
+        """Получить всех родственников пользователя (context загружается только при include_context)"""
         pass
 
     @abstractmethod
@@ -113,7 +113,7 @@ class FamilyRelationRepositoryAbstract(RepositoryAbstract[ModelType]):
         pass
 
     @abstractmethod
-    async def search_by_name(self, user_id: int, search_term: str) -> List[ModelType]:
+    async def search_by_name(self, user_id: int, search_term: str, include_context: bool = False) -> List[ModelType]:
         """Поиск родственников по имени"""
         pass
 
@@ -123,7 +123,7 @@ class FamilyRelationRepositoryAbstract(RepositoryAbstract[ModelType]):
         pass
 
     @abstractmethod
-    async def get_by_gender(self, user_id: int, gender: str, only_active: bool = True) -> List[ModelType]:
+    async def get_by_gender(self, user_id: int, gender: str, only_active: bool = True, include_context: bool = False) -> List[ModelType]:
         """Получить родственников по полу"""
         pass
 
@@ -133,18 +133,19 @@ class FamilyRelationRepositoryAbstract(RepositoryAbstract[ModelType]):
         user_id: int,
         start_date: Optional[Any] = None,
         end_date: Optional[Any] = None,
-        only_active: bool = True
+        only_active: bool = True,
+        include_context: bool = False
     ) -> List[ModelType]:
         """Получить родственников по диапазону дат рождения"""
         pass
 
     @abstractmethod
-    async def get_deceased(self, user_id: int, only_active: bool = True) -> List[ModelType]:
+    async def get_deceased(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[ModelType]:
         """Получить умерших родственников (death_date is not None)"""
         pass
 
     @abstractmethod
-    async def get_alive(self, user_id: int, only_active: bool = True) -> List[ModelType]:
+    async def get_alive(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[ModelType]:
         """Получить живых родственников (death_date is None)"""
         pass
 
@@ -178,7 +179,7 @@ class FamilyRelationshipRepositoryAbstract(RepositoryAbstract[ModelType]):
         pass
 
     @abstractmethod
-    async def get_with_details(self, user_id: int) -> List[ModelType]:
+    async def get_with_details(self, user_id: int, skip: int = 0, limit: Optional[int] = 100, cursor: Optional[str] = None) -> List[ModelType]:
         """Получить связи с предзагруженными деталями родственников (избежание N+1)"""
         pass
 
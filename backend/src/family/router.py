@@ -1,20 +1,23 @@
-from fastapi import APIRouter, Body, Path, Query, UploadFile, File
+from fastapi import APIRouter, Body, Path, Query, Response, UploadFile, File
 from src.family.dependencies import get_family_relation_service, get_family_relationship_service
 from src.family.schemas import (
     FamilyRelationCreateSchema, FamilyRelationUpdateSchema, FamilyRelationContextUpdateSchema,
     FamilyRelationshipCreateSchema, FamilyRelationshipUpdateSchema,
-    FamilyRelationOutputSchema, FamilyRelationshipOutputSchema,
+    FamilyRelationOutputSchema, FamilyRelationListItemSchema, FamilyRelationshipOutputSchema,
     FamilyStatisticsSchema, FamilyRelationContextOutputSchema,
-    StorySchema, StoryCreateSchema, StoryUpdateSchema, StoryMediaUploadResponseSchema,
+    StorySchema, RelativeStorySchema, StoryCreateSchema, StoryUpdateSchema, StoryMediaUploadResponseSchema,
+    StoryMediaPresignRequestSchema, StoryMediaPresignResponseSchema, StoryMediaCompleteRequestSchema,
     GenerateInvitationResponseSchema, ActivateInvitationRequestSchema,
     InterviewMessageRequestSchema, BotStoryCreateSchema, StoriesCountResponseSchema,
-    BotRelativeCreateSchema, BotRelativeCreateResponseSchema
+    BotRelativeCreateSchema, BotRelativeCreateResponseSchema, KinshipRelativeSchema
 )
+from src.family.enums import KinshipType
 from src.family.service import FamilyRelationService, FamilyRelationshipService
 from src.family.story_service import StoryService
 from src.storage.s3.dependencies import get_s3_manager
 from src.storage.s3.manager import S3Manager
-from typing import List
+from src.core.pagination import next_cursor
+from typing import List, Optional
 from fastapi import Depends
 from src.auth.dependencies import require_superuser
 from src.auth.dependencies import get_current_user_id
@@ -25,10 +28,11 @@ from src.subscription.enums import QuotaResource
 
 def get_story_service(
     family_service: FamilyRelationService = Depends(get_family_relation_service),
-    s3_manager: S3Manager = Depends(get_s3_manager)
+    s3_manager: S3Manager = Depends(get_s3_manager),
+    quota_service: QuotaService = Depends(get_quota_service)
 ) -> StoryService:
     """Зависимость для получения StoryService"""
-    return StoryService(family_service, s3_manager)
+    return StoryService(family_service, s3_manager, quota_service)
 
 router = APIRouter(prefix="/api/v1/family", tags=["Family"])
 
@@ -63,65 +67,72 @@ async def get_relative_context(
 
 
 
-@router.get("/{user_id}/relatives", response_model=List[FamilyRelationOutputSchema])
+@router.get("/{user_id}/relatives", response_model=List[FamilyRelationListItemSchema])
 async def get_user_relatives(
     user_id: int = Depends(get_current_user_id),
     only_active: bool = True,
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
-    return await service.get_user_relatives(user_id, only_active)
+    return await service.get_user_relatives(user_id, only_active, include_context)
 
 # Специфичные маршруты должны быть определены ПЕРЕД общим маршрутом с {relative_id}
-@router.get("/{user_id}/relatives/alive", response_model=List[FamilyRelationOutputSchema])
+@router.get("/{user_id}/relatives/alive", response_model=List[FamilyRelationListItemSchema])
 async def get_alive_relatives(
     user_id: int = Depends(get_current_user_id),
     only_active: bool = True,
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
-    return await service.get_alive_relatives(user_id, only_active)
+    return await service.get_alive_relatives(user_id, only_active, include_context)
 
-@router.get("/{user_id}/relatives/deceased", response_model=List[FamilyRelationOutputSchema])
+@router.get("/{user_id}/relatives/deceased", response_model=List[FamilyRelationListItemSchema])
 async def get_deceased_relatives(
     user_id: int = Depends(get_current_user_id),
     only_active: bool = True,
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
-    return await service.get_deceased_relatives(user_id, only_active)
+    return await service.get_deceased_relatives(user_id, only_active, include_context)
 
-@router.get("/{user_id}/relatives/search/{search_term}", response_model=List[FamilyRelationOutputSchema])
+@router.get("/{user_id}/relatives/search/{search_term}", response_model=List[FamilyRelationListItemSchema])
 async def search_relatives(
     user_id: int = Depends(get_current_user_id),
     search_term: str = Path(...),
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
-    return await service.search_relatives_by_name(user_id, search_term)
+    return await service.search_relatives_by_name(user_id, search_term, include_context)
 
-@router.get("/{user_id}/relatives/gender/{gender}", response_model=List[FamilyRelationOutputSchema])
+@router.get("/{user_id}/relatives/gender/{gender}", response_model=List[FamilyRelationListItemSchema])
 async def get_relatives_by_gender(
     user_id: int = Depends(get_current_user_id),
     gender: str = Path(...),
     only_active: bool = True,
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
-    return await service.get_relatives_by_gender(user_id, gender, only_active)
+    return await service.get_relatives_by_gender(user_id, gender, only_active, include_context)
 
-@router.get("/{user_id}/relatives/activated", response_model=List[FamilyRelationOutputSchema])
+@router.get("/{user_id}/relatives/activated", response_model=List[FamilyRelationListItemSchema])
 async def get_activated_relatives(
     user_id: int = Depends(get_current_user_id),
     only_active: bool = True,
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
     """Получить активированных (подключённых к Telegram) родственников"""
-    return await service.get_activated_relatives(user_id, only_active)
+    return await service.get_activated_relatives(user_id, only_active, include_context)
 
-@router.get("/{user_id}/relatives/not-activated", response_model=List[FamilyRelationOutputSchema])
+@router.get("/{user_id}/relatives/not-activated", response_model=List[FamilyRelationListItemSchema])
 async def get_not_activated_relatives(
     user_id: int = Depends(get_current_user_id),
     only_active: bool = True,
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
     """Получить не активированных (не подключённых к Telegram) родственников"""
-    return await service.get_not_activated_relatives(user_id, only_active)
+    return await service.get_not_activated_relatives(user_id, only_active, include_context)
 
 @router.get("/{user_id}/relatives/{relative_id}", response_model=FamilyRelationOutputSchema)
 async def get_relative(
@@ -273,12 +284,13 @@ async def get_relative_by_telegram(
     return await service.get_relative_by_telegram_id(telegram_user_id)
 
 
-@router.get("/relatives/active-telegram", response_model=List[FamilyRelationOutputSchema])
+@router.get("/relatives/active-telegram", response_model=List[FamilyRelationListItemSchema])
 async def get_all_active_telegram_users(
+    include_context: bool = Query(False, description="Загрузить JSON context (по умолчанию не загружается)"),
     service: FamilyRelationService = Depends(get_family_relation_service)
 ):
     """Получить всех родственников с привязанным Telegram (публичный эндпоинт для рассылки)"""
-    return await service.get_all_telegram_users()
+    return await service.get_all_telegram_users(include_context)
 
 
 @router.get("/relatives/{relative_id}/related-stories")
@@ -334,11 +346,24 @@ async def create_relationship(
 
 @router.get("/{user_id}/relationships", response_model=List[FamilyRelationshipOutputSchema])
 async def get_user_relationships(
+    response: Response,
     user_id: int = Depends(get_current_user_id),
     with_details: bool = False,
+    limit: Optional[int] = Query(
+        None, ge=1, le=1000,
+        description="Размер страницы (по умолчанию 100; with_details без limit и cursor возвращает всё дерево)"
+    ),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor предыдущей страницы"),
     service: FamilyRelationshipService = Depends(get_family_relationship_service)
 ):
-    return await service.get_user_relationships(user_id, with_details)
+    if limit is None and (cursor or not with_details):
+        limit = 100
+    relationships = await service.get_user_relationships(user_id, with_details, limit=limit, cursor=cursor)
+    if limit is not None:
+        cursor_value = next_cursor(relationships, limit, key=lambda r: (r.created_at, r.id))
+        if cursor_value:
+            response.headers["X-Next-Cursor"] = cursor_value
+    return relationships
 
 @router.get("/{user_id}/relationships/{relationship_id}", response_model=FamilyRelationshipOutputSchema)
 async def get_relationship(
@@ -421,6 +446,17 @@ async def get_grandchildren(
 ):
     return await service.get_grandchildren(user_id, relative_id)
 
+@router.get("/{user_id}/relationships/kinship/{relative_id}", response_model=List[KinshipRelativeSchema])
+async def get_kinship(
+    user_id: int = Depends(get_current_user_id),
+    relative_id: int = Path(...),
+    kinship: KinshipType | None = Query(None, description="Вид родства; без параметра — все виды"),
+    max_depth: int = Query(3, ge=1, le=10, description="Максимальное число поколений"),
+    service: FamilyRelationshipService = Depends(get_family_relationship_service)
+):
+    """Найти предков, потомков, братьев/сестер, кузенов и свойственников с путем и степенью родства"""
+    return await service.get_kinship(user_id, relative_id, kinship, max_depth)
+
 @router.get("/{user_id}/family-tree", response_model=List[FamilyRelationshipOutputSchema])
 async def get_family_tree(
     user_id: int = Depends(get_current_user_id),
@@ -440,6 +476,15 @@ async def get_family_statistics(
 
 # ============ Story Endpoints ============
 
+@router.get("/{user_id}/stories", response_model=List[RelativeStorySchema])
+async def get_user_stories(
+    user_id: int = Depends(get_current_user_id),
+    story_service: StoryService = Depends(get_story_service)
+):
+    """Получить истории всех активных родственников пользователя"""
+    return await story_service.get_user_stories(user_id)
+
+
 @router.get("/{user_id}/relatives/{relative_id}/stories", response_model=List[StorySchema])
 async def get_relative_stories(
     user_id: int = Depends(get_current_user_id),
@@ -518,6 +563,45 @@ async def upload_story_media(
     return await story_service.upload_media(user_id, relative_id, story_key, file)
 
 
+@router.post(
+    "/{user_id}/relatives/{relative_id}/stories/{story_key}/media/direct-upload",
+    response_model=StoryMediaPresignResponseSchema
+)
+async def create_story_media_direct_upload(
+    user_id: int = Depends(get_current_user_id),
+    relative_id: int = Path(...),
+    story_key: str = Path(...),
+    data: StoryMediaPresignRequestSchema = Body(...),
+    story_service: StoryService = Depends(get_story_service)
+):
+    """
+    Получить подписанную форму для загрузки медиа напрямую в S3.
+
+    Клиент отправляет POST multipart/form-data на url: все fields и файл в поле file,
+    затем вызывает /direct-upload/complete с key. Форма действует expires_in секунд.
+    """
+    return await story_service.create_direct_upload(
+        user_id, relative_id, story_key, data.filename, data.content_type, data.size
+    )
+
+
+@router.post(
+    "/{user_id}/relatives/{relative_id}/stories/{story_key}/media/direct-upload/complete",
+    response_model=StoryMediaUploadResponseSchema
+)
+async def complete_story_media_direct_upload(
+    user_id: int = Depends(get_current_user_id),
+    relative_id: int = Path(...),
+    story_key: str = Path(...),
+    data: StoryMediaCompleteRequestSchema = Body(...),
+    story_service: StoryService = Depends(get_story_service)
+):
+    """Подтвердить прямую загрузку: проверить файл в S3 и добавить его в историю"""
+    return await story_service.complete_direct_upload(
+        user_id, relative_id, story_key, data.key, data.filename
+    )
+
+
 @router.delete("/{user_id}/relatives/{relative_id}/stories/{story_key}/media")
 async def delete_story_media(
     user_id: int = Depends(get_current_user_id),
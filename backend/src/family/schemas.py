@@ -1,9 +1,10 @@
 from fastapi import UploadFile, File
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from enum import Enum
-from src.family.enums import RelationshipType, GenderType
+from src.family.enums import RelationshipType, GenderType, KinshipType
+from src.storage.s3.thumbnails import thumbnail_urls
 
 
 # ============ Story Media Schemas ============
@@ -24,6 +25,12 @@ class StoryMediaSchema(BaseModel):
     size: Optional[int] = None  # размер в байтах
     duration: Optional[int] = None  # длительность для аудио/видео в секундах
 
+    @computed_field
+    @property
+    def thumbnails(self) -> Optional[Dict[str, str]]:
+        """WebP-миниатюры фото: размер в px по большей стороне ("64", "256", "1024") -> URL"""
+        return thumbnail_urls(self.url) if self.type == StoryMediaType.IMAGE else None
+
 
 class StorySchema(BaseModel):
     """Полная схема истории с текстом и медиа"""
@@ -34,6 +41,11 @@ class StorySchema(BaseModel):
     updated_at: Optional[datetime] = None
 
 
+class RelativeStorySchema(StorySchema):
+    """История в общей ленте историй пользователя"""
+    relative_id: int
+
+
 class StoryCreateSchema(BaseModel):
     """Создание новой истории"""
     title: str = Field(..., min_length=1, max_length=255)
@@ -52,6 +64,40 @@ class StoryMediaUploadResponseSchema(BaseModel):
     media: StoryMediaSchema
     message: str = "Медиа успешно загружено"
 
+
+class StoryMediaPresignRequestSchema(BaseModel):
+    """Запрос на прямую загрузку медиа в S3"""
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str = Field(..., max_length=100)
+    size: int = Field(..., gt=0)  # размер в байтах
+
+
+class StoryMediaPresignResponseSchema(BaseModel):
+    """Подписанная форма: клиент отправляет POST multipart/form-data на url с fields и файлом (поле file)"""
+    key: str
+    url: str
+    fields: Dict[str, str]
+    object_url: str
+    expires_in: int
+    max_size: int
+
+
+class StoryMediaCompleteRequestSchema(BaseModel):
+    """Подтверждение прямой загрузки медиа"""
+    key: str = Field(..., min_length=1, max_length=512)
+    filename: Optional[str] = Field(None, max_length=255)
+
+class RelativeThumbnailsMixin(BaseModel):
+    """Миниатюры фото профиля для схем родственника"""
+    image_url: str | None = None
+
+    @computed_field
+    @property
+    def thumbnails(self) -> Optional[Dict[str, str]]:
+        """WebP-миниатюры image_url: размер в px по большей стороне ("64", "256", "1024") -> URL"""
+        return thumbnail_urls(self.image_url)
+
+
 # Родственник
 class FamilyRelationCreateSchema(BaseModel):
     image_url: str | None = Field(None, max_length=255)
@@ -70,7 +116,7 @@ class FamilyRelationContextUpdateSchema(BaseModel):
     key: str = Field(..., min_length=1, max_length=255)
     value: str | None = Field(None, max_length=2000)  # None для удаления истории
 
-class FamilyRelationReadSchema(BaseModel):
+class FamilyRelationReadSchema(RelativeThumbnailsMixin):
     id: int
     user_id: int
     image_url: str | None
@@ -113,7 +159,7 @@ class FamilyRelationDeleteSchema(BaseModel):
 class FamilyRelationContextOutputSchema(BaseModel):
     context: Dict[str, Any] = Field(default={})
 
-class FamilyRelationOutputSchema(BaseModel):
+class FamilyRelationOutputSchema(RelativeThumbnailsMixin):
     id: int
     user_id: int
     image_url: str | None
@@ -135,6 +181,30 @@ class FamilyRelationOutputSchema(BaseModel):
     updated_at: datetime
     is_active: bool
 
+class FamilyRelationListItemSchema(RelativeThumbnailsMixin):
+    """Родственник в списках: context заполняется только при include_context=true"""
+    id: int
+    user_id: int
+    image_url: str | None
+    first_name: str | None
+    last_name: str | None
+    middle_name: str | None
+    birth_date: datetime | None
+    death_date: datetime | None
+    gender: GenderType | None
+    contact_info: str | None
+    telegram_id: str | None
+    invitation_token: str | None
+    telegram_user_id: int | None
+    is_activated: bool
+    activated_at: datetime | None
+    context: Dict[str, Any] | None = None
+    stories_count: int = 0
+    generation: int | None
+    created_at: datetime
+    updated_at: datetime
+    is_active: bool
+
 # Связь между родственниками
 class FamilyRelationshipCreateSchema(BaseModel):
     from_relative_id: int
@@ -168,6 +238,21 @@ class FamilyRelationshipOutputSchema(BaseModel):
     is_active: bool
 
 
+class KinshipRelativeSchema(RelativeThumbnailsMixin):
+    """Родственник, найденный обходом графа связей"""
+    relative_id: int
+    first_name: str | None = None
+    middle_name: str | None = None
+    last_name: str | None = None
+    gender: GenderType | None = None
+    image_url: str | None = None
+    kinship: KinshipType
+    degree: int  # количество шагов по графу (степень родства)
+    generations_up: int  # сколько поколений вверх до общего предка
+    generations_down: int  # сколько поколений вниз от общего предка
+    path: List[int]  # цепочка ID от исходного родственника до найденного
+
+
 # Statistics schemas
 class GenderStatisticsSchema(BaseModel):
     male: int = 0
@@ -1,7 +1,9 @@
 from fastapi import UploadFile
 from src.storage.s3.manager import S3Manager
-from src.family.repository import FamilyRelationRepository, FamilyRelationshipRepository
-from src.family.models import FamilyRelationModel, FamilyRelationshipModel
+from src.storage.s3.thumbnails import urls_with_thumbnails
+from src.family.repository import FamilyRelationRepository, FamilyRelationshipRepository, RelativeListItem
+from src.family.story_repository import StoryRepository, InterviewMessageRepository
+from src.family.models import FamilyRelationModel, FamilyRelationshipModel, StoryModel
 from src.family.schemas import (
     FamilyRelationCreateSchema, FamilyRelationUpdateSchema, FamilyRelationContextUpdateSchema,
     FamilyRelationContextOutputSchema,
@@ -15,15 +17,26 @@ from src.family.exceptions import (
     RelationshipAlreadyExistsError
 )
 from src.core.logger import log_service_operation
-from typing import List
+from src.family.enums import KinshipType
+from src.family.graph import FamilyGraph, GraphRelationship, family_graph_cache
+from src.family.utils import STORY_TITLE_MAX_LENGTH, split_context_stories
+from typing import List, Optional, Dict, Any
 from datetime import timezone
 
 class FamilyRelationService:
     """Сервис для работы с родственниками"""
 
-    def __init__(self, family_relation_repository: FamilyRelationRepository, s3_manager: S3Manager):
+    def __init__(
+        self,
+        family_relation_repository: FamilyRelationRepository,
+        s3_manager: S3Manager,
+        story_repository: StoryRepository,
+        interview_repository: InterviewMessageRepository
+    ):
         self.repository = family_relation_repository
         self.s3_manager = s3_manager
+        self.story_repository = story_repository
+        self.interview_repository = interview_repository
 
     @log_service_operation
     async def create_relative(self, user_id: int, relative_data: FamilyRelationCreateSchema) -> FamilyRelationModel:
@@ -41,6 +54,7 @@ class FamilyRelationService:
 
         birth_date = as_utc(relative_data.birth_date)
         death_date = as_utc(relative_data.death_date)
+        stories, context = split_context_stories(relative_data.context)
 
         relative = await self.repository.create(
             user_id=user_id,
@@ -53,10 +67,12 @@ class FamilyRelationService:
             gender=relative_data.gender,
             contact_info=relative_data.contact_info,
             telegram_id=relative_data.telegram_id,
-            context=relative_data.context,
+            context=context,
             generation=relative_data.generation,
             is_active=True
         )
+        await self._save_context_stories(user_id, relative.id, stories)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return relative
 
     @log_service_operation
@@ -67,8 +83,8 @@ class FamilyRelationService:
         return relative
 
     @log_service_operation
-    async def get_user_relatives(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
-        relatives = await self.repository.get_by_user_id(user_id, only_active)
+    async def get_user_relatives(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
+        relatives = await self.repository.get_by_user_id(user_id, only_active, include_context)
         return relatives
 
     @log_service_operation
@@ -82,17 +98,24 @@ class FamilyRelationService:
                 raise InvalidDateRangeError("birth_date", "death_date")
 
         update_data = relative_data.model_dump(exclude_unset=True)
+        stories = {}
+        if 'context' in update_data:
+            stories, update_data['context'] = split_context_stories(update_data['context'])
         relative = await self.repository.update(user_id, relative_id, **update_data)
+        await self._save_context_stories(user_id, relative_id, stories)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return relative
 
     @log_service_operation
     async def activate_relative(self, user_id: int, relative_id: int) -> bool:
         result = await self.repository.activate(user_id, relative_id)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
     async def deactivate_relative(self, user_id: int, relative_id: int) -> bool:
         result = await self.repository.deactivate(user_id, relative_id)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
@@ -100,53 +123,88 @@ class FamilyRelationService:
         relative = await self.repository.get_by_id(relative_id, user_id)
         if relative:
             if relative.image_url:
-                await self.s3_manager.delete_object(relative.image_url)
+                await self.s3_manager.delete_many(urls_with_thumbnails([relative.image_url]))
         result = await self.repository.delete(user_id, relative_id)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
     async def update_relative_context(self, user_id: int, relative_id: int, context_data: FamilyRelationContextUpdateSchema) -> bool:
-        result = await self.repository.update_context(user_id, relative_id, context_data.key, context_data.value)
-        return result
+        """
+        Записать историю по ключу context (старый API): value — текст истории, None — удаление.
+
+        Истории хранятся в таблице stories; ключ удаляется и из context, если перенос
+        (src.family.backfill) для этого родственника ещё не выполнялся.
+        """
+        title = context_data.key
+        if context_data.value is None:
+            await self.delete_story_by_title(user_id, relative_id, title)
+        else:
+            await self.save_story_text(user_id, relative_id, title, context_data.value)
+
+        relative = await self.repository.get_by_id(relative_id, user_id)
+        if relative.context and title in relative.context:
+            await self.repository.update_context(user_id, relative_id, title, None)
+        return True
 
     @log_service_operation
     async def get_relative_context(self, user_id: int, relative_id: int) -> FamilyRelationContextOutputSchema:
-        """Получить контекст родственника"""
+        """Получить контекст родственника; истории из таблицы stories — в старом формате {"text", "media"}"""
         relative = await self.repository.get_by_id(relative_id, user_id)
         if not relative:
             raise RelativeNotFoundError(relative_id)
-        return FamilyRelationContextOutputSchema(context=relative.context or {})
-
-    @log_service_operation
-    async def search_relatives_by_name(self, user_id: int, search_term: str) -> List[FamilyRelationModel]:
-        relatives = await self.repository.search_by_name(user_id, search_term)
+        context = dict(relative.context or {})
+        for story in await self.story_repository.get_by_relative(relative_id):
+            context[story.title] = {
+                "text": story.text,
+                "media": story.media or [],
+                "created_at": story.created_at.isoformat() if story.created_at else None,
+                "updated_at": story.updated_at.isoformat() if story.updated_at else None,
+            }
+        return FamilyRelationContextOutputSchema(context=context)
+
+    async def _save_context_stories(self, user_id: int, relative_id: int, stories: Dict[str, Any]) -> None:
+        """Сохранить истории старого формата context (строка или {"text", "media"}) в таблицу stories"""
+        for key, value in stories.items():
+            title = key[:STORY_TITLE_MAX_LENGTH]
+            text = value if isinstance(value, str) else (value.get('text') or '')
+            story = await self.story_repository.get_by_title(relative_id, title)
+            if story:
+                await self.story_repository.update(story, text=text)
+            else:
+                media = [] if isinstance(value, str) else list(value.get('media') or [])
+                await self.story_repository.create(user_id, relative_id, title, text, media)
+
+    @log_service_operation
+    async def search_relatives_by_name(self, user_id: int, search_term: str, include_context: bool = False) -> List[RelativeListItem]:
+        relatives = await self.repository.search_by_name(user_id, search_term, include_context)
         return relatives
 
     @log_service_operation
-    async def get_relatives_by_gender(self, user_id: int, gender: str, only_active: bool = True) -> List[FamilyRelationModel]:
-        relatives = await self.repository.get_by_gender(user_id, gender, only_active)
+    async def get_relatives_by_gender(self, user_id: int, gender: str, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
+        relatives = await self.repository.get_by_gender(user_id, gender, only_active, include_context)
         return relatives
 
     @log_service_operation
-    async def get_deceased_relatives(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
-        relatives = await self.repository.get_deceased(user_id, only_active)
+    async def get_deceased_relatives(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
+        relatives = await self.repository.get_deceased(user_id, only_active, include_context)
         return relatives
 
     @log_service_operation
-    async def get_alive_relatives(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
-        relatives = await self.repository.get_alive(user_id, only_active)
+    async def get_alive_relatives(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
+        relatives = await self.repository.get_alive(user_id, only_active, include_context)
         return relatives
 
     @log_service_operation
-    async def get_activated_relatives(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_activated_relatives(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить активированных (подключённых к Telegram) родственников"""
-        relatives = await self.repository.get_activated(user_id, only_active)
+        relatives = await self.repository.get_activated(user_id, only_active, include_context)
         return relatives
 
     @log_service_operation
-    async def get_not_activated_relatives(self, user_id: int, only_active: bool = True) -> List[FamilyRelationModel]:
+    async def get_not_activated_relatives(self, user_id: int, only_active: bool = True, include_context: bool = False) -> List[RelativeListItem]:
         """Получить не активированных (не подключённых к Telegram) родственников"""
-        relatives = await self.repository.get_not_activated(user_id, only_active)
+        relatives = await self.repository.get_not_activated(user_id, only_active, include_context)
         return relatives
 
     @log_service_operation
@@ -211,40 +269,18 @@ class FamilyRelationService:
             telegram_user_id,
             telegram_username
         )
+        family_graph_cache.invalidate_on_commit(self.repository.session, relative.user_id)
 
         return activated_relative
 
     @log_service_operation
     async def save_interview_message(self, relative_id: int, user_message: str, ai_response: str) -> bool:
-        """Сохранить сообщения из интервью в контекст родственника"""
-        import json
-        from datetime import datetime, timezone
-
-        # Get current context
+        """Сохранить сообщения из интервью (хранятся последние 100 пар)"""
         relative = await self.repository.get_by_id_without_user(relative_id)
         if not relative:
             raise RelativeNotFoundError(relative_id)
 
-        context = relative.context or {}
-
-        # Initialize interview_messages if not exists
-        if 'interview_messages' not in context:
-            context['interview_messages'] = []
-
-        # Add new message pair
-        context['interview_messages'].append({
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'user': user_message,
-            'ai': ai_response
-        })
-
-        # Keep only last 100 messages to avoid context bloat
-        if len(context['interview_messages']) > 100:
-            context['interview_messages'] = context['interview_messages'][-100:]
-
-        # Update context
-        await self.repository.update_full_context(relative_id, context)
-
+        await self.interview_repository.add(relative_id, user_message, ai_response)
         return True
 
     @log_service_operation
@@ -256,96 +292,90 @@ class FamilyRelationService:
         if not relative:
             raise RelativeNotFoundError(relative_id)
 
-        context = relative.context or {}
-
-        # Create unique story key
-        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-        story_key = f"{title}"
-
         # If story with this title exists, add timestamp to make it unique
-        if story_key in context:
+        story_key = title
+        if await self.story_repository.get_by_title(relative_id, story_key):
+            timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
             story_key = f"{title} ({timestamp})"
 
-        now = datetime.now(timezone.utc).isoformat()
-        story_data = {
-            "text": text,
-            "media": [],
-            "created_at": now,
-            "updated_at": now,
-        }
-
-        context[story_key] = story_data
-        await self.repository.update_full_context(relative_id, context)
+        story = await self.story_repository.create(relative.user_id, relative_id, story_key, text)
+        family_graph_cache.invalidate_on_commit(self.repository.session, relative.user_id)
 
-        return {
-            "title": story_key,
-            "text": text,
-            "media": [],
-            "created_at": now,
-            "updated_at": now,
-        }
+        return self._story_to_dict(story)
 
     @log_service_operation
     async def get_interview_messages(self, relative_id: int) -> list[dict]:
         """Получить историю интервью родственника"""
-        relative = await self.repository.get_by_id_without_user(relative_id)
-        if not relative:
-            return []
-
-        context = relative.context or {}
-        return context.get('interview_messages', [])
+        messages = await self.interview_repository.get_by_relative(relative_id)
+        return [
+            {
+                'timestamp': m.created_at.isoformat() if m.created_at else None,
+                'user': m.user_message,
+                'ai': m.ai_response
+            }
+            for m in messages
+        ]
 
     @log_service_operation
     async def get_stories(self, relative_id: int) -> list[dict]:
-        """Получить все истории родственника (без interview_messages)"""
-        relative = await self.repository.get_by_id_without_user(relative_id)
-        if not relative:
-            return []
-
-        context = relative.context or {}
-        stories = []
-        for key, value in context.items():
-            if key == 'interview_messages':
-                continue
-            if isinstance(value, str):
-                stories.append({
-                    "key": key,
-                    "title": key,
-                    "text": value,
-                    "media": [],
-                    "created_at": None,
-                    "updated_at": None,
-                })
-            elif isinstance(value, dict) and 'text' in value:
-                stories.append({
-                    "key": key,
-                    "title": key,
-                    "text": value["text"],
-                    "media": value.get("media", []),
-                    "created_at": value.get("created_at"),
-                    "updated_at": value.get("updated_at"),
-                })
-        return stories
+        """Получить все истории родственника"""
+        stories = await self.story_repository.get_by_relative(relative_id)
+        return [self._story_to_dict(story) for story in stories]
 
     @log_service_operation
     async def get_stories_count(self, relative_id: int) -> int:
         """Получить количество историй родственника"""
-        relative = await self.repository.get_by_id_without_user(relative_id)
+        return await self.story_repository.count_by_relative(relative_id)
+
+    @log_service_operation
+    async def get_user_stories(self, user_id: int) -> Dict[int, List[StoryModel]]:
+        """Истории всех активных родственников пользователя, сгруппированные по relative_id"""
+        return await self.story_repository.get_by_user(user_id)
+
+    @log_service_operation
+    async def get_story_titles(self, user_id: int) -> Dict[int, List[str]]:
+        """Названия историй пользователя без текстов, сгруппированные по relative_id"""
+        return await self.story_repository.get_titles_by_user(user_id)
+
+    @log_service_operation
+    async def save_story_text(self, user_id: int, relative_id: int, title: str, text: str) -> StoryModel:
+        """Создать историю или заменить текст существующей (используется ИИ-ассистентом)"""
+        relative = await self.repository.get_by_id(relative_id, user_id)
         if not relative:
-            return 0
+            raise RelativeNotFoundError(relative_id)
 
-        context = relative.context or {}
+        story = await self.story_repository.get_by_title(relative_id, title)
+        if story:
+            story = await self.story_repository.update(story, text=text)
+        else:
+            story = await self.story_repository.create(user_id, relative_id, title, text)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
+        return story
+
+    @log_service_operation
+    async def delete_story_by_title(self, user_id: int, relative_id: int, title: str) -> bool:
+        """Удалить историю по названию; False если такой истории нет"""
+        relative = await self.repository.get_by_id(relative_id, user_id)
+        if not relative:
+            raise RelativeNotFoundError(relative_id)
 
-        # Count stories (exclude interview_messages)
-        count = 0
-        for key, value in context.items():
-            if key == 'interview_messages':
-                continue
-            # Count both old string format and new dict format
-            if isinstance(value, str) or (isinstance(value, dict) and 'text' in value):
-                count += 1
+        story = await self.story_repository.get_by_title(relative_id, title)
+        if not story:
+            return False
+        await self.story_repository.delete(story)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
+        return True
 
-        return count
+    @staticmethod
+    def _story_to_dict(story: StoryModel) -> dict:
+        return {
+            "key": story.title,
+            "title": story.title,
+            "text": story.text,
+            "media": story.media or [],
+            "created_at": story.created_at,
+            "updated_at": story.updated_at,
+        }
 
     @log_service_operation
     async def get_relative_by_telegram_id(self, telegram_user_id: int) -> FamilyRelationModel:
@@ -356,9 +386,9 @@ class FamilyRelationService:
         return relative
 
     @log_service_operation
-    async def get_all_telegram_users(self) -> List[FamilyRelationModel]:
+    async def get_all_telegram_users(self, include_context: bool = False) -> List[RelativeListItem]:
         """Получить всех родственников с привязанным Telegram (для рассылки)"""
-        return await self.repository.get_all_telegram_users()
+        return await self.repository.get_all_telegram_users(include_context)
 
     @log_service_operation
     async def get_related_stories(self, relative_id: int, relationship_repo: "FamilyRelationshipRepository") -> List[dict]:
@@ -458,6 +488,7 @@ class FamilyRelationService:
             relationship_type=relationship_type_enum,
             is_active=True
         )
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
 
         return {
             "relative_id": new_relative.id,
@@ -470,9 +501,15 @@ class FamilyRelationService:
 class FamilyRelationshipService:
     """Сервис для работы со связями между родственниками"""
 
-    def __init__(self, family_relationship_repository: FamilyRelationshipRepository, family_relation_repository: FamilyRelationRepository):
+    def __init__(
+        self,
+        family_relationship_repository: FamilyRelationshipRepository,
+        family_relation_repository: FamilyRelationRepository,
+        story_repository: StoryRepository
+    ):
         self.repository = family_relationship_repository
         self.relation_repository = family_relation_repository
+        self.story_repository = story_repository
 
     @log_service_operation
     async def create_relationship(self, user_id: int, relationship_data: FamilyRelationshipCreateSchema) -> FamilyRelationshipModel:
@@ -515,6 +552,7 @@ class FamilyRelationshipService:
             relationship_type=relationship_data.relationship_type,
             is_active=True
         )
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return relationship
 
     @log_service_operation
@@ -523,11 +561,18 @@ class FamilyRelationshipService:
         return relationship
 
     @log_service_operation
-    async def get_user_relationships(self, user_id: int, with_details: bool = False, skip: int = 0, limit: int = 100) -> List[FamilyRelationshipModel]:
+    async def get_user_relationships(
+        self,
+        user_id: int,
+        with_details: bool = False,
+        skip: int = 0,
+        limit: Optional[int] = 100,
+        cursor: Optional[str] = None
+    ) -> List[FamilyRelationshipModel]:
         if with_details:
-            relationships = await self.repository.get_with_details(user_id, skip, limit)
+            relationships = await self.repository.get_with_details(user_id, skip, limit, cursor)
         else:
-            relationships = await self.repository.get_all(user_id, skip, limit)
+            relationships = await self.repository.get_all(user_id, skip, limit, cursor)
         return relationships
 
     @log_service_operation
@@ -555,41 +600,65 @@ class FamilyRelationshipService:
         grandchildren = await self.repository.get_grandchildren(user_id, relative_id)
         return grandchildren
 
+    async def get_family_graph(self, user_id: int) -> FamilyGraph:
+        """Получить in-memory граф дерева пользователя (из кэша или из БД)"""
+        async def load() -> FamilyGraph:
+            relatives = await self.relation_repository.get_by_user_id(user_id, True)
+            relationships = await self.repository.get_all_relationships_graph(user_id)
+            story_titles = await self.story_repository.get_titles_by_user(user_id)
+            return FamilyGraph.from_models(user_id, relatives, relationships, story_titles)
+
+        return await family_graph_cache.get_or_load(user_id, load)
+
     @log_service_operation
-    async def get_family_tree(self, user_id: int) -> List[FamilyRelationshipModel]:
-        tree = await self.repository.get_all_relationships_graph(user_id)
-        return tree
+    async def get_kinship(
+        self,
+        user_id: int,
+        relative_id: int,
+        kinship: Optional[KinshipType] = None,
+        max_depth: int = 3
+    ) -> List[Dict[str, Any]]:
+        """Найти родственников заданного вида до max_depth поколений (обход кэшированного графа)"""
+        graph = await self.get_family_graph(user_id)
+        return graph.kinship(relative_id, kinship, max_depth)
+
+    @log_service_operation
+    async def get_family_tree(self, user_id: int) -> List[GraphRelationship]:
+        graph = await self.get_family_graph(user_id)
+        return graph.relationships
 
     @log_service_operation
     async def update_relationship(self, user_id: int, relationship_id: int, relationship_data: FamilyRelationshipUpdateSchema) -> FamilyRelationshipModel:
         update_data = relationship_data.model_dump(exclude_unset=True)
         relationship = await self.repository.update(relationship_id, user_id, **update_data)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return relationship
 
 
     @log_service_operation
     async def activate_relationship(self, user_id: int, relationship_id: int) -> bool:
         result = await self.repository.activate(user_id, relationship_id)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
     async def deactivate_relationship(self, user_id: int, relationship_id: int) -> bool:
         result = await self.repository.deactivate(user_id, relationship_id)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
         
     @log_service_operation
     async def delete_relationship(self, user_id: int, relationship_id: int) -> bool:
         result = await self.repository.delete(user_id, relationship_id)
+        family_graph_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
     async def get_family_statistics(self, user_id: int) -> FamilyStatisticsSchema:
         """Получить полную статистику по семейному дереву"""
-        # Get relatives statistics
-        relatives_stats = await self.relation_repository.get_statistics(user_id)
-
-        # Get relationships statistics
-        relationships_stats = await self.repository.get_statistics(user_id)
+        graph = await self.get_family_graph(user_id)
+        relatives_stats = graph.relatives_statistics()
+        relationships_stats = graph.relationships_statistics()
 
         return FamilyStatisticsSchema(
             total_relatives=relatives_stats['total_relatives'],
@@ -0,0 +1,192 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, func, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.exceptions import handle_database_errors
+from src.family.models import FamilyRelationModel, StoryModel, InterviewMessageModel
+
+
+# Сколько последних сообщений интервью хранится на одного родственника
+MAX_INTERVIEW_MESSAGES = 100
+
+
+class StoryRepository:
+    """Репозиторий историй родственников (таблица stories)"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @handle_database_errors
+    async def get_by_relative(self, relative_id: int) -> List[StoryModel]:
+        """Все истории родственника в порядке создания"""
+        result = await self.session.execute(
+            select(StoryModel)
+            .where(StoryModel.relative_id == relative_id)
+            .order_by(StoryModel.created_at, StoryModel.id)
+        )
+        return list(result.scalars().all())
+
+    @handle_database_errors
+    async def get_by_title(self, relative_id: int, title: str) -> Optional[StoryModel]:
+        """История родственника по названию (названия уникальны в пределах родственника)"""
+        result = await self.session.execute(
+            select(StoryModel).where(
+                StoryModel.relative_id == relative_id,
+                StoryModel.title == title
+            )
+        )
+        return result.scalar_one_or_none()
+
+    @handle_database_errors
+    async def get_by_title_for_update(self, relative_id: int, title: str) -> Optional[StoryModel]:
+        """
+        История для изменения списка media до конца транзакции.
+
+        Блокируется строка родственника (SELECT ... FOR UPDATE), а не истории: так
+        сериализуется и создание истории при первом медиа. История перечитывается
+        из БД, а не берётся из identity map сессии.
+        """
+        await self.session.execute(
+            select(FamilyRelationModel.id)
+            .where(FamilyRelationModel.id == relative_id)
+            .with_for_update()
+        )
+        result = await self.session.execute(
+            select(StoryModel)
+            .where(StoryModel.relative_id == relative_id, StoryModel.title == title)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+
+    @handle_database_errors
+    async def get_by_relative_ids(self, relative_ids: List[int]) -> Dict[int, List[StoryModel]]:
+        """Истории нескольких родственников одним запросом, сгруппированные по relative_id"""
+        grouped: Dict[int, List[StoryModel]] = defaultdict(list)
+        if not relative_ids:
+            return grouped
+        result = await self.session.execute(
+            select(StoryModel)
+            .where(StoryModel.relative_id.in_(relative_ids))
+            .order_by(StoryModel.relative_id, StoryModel.created_at, StoryModel.id)
+        )
+        for story in result.scalars().all():
+            grouped[story.relative_id].append(story)
+        return grouped
+
+    @handle_database_errors
+    async def get_by_user(self, user_id: int) -> Dict[int, List[StoryModel]]:
+        """Истории активных родственников пользователя, сгруппированные по relative_id"""
+        result = await self.session.execute(
+            select(StoryModel)
+            .join(FamilyRelationModel, FamilyRelationModel.id == StoryModel.relative_id)
+            .where(
+                StoryModel.user_id == user_id,
+                FamilyRelationModel.is_active == True
+            )
+            .order_by(StoryModel.relative_id, StoryModel.created_at, StoryModel.id)
+        )
+        grouped: Dict[int, List[StoryModel]] = defaultdict(list)
+        for story in result.scalars().all():
+            grouped[story.relative_id].append(story)
+        return grouped
+
+    @handle_database_errors
+    async def get_titles_by_user(self, user_id: int) -> Dict[int, List[str]]:
+        """Только названия историй пользователя (без текста), сгруппированные по relative_id"""
+        result = await self.session.execute(
+            select(StoryModel.relative_id, StoryModel.title)
+            .where(StoryModel.user_id == user_id)
+            .order_by(StoryModel.relative_id, StoryModel.created_at, StoryModel.id)
+        )
+        grouped: Dict[int, List[str]] = defaultdict(list)
+        for relative_id, title in result.all():
+            grouped[relative_id].append(title)
+        return grouped
+
+    @handle_database_errors
+    async def count_by_relative(self, relative_id: int) -> int:
+        """Количество историй родственника"""
+        result = await self.session.execute(
+            select(func.count()).select_from(StoryModel).where(StoryModel.relative_id == relative_id)
+        )
+        return result.scalar() or 0
+
+    @handle_database_errors
+    async def create(self, user_id: int, relative_id: int, title: str, text: str = "", media: Optional[list] = None) -> StoryModel:
+        """Создать историю"""
+        now = datetime.now(timezone.utc)
+        story = StoryModel(
+            user_id=user_id,
+            relative_id=relative_id,
+            title=title,
+            text=text or "",
+            media=list(media or []),
+            created_at=now,
+            updated_at=now,
+        )
+        self.session.add(story)
+        await self.session.flush()
+        return story
+
+    @handle_database_errors
+    async def update(self, story: StoryModel, **kwargs) -> StoryModel:
+        """Обновить поля истории (media заменяется целиком)"""
+        for key, value in kwargs.items():
+            setattr(story, key, value)
+        story.updated_at = datetime.now(timezone.utc)
+        await self.session.flush()
+        return story
+
+    @handle_database_errors
+    async def delete(self, story: StoryModel) -> None:
+        """Удалить историю"""
+        await self.session.delete(story)
+        await self.session.flush()
+
+
+class InterviewMessageRepository:
+    """Репозиторий сообщений интервью (таблица interview_messages)"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @handle_database_errors
+    async def get_by_relative(self, relative_id: int) -> List[InterviewMessageModel]:
+        """Сообщения интервью родственника в хронологическом порядке"""
+        result = await self.session.execute(
+            select(InterviewMessageModel)
+            .where(InterviewMessageModel.relative_id == relative_id)
+            .order_by(InterviewMessageModel.created_at, InterviewMessageModel.id)
+        )
+        return list(result.scalars().all())
+
+    @handle_database_errors
+    async def add(self, relative_id: int, user_message: str, ai_response: str) -> InterviewMessageModel:
+        """Добавить пару сообщений и удалить самые старые сверх MAX_INTERVIEW_MESSAGES"""
+        message = InterviewMessageModel(
+            relative_id=relative_id,
+            user_message=user_message,
+            ai_response=ai_response,
+            created_at=datetime.now(timezone.utc),
+        )
+        self.session.add(message)
+        await self.session.flush()
+
+        keep_ids = (
+            select(InterviewMessageModel.id)
+            .where(InterviewMessageModel.relative_id == relative_id)
+            .order_by(InterviewMessageModel.created_at.desc(), InterviewMessageModel.id.desc())
+            .limit(MAX_INTERVIEW_MESSAGES)
+        )
+        await self.session.execute(
+            delete(InterviewMessageModel)
+            .where(
+                InterviewMessageModel.relative_id == relative_id,
+                InterviewMessageModel.id.not_in(keep_ids)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return message
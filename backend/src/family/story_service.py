@@ -1,17 +1,29 @@
 # -*- coding: utf-8 -*-
 """Сервис для работы с историями родственников и их медиа"""
 
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timezone
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 from fastapi import UploadFile, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.family.schemas import (
-    StorySchema, StoryCreateSchema, StoryUpdateSchema,
-    StoryMediaSchema, StoryMediaType, StoryMediaUploadResponseSchema
+    StorySchema, RelativeStorySchema, StoryCreateSchema, StoryUpdateSchema,
+    StoryMediaSchema, StoryMediaType, StoryMediaUploadResponseSchema,
+    StoryMediaPresignResponseSchema,
 )
 from src.family.service import FamilyRelationService
+from src.family.models import StoryModel
+from src.family.graph import family_graph_cache
+from src.family.story_repository import StoryRepository
+from src.storage.s3.exceptions import FileTooLargeError
 from src.storage.s3.manager import S3Manager
+from src.storage.s3.thumbnails import thumbnail_pipeline, urls_with_thumbnails
+from src.subscription.quota_service import QuotaService
+from src.config import settings
 
+logger = logging.getLogger(__name__)
 
 # Допустимые MIME-типы для разных типов медиа
 ALLOWED_MEDIA_TYPES = {
@@ -37,6 +49,9 @@ MAX_FILE_SIZES = {
 # Максимальное количество изображений на одну историю
 MAX_IMAGES_PER_STORY = 5
 
+# Корень ключей прямой загрузки: stories/{user_id}/{relative_id}/...
+DIRECT_UPLOAD_ROOT = "stories/"
+
 
 class StoryService:
     """Сервис для управления историями родственников"""
@@ -44,10 +59,13 @@ class StoryService:
     def __init__(
         self,
         family_service: FamilyRelationService,
-        s3_manager: S3Manager
+        s3_manager: S3Manager,
+        quota_service: Optional[QuotaService] = None
     ):
         self.family_service = family_service
+        self.story_repository = family_service.story_repository
         self.s3_manager = s3_manager
+        self.quota_service = quota_service
 
     def _detect_media_type(self, content_type: str) -> StoryMediaType:
         """Определение типа медиа по MIME-типу"""
@@ -69,14 +87,40 @@ class StoryService:
                 detail=f"Файл слишком большой. Максимальный размер для {media_type.value}: {max_mb} MB"
             )
 
-    def _get_story_from_context(self, context: Dict[str, Any], story_key: str) -> Optional[Dict]:
-        """Получение истории из контекста"""
-        return context.get(story_key)
+    def _check_image_limit(self, story: Optional[StoryModel], media_type: StoryMediaType) -> None:
+        """Проверка лимита изображений в истории"""
+        if media_type == StoryMediaType.IMAGE and story:
+            current_images = sum(1 for m in story.media or [] if m.get("type") == "image")
+            if current_images >= MAX_IMAGES_PER_STORY:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Достигнут лимит фотографий ({MAX_IMAGES_PER_STORY}). Удалите существующие для добавления новых."
+                )
+
+    async def _append_media(
+        self,
+        user_id: int,
+        relative_id: int,
+        story_key: str,
+        story: Optional[StoryModel],
+        media_item: dict
+    ) -> None:
+        """Добавить медиа в историю; история создаётся, если её ещё нет"""
+        if story:
+            await self.story_repository.update(story, media=[*(story.media or []), media_item])
+        else:
+            await self.story_repository.create(user_id, relative_id, story_key, "", [media_item])
+            family_graph_cache.invalidate_on_commit(self.story_repository.session, user_id)
+
+    @staticmethod
+    def _direct_upload_prefix(user_id: int, relative_id: int) -> str:
+        """Префикс ключей прямой загрузки: подтвердить можно только объект своего родственника"""
+        return f"{DIRECT_UPLOAD_ROOT}{user_id}/{relative_id}/"
 
-    def _story_dict_to_schema(self, story_key: str, story_dict: Dict) -> StorySchema:
-        """Конвертация dict истории в схему"""
+    def _story_to_schema(self, story: StoryModel) -> StorySchema:
+        """Конвертация модели истории в схему"""
         media_list = []
-        for m in story_dict.get("media", []):
+        for m in story.media or []:
             media_list.append(StoryMediaSchema(
                 type=StoryMediaType(m["type"]),
                 url=m["url"],
@@ -87,36 +131,44 @@ class StoryService:
             ))
 
         return StorySchema(
-            title=story_key,
-            text=story_dict.get("text"),
+            title=story.title,
+            text=story.text,
             media=media_list,
-            created_at=story_dict.get("created_at"),
-            updated_at=story_dict.get("updated_at"),
+            created_at=story.created_at,
+            updated_at=story.updated_at,
         )
 
+    async def _get_story_or_404(
+        self, user_id: int, relative_id: int, story_key: str, for_update: bool = False
+    ) -> StoryModel:
+        """Проверка владельца родственника и получение истории (for_update — для изменения media)"""
+        await self.family_service.get_relative_by_id(user_id, relative_id)
+        if for_update:
+            story = await self.story_repository.get_by_title_for_update(relative_id, story_key)
+        else:
+            story = await self.story_repository.get_by_title(relative_id, story_key)
+        if not story:
+            raise HTTPException(status_code=404, detail="История не найдена")
+        return story
+
     async def get_stories(
         self,
         user_id: int,
         relative_id: int
     ) -> List[StorySchema]:
         """Получение всех историй родственника"""
-        context_data = await self.family_service.get_relative_context(user_id, relative_id)
-        context = context_data.context
-
-        stories = []
-        for key, value in context.items():
-            if isinstance(value, dict) and "text" in value:
-                # Новый формат истории с медиа
-                stories.append(self._story_dict_to_schema(key, value))
-            elif isinstance(value, str):
-                # Старый формат - просто текст
-                stories.append(StorySchema(
-                    title=key,
-                    text=value,
-                    media=[],
-                ))
-
-        return stories
+        await self.family_service.get_relative_by_id(user_id, relative_id)
+        stories = await self.story_repository.get_by_relative(relative_id)
+        return [self._story_to_schema(story) for story in stories]
+
+    async def get_user_stories(self, user_id: int) -> List[RelativeStorySchema]:
+        """Истории всех активных родственников пользователя (лента историй)"""
+        grouped = await self.story_repository.get_by_user(user_id)
+        return [
+            RelativeStorySchema(**dict(self._story_to_schema(story)), relative_id=relative_id)
+            for relative_id, stories in grouped.items()
+            for story in stories
+        ]
 
     async def get_story(
         self,
@@ -125,18 +177,8 @@ class StoryService:
         story_key: str
     ) -> StorySchema:
         """Получение конкретной истории"""
-        context_data = await self.family_service.get_relative_context(user_id, relative_id)
-        context = context_data.context
-
-        story_data = context.get(story_key)
-        if not story_data:
-            raise HTTPException(status_code=404, detail="История не найдена")
-
-        if isinstance(story_data, dict):
-            return self._story_dict_to_schema(story_key, story_data)
-        else:
-            # Старый формат
-            return StorySchema(title=story_key, text=str(story_data), media=[])
+        story = await self._get_story_or_404(user_id, relative_id, story_key)
+        return self._story_to_schema(story)
 
     async def create_story(
         self,
@@ -145,32 +187,14 @@ class StoryService:
         story_data: StoryCreateSchema
     ) -> StorySchema:
         """Создание новой истории"""
-        context_data = await self.family_service.get_relative_context(user_id, relative_id)
-        context = context_data.context
+        await self.family_service.get_relative_by_id(user_id, relative_id)
 
-        story_key = story_data.title
-        if story_key in context:
+        if await self.story_repository.get_by_title(relative_id, story_data.title):
             raise HTTPException(status_code=400, detail="История с таким названием уже существует")
 
-        now = datetime.now(timezone.utc).isoformat()
-        new_story = {
-            "text": story_data.text,
-            "media": [],
-            "created_at": now,
-            "updated_at": now,
-        }
-
-        context[story_key] = new_story
-
-        # Обновляем весь контекст
-        relative = await self.family_service.get_relative_by_id(user_id, relative_id)
-        from src.family.schemas import FamilyRelationUpdateSchema
-        await self.family_service.update_relative(
-            user_id, relative_id,
-            FamilyRelationUpdateSchema(context=context)
-        )
-
-        return self._story_dict_to_schema(story_key, new_story)
+        story = await self.story_repository.create(user_id, relative_id, story_data.title, story_data.text or "")
+        family_graph_cache.invalidate_on_commit(self.story_repository.session, user_id)
+        return self._story_to_schema(story)
 
     async def update_story(
         self,
@@ -180,42 +204,22 @@ class StoryService:
         story_data: StoryUpdateSchema
     ) -> StorySchema:
         """Обновление истории"""
-        context_data = await self.family_service.get_relative_context(user_id, relative_id)
-        context = context_data.context
-
-        if story_key not in context:
-            raise HTTPException(status_code=404, detail="История не найдена")
-
-        existing = context[story_key]
-        if isinstance(existing, str):
-            # Конвертируем старый формат
-            existing = {
-                "text": existing,
-                "media": [],
-                "created_at": datetime.now(timezone.utc).isoformat(),
-            }
+        story = await self._get_story_or_404(user_id, relative_id, story_key)
 
+        changes = {}
         if story_data.text is not None:
-            existing["text"] = story_data.text
-
-        existing["updated_at"] = datetime.now(timezone.utc).isoformat()
+            changes["text"] = story_data.text
 
         # Если меняется название
         if story_data.title and story_data.title != story_key:
-            if story_data.title in context:
+            if await self.story_repository.get_by_title(relative_id, story_data.title):
                 raise HTTPException(status_code=400, detail="История с таким названием уже существует")
-            del context[story_key]
-            story_key = story_data.title
-
-        context[story_key] = existing
-
-        from src.family.schemas import FamilyRelationUpdateSchema
-        await self.family_service.update_relative(
-            user_id, relative_id,
-            FamilyRelationUpdateSchema(context=context)
-        )
+            changes["title"] = story_data.title
 
-        return self._story_dict_to_schema(story_key, existing)
+        story = await self.story_repository.update(story, **changes)
+        if "title" in changes:
+            family_graph_cache.invalidate_on_commit(self.story_repository.session, user_id)
+        return self._story_to_schema(story)
 
     async def delete_story(
         self,
@@ -224,29 +228,18 @@ class StoryService:
         story_key: str
     ) -> None:
         """Удаление истории и всех её медиа"""
-        context_data = await self.family_service.get_relative_context(user_id, relative_id)
-        context = context_data.context
+        story = await self._get_story_or_404(user_id, relative_id, story_key)
 
-        if story_key not in context:
-            raise HTTPException(status_code=404, detail="История не найдена")
-
-        story_data = context[story_key]
-
-        # Удаляем медиа из S3
-        if isinstance(story_data, dict) and "media" in story_data:
-            for media in story_data["media"]:
-                try:
-                    await self.s3_manager.delete(media["url"])
-                except Exception:
-                    pass  # Игнорируем ошибки удаления
+        # Удаляем медиа из S3 одним пакетным запросом (ошибки удаления не блокируют удаление истории)
+        media_urls = [media["url"] for media in story.media or [] if media.get("url")]
+        if media_urls:
+            try:
+                await self.s3_manager.delete_many(urls_with_thumbnails(media_urls))
+            except Exception:
+                pass
 
-        del context[story_key]
-
-        from src.family.schemas import FamilyRelationUpdateSchema
-        await self.family_service.update_relative(
-            user_id, relative_id,
-            FamilyRelationUpdateSchema(context=context)
-        )
+        await self.story_repository.delete(story)
+        family_graph_cache.invalidate_on_commit(self.story_repository.session, user_id)
 
     async def upload_media(
         self,
@@ -257,53 +250,37 @@ class StoryService:
     ) -> StoryMediaUploadResponseSchema:
         """Загрузка медиа-файла в историю"""
         # Проверяем существование родственника и истории
-        context_data = await self.family_service.get_relative_context(user_id, relative_id)
-        context = context_data.context
-
-        # Создаём историю если не существует
-        if story_key not in context:
-            now = datetime.now(timezone.utc).isoformat()
-            context[story_key] = {
-                "text": "",
-                "media": [],
-                "created_at": now,
-                "updated_at": now,
-            }
-
-        story_data = context[story_key]
-
-        # Конвертируем старый формат если нужно
-        if isinstance(story_data, str):
-            story_data = {
-                "text": story_data,
-                "media": [],
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat(),
-            }
+        await self.family_service.get_relative_by_id(user_id, relative_id)
+        story = await self.story_repository.get_by_title(relative_id, story_key)
 
         # Определяем тип медиа предварительно для проверки лимита
         content_type = file.content_type or "application/octet-stream"
         media_type = self._detect_media_type(content_type)
 
-        # Проверка лимита изображений
-        if media_type == StoryMediaType.IMAGE:
-            current_images = sum(1 for m in story_data.get("media", []) if m.get("type") == "image")
-            if current_images >= MAX_IMAGES_PER_STORY:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Достигнут лимит фотографий ({MAX_IMAGES_PER_STORY}). Удалите существующие для добавления новых."
-                )
-
-        # Читаем файл для проверки размера
-        file_content = await file.read()
-        file_size = len(file_content)
-        self._validate_file_size(file_size, media_type)
-
-        # Возвращаем курсор в начало для загрузки
-        await file.seek(0)
-
-        # Загружаем в S3
-        key, url, uploaded_content_type = await self.s3_manager.upload(file)
+        self._check_image_limit(story, media_type)
+
+        # Заявленный размер проверяем сразу, фактический — по ходу потоковой загрузки в S3
+        if file.size is not None:
+            self._validate_file_size(file.size, media_type)
+        try:
+            uploaded = await self.s3_manager.upload_stream(file, max_size=MAX_FILE_SIZES.get(media_type))
+        except FileTooLargeError as e:
+            self._validate_file_size(e.size, media_type)
+            raise
+        url = uploaded.url
+        uploaded_content_type = uploaded.content_type
+        file_size = uploaded.size
+
+        # Пока файл загружался, параллельный запрос мог изменить историю — перечитываем под блокировкой
+        story = await self.story_repository.get_by_title_for_update(relative_id, story_key)
+        try:
+            self._check_image_limit(story, media_type)
+        except HTTPException:
+            try:
+                await self.s3_manager.delete(url)
+            except Exception:
+                pass
+            raise
 
         # Создаём запись о медиа
         media_item = {
@@ -314,20 +291,9 @@ class StoryService:
             "size": file_size,
         }
 
-        # Добавляем в историю
-        if "media" not in story_data:
-            story_data["media"] = []
-        story_data["media"].append(media_item)
-        story_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-
-        context[story_key] = story_data
-
-        # Сохраняем
-        from src.family.schemas import FamilyRelationUpdateSchema
-        await self.family_service.update_relative(
-            user_id, relative_id,
-            FamilyRelationUpdateSchema(context=context)
-        )
+        await self._append_media(user_id, relative_id, story_key, story, media_item)
+        if media_type == StoryMediaType.IMAGE:
+            thumbnail_pipeline.schedule(uploaded.key, self.s3_manager)
 
         return StoryMediaUploadResponseSchema(
             story_key=story_key,
@@ -341,6 +307,119 @@ class StoryService:
             message="Медиа успешно загружено"
         )
 
+    async def create_direct_upload(
+        self,
+        user_id: int,
+        relative_id: int,
+        story_key: str,
+        filename: str,
+        content_type: str,
+        size: int
+    ) -> StoryMediaPresignResponseSchema:
+        """
+        Выдать подписанную форму для загрузки медиа клиентом напрямую в S3.
+
+        Файл не проходит через API: сервер проверяет тип, размер, лимит фото и квоту
+        хранилища, а S3 сам отклоняет загрузку другого типа или большего размера.
+        Медиа попадает в историю только после complete_direct_upload.
+        """
+        await self.family_service.get_relative_by_id(user_id, relative_id)
+        story = await self.story_repository.get_by_title(relative_id, story_key)
+
+        media_type = self._detect_media_type(content_type)
+        self._check_image_limit(story, media_type)
+        self._validate_file_size(size, media_type)
+        if self.quota_service:
+            await self.quota_service.enforce_storage_limit(user_id, size / (1024 * 1024))
+
+        max_size = MAX_FILE_SIZES[media_type]
+        upload = await self.s3_manager.presign_upload(
+            filename=os.path.basename(filename.replace("\\", "/")),
+            content_type=content_type,
+            max_size=max_size,
+            prefix=self._direct_upload_prefix(user_id, relative_id),
+            expires_in=settings.s3_presign_expires_seconds,
+        )
+        return StoryMediaPresignResponseSchema(
+            key=upload.key,
+            url=upload.url,
+            fields=upload.fields,
+            object_url=upload.object_url,
+            expires_in=upload.expires_in,
+            max_size=max_size,
+        )
+
+    async def complete_direct_upload(
+        self,
+        user_id: int,
+        relative_id: int,
+        story_key: str,
+        key: str,
+        filename: Optional[str] = None
+    ) -> StoryMediaUploadResponseSchema:
+        """
+        Подтвердить прямую загрузку: проверить объект в S3 (HEAD) и записать его в историю.
+
+        Тип и размер берутся из S3, а не от клиента. Объект, не прошедший проверки,
+        удаляется из бакета. Повторное подтверждение того же ключа ничего не меняет.
+        """
+        await self.family_service.get_relative_by_id(user_id, relative_id)
+        if not key.startswith(self._direct_upload_prefix(user_id, relative_id)) or ".." in key:
+            raise HTTPException(status_code=400, detail="Недопустимый ключ загрузки")
+
+        info = await self.s3_manager.head(key)
+        if info is None:
+            raise HTTPException(status_code=400, detail="Файл не найден в хранилище")
+
+        # Параллельные подтверждения одной истории выполняются по очереди — ни одно медиа не теряется
+        story = await self.story_repository.get_by_title_for_update(relative_id, story_key)
+        existing = next((m for m in (story.media or []) if m.get("url") == info.url), None) if story else None
+        if existing:
+            return StoryMediaUploadResponseSchema(
+                story_key=story_key,
+                media=StoryMediaSchema(**existing),
+                message="Медиа уже добавлено"
+            )
+
+        try:
+            media_type = self._detect_media_type(info.content_type)
+            self._check_image_limit(story, media_type)
+            self._validate_file_size(info.size, media_type)
+            if self.quota_service:
+                await self.quota_service.enforce_storage_limit(user_id, info.size / (1024 * 1024))
+        except Exception:
+            try:
+                await self.s3_manager.delete(info.url)
+            except Exception:
+                pass
+            raise
+
+        name = os.path.basename((filename or key).replace("\\", "/"))
+        media_item = {
+            "type": media_type.value,
+            "url": info.url,
+            "filename": name,
+            "content_type": info.content_type,
+            "size": info.size,
+        }
+        await self._append_media(user_id, relative_id, story_key, story, media_item)
+        if media_type == StoryMediaType.IMAGE:
+            thumbnail_pipeline.schedule(info.key, self.s3_manager)
+        if self.quota_service and info.size > 0:
+            await self.quota_service.increment_storage(user_id, info.size / (1024 * 1024))
+
+        return StoryMediaUploadResponseSchema(
+            story_key=story_key,
+            media=StoryMediaSchema(
+                type=media_type,
+                url=info.url,
+                filename=name,
+                content_type=info.content_type,
+                size=info.size,
+            ),
+            message="Медиа успешно загружено"
+        )
+
     async def delete_media(
         self,
         user_id: int,
@@ -349,40 +428,54 @@ class StoryService:
         media_url: str
     ) -> None:
         """Удаление медиа-файла из истории"""
-        context_data = await self.family_service.get_relative_context(user_id, relative_id)
-        context = context_data.context
-
-        if story_key not in context:
-            raise HTTPException(status_code=404, detail="История не найдена")
+        story = await self._get_story_or_404(user_id, relative_id, story_key, for_update=True)
 
-        story_data = context[story_key]
-        if isinstance(story_data, str):
+        media_list = list(story.media or [])
+        if not media_list:
             raise HTTPException(status_code=400, detail="В этой истории нет медиа")
 
-        media_list = story_data.get("media", [])
-        media_found = False
-
-        for i, media in enumerate(media_list):
-            if media["url"] == media_url:
-                # Удаляем из S3
-                try:
-                    await self.s3_manager.delete(media_url)
-                except Exception:
-                    pass
-
-                media_list.pop(i)
-                media_found = True
-                break
-
-        if not media_found:
+        remaining = [media for media in media_list if media["url"] != media_url]
+        if len(remaining) == len(media_list):
             raise HTTPException(status_code=404, detail="Медиа не найдено")
 
-        story_data["media"] = media_list
-        story_data["updated_at"] = datetime.now(timezone.utc).isoformat()
-        context[story_key] = story_data
-
-        from src.family.schemas import FamilyRelationUpdateSchema
-        await self.family_service.update_relative(
-            user_id, relative_id,
-            FamilyRelationUpdateSchema(context=context)
-        )
+        # Удаляем из S3 вместе с миниатюрами
+        try:
+            await self.s3_manager.delete_many(urls_with_thumbnails([media_url]))
+        except Exception:
+            pass
+
+        await self.story_repository.update(story, media=remaining)
+
+
+async def sweep_orphan_uploads(session: AsyncSession, s3_manager: S3Manager, min_age_seconds: int) -> int:
+    """
+    Удалить объекты прямой загрузки, на которые не ссылается ни одна история.
+
+    Подписанная форма может быть использована без complete_direct_upload (клиент закрыл
+    вкладку, подтверждение не прошло проверки) — такой объект занимает бакет, но не
+    учитывается в квоте. Удаляются только объекты старше min_age_seconds, чтобы не
+    задеть загрузку, которая ещё может быть подтверждена. Возвращает число удалённых.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)
+    candidates = {}
+    for obj in await s3_manager.list_objects(DIRECT_UPLOAD_ROOT):
+        parts = obj.key[len(DIRECT_UPLOAD_ROOT):].split("/")
+        if obj.last_modified < cutoff and len(parts) == 3 and parts[1].isdigit():
+            candidates[obj.url] = int(parts[1])
+    if not candidates:
+        return 0
+
+    grouped = await StoryRepository(session).get_by_relative_ids(sorted(set(candidates.values())))
+    referenced = {
+        media.get("url")
+        for stories in grouped.values()
+        for story in stories
+        for media in story.media or []
+    }
+    orphans = [url for url in candidates if url not in referenced]
+    if not orphans:
+        return 0
+    failed = set(await s3_manager.delete_many(urls_with_thumbnails(orphans)))
+    deleted = sum(1 for url in orphans if url not in failed)
+    logger.info(f"Удалено неподтверждённых загрузок медиа: {deleted}")
+    return deleted
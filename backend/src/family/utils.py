@@ -1,9 +1,94 @@
 
-from typing import Any
+from typing import Any, Dict, Optional, NamedTuple, Tuple
 from src.family.exceptions import InvalidDateRangeError
+from src.family.enums import KinshipType
 
 
 
 def validate_date_range(birth_date: Any, death_date: Any) -> None:
     if birth_date and death_date and death_date < birth_date:
         raise InvalidDateRangeError("birth_date", "death_date")
+
+
+# Ключ context с сообщениями интервью; остальные ключи context в старом формате — истории
+INTERVIEW_MESSAGES_KEY = 'interview_messages'
+# Длина stories.title
+STORY_TITLE_MAX_LENGTH = 512
+
+
+def is_context_story(key: str, value: Any) -> bool:
+    """История в старом формате context — строка или dict с полем text"""
+    if key == INTERVIEW_MESSAGES_KEY:
+        return False
+    return isinstance(value, str) or (isinstance(value, dict) and 'text' in value)
+
+
+def split_context_stories(context: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Разделить context на истории (хранятся в таблице stories) и остальные ключи"""
+    stories: Dict[str, Any] = {}
+    remaining: Dict[str, Any] = {}
+    for key, value in (context or {}).items():
+        if is_context_story(key, value):
+            stories[key] = value
+        else:
+            remaining[key] = value
+    return stories, remaining
+
+
+# Типы связей, образующие ребра "родитель -> ребенок" (from = родитель, to = ребенок)
+PARENT_RELATIONSHIP_TYPES = ['parent', 'father', 'mother']
+# Типы супружеских связей (ребро неориентированное)
+SPOUSE_RELATIONSHIP_TYPES = ['spouse', 'husband', 'wife', 'partner', 'ex_spouse']
+
+
+def classify_kinship(up: int, down: int, spouse: int) -> Optional[KinshipType]:
+    """
+    Определить вид родства по форме пути в графе.
+
+    up/down — число шагов вверх (к предкам) и вниз (к потомкам),
+    spouse — 0 для кровного родства, 1 если путь начался с супруга,
+    2 если путь закончился супругом кровного родственника.
+    """
+    if spouse == 1:
+        if up == 0 and down == 0:
+            return KinshipType.SPOUSE
+        # Родители и братья/сестры супруга; дети супруга (пасынки) не свойственники
+        return KinshipType.IN_LAW if up > 0 else None
+    if spouse == 2:
+        # Супруги детей, братьев/сестер и т.д.; супруги предков — отчимы/мачехи
+        return KinshipType.IN_LAW if down > 0 else None
+    if down == 0:
+        return KinshipType.ANCESTOR if up > 0 else None
+    if up == 0:
+        return KinshipType.DESCENDANT
+    if up == 1 and down == 1:
+        return KinshipType.SIBLING
+    if up >= 2 and up == down:
+        return KinshipType.COUSIN
+    return KinshipType.COLLATERAL
+
+
+class KinshipWalkRules(NamedTuple):
+    """Какие шаги разрешены при обходе графа для заданного вида родства"""
+    walk_up: bool
+    walk_down: bool
+    walk_spouse: bool
+    max_up: int
+    max_down: int
+
+
+def kinship_walk_rules(kinship: Optional[KinshipType], max_depth: int) -> KinshipWalkRules:
+    """Ограничить обход только теми шагами, которые могут привести к нужному виду родства"""
+    depth = 1 if kinship == KinshipType.SIBLING else max_depth
+    return KinshipWalkRules(
+        walk_up=kinship not in (KinshipType.DESCENDANT, KinshipType.SPOUSE),
+        walk_down=kinship not in (KinshipType.ANCESTOR, KinshipType.SPOUSE),
+        walk_spouse=kinship in (None, KinshipType.SPOUSE, KinshipType.IN_LAW),
+        max_up=depth,
+        max_down=depth,
+    )
+
+
+def kinship_rank(up: int, down: int, spouse: int) -> Tuple[bool, int, int]:
+    """Ключ выбора пути: кровное родство важнее свойства, ближайший общий предок важнее дальнего"""
+    return (spouse != 0, up, down)
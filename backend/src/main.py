@@ -1,3 +1,4 @@
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
@@ -15,21 +16,26 @@ from src.book.router import router as book_router
 from src.admin.router import router as admin_router
 from src.subscription.router import router as subscription_router
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Инициализация при старте: seed тарифов, запуск шедулера"""
-    from src.database.client import async_session
+    """Инициализация при старте: схема БД, seed тарифов, запуск шедулера"""
+    from src.database.client import async_engine, async_session
+    from src.database.schema import ensure_schema
     from src.subscription.seed import seed_plans
 
+    # Недостающие таблицы (stories, interview_messages и т.д.) — до первых запросов к ним
+    await ensure_schema(async_engine)
+
     async with async_session() as session:
         try:
             await seed_plans(session)
             await session.commit()
         except Exception as e:
             await session.rollback()
-            import logging
-            logging.getLogger(__name__).error(f"Ошибка seed тарифов: {e}")
+            logger.error(f"Ошибка seed тарифов: {e}")
 
     # Запуск APScheduler
     try:
@@ -38,6 +44,11 @@ async def lifespan(app: FastAPI):
             check_expiring_subscriptions,
             expire_past_due_subscriptions,
         )
+        from src.ai.cache import llm_response_cache
+        from src.book.downloads import sync_book_spool
+        from src.family.story_service import sweep_orphan_uploads
+        from src.config import settings
+        from src.storage.s3.dependencies import s3_manager
 
         scheduler = AsyncIOScheduler()
 
@@ -46,30 +57,89 @@ async def lifespan(app: FastAPI):
                 try:
                     await check_expiring_subscriptions(session)
                     await session.commit()
-                except Exception:
+                except Exception as e:
                     await session.rollback()
+                    logger.error(f"Ошибка проверки истекающих подписок: {e}")
 
         async def _expire_past_due():
             async with async_session() as session:
                 try:
                     await expire_past_due_subscriptions(session)
                     await session.commit()
-                except Exception:
+                except Exception as e:
                     await session.rollback()
+                    logger.error(f"Ошибка завершения просроченных подписок: {e}")
+
+        async def _prune_llm_cache():
+            try:
+                await llm_response_cache.prune()
+            except Exception as e:
+                logger.error(f"Ошибка очистки кэша ответов LLM: {e}")
+
+        async def _sync_book_spool():
+            async with async_session() as session:
+                try:
+                    await sync_book_spool(session, s3_manager)
+                except Exception as e:
+                    await session.rollback()
+                    logger.error(f"Ошибка синхронизации spool книг с S3: {e}")
+
+        async def _sweep_orphan_uploads():
+            async with async_session() as session:
+                try:
+                    await sweep_orphan_uploads(session, s3_manager, settings.s3_orphan_upload_seconds)
+                except Exception as e:
+                    logger.error(f"Ошибка удаления неподтверждённых загрузок медиа: {e}")
 
         scheduler.add_job(_check_expiring, "cron", hour=2, minute=0)
         scheduler.add_job(_expire_past_due, "cron", hour=3, minute=0)
+        scheduler.add_job(_prune_llm_cache, "cron", minute=30)
+        scheduler.add_job(_sync_book_spool, "interval", minutes=15)
+        scheduler.add_job(_sweep_orphan_uploads, "cron", hour=4, minute=0)
         scheduler.start()
         app.state.scheduler = scheduler
     except ImportError:
         pass  # APScheduler не установлен — пропускаем
 
+    # Долгоживущий S3-клиент с пулом соединений
+    from src.storage.s3.dependencies import s3_manager, storage_proxy
+    await s3_manager.start()
+    await storage_proxy.start()
+
+    # Пакетная запись логов использования AI
+    from src.ai.usage import ai_usage_recorder
+    ai_usage_recorder.start()
+
+    # Отозванные токены: загрузка и фоновая синхронизация между воркерами
+    from src.auth.security import revocation_store
+    await revocation_store.start()
+
+    # Воркеры фоновой генерации книг
+    from src.book.jobs import book_job_manager
+    await book_job_manager.start()
+
     yield
 
     # Shutdown
+    await book_job_manager.stop()
+    await revocation_store.stop()
+    # После остановки генерации книг: их последние события тоже попадут в БД
+    await ai_usage_recorder.stop()
     if hasattr(app.state, "scheduler"):
         app.state.scheduler.shutdown(wait=False)
 
+    from src.book.renderer import book_renderer
+    book_renderer.shutdown()
+
+    from src.storage.s3.thumbnails import thumbnail_pipeline
+    await thumbnail_pipeline.shutdown()
+
+    from src.users.security import password_hasher
+    password_hasher.shutdown()
+
+    await s3_manager.close()
+    await storage_proxy.close()
+
 
 app = FastAPI(
     title="GenericTree API",
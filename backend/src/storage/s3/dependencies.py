@@ -1,13 +1,25 @@
 from typing import AsyncGenerator
 from fastapi import Depends
-from src.storage.s3.manager import S3Manager
+from src.storage.s3.manager import MIN_PART_SIZE, S3Manager
+from src.storage.s3.proxy import StorageProxy, storage_proxy
 from src.config import settings
 
+# Один менеджер на процесс: долгоживущий клиент открывается и закрывается в lifespan приложения
+s3_manager = S3Manager(
+    access_key_id=settings.access_key_id,
+    secret_access_key=settings.secret_access_key,
+    endpoint_url=settings.endpoint_url,
+    bucket_name=settings.bucket_name,
+    region_name=settings.region_name,
+    part_size=max(settings.s3_multipart_part_size, MIN_PART_SIZE),
+    part_concurrency=settings.s3_multipart_concurrency,
+    max_pool_connections=settings.s3_max_pool_connections,
+)
+
+
 def get_s3_manager() -> S3Manager:
-    return S3Manager(
-        access_key_id=settings.access_key_id,
-        secret_access_key=settings.secret_access_key,
-        endpoint_url=settings.endpoint_url,
-        bucket_name=settings.bucket_name,
-        region_name=settings.region_name,
-    )
+    return s3_manager
+
+
+def get_storage_proxy() -> StorageProxy:
+    return storage_proxy
@@ -0,0 +1,22 @@
+from fastapi import status
+from src.exceptions import BaseAppException
+
+
+class StorageException(BaseAppException):
+    """Базовое исключение модуля хранилища"""
+    pass
+
+
+class FileTooLargeError(StorageException):
+    """Файл превышает допустимый размер (обнаружено во время потоковой загрузки)"""
+    def __init__(self, max_size: int, size: int):
+        self.max_size = max_size
+        self.size = size
+        super().__init__(
+            message=f"Файл слишком большой. Максимальный размер: {max_size / (1024 * 1024):g} MB",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            details={
+                "error_type": "file_too_large",
+                "max_size": max_size,
+            }
+        )
@@ -1,12 +1,66 @@
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
-from contextlib import asynccontextmanager
+from botocore.exceptions import ClientError
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable
 from fastapi import UploadFile
 from datetime import datetime, timezone
 from urllib.parse import urlparse, unquote
 from uuid import uuid4
+import asyncio
+import hashlib
+import logging
 import mimetypes
 import os
 
+from src.storage.s3.exceptions import FileTooLargeError
+
+logger = logging.getLogger(__name__)
+
+# Минимальный размер части multipart upload в S3 (кроме последней)
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Максимум ключей в одном запросе DeleteObjects
+DELETE_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class UploadResult:
+    """Результат потоковой загрузки: размер и sha256 посчитаны по ходу передачи"""
+    key: str
+    url: str
+    content_type: str
+    size: int
+    sha256: str
+
+
+@dataclass(frozen=True)
+class PresignedUpload:
+    """Подписанная форма для загрузки объекта клиентом напрямую в S3 (POST multipart/form-data)"""
+    key: str
+    url: str
+    fields: dict
+    object_url: str
+    expires_in: int
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    """Метаданные загруженного объекта (HEAD)"""
+    key: str
+    url: str
+    size: int
+    content_type: str
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    """Объект бакета из листинга"""
+    key: str
+    url: str
+    size: int
+    last_modified: datetime
+
 
 class S3Manager:
     def __init__(
@@ -16,19 +70,55 @@ class S3Manager:
         endpoint_url: str,
         bucket_name: str,
         region_name: str | None = None,
+        part_size: int = 8 * 1024 * 1024,
+        part_concurrency: int = 4,
+        max_pool_connections: int = 10,
     ):
         self.bucket_name = bucket_name
         self.endpoint_url = endpoint_url.rstrip('/')
+        self.part_size = part_size
+        self.part_concurrency = max(1, part_concurrency)
         self._session = get_session()
         self._config = {
             "aws_access_key_id": access_key_id,
             "aws_secret_access_key": secret_access_key,
             "endpoint_url": endpoint_url,
             **({"region_name": region_name} if region_name else {}),
+            "config": AioConfig(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 3, "mode": "standard"},
+            ),
         }
+        self._shared_client = None
+        self._exit_stack: AsyncExitStack | None = None
+
+    async def start(self) -> None:
+        """
+        Открыть долгоживущий клиент (вызывается в lifespan приложения).
+
+        Клиент держит пул соединений: запросы не тратят время на TLS-рукопожатие
+        и разрешение учётных данных. До start() и после close() каждый вызов
+        открывает свой клиент, как раньше.
+        """
+        if self._shared_client is not None:
+            return
+        stack = AsyncExitStack()
+        self._shared_client = await stack.enter_async_context(
+            self._session.create_client("s3", **self._config)
+        )
+        self._exit_stack = stack
+
+    async def close(self) -> None:
+        """Закрыть долгоживущий клиент и его пул соединений"""
+        stack, self._exit_stack, self._shared_client = self._exit_stack, None, None
+        if stack is not None:
+            await stack.aclose()
 
     @asynccontextmanager
     async def _client(self):
+        if self._shared_client is not None:
+            yield self._shared_client
+            return
         async with self._session.create_client("s3", **self._config) as client:
             yield client
 
@@ -38,9 +128,11 @@ class S3Manager:
     def _resolve_content_type(self, filename: str | None, content_type: str | None) -> str:
         return content_type or mimetypes.guess_type(filename or '')[0] or 'application/octet-stream'
 
-    def _generate_key(self, filename: str | None, content_type: str) -> str:
-        date_path = datetime.now(timezone.utc).strftime('%Y/%m/%d')
+    def _generate_key(self, filename: str | None, content_type: str, prefix: str | None = None) -> str:
         ext = os.path.splitext(filename or '')[1].lower() or mimetypes.guess_extension(content_type) or ''
+        if prefix:
+            return f"{prefix.strip('/')}/{uuid4().hex}{ext}"
+        date_path = datetime.now(timezone.utc).strftime('%Y/%m/%d')
         return f"uploads/{date_path}/{uuid4().hex}{ext}"
 
     def _extract_key_from_url(self, url: str) -> str:
@@ -50,24 +142,127 @@ class S3Manager:
 
     async def upload(self, file: UploadFile) -> tuple[str, str, str]:
         """Upload file and return (key, url, content_type)"""
-        data = await file.read()
+        result = await self.upload_stream(file)
+        return result.key, result.url, result.content_type
+
+    async def upload_stream(self, file: UploadFile, max_size: int | None = None) -> UploadResult:
+        """
+        Потоковая загрузка файла частями по part_size, не читая его в память целиком.
+
+        Файл не больше одной части уходит обычным put_object, больший — multipart upload
+        с параллельной передачей до part_concurrency частей. Размер и sha256 считаются по ходу
+        чтения; при превышении max_size (FileTooLargeError) или любой ошибке незавершённая
+        загрузка отменяется (abort), чтобы в бакете не оставались брошенные части.
+        """
         content_type = self._resolve_content_type(file.filename, file.content_type)
         key = self._generate_key(file.filename, content_type)
+        digest = hashlib.sha256()
+        size = 0
+
+        async def read_part() -> bytes:
+            nonlocal size
+            data = await file.read(self.part_size)
+            size += len(data)
+            if max_size is not None and size > max_size:
+                raise FileTooLargeError(max_size, size)
+            digest.update(data)
+            return data
 
+        first = await read_part()
         async with self._client() as client:
-            await client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=data,
-                ContentType=content_type,
-                ACL="public-read",
-            )
+            if len(first) < self.part_size:
+                await client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    Body=first,
+                    ContentType=content_type,
+                    ACL="public-read",
+                )
+            else:
+                upload = await client.create_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    ContentType=content_type,
+                    ACL="public-read",
+                )
+                upload_id = upload["UploadId"]
+                try:
+                    parts = await self._upload_parts(client, key, upload_id, first, read_part)
+                    await client.complete_multipart_upload(
+                        Bucket=self.bucket_name,
+                        Key=key,
+                        UploadId=upload_id,
+                        MultipartUpload={"Parts": parts},
+                    )
+                except BaseException:
+                    try:
+                        await client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+                    except Exception as e:
+                        logger.error(f"Не удалось отменить multipart upload {key}: {type(e).__name__}: {e}")
+                    raise
 
-        return key, self._get_public_url(key), content_type
+        return UploadResult(
+            key=key,
+            url=self._get_public_url(key),
+            content_type=content_type,
+            size=size,
+            sha256=digest.hexdigest(),
+        )
+
+    async def _upload_parts(
+        self,
+        client,
+        key: str,
+        upload_id: str,
+        first: bytes,
+        read_part: Callable[[], Awaitable[bytes]],
+    ) -> list[dict]:
+        """
+        Передать части параллельно; следующая часть читается, только когда есть свободный слот,
+        поэтому в памяти не больше part_concurrency + 1 частей.
+        """
+        slots = asyncio.Semaphore(self.part_concurrency)
 
-    async def upload_bytes(self, data: bytes, filename: str, content_type: str) -> tuple[str, str, str]:
-        """Upload raw bytes and return (key, url, content_type)"""
-        key = self._generate_key(filename, content_type)
+        async def send(number: int, data: bytes) -> dict:
+            try:
+                response = await client.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=data,
+                )
+                return {"PartNumber": number, "ETag": response["ETag"]}
+            finally:
+                slots.release()
+
+        tasks: list[asyncio.Task] = []
+        try:
+            data, number = first, 1
+            while data:
+                await slots.acquire()
+                # Ошибка уже отправленной части — прекращаем чтение сразу
+                for task in tasks:
+                    if task.done() and task.exception() is not None:
+                        raise task.exception()
+                tasks.append(asyncio.create_task(send(number, data)))
+                data, number = await read_part(), number + 1
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def upload_bytes(
+        self,
+        data: bytes,
+        filename: str,
+        content_type: str,
+        key: str | None = None,
+    ) -> tuple[str, str, str]:
+        """Upload raw bytes (под новым ключом или под заданным key) and return (key, url, content_type)"""
+        key = key or self._generate_key(filename, content_type)
 
         async with self._client() as client:
             await client.put_object(
@@ -84,3 +279,152 @@ class S3Manager:
         """Delete object by its public URL"""
         async with self._client() as client:
             await client.delete_object(Bucket=self.bucket_name, Key=self._extract_key_from_url(url))
+
+    async def delete_many(self, urls: list[str]) -> list[str]:
+        """
+        Удалить объекты по публичным URL пакетами DeleteObjects (до 1000 ключей на запрос).
+
+        Возвращает URL, которые удалить не удалось.
+        """
+        keys = {self._extract_key_from_url(url): url for url in dict.fromkeys(urls)}
+        failed: list[str] = []
+        key_list = list(keys)
+        async with self._client() as client:
+            for i in range(0, len(key_list), DELETE_BATCH_SIZE):
+                batch = key_list[i:i + DELETE_BATCH_SIZE]
+                try:
+                    response = await client.delete_objects(
+                        Bucket=self.bucket_name,
+                        Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                    )
+                except Exception as e:
+                    logger.error(f"Ошибка пакетного удаления из S3 ({len(batch)} объектов): {type(e).__name__}: {e}")
+                    failed.extend(keys[key] for key in batch)
+                    continue
+                for error in response.get("Errors", []):
+                    logger.warning(f"S3 не удалил {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+                    if error.get("Key") in keys:
+                        failed.append(keys[error["Key"]])
+        return failed
+
+    async def upload_many(
+        self,
+        items: list[tuple[bytes, str, str]],
+        concurrency: int | None = None,
+    ) -> list[tuple[str, str, str]]:
+        """
+        Загрузить несколько объектов (data, filename, content_type) параллельно через общий пул.
+
+        Пакетного PUT в S3 нет — выигрыш в переиспользовании соединений и параллельности.
+        Результаты в порядке items; при ошибке уже загруженные объекты удаляются.
+        """
+        slots = asyncio.Semaphore(concurrency or self.part_concurrency)
+
+        async def upload_one(data: bytes, filename: str, content_type: str) -> tuple[str, str, str]:
+            async with slots:
+                return await self.upload_bytes(data, filename, content_type)
+
+        results = await asyncio.gather(*(upload_one(*item) for item in items), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            uploaded = [r[1] for r in results if not isinstance(r, BaseException)]
+            if uploaded:
+                await self.delete_many(uploaded)
+            raise errors[0]
+        return results
+
+    async def presign_upload(
+        self,
+        filename: str | None,
+        content_type: str,
+        max_size: int,
+        prefix: str,
+        expires_in: int = 900,
+    ) -> PresignedUpload:
+        """
+        Подписать форму прямой загрузки в S3 под новым ключом внутри prefix.
+
+        Политика формы фиксирует ключ, Content-Type и ACL и ограничивает размер
+        (content-length-range), поэтому клиент не может загрузить другой тип,
+        больший файл или объект под чужим ключом. Подпись считается локально, без запроса к S3.
+        """
+        key = self._generate_key(filename, content_type, prefix)
+        fields = {"Content-Type": content_type, "acl": "public-read"}
+        conditions = [
+            {"Content-Type": content_type},
+            {"acl": "public-read"},
+            ["content-length-range", 1, max_size],
+        ]
+        async with self._client() as client:
+            form = await client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=key,
+                Fields=fields,
+                Conditions=conditions,
+                ExpiresIn=expires_in,
+            )
+        return PresignedUpload(
+            key=key,
+            url=form["url"],
+            fields=form["fields"],
+            object_url=self._get_public_url(key),
+            expires_in=expires_in,
+        )
+
+    async def head(self, key: str) -> ObjectInfo | None:
+        """Метаданные объекта или None, если его нет"""
+        async with self._client() as client:
+            try:
+                response = await client.head_object(Bucket=self.bucket_name, Key=key)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                    return None
+                raise
+        return ObjectInfo(
+            key=key,
+            url=self._get_public_url(key),
+            size=response["ContentLength"],
+            content_type=response.get("ContentType") or "application/octet-stream",
+        )
+
+    async def list_objects(self, prefix: str) -> list[StoredObject]:
+        """Все объекты с ключами, начинающимися с prefix (постранично через ListObjectsV2)"""
+        objects: list[StoredObject] = []
+        params = {"Bucket": self.bucket_name, "Prefix": prefix}
+        async with self._client() as client:
+            while True:
+                response = await client.list_objects_v2(**params)
+                for item in response.get("Contents", []):
+                    objects.append(StoredObject(
+                        key=item["Key"],
+                        url=self._get_public_url(item["Key"]),
+                        size=item.get("Size", 0),
+                        last_modified=item["LastModified"],
+                    ))
+                if not response.get("IsTruncated"):
+                    return objects
+                params["ContinuationToken"] = response["NextContinuationToken"]
+
+    async def get_size(self, key: str) -> int:
+        """Размер объекта в байтах (HEAD)"""
+        async with self._client() as client:
+            response = await client.head_object(Bucket=self.bucket_name, Key=key)
+        return response["ContentLength"]
+
+    async def stream(
+        self,
+        key: str,
+        start: int | None = None,
+        end: int | None = None,
+        chunk_size: int = 64 * 1024,
+    ) -> AsyncIterator[bytes]:
+        """Читать объект (или диапазон байт [start, end]) порциями, не загружая его в память целиком"""
+        params = {"Bucket": self.bucket_name, "Key": key}
+        if start is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end}"
+        async with self._client() as client:
+            response = await client.get_object(**params)
+            async with response["Body"] as body:
+                async for chunk in body.iter_chunks(chunk_size):
+                    yield chunk
+
@@ -0,0 +1,441 @@
+"""
+Потоковый прокси объектов S3 (обход CORS для фронтенда) с дисковым LRU-кэшем.
+
+Один httpx.AsyncClient с пулом соединений на процесс; тело ответа передаётся клиенту
+порциями по мере получения, поэтому память на запрос не зависит от размера объекта.
+Поддерживаются условные запросы (If-None-Match → 304) и диапазоны (Range → 206).
+
+Небольшие объекты (до max_object_bytes — фото профилей и историй) при первом полном
+запросе записываются на диск параллельно с передачей клиенту, повторные запросы
+отдаются с диска. Объём кэша ограничен max_bytes, вытесняются давно не
+использованные записи. Записи старше ttl перепроверяются в S3 по ETag.
+
+Каталог кэша общий для воркеров, а индекс и max_bytes — у каждого свои: на диске
+кэш занимает до «число воркеров × max_bytes», под это и задаётся лимит. Временные
+файлы помечены pid процесса; при старте воркер удаляет только свои и давно
+брошенные (старше STALE_FILE_SECONDS) файлы, не трогая чужие незавершённые записи.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, BinaryIO, Optional
+from uuid import uuid4
+
+import httpx
+from starlette.datastructures import Headers
+from starlette.responses import Response, StreamingResponse
+
+from src.config import settings
+from src.core.ranges import CHUNK_SIZE, RangeNotSatisfiableError, parse_range, read_file_range
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = "public, max-age=31536000"
+# Заголовки ответа S3, которые передаются клиенту как есть
+PASSTHROUGH_HEADERS = ("content-type", "content-length", "content-range", "etag", "last-modified", "accept-ranges")
+# Незавершённые и несогласованные файлы кэша моложе этого срока могут принадлежать
+# записи другого воркера — при старте они не удаляются
+STALE_FILE_SECONDS = 3600
+
+
+@dataclass
+class CachedObject:
+    url: str
+    size: int
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+def etag_matches(if_none_match: str, etag: Optional[str]) -> bool:
+    """Слабое сравнение ETag из If-None-Match (список через запятую или *)"""
+    if not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def normalize(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return normalize(etag) in {normalize(tag) for tag in if_none_match.split(",")}
+
+
+class CacheWriter:
+    """Запись объекта в кэш по ходу передачи клиенту; в кэш попадает только полностью полученный объект"""
+
+    def __init__(self, cache: "ProxyDiskCache", entry: CachedObject):
+        self._cache = cache
+        self._entry = entry
+        self._tmp_path = os.path.join(cache.directory, f"{cache.key(entry.url)}.{os.getpid()}.{uuid4().hex}.tmp")
+        self._file: Optional[BinaryIO] = None
+        self._written = 0
+
+    async def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            self._file = await asyncio.to_thread(open, self._tmp_path, "wb")
+        await asyncio.to_thread(self._file.write, chunk)
+        self._written += len(chunk)
+
+    async def commit(self) -> None:
+        if self._written != self._entry.size:
+            await self.abort()
+            return
+        try:
+            await asyncio.to_thread(self._finish)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить объект в кэш прокси: {e}")
+            await self.abort()
+            return
+        self._cache._add(self._entry)
+
+    def _finish(self) -> None:
+        if self._file is None:
+            open(self._tmp_path, "wb").close()
+        else:
+            self._file.close()
+        data_path, meta_path = self._cache._paths(self._entry.url)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self._entry), f)
+        os.replace(self._tmp_path, data_path)
+
+    async def abort(self) -> None:
+        def cleanup():
+            if self._file is not None:
+                self._file.close()
+            try:
+                os.remove(self._tmp_path)
+            except FileNotFoundError:
+                pass
+
+        await asyncio.to_thread(cleanup)
+
+
+class ProxyDiskCache:
+    """LRU-кэш объектов на диске: данные в <sha256(url)>.bin, метаданные рядом в .json (max_bytes — на процесс)"""
+
+    def __init__(self, directory: str, max_bytes: int, max_object_bytes: int, ttl_seconds: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, CachedObject] = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        base = os.path.join(self.directory, self.key(url))
+        return f"{base}.bin", f"{base}.json"
+
+    def _ensure_loaded(self) -> None:
+        """Восстановить индекс по файлам каталога (после перезапуска), порядок — по времени изменения"""
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.max_bytes <= 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        names = set(os.listdir(self.directory))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp"):
+                # <key>.<pid>.<uuid>.tmp: свои остались от прошлого запуска с тем же pid
+                own = name.split(".")[1:2] == [str(os.getpid())]
+                if own or self._is_stale(path):
+                    self._remove(path)
+                continue
+            if name.endswith(".bin") and name[:-len(".bin")] + ".json" not in names:
+                # Данные без метаданных — чужая запись между шагами или брошенный файл
+                if self._is_stale(path):
+                    self._remove(path)
+                continue
+            if not name.endswith(".json"):
+                continue
+            data_path = path[:-len(".json")] + ".bin"
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entry = CachedObject(**json.load(f))
+                stat = os.stat(data_path)
+                if stat.st_size != entry.size or self._paths(entry.url)[1] != path:
+                    raise ValueError("inconsistent cache entry")
+            except (OSError, ValueError, TypeError):
+                if self._is_stale(path):
+                    self._remove(path)
+                    self._remove(data_path)
+                continue
+            found.append((stat.st_mtime, entry))
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._add(entry)
+
+    @staticmethod
+    def _is_stale(path: str) -> bool:
+        try:
+            return time.time() - os.stat(path).st_mtime > STALE_FILE_SECONDS
+        except OSError:
+            return False
+
+    def get(self, url: str) -> Optional[CachedObject]:
+        self._ensure_loaded()
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(url)
+        self.hits += 1
+        return entry
+
+    def open(self, entry: CachedObject) -> Optional[BinaryIO]:
+        """Открыть данные записи; None, если файл пропал (запись удаляется из индекса)"""
+        try:
+            return open(self._paths(entry.url)[0], "rb")
+        except OSError:
+            self.discard(entry.url)
+            return None
+
+    def is_fresh(self, entry: CachedObject) -> bool:
+        return time.time() - entry.stored_at < self.ttl_seconds
+
+    def touch(self, entry: CachedObject) -> None:
+        """Запись перепроверена в S3 — продлить срок"""
+        entry.stored_at = time.time()
+
+    def writer(
+        self,
+        url: str,
+        size: Optional[int],
+        content_type: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+    ) -> Optional[CacheWriter]:
+        """Писатель для объекта известного размера, если он помещается в кэш; иначе None"""
+        self._ensure_loaded()
+        if size is None or self.max_bytes <= 0 or size > min(self.max_object_bytes, self.max_bytes):
+            return None
+        return CacheWriter(self, CachedObject(
+            url=url,
+            size=size,
+            content_type=content_type,
+            etag=etag,
+            last_modified=last_modified,
+            stored_at=time.time(),
+        ))
+
+    def _add(self, entry: CachedObject) -> None:
+        old = self._entries.pop(entry.url, None)
+        if old is not None:
+            self._size -= old.size
+        self._entries[entry.url] = entry
+        self._size += entry.size
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+            for path in self._paths(evicted.url):
+                self._remove(path)
+
+    def discard(self, url: str) -> None:
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._size -= entry.size
+            for path in self._paths(url):
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
+
+
+class StorageProxy:
+    """Прокси объектов S3 на общем пуле соединений с дисковым кэшем"""
+
+    def __init__(
+        self,
+        cache: ProxyDiskCache,
+        timeout: float = 30.0,
+        max_connections: int = 50,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.cache = cache
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Клиент создаётся один раз; в lifespan — заранее, иначе при первом запросе
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self._timeout, connect=min(self._timeout, 10.0)),
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                ),
+                follow_redirects=False,
+                transport=self._transport,
+            )
+        return self._client
+
+    async def start(self) -> None:
+        self._http()
+        await asyncio.to_thread(self.cache._ensure_loaded)
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def fetch(self, url: str, request_headers: Headers) -> Response:
+        """
+        Ответ на GET объекта: с диска или потоком из S3.
+
+        Ошибки соединения с S3 (httpx.TimeoutException, httpx.RequestError) пробрасываются.
+        """
+        if_none_match = request_headers.get("if-none-match")
+        range_header = request_headers.get("range")
+
+        entry = self.cache.get(url)
+        if entry is not None:
+            if not self.cache.is_fresh(entry) and not await self._revalidate(url, entry):
+                entry = None
+            if entry is not None:
+                response = self._from_cache(entry, if_none_match, range_header)
+                if response is not None:
+                    return response
+
+        headers = {"Accept-Encoding": "identity"}
+        if if_none_match:
+            headers["If-None-Match"] = if_none_match
+        if range_header:
+            headers["Range"] = range_header
+        client = self._http()
+        upstream = await client.send(client.build_request("GET", url, headers=headers), stream=True)
+
+        response_headers = {
+            name: upstream.headers[name] for name in PASSTHROUGH_HEADERS if name in upstream.headers
+        }
+        if upstream.status_code == 304:
+            await upstream.aclose()
+            response_headers.pop("content-length", None)
+            return Response(status_code=304, headers={**response_headers, "Cache-Control": CACHE_CONTROL})
+        response_headers["Cache-Control"] = CACHE_CONTROL if upstream.status_code in (200, 206) else "no-store"
+
+        writer = None
+        if upstream.status_code == 200 and not range_header:
+            content_length = upstream.headers.get("content-length")
+            writer = self.cache.writer(
+                url,
+                size=int(content_length) if content_length and content_length.isdigit() else None,
+                content_type=upstream.headers.get("content-type", "application/octet-stream"),
+                etag=upstream.headers.get("etag"),
+                last_modified=upstream.headers.get("last-modified"),
+            )
+
+        async def body() -> AsyncIterator[bytes]:
+            nonlocal writer
+            try:
+                async for chunk in upstream.aiter_raw(CHUNK_SIZE):
+                    if writer is not None:
+                        await writer.write(chunk)
+                    yield chunk
+                if writer is not None:
+                    await writer.commit()
+                    writer = None
+            finally:
+                if writer is not None:
+                    await writer.abort()
+                await upstream.aclose()
+
+        return StreamingResponse(
+            body(),
+            status_code=upstream.status_code,
+            headers=response_headers,
+            media_type=upstream.headers.get("content-type", "application/octet-stream"),
+        )
+
+    async def _revalidate(self, url: str, entry: CachedObject) -> bool:
+        """Проверить устаревшую запись в S3 по ETag; False — объект изменился или недоступен"""
+        if entry.etag:
+            client = self._http()
+            request = client.build_request("GET", url, headers={"If-None-Match": entry.etag, "Accept-Encoding": "identity"})
+            try:
+                # Тело изменившегося объекта не читаем — его запросит обычная ветка
+                response = await client.send(request, stream=True)
+                await response.aclose()
+            except httpx.RequestError:
+                # S3 недоступен — отдаём то, что есть
+                return True
+            if response.status_code == 304:
+                self.cache.touch(entry)
+                return True
+        self.cache.discard(url)
+        return False
+
+    def _from_cache(
+        self,
+        entry: CachedObject,
+        if_none_match: Optional[str],
+        range_header: Optional[str],
+    ) -> Optional[Response]:
+        headers = {"Accept-Ranges": "bytes", "Cache-Control": CACHE_CONTROL, "X-Proxy-Cache": "HIT"}
+        if entry.etag:
+            headers["ETag"] = entry.etag
+        if entry.last_modified:
+            headers["Last-Modified"] = entry.last_modified
+        if if_none_match and etag_matches(if_none_match, entry.etag):
+            return Response(status_code=304, headers=headers)
+
+        try:
+            byte_range = parse_range(range_header, entry.size)
+        except RangeNotSatisfiableError as e:
+            return Response(status_code=e.status_code, headers=e.headers)
+
+        file = self.cache.open(entry)
+        if file is None:
+            return None
+        start, end = byte_range or (0, entry.size - 1)
+        status_code = 200
+        if byte_range:
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{entry.size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            read_file_range(file, start, end),
+            status_code=status_code,
+            headers=headers,
+            media_type=entry.content_type,
+        )
+
+
+storage_proxy = StorageProxy(
+    ProxyDiskCache(
+        directory=settings.storage_proxy_cache_dir,
+        max_bytes=settings.storage_proxy_cache_max_bytes,
+        max_object_bytes=settings.storage_proxy_cache_max_object_bytes,
+        ttl_seconds=settings.storage_proxy_cache_ttl_seconds,
+    ),
+    timeout=settings.storage_proxy_timeout_seconds,
+    max_connections=settings.storage_proxy_max_connections,
+)
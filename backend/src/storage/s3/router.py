@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Response
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request
 from src.auth.dependencies import get_current_user_id
-from src.storage.s3.dependencies import get_s3_manager
+from src.storage.s3.dependencies import get_s3_manager, get_storage_proxy
 from src.storage.s3.manager import S3Manager
+from src.storage.s3.proxy import StorageProxy
+from src.storage.s3.thumbnails import thumbnail_pipeline
 from src.storage.s3.schemas import UploadOutputSchema
 from src.subscription.dependencies import get_quota_service
 from src.subscription.quota_service import QuotaService
+from urllib.parse import unquote
 import httpx
 import os
 
@@ -25,32 +28,37 @@ async def upload_file(
     file_size_mb = 0
     if file.size:
         file_size_mb = file.size / (1024 * 1024)
-    if not await quota_service.check_storage_limit(user_id, file_size_mb):
-        from src.subscription.exceptions import QuotaExceededError
-        plan = await quota_service.get_user_plan(user_id)
-        quota = await quota_service.get_or_create_quota(user_id)
-        raise QuotaExceededError(
-            resource="Хранилище (МБ)",
-            limit=plan.max_storage_mb,
-            used=quota.storage_used_mb,
-        )
+    await quota_service.enforce_storage_limit(user_id, file_size_mb)
 
     # Санитизация имени файла (защита от path traversal в filename)
     if file.filename:
         safe_name = os.path.basename(file.filename.replace("\\", "/"))
         file.filename = safe_name
 
-    key, url, content_type = await s3.upload(file)
+    # Файл передаётся в S3 частями; фактический размер считается по ходу загрузки
+    result = await s3.upload_stream(file)
+    # Фото профилей загружаются через этот эндпоинт — миниатюры создаются в фоне
+    if result.content_type.startswith("image/"):
+        thumbnail_pipeline.schedule(result.key, s3)
 
-    if file_size_mb > 0:
-        await quota_service.increment_storage(user_id, file_size_mb)
+    if result.size > 0:
+        await quota_service.increment_storage(user_id, result.size / (1024 * 1024))
 
-    return UploadOutputSchema(key=key, url=url, content_type=content_type)
+    return UploadOutputSchema(key=result.key, url=result.url, content_type=result.content_type)
 
 
 @router.get("/proxy")
-async def proxy_content(url: str):
-    """Проксирование контента из S3 для обхода CORS"""
+async def proxy_content(
+    url: str,
+    request: Request,
+    proxy: StorageProxy = Depends(get_storage_proxy),
+):
+    """
+    Проксирование контента из S3 для обхода CORS.
+
+    Тело передаётся потоком; поддерживаются If-None-Match и Range,
+    часто запрашиваемые небольшие объекты отдаются из дискового кэша.
+    """
     parsed = httpx.URL(url)
 
     if parsed.scheme != "https" or parsed.host not in ALLOWED_PROXY_HOSTS:
@@ -58,18 +66,13 @@ async def proxy_content(url: str):
     # Явно запрещаем нестандартные порты (минимизация SSRF-обходов)
     if parsed.port is not None and parsed.port != 443:
         raise HTTPException(status_code=400, detail="Недопустимый адрес")
+    # Управляющие символы в пути (CRLF, NUL) не бывают в ключах наших объектов
+    if any(ord(ch) < 0x20 or ord(ch) == 0x7f for ch in unquote(parsed.path)):
+        raise HTTPException(status_code=400, detail="Недопустимый адрес")
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, follow_redirects=True)
+        return await proxy.fetch(str(parsed), request.headers)
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="Превышено время ожидания")
     except httpx.RequestError:
         raise HTTPException(status_code=502, detail="Ошибка при обращении к источнику")
-
-    return Response(
-        content=response.content,
-        media_type=response.headers.get("content-type", "application/octet-stream"),
-        headers={"Cache-Control": "public, max-age=31536000"},
-        status_code=response.status_code,
-    )
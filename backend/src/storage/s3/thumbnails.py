@@ -0,0 +1,201 @@
+"""
+Миниатюры загруженных фотографий.
+
+После загрузки фото (профиль родственника, фото истории) в фоне создаются WebP-копии
+64/256/1024 px по большей стороне. Декодирование и сжатие выполняются в пуле процессов,
+чтобы не занимать event loop и GIL. Ключи миниатюр детерминированы и выводятся из ключа
+оригинала: uploads/2026/01/02/abc.jpg -> thumbs/uploads/2026/01/02/abc/256.webp.
+Поэтому схемы отдают ссылки на миниатюры без хранения в БД. Для фото, загруженных
+до появления пайплайна, миниатюры создаёт python -m src.storage.s3.thumbnails_backfill;
+пока миниатюра не готова (фоновая генерация ещё идёт), фронтенд показывает оригинал.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, Optional, Sequence
+
+from PIL import Image, ImageOps
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (64, 256, 1024)
+THUMBNAIL_PREFIX = "thumbs"
+# Форматы, которые декодирует Pillow; для HEIC/HEIF миниатюр нет — показывается оригинал
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+
+def thumbnail_key(key: str, size: int) -> str:
+    """Ключ миниатюры размера size для объекта key"""
+    stem = os.path.splitext(key)[0]
+    return f"{THUMBNAIL_PREFIX}/{stem}/{size}.webp"
+
+
+def _public_prefix() -> str:
+    return f"{settings.endpoint_url.rstrip('/')}/{settings.bucket_name}/"
+
+
+def has_thumbnails(key: str) -> bool:
+    """Создаются ли миниатюры для объекта (изображение, не сама миниатюра)"""
+    return (
+        os.path.splitext(key)[1].lower() in IMAGE_EXTENSIONS
+        and not key.startswith(f"{THUMBNAIL_PREFIX}/")
+    )
+
+
+def bucket_key(url: Optional[str]) -> Optional[str]:
+    """Ключ объекта по публичному URL или None, если URL не из нашего бакета"""
+    prefix = _public_prefix()
+    if not url or not url.startswith(prefix):
+        return None
+    return url[len(prefix):]
+
+
+def thumbnail_urls(url: Optional[str]) -> Optional[Dict[str, str]]:
+    """Публичные URL миниатюр ({"64": url, ...}) или None, если фото не из нашего бакета"""
+    key = bucket_key(url)
+    if key is None or not has_thumbnails(key):
+        return None
+    prefix = _public_prefix()
+    return {str(size): prefix + thumbnail_key(key, size) for size in THUMBNAIL_SIZES}
+
+
+def urls_with_thumbnails(urls: Sequence[str]) -> list[str]:
+    """URL объектов вместе с URL их миниатюр — для удаления одним пакетом"""
+    result = []
+    for url in urls:
+        result.append(url)
+        result.extend((thumbnail_urls(url) or {}).values())
+    return result
+
+
+def render_thumbnails(data: bytes, sizes: Sequence[int], quality: int) -> Dict[int, bytes]:
+    """
+    WebP-миниатюры изображения (выполняется в процессе пула).
+
+    Изображение поворачивается по EXIF и не увеличивается: для маленького
+    оригинала все размеры совпадают с ним.
+    """
+    result: Dict[int, bytes] = {}
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        # От большего размера к меньшему: каждая следующая миниатюра уменьшается из предыдущей
+        for size in sorted(sizes, reverse=True):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            output = BytesIO()
+            image.save(output, "WEBP", quality=quality, method=4)
+            result[size] = output.getvalue()
+    return result
+
+
+class ThumbnailPipeline:
+    """Фоновая генерация миниатюр: задачи в event loop, обработка изображений в пуле процессов"""
+
+    def __init__(
+        self,
+        workers: int,
+        concurrency: int = 4,
+        quality: int = 80,
+        max_source_bytes: int = 30 * 1024 * 1024,
+        sizes: Sequence[int] = THUMBNAIL_SIZES,
+    ):
+        self.workers = workers
+        self.quality = quality
+        self.max_source_bytes = max_source_bytes
+        self.sizes = tuple(sizes)
+        self._slots = asyncio.Semaphore(max(1, concurrency))
+        self._executor: Optional[Executor] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.generated = 0
+        self.failed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers > 0:
+                # spawn, а не fork: форк процесса с запущенным event loop и потоками небезопасен
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        return self._executor
+
+    def schedule(self, key: str, s3_manager) -> None:
+        """Запустить генерацию в фоне; ошибки логируются и не влияют на загрузку оригинала"""
+        if not has_thumbnails(key):
+            return
+        task = asyncio.create_task(self._run(key, s3_manager))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: str, s3_manager) -> None:
+        try:
+            await self.generate(key, s3_manager)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Не удалось создать миниатюры {key}: {type(e).__name__}: {e}")
+
+    async def generate(self, key: str, s3_manager) -> Dict[int, str]:
+        """Создать и загрузить миниатюры объекта key; возвращает размер -> URL"""
+        async with self._slots:
+            chunks = []
+            size = 0
+            async for chunk in s3_manager.stream(key):
+                size += len(chunk)
+                if size > self.max_source_bytes:
+                    raise ValueError(f"оригинал больше {self.max_source_bytes} байт")
+                chunks.append(chunk)
+
+            loop = asyncio.get_running_loop()
+            try:
+                thumbnails = await loop.run_in_executor(
+                    self._get_executor(), render_thumbnails, b"".join(chunks), self.sizes, self.quality
+                )
+            except BrokenProcessPool:
+                logger.error("Процесс генерации миниатюр аварийно завершился, пул будет пересоздан")
+                self.shutdown_executor()
+                raise
+
+            uploaded = await asyncio.gather(*(
+                s3_manager.upload_bytes(data, f"{size}.webp", "image/webp", key=thumbnail_key(key, size))
+                for size, data in thumbnails.items()
+            ))
+        self.generated += 1
+        return {size: url for size, (_, url, _) in zip(thumbnails, uploaded)}
+
+    async def drain(self) -> None:
+        """Дождаться всех запущенных генераций"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def shutdown_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def shutdown(self) -> None:
+        """Отменить незавершённые задачи и остановить пул (вызывается при остановке приложения)"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        self.shutdown_executor()
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": len(self._tasks), "generated": self.generated, "failed": self.failed}
+
+
+thumbnail_pipeline = ThumbnailPipeline(
+    workers=settings.thumbnail_workers,
+    concurrency=settings.thumbnail_concurrency,
+    quality=settings.thumbnail_webp_quality,
+)
@@ -0,0 +1,125 @@
+"""
+Создание миниатюр для фотографий, загруженных до появления пайплайна миниатюр.
+
+Схемы отдают ссылки на миниатюры для всех фото из бакета, поэтому для старых фото
+(image_url родственников и изображения в media историй) миниатюры нужно создать.
+Фото, у которых уже есть самая крупная миниатюра, пропускаются, поэтому скрипт можно
+прерывать и запускать повторно. Записи читаются пачками по id (keyset).
+
+Использование:
+    cd backend
+    python -m src.storage.s3.thumbnails_backfill [--batch-size 500]
+"""
+import asyncio
+import sys
+from typing import AsyncIterator, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.client import async_engine, async_session
+from src.database.schema import ensure_schema
+from src.users.models import UserModel  # noqa: F401 — нужен для SQLAlchemy mapper
+from src.family.models import FamilyRelationModel, StoryModel
+from src.storage.s3.thumbnails import (
+    THUMBNAIL_SIZES, ThumbnailPipeline, bucket_key, has_thumbnails, thumbnail_key, thumbnail_pipeline,
+)
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+async def _image_urls(session: AsyncSession, batch_size: int) -> AsyncIterator[List[str]]:
+    """URL фото родственников и изображений историй пачками"""
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(FamilyRelationModel.id, FamilyRelationModel.image_url)
+            .where(FamilyRelationModel.id > last_id, FamilyRelationModel.image_url.isnot(None))
+            .order_by(FamilyRelationModel.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        yield [url for _, url in rows]
+
+    last_id = 0
+    while True:
+        result = await session.execute(
+            select(StoryModel.id, StoryModel.media)
+            .where(StoryModel.id > last_id)
+            .order_by(StoryModel.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        yield [
+            media.get("url")
+            for _, media_list in rows
+            for media in media_list or []
+            if isinstance(media, dict) and media.get("type") == "image"
+        ]
+
+
+async def backfill_thumbnails(
+    session: AsyncSession,
+    s3_manager,
+    pipeline: ThumbnailPipeline = thumbnail_pipeline,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Создать недостающие миниатюры; параллелизм ограничен семафором пайплайна"""
+    stats = {'images': 0, 'generated': 0, 'existing': 0, 'failed': 0}
+    largest = max(THUMBNAIL_SIZES)
+
+    async def process(key: str) -> None:
+        try:
+            if await s3_manager.head(thumbnail_key(key, largest)) is not None:
+                stats['existing'] += 1
+                return
+            await pipeline.generate(key, s3_manager)
+            stats['generated'] += 1
+        except Exception as e:
+            stats['failed'] += 1
+            print(f"Не удалось создать миниатюры {key}: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async for urls in _image_urls(session, batch_size):
+        keys = list(dict.fromkeys(
+            key for key in map(bucket_key, urls) if key is not None and has_thumbnails(key)
+        ))
+        stats['images'] += len(keys)
+        await asyncio.gather(*(process(key) for key in keys))
+
+    return stats
+
+
+async def run(batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    from src.storage.s3.dependencies import s3_manager
+
+    await ensure_schema(async_engine)
+    try:
+        async with async_session() as session:
+            return await backfill_thumbnails(session, s3_manager, batch_size=batch_size)
+    finally:
+        thumbnail_pipeline.shutdown_executor()
+
+
+def main():
+    batch_size = DEFAULT_BATCH_SIZE
+    if "--batch-size" in sys.argv:
+        batch_size = int(sys.argv[sys.argv.index("--batch-size") + 1])
+
+    stats = asyncio.run(run(batch_size))
+    print(
+        f"Фото обработано: {stats['images']}, "
+        f"миниатюр создано: {stats['generated']}, "
+        f"уже были: {stats['existing']}, "
+        f"ошибок: {stats['failed']}."
+    )
+
+
+if __name__ == "__main__":
+    main()
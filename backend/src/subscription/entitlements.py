@@ -0,0 +1,126 @@
+"""
+Кэш тарифов и права пользователей (Entitlements) для QuotaService.
+
+Проверка квоты раньше стоила 3–4 запроса до начала полезной работы: активная подписка,
+FREE-план при её отсутствии, квота за месяц. Теперь:
+
+- PlanCache — тарифные планы на процесс (меняются только при seed_plans), копии строк
+  без привязки к сессии;
+- Entitlements — снимок «план + счётчики месяца» пользователя в коротком TTL-кэше.
+  Списание квоты обновляет снимок этого процесса значениями счётчиков из БД,
+  смена подписки (активация по webhook, отмена, истечение, назначение админом)
+  сбрасывает снимок. В других воркерах снимок обновится не позже чем через ttl_seconds.
+
+Абсолютные лимиты (родственники, приглашения) проверяются при записи и считаются
+по БД, в снимок не входят.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from src.config import settings
+from src.core.cache import VersionedTTLCache
+from src.core.dates import as_utc
+from src.subscription.models import SubscriptionPlanModel, UsageQuotaModel
+
+# Счётчики UsageQuotaModel, которые хранятся в снимке
+USAGE_FIELDS = (
+    "ai_requests_used",
+    "ai_smart_requests_used",
+    "tree_generations_used",
+    "book_generations_used",
+    "telegram_sessions_used",
+    "tts_used",
+    "storage_used_mb",
+)
+
+
+def copy_plan(plan: SubscriptionPlanModel) -> SubscriptionPlanModel:
+    """Копия плана, не привязанная к сессии (безопасно делить между запросами)"""
+    return SubscriptionPlanModel(**{
+        column.key: getattr(plan, column.key)
+        for column in SubscriptionPlanModel.__table__.columns
+    })
+
+
+@dataclass(slots=True)
+class Entitlements:
+    """Права пользователя: текущий план и расход за месяц"""
+    user_id: int
+    plan: SubscriptionPlanModel
+    period_start: datetime
+    period_end: datetime
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_models(cls, user_id: int, plan: SubscriptionPlanModel, quota: UsageQuotaModel) -> "Entitlements":
+        return cls(
+            user_id=user_id,
+            plan=plan,
+            period_start=as_utc(quota.period_start),
+            period_end=as_utc(quota.period_end),
+            usage={name: getattr(quota, name, 0) or 0 for name in USAGE_FIELDS},
+        )
+
+    def limit(self, limit_field: str) -> int:
+        return getattr(self.plan, limit_field, -1)
+
+    def used(self, quota_field: str) -> int:
+        return self.usage.get(quota_field, 0)
+
+    def is_current(self) -> bool:
+        """Снимок относится к текущему периоду (с началом месяца нужна новая квота)"""
+        return self.period_end > datetime.now(timezone.utc)
+
+
+class EntitlementsCache(VersionedTTLCache[int, Entitlements]):
+    """Кэш Entitlements по user_id с TTL; снимок прошлого месяца не выдаётся"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds=ttl_seconds, max_size=max_entries)
+
+    def _key(self, entitlements: Entitlements) -> int:
+        return entitlements.user_id
+
+    def _is_valid(self, entitlements: Entitlements) -> bool:
+        return entitlements.is_current()
+
+    def update_usage(self, user_id: int, quota: UsageQuotaModel) -> None:
+        """Обновить счётчики снимка значениями из БД (RETURNING после списания)"""
+        entitlements = self._peek(user_id)
+        if entitlements is not None:
+            entitlements.usage.update({name: getattr(quota, name, 0) or 0 for name in USAGE_FIELDS})
+
+
+# Ключ списка активных планов в PlanCache (планы кэшируются по PlanType)
+_ACTIVE_PLANS = "__active__"
+
+
+class PlanCache(VersionedTTLCache[Any, Any]):
+    """Тарифные планы на процесс: по имени и список активных, с редким обновлением по TTL"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 64):
+        super().__init__(ttl_seconds=ttl_seconds, max_size=max_entries)
+
+    async def get_by_name(self, plan_repo, name) -> Optional[SubscriptionPlanModel]:
+        """План по имени (PlanType); отсутствующий план не кэшируется"""
+        async def load() -> Optional[SubscriptionPlanModel]:
+            plan = await plan_repo.get_by_name(name)
+            return copy_plan(plan) if plan is not None else None
+
+        return await self.get_or_load(name, load)
+
+    async def get_all_active(self, plan_repo) -> List[SubscriptionPlanModel]:
+        """Активные планы в порядке sort_order"""
+        async def load() -> List[SubscriptionPlanModel]:
+            return [copy_plan(plan) for plan in await plan_repo.get_all_active()]
+
+        return await self.get_or_load(_ACTIVE_PLANS, load)
+
+
+entitlements_cache = EntitlementsCache(
+    ttl_seconds=settings.entitlements_cache_ttl_seconds,
+    max_entries=settings.entitlements_cache_max_entries,
+)
+
+plan_cache = PlanCache(ttl_seconds=settings.plan_cache_ttl_seconds)
@@ -14,6 +14,7 @@ from src.subscription.repository import (
 )
 from src.subscription.enums import PlanType, SubscriptionStatus, QuotaResource
 from src.subscription.exceptions import QuotaExceededError
+from src.subscription.entitlements import Entitlements, copy_plan, entitlements_cache, plan_cache
 from src.subscription.schemas import QuotaItemSchema, UsageSummarySchema, PlanOutputSchema
 from src.core.logger import get_logger
 
@@ -54,6 +55,15 @@ RESOURCE_DISPLAY_NAMES = {
 }
 
 
+def current_period(now: datetime | None = None) -> tuple[datetime, datetime]:
+    """Границы месячного периода квоты (UTC); period_start — часть ключа uq_user_period"""
+    now = now or datetime.now(timezone.utc)
+    period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_day = monthrange(now.year, now.month)[1]
+    period_end = period_start.replace(day=last_day, hour=23, minute=59, second=59)
+    return period_start, period_end
+
+
 class QuotaService:
     def __init__(
         self,
@@ -69,44 +79,50 @@ class QuotaService:
 
     async def get_user_plan(self, user_id: int) -> SubscriptionPlanModel:
         """Получить текущий план пользователя. FREE если нет активной подписки."""
+        entitlements = entitlements_cache.get(user_id)
+        if entitlements is not None:
+            return entitlements.plan
+        return await self._resolve_plan(user_id)
+
+    async def _resolve_plan(self, user_id: int) -> SubscriptionPlanModel:
         subscription = await self.subscription_repo.get_active_by_user(user_id)
         if subscription and subscription.plan:
-            return subscription.plan
+            return copy_plan(subscription.plan)
 
-        # Возвращаем FREE план
-        free_plan = await self.plan_repo.get_by_name(PlanType.FREE)
+        # Возвращаем FREE план (из кэша планов процесса)
+        free_plan = await plan_cache.get_by_name(self.plan_repo, PlanType.FREE)
         if not free_plan:
             logger.error("FREE план не найден в БД! Создайте seed-данные.")
             raise RuntimeError("FREE план не найден. Выполните seed_plans().")
         return free_plan
 
+    async def get_entitlements(self, user_id: int) -> Entitlements:
+        """План и расход за месяц из кэша (src/subscription/entitlements.py) или из БД"""
+        return await entitlements_cache.get_or_load(user_id, lambda: self._load_entitlements(user_id))
+
+    async def _load_entitlements(self, user_id: int) -> Entitlements:
+        plan = await self._resolve_plan(user_id)
+        quota = await self.get_or_create_quota(user_id)
+        return Entitlements.from_models(user_id, plan, quota)
+
     async def get_or_create_quota(self, user_id: int) -> UsageQuotaModel:
         """Получить или создать квоту за текущий месяц"""
         quota = await self.quota_repo.get_current(user_id)
         if quota:
             return quota
 
-        # Создаём квоту на текущий месяц
-        now = datetime.now(timezone.utc)
-        period_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        last_day = monthrange(now.year, now.month)[1]
-        period_end = period_start.replace(day=last_day, hour=23, minute=59, second=59)
-
-        quota = await self.quota_repo.create(
-            user_id=user_id,
-            period_start=period_start,
-            period_end=period_end,
-        )
-        return quota
+        # Создаём квоту на текущий месяц (параллельный запрос мог создать её раньше)
+        period_start, period_end = current_period()
+        return await self.quota_repo.get_or_create(user_id, period_start, period_end)
 
     async def check_quota(self, user_id: int, resource: QuotaResource) -> bool:
         """Проверить, можно ли выполнить операцию. True = можно."""
-        plan = await self.get_user_plan(user_id)
+        entitlements = await self.get_entitlements(user_id)
         limit_field = RESOURCE_TO_PLAN_LIMIT.get(resource)
         if not limit_field:
             return True
 
-        limit = getattr(plan, limit_field, -1)
+        limit = entitlements.limit(limit_field)
         if limit == -1:
             return True  # Безлимит
 
@@ -120,22 +136,20 @@ class QuotaService:
             return await self._check_invitations_count(user_id, limit)
 
         # Месячные квоты
-        quota = await self.get_or_create_quota(user_id)
         quota_field = RESOURCE_TO_QUOTA_FIELD.get(resource)
         if not quota_field:
             return True
 
-        used = getattr(quota, quota_field, 0)
-        return used < limit
+        return entitlements.used(quota_field) < limit
 
     async def enforce_quota(self, user_id: int, resource: QuotaResource) -> None:
         """Проверить квоту и бросить исключение, если превышена"""
-        plan = await self.get_user_plan(user_id)
+        entitlements = await self.get_entitlements(user_id)
         limit_field = RESOURCE_TO_PLAN_LIMIT.get(resource)
         if not limit_field:
             return
 
-        limit = getattr(plan, limit_field, -1)
+        limit = entitlements.limit(limit_field)
         if limit == -1:
             return
 
@@ -166,12 +180,11 @@ class QuotaService:
                 used=0,
             )
 
-        quota = await self.get_or_create_quota(user_id)
         quota_field = RESOURCE_TO_QUOTA_FIELD.get(resource)
         if not quota_field:
             return
 
-        used = getattr(quota, quota_field, 0)
+        used = entitlements.used(quota_field)
         if used >= limit:
             raise QuotaExceededError(
                 resource=RESOURCE_DISPLAY_NAMES.get(resource, resource.value),
@@ -182,19 +195,55 @@ class QuotaService:
     async def increment_quota(
         self, user_id: int, resource: QuotaResource, amount: int = 1
     ) -> None:
-        """Увеличить счётчик использования после выполнения операции"""
+        """Увеличить счётчик использования после выполнения операции (одним атомарным запросом)"""
         quota_field = RESOURCE_TO_QUOTA_FIELD.get(resource)
         if not quota_field:
             return
 
-        quota = await self.get_or_create_quota(user_id)
-        current = getattr(quota, quota_field, 0)
-        await self.quota_repo.update(quota, **{quota_field: current + amount})
+        period_start, period_end = current_period()
+        quota = await self.quota_repo.increment(user_id, period_start, period_end, **{quota_field: amount})
+        entitlements_cache.update_usage(user_id, quota)
+
+    async def consume_quota(
+        self, user_id: int, resource: QuotaResource, amount: int = 1
+    ) -> None:
+        """
+        Проверить и списать месячную квоту одним запросом (вместо enforce_quota + increment_quota).
+
+        Лимит проверяется в том же UPSERT, что и увеличение счётчика, поэтому параллельные
+        запросы пользователя не превысят его. Для абсолютных лимитов — только проверка.
+        """
+        quota_field = RESOURCE_TO_QUOTA_FIELD.get(resource)
+        if not quota_field:
+            await self.enforce_quota(user_id, resource)
+            return
+
+        entitlements = await self.get_entitlements(user_id)
+        limit_field = RESOURCE_TO_PLAN_LIMIT.get(resource)
+        limit = entitlements.limit(limit_field) if limit_field else -1
+        if limit == -1:
+            await self.increment_quota(user_id, resource, amount)
+            return
+
+        period_start, period_end = current_period()
+        quota = await self.quota_repo.consume(
+            user_id, period_start, period_end, quota_field, amount, limit
+        )
+        if quota is None:
+            used = entitlements.used(quota_field)
+            # Снимок мог отстать от других воркеров — перечитаем при следующем обращении
+            entitlements_cache.invalidate(user_id)
+            raise QuotaExceededError(
+                resource=RESOURCE_DISPLAY_NAMES.get(resource, resource.value),
+                limit=limit,
+                used=used,
+            )
+        entitlements_cache.update_usage(user_id, quota)
 
     async def get_usage_summary(self, user_id: int) -> UsageSummarySchema:
         """Сводка использования для UI"""
-        plan = await self.get_user_plan(user_id)
-        quota = await self.get_or_create_quota(user_id)
+        entitlements = await self.get_entitlements(user_id)
+        plan = entitlements.plan
 
         quotas = []
 
@@ -204,7 +253,7 @@ class QuotaService:
             if not limit_field:
                 continue
             limit = getattr(plan, limit_field, 0)
-            used = getattr(quota, quota_field, 0)
+            used = entitlements.used(quota_field)
             quotas.append(QuotaItemSchema(
                 resource=resource.value,
                 display_name=RESOURCE_DISPLAY_NAMES.get(resource, resource.value),
@@ -235,25 +284,36 @@ class QuotaService:
         return UsageSummarySchema(
             plan=PlanOutputSchema.from_model(plan),
             quotas=quotas,
-            period_start=quota.period_start,
-            period_end=quota.period_end,
+            period_start=entitlements.period_start,
+            period_end=entitlements.period_end,
         )
 
     async def check_storage_limit(self, user_id: int, file_size_mb: float) -> bool:
         """Проверить, поместится ли файл в хранилище"""
-        plan = await self.get_user_plan(user_id)
-        if plan.max_storage_mb == -1:
+        entitlements = await self.get_entitlements(user_id)
+        limit = entitlements.plan.max_storage_mb
+        if limit == -1:
             return True
-        quota = await self.get_or_create_quota(user_id)
-        return (quota.storage_used_mb + file_size_mb) <= plan.max_storage_mb
+        return (entitlements.used("storage_used_mb") + file_size_mb) <= limit
+
+    async def enforce_storage_limit(self, user_id: int, file_size_mb: float) -> None:
+        """Проверить место в хранилище и бросить исключение, если файл не поместится"""
+        if await self.check_storage_limit(user_id, file_size_mb):
+            return
+        entitlements = await self.get_entitlements(user_id)
+        raise QuotaExceededError(
+            resource=RESOURCE_DISPLAY_NAMES[QuotaResource.STORAGE_MB],
+            limit=entitlements.plan.max_storage_mb,
+            used=entitlements.used("storage_used_mb"),
+        )
 
     async def increment_storage(self, user_id: int, file_size_mb: float) -> None:
-        """Увеличить использование хранилища"""
-        quota = await self.get_or_create_quota(user_id)
-        await self.quota_repo.update(
-            quota,
-            storage_used_mb=quota.storage_used_mb + int(file_size_mb),
+        """Увеличить использование хранилища (одним атомарным запросом)"""
+        period_start, period_end = current_period()
+        quota = await self.quota_repo.increment(
+            user_id, period_start, period_end, storage_used_mb=int(file_size_mb)
         )
+        entitlements_cache.update_usage(user_id, quota)
 
     # --- Вспомогательные методы ---
 
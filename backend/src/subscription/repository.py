@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from sqlalchemy import select, func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
@@ -248,3 +249,71 @@ class UsageQuotaRepository:
         await self.session.flush()
         await self.session.refresh(quota)
         return quota
+
+    def _upsert(self, user_id: int, period_start: datetime, period_end: datetime, **values):
+        """INSERT строки квоты за период; ON CONFLICT задаёт вызывающий метод"""
+        dialect = self.session.get_bind().dialect.name
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        return insert(UsageQuotaModel).values(
+            user_id=user_id, period_start=period_start, period_end=period_end, **values
+        )
+
+    async def _returning(self, stmt) -> Optional[UsageQuotaModel]:
+        result = await self.session.execute(
+            stmt.returning(UsageQuotaModel),
+            execution_options={"populate_existing": True},
+        )
+        return result.scalar_one_or_none()
+
+    @handle_database_errors
+    async def get_or_create(
+        self, user_id: int, period_start: datetime, period_end: datetime
+    ) -> UsageQuotaModel:
+        """Квота за период одним запросом, без гонки на uq_user_period"""
+        stmt = self._upsert(user_id, period_start, period_end)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UsageQuotaModel.user_id, UsageQuotaModel.period_start],
+            set_={"period_end": UsageQuotaModel.period_end},
+        )
+        return await self._returning(stmt)
+
+    @handle_database_errors
+    async def increment(
+        self, user_id: int, period_start: datetime, period_end: datetime, **amounts: int
+    ) -> UsageQuotaModel:
+        """
+        Атомарно увеличить счётчики за период:
+        INSERT ... ON CONFLICT (user_id, period_start) DO UPDATE SET x = x + :n RETURNING *
+        """
+        stmt = self._upsert(user_id, period_start, period_end, **amounts)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UsageQuotaModel.user_id, UsageQuotaModel.period_start],
+            set_={name: getattr(UsageQuotaModel, name) + amount for name, amount in amounts.items()},
+        )
+        return await self._returning(stmt)
+
+    @handle_database_errors
+    async def consume(
+        self,
+        user_id: int,
+        period_start: datetime,
+        period_end: datetime,
+        field: str,
+        amount: int,
+        limit: int,
+    ) -> Optional[UsageQuotaModel]:
+        """
+        Списать amount со счётчика, только если итог не превысит limit (в том же запросе).
+
+        None — лимит исчерпан, счётчик не изменился.
+        """
+        if amount > limit:
+            return None
+        column = getattr(UsageQuotaModel, field)
+        stmt = self._upsert(user_id, period_start, period_end, **{field: amount})
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UsageQuotaModel.user_id, UsageQuotaModel.period_start],
+            set_={field: column + amount},
+            where=column + amount <= limit,
+        )
+        return await self._returning(stmt)
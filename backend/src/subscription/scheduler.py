@@ -11,6 +11,7 @@ from src.subscription.repository import (
 from src.subscription.payment_service import PaymentService
 from src.subscription.service import SubscriptionService
 from src.subscription.enums import SubscriptionStatus, PlanType, BillingPeriod
+from src.subscription.entitlements import entitlements_cache
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -52,6 +53,7 @@ async def check_expiring_subscriptions(session: AsyncSession) -> None:
             )
             # Помечаем подписку как past_due
             await sub_repo.update(sub, status=SubscriptionStatus.PAST_DUE)
+            entitlements_cache.invalidate_on_commit(session, sub.user_id)
 
 
 async def expire_past_due_subscriptions(session: AsyncSession) -> None:
@@ -77,6 +79,7 @@ async def expire_past_due_subscriptions(session: AsyncSession) -> None:
 
     for sub in expired:
         await sub_repo.update(sub, status=SubscriptionStatus.EXPIRED)
+        entitlements_cache.invalidate_on_commit(session, sub.user_id)
         logger.info(f"Подписка истекла: user={sub.user_id}, sub={sub.id}")
 
     if expired:
@@ -5,6 +5,7 @@ from sqlalchemy import select
 
 from src.subscription.models import SubscriptionPlanModel
 from src.subscription.enums import PlanType
+from src.subscription.entitlements import entitlements_cache, plan_cache
 from src.core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -90,4 +91,6 @@ async def seed_plans(session: AsyncSession) -> None:
             logger.info(f"План создан: {plan_data['name'].value}")
 
     await session.flush()
+    plan_cache.clear()
+    entitlements_cache.clear()
     logger.info("Seed тарифных планов завершён")
@@ -12,6 +12,7 @@ from src.subscription.repository import (
 from src.subscription.enums import (
     PlanType, SubscriptionStatus, PaymentStatus, BillingPeriod
 )
+from src.subscription.entitlements import entitlements_cache, plan_cache
 from src.subscription.exceptions import (
     PlanNotFoundError, SubscriptionNotFoundError, AlreadySubscribedError
 )
@@ -36,7 +37,7 @@ class SubscriptionService:
 
     async def get_plans(self) -> list[PlanOutputSchema]:
         """Получить все активные тарифы"""
-        plans = await self.plan_repo.get_all_active()
+        plans = await plan_cache.get_all_active(self.plan_repo)
         return [PlanOutputSchema.from_model(p) for p in plans]
 
     async def get_user_subscription(self, user_id: int) -> SubscriptionOutputSchema | None:
@@ -85,6 +86,7 @@ class SubscriptionService:
                 auto_renew=True,
                 yookassa_payment_method_id=yookassa_payment_method_id or current.yookassa_payment_method_id,
             )
+            entitlements_cache.invalidate_on_commit(self.subscription_repo.session, user_id)
 
             logger.info(
                 f"Подписка продлена: user={user_id}, plan={plan_name.value}, "
@@ -115,6 +117,7 @@ class SubscriptionService:
             yookassa_payment_method_id=yookassa_payment_method_id,
             auto_renew=True,
         )
+        entitlements_cache.invalidate_on_commit(self.subscription_repo.session, user_id)
 
         logger.info(
             f"Подписка активирована: user={user_id}, plan={plan_name.value}, "
@@ -134,6 +137,7 @@ class SubscriptionService:
             cancelled_at=datetime.now(timezone.utc),
             auto_renew=False,
         )
+        entitlements_cache.invalidate_on_commit(self.subscription_repo.session, user_id)
 
         logger.info(f"Подписка отменена: user={user_id}, действует до {sub.expires_at}")
         return self._sub_to_schema(sub)
@@ -0,0 +1,64 @@
+"""
+Кэш текущего пользователя для auth-зависимости get_current_user.
+
+Почти каждый авторизованный запрос загружает пользователя только ради проверки
+is_active/is_superuser. Внутри запроса пользователь запоминается в request.state,
+между запросами — в коротком TTL-кэше процесса по user_id.
+
+В кэше хранится копия строки без хеша пароля, а на каждый запрос выдаётся новый
+объект UserModel, не привязанный к сессии: изменения в одном запросе не видны другим.
+UserService сбрасывает запись при изменении пользователя (активация, деактивация,
+права суперпользователя, удаление, профиль). Кэш локален для процесса, поэтому в
+остальных воркерах изменение вступает в силу не позже чем через ttl_seconds.
+"""
+from typing import Any, Dict
+
+from src.config import settings
+from src.core.cache import VersionedTTLCache
+from src.users.models import UserModel
+
+# Поля, которые не держим в памяти процесса дольше запроса
+_EXCLUDED_FIELDS = frozenset({"password"})
+
+
+def _snapshot(user: UserModel) -> Dict[str, Any]:
+    return {
+        column.key: getattr(user, column.key)
+        for column in UserModel.__table__.columns
+        if column.key not in _EXCLUDED_FIELDS
+    }
+
+
+class PrincipalCache(VersionedTTLCache[int, UserModel]):
+    """
+    Кэш пользователей по user_id с TTL и ограничением числа записей.
+
+    Хранит снимок колонок без пароля; get() каждый раз возвращает новый объект.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        super().__init__(ttl_seconds=ttl_seconds, max_size=max_entries)
+        self.request_hits = 0
+
+    @property
+    def max_entries(self) -> int:
+        return self.max_size
+
+    def _key(self, user: UserModel) -> int:
+        return user.id
+
+    def _pack(self, user: UserModel) -> Dict[str, Any]:
+        return _snapshot(user)
+
+    def _unpack(self, values: Dict[str, Any]) -> UserModel:
+        return UserModel(**values)
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики кэша: hits/misses между запросами, request_hits — повторы внутри запроса"""
+        return {**super().stats(), 'request_hits': self.request_hits}
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+    max_entries=settings.principal_cache_max_entries,
+)
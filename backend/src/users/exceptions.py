@@ -45,3 +45,13 @@ class UserInactiveError(UserException):
         )
 
 
+
+
+class PasswordHashingBusyError(UserException):
+    """Очередь хеширования паролей переполнена (всплеск входов/регистраций)"""
+    def __init__(self):
+        super().__init__(
+            message="Сервер перегружен, повторите попытку через несколько секунд",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            details={"error_type": "password_hashing_busy"}
+        )
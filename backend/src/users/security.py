@@ -1,37 +1,149 @@
+"""
+Хеширование паролей (PBKDF2-SHA256).
+
+PBKDF2 с сотнями тысяч итераций занимает 100–300 мс CPU. hashlib отпускает GIL на время
+вычисления, поэтому хеш считается в отдельном пуле потоков и event loop в это время
+обслуживает остальные запросы (в том числе стриминг ответов AI). Одновременно считается
+не больше workers хешей, в очереди ждут не больше max_queue — при переполнении
+PasswordHashingBusyError (503), чтобы всплеск логинов не копил неограниченную очередь.
+
+Число итераций хранится в самом хеше, поэтому его можно менять (password_hash_iterations):
+needs_rehash() сообщает, что хеш создан с другими параметрами, и при успешном входе
+пароль перехешируется с текущими.
+"""
+import asyncio
 import base64
 import hashlib
 import hmac
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 
+from src.config import settings
+from src.users.exceptions import PasswordHashingBusyError
 
-async def _pbkdf2_hash(password: str, salt: bytes, iterations: int = 310000) -> bytes:
-    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
 
+class PasswordHasher:
+    """PBKDF2 в ограниченном пуле потоков с метриками очереди"""
 
-async def hash_password(password: str, *, iterations: int = 310000) -> str:
-    if not isinstance(password, str) or password == "":
-        raise ValueError("Password must be non-empty string")
-    salt = os.urandom(16)
-    dk = await _pbkdf2_hash(password, salt, iterations)
-    return "pbkdf2$sha256$%d$%s$%s" % (
-        iterations,
-        base64.b64encode(salt).decode("ascii"),
-        base64.b64encode(dk).decode("ascii"),
-    )
+    def __init__(self, workers: int, max_queue: int, iterations: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.iterations = iterations
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._max_pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
 
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
 
-async def verify_password(password: str, hashed_password: str) -> bool:
-    try:
-        algo, alg_hash, iters_str, salt_b64, hash_b64 = hashed_password.split("$")
-        if algo != "pbkdf2" or alg_hash != "sha256":
+    def _pbkdf2(self, password: str, salt: bytes, iterations: int, submitted_at: float) -> bytes:
+        started = time.perf_counter()
+        try:
+            return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._wait_seconds += started - submitted_at
+                self._run_seconds += finished - started
+
+    async def _derive(self, password: str, salt: bytes, iterations: int) -> bytes:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PasswordHashingBusyError()
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), self._pbkdf2, password, salt, iterations, time.perf_counter()
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    async def hash(self, password: str, iterations: Optional[int] = None) -> str:
+        if not isinstance(password, str) or password == "":
+            raise ValueError("Password must be non-empty string")
+        iterations = iterations or self.iterations
+        salt = os.urandom(16)
+        dk = await self._derive(password, salt, iterations)
+        return "pbkdf2$sha256$%d$%s$%s" % (
+            iterations,
+            base64.b64encode(salt).decode("ascii"),
+            base64.b64encode(dk).decode("ascii"),
+        )
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        try:
+            algo, alg_hash, iters_str, salt_b64, hash_b64 = hashed_password.split("$")
+            if algo != "pbkdf2" or alg_hash != "sha256":
+                return False
+            iterations = int(iters_str)
+            salt = base64.b64decode(salt_b64)
+            expected = base64.b64decode(hash_b64)
+        except Exception:
+            return False
+        if not isinstance(password, str):
             return False
-        iterations = int(iters_str)
-        salt = base64.b64decode(salt_b64)
-        expected = base64.b64decode(hash_b64)
-        dk = await _pbkdf2_hash(password, salt, iterations)
+        dk = await self._derive(password, salt, iterations)
         return hmac.compare_digest(dk, expected)
-    except Exception:
-        return False
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Хеш создан с другими параметрами, чем текущие (проверять после успешного verify)"""
+        try:
+            algo, alg_hash, iters_str, _, _ = hashed_password.split("$")
+            return algo != "pbkdf2" or alg_hash != "sha256" or int(iters_str) != self.iterations
+        except Exception:
+            return False
+
+    def stats(self) -> Dict[str, float]:
+        """Метрики пула: в работе и в очереди (pending), пик очереди, отказы, среднее ожидание и время хеша"""
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "pending": self._pending,
+                "max_pending": self._max_pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_seconds / completed * 1000, 2),
+                "avg_hash_ms": round(self._run_seconds / completed * 1000, 2),
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+    iterations=settings.password_hash_iterations,
+)
+
+
+async def hash_password(password: str, *, iterations: Optional[int] = None) -> str:
+    return await password_hasher.hash(password, iterations)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    return password_hasher.needs_rehash(hashed_password)
 
 
 # Совместимые async-обёртки для текущих вызовов в коде
@@ -40,4 +152,4 @@ async def get_hash_password(password: str) -> str:
 
 
 async def verify_hash_password(password: str, hashed_password: str) -> bool:
-    return await verify_password(password, hashed_password)
\ No newline at end of file
+    return await verify_password(password, hashed_password)
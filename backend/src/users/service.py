@@ -1,16 +1,20 @@
+import logging
 from typing import Optional, List
-from src.users.security import hash_password
+from src.users.security import hash_password, needs_rehash
 from src.users.repository import UserRepository
 from src.users.models import UserModel
+from src.users.cache import principal_cache
 
 from src.users.schemas import (
     UserCreateSchema,
     UserUpdateSchema,
 
 )
-from src.users.exceptions import UserNotFoundError
+from src.users.exceptions import UserNotFoundError, PasswordHashingBusyError
 from src.core.logger import log_service_operation
 
+logger = logging.getLogger(__name__)
+
 
 class UserService:
     """Сервис для работы с пользователями"""
@@ -30,6 +34,24 @@ class UserService:
         )
         return user
 
+    async def rehash_password_if_needed(self, user: UserModel, password: str) -> bool:
+        """
+        Перехешировать пароль с текущими параметрами, если хеш создан со старыми.
+
+        Вызывается после успешной проверки пароля при входе — другого момента,
+        когда известен открытый пароль, нет. Если пул хеширования занят, обновление
+        откладывается до следующего входа: вход не должен падать из-за него с 503.
+        """
+        if not needs_rehash(user.password):
+            return False
+        try:
+            new_hash = await hash_password(password)
+        except PasswordHashingBusyError:
+            logger.warning(f"Перехеширование пароля пользователя {user.id} отложено: пул хеширования занят")
+            return False
+        await self.repository.update(user.id, password=new_hash)
+        return True
+
     @log_service_operation
     async def get_user_by_id(self, user_id: int) -> UserModel:
         user = await self.repository.get_by_id(user_id)
@@ -55,26 +77,31 @@ class UserService:
     async def update_user(self, user_id: int, user_data: UserUpdateSchema) -> UserModel:
         update_data = user_data.model_dump(exclude_unset=True)
         user = await self.repository.update(user_id, **update_data)
+        principal_cache.invalidate_on_commit(self.repository.session, user_id)
         return user
 
     @log_service_operation
     async def update_superuser(self, user_id: int, is_superuser: bool) -> UserModel:
         user = await self.repository.update_superuser(user_id, is_superuser)
+        principal_cache.invalidate_on_commit(self.repository.session, user_id)
         return user
     
     @log_service_operation
     async def deactivate_user(self, user_id: int) -> bool:
         result = await self.repository.deactivate(user_id)
+        principal_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
     async def activate_user(self, user_id: int) -> bool:
         result = await self.repository.activate(user_id)
+        principal_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
     async def delete_user(self, user_id: int) -> bool:
         result = await self.repository.delete(user_id)
+        principal_cache.invalidate_on_commit(self.repository.session, user_id)
         return result
 
     @log_service_operation
@@ -21,9 +21,12 @@ os.environ.setdefault("OPENROUTER_API_KEY", "test-openrouter-key")
 os.environ.setdefault("TELEGRAM_BOT_TOKEN", "1234567890:ABCdefGHIjklMNOpqrSTUvwxYZ")
 os.environ.setdefault("TELEGRAM_BOT_USERNAME", "test_bot")
 os.environ.setdefault("ALLOW_ORIGINS", "*")
+os.environ.setdefault("THUMBNAIL_WORKERS", "0")
+os.environ.setdefault("TOKEN_REVOCATION_BACKEND", "memory")
 
 import pytest
 import asyncio
+import hashlib
 import uuid
 from typing import AsyncGenerator, Generator
 
@@ -34,15 +37,17 @@ from sqlalchemy.ext.asyncio import (
     AsyncEngine,
 )
 from sqlalchemy.pool import StaticPool
+import httpx
 from httpx import AsyncClient, ASGITransport
 
 from src.database.base import Base
 
 # Импорт всех моделей для metadata
 from src.users.models import UserModel  # noqa: F401
-from src.family.models import FamilyRelationModel, FamilyRelationshipModel  # noqa: F401
+from src.family.models import FamilyRelationModel, FamilyRelationshipModel, StoryModel, InterviewMessageModel  # noqa: F401
 from src.admin.models import AdminAuditLogModel, AIUsageLogModel, BookGenerationModel  # noqa: F401
-from src.ai.models import AIChatSessionModel  # noqa: F401
+from src.ai.models import AIChatSessionModel, LLMResponseCacheModel  # noqa: F401
+from src.auth.models import RevokedTokenModel  # noqa: F401
 from src.subscription.models import (  # noqa: F401
     SubscriptionPlanModel,
     UserSubscriptionModel,
@@ -110,28 +115,164 @@ class MockS3Manager:
     """Мок S3 менеджера — хранит файлы в памяти."""
 
     def __init__(self):
+        # Публичные URL строятся как у S3Manager — от ENDPOINT_URL и BUCKET_NAME
+        self.base_url = f"{os.environ['ENDPOINT_URL']}/{os.environ['BUCKET_NAME']}"
         self.files: dict[str, bytes] = {}
+        self.content_types: dict[str, str] = {}
         self._counter = 0
 
     async def upload(self, file):
         self._counter += 1
         key = f"uploads/{self._counter}/{file.filename}"
-        url = f"https://mock.s3/test-bucket/{key}"
+        url = f"{self.base_url}/{key}"
         content = await file.read()
         self.files[url] = content
         ct = file.content_type or "image/jpeg"
         return key, url, ct
 
-    async def upload_bytes(self, data: bytes, filename: str, content_type: str):
+    async def upload_stream(self, file, max_size=None):
+        from src.storage.s3.exceptions import FileTooLargeError
+        from src.storage.s3.manager import UploadResult
+
+        content = await file.read()
+        if max_size is not None and len(content) > max_size:
+            raise FileTooLargeError(max_size, len(content))
+        key, url, ct = await self.upload_bytes(content, file.filename, file.content_type or "image/jpeg")
+        return UploadResult(key=key, url=url, content_type=ct, size=len(content), sha256=hashlib.sha256(content).hexdigest())
+
+    async def upload_bytes(self, data: bytes, filename: str, content_type: str, key=None):
         self._counter += 1
-        key = f"uploads/{self._counter}/{filename}"
-        url = f"https://mock.s3/test-bucket/{key}"
+        key = key or f"uploads/{self._counter}/{filename}"
+        url = f"{self.base_url}/{key}"
         self.files[url] = data
         return key, url, content_type
 
     async def delete(self, url: str):
         self.files.pop(url, None)
 
+    async def delete_many(self, urls):
+        for url in urls:
+            self.files.pop(url, None)
+        return []
+
+    async def get_size(self, key: str) -> int:
+        return len(self.files[f"{self.base_url}/{key}"])
+
+    async def presign_upload(self, filename, content_type, max_size, prefix, expires_in=900):
+        from src.storage.s3.manager import PresignedUpload
+
+        self._counter += 1
+        key = f"{prefix.strip('/')}/{self._counter}-{filename}"
+        return PresignedUpload(
+            key=key,
+            url=self.base_url,
+            fields={"key": key, "Content-Type": content_type, "policy": "p", "x-amz-signature": "s"},
+            object_url=f"{self.base_url}/{key}",
+            expires_in=expires_in,
+        )
+
+    def put_direct(self, key: str, data: bytes, content_type: str):
+        """Имитация загрузки клиентом по подписанной форме"""
+        url = f"{self.base_url}/{key}"
+        self.files[url] = data
+        self.content_types[url] = content_type
+
+    async def list_objects(self, prefix: str):
+        from datetime import datetime, timezone
+        from src.storage.s3.manager import StoredObject
+
+        start = f"{self.base_url}/"
+        return [
+            StoredObject(key=url[len(start):], url=url, size=len(data), last_modified=datetime.now(timezone.utc))
+            for url, data in self.files.items()
+            if url[len(start):].startswith(prefix)
+        ]
+
+    async def head(self, key: str):
+        from src.storage.s3.manager import ObjectInfo
+
+        url = f"{self.base_url}/{key}"
+        if url not in self.files:
+            return None
+        return ObjectInfo(
+            key=key, url=url, size=len(self.files[url]),
+            content_type=self.content_types.get(url, "application/octet-stream"),
+        )
+
+    async def stream(self, key: str, start=None, end=None, chunk_size: int = 64 * 1024):
+        data = self.files[f"{self.base_url}/{key}"]
+        data = data[start or 0:None if end is None else end + 1]
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Тело ответа порциями: ответ с content=bytes httpx читает сразу, а S3 отдаёт поток."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aiter__(self):
+        for i in range(0, len(self.data), 4):
+            yield self.data[i:i + 4]
+
+
+class MockS3Upstream:
+    """Публичный HTTP-доступ к объектам S3 для прокси: ETag, If-None-Match, Range."""
+
+    def __init__(self):
+        self.objects: dict[str, tuple[bytes, str]] = {}
+        self.requests: list = []
+
+    def put(self, path: str, data: bytes, content_type: str = "image/jpeg"):
+        self.objects[path] = (data, content_type)
+
+    def handler(self, request):
+
+        self.requests.append(request)
+        if request.url.path not in self.objects:
+            return httpx.Response(404, stream=ChunkedStream(b"<Error>NoSuchKey</Error>"), headers={"content-type": "application/xml"})
+        data, content_type = self.objects[request.url.path]
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        headers = {"content-type": content_type, "etag": etag, "accept-ranges": "bytes"}
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        range_header = request.headers.get("range")
+        if range_header:
+            start, end = range_header[len("bytes="):].split("-")
+            start, end = int(start), int(end) if end else len(data) - 1
+            headers["content-range"] = f"bytes {start}-{end}/{len(data)}"
+            part = data[start:end + 1]
+            headers["content-length"] = str(len(part))
+            return httpx.Response(206, stream=ChunkedStream(part), headers=headers)
+        headers["content-length"] = str(len(data))
+        return httpx.Response(200, stream=ChunkedStream(data), headers=headers)
+
+
+@pytest.fixture(autouse=True)
+def clear_family_graph_cache():
+    """Кэш графов общий на процесс, а ID пользователей повторяются между тестами."""
+    from src.family.graph import family_graph_cache
+    family_graph_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache():
+    """Кэш текущего пользователя тоже общий на процесс."""
+    from src.users.cache import principal_cache
+    principal_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def clear_subscription_caches():
+    """Тарифы и права пользователей кэшируются на процесс, а планы создаются в каждом тесте заново."""
+    from src.subscription.entitlements import entitlements_cache, plan_cache
+    entitlements_cache.clear()
+    plan_cache.clear()
+    yield
+
 
 @pytest.fixture(scope="function")
 def mock_s3() -> MockS3Manager:
@@ -139,20 +280,47 @@ def mock_s3() -> MockS3Manager:
 
 
 @pytest.fixture(scope="function")
-async def app(test_engine: AsyncEngine, test_session: AsyncSession, mock_s3: MockS3Manager):
+def mock_s3_upstream() -> MockS3Upstream:
+    return MockS3Upstream()
+
+
+@pytest.fixture(scope="function")
+async def storage_proxy(tmp_path, mock_s3_upstream: MockS3Upstream):
+    """Прокси с кэшем во временном каталоге и S3 без сети."""
+    from src.storage.s3.proxy import ProxyDiskCache, StorageProxy
+
+    proxy = StorageProxy(
+        ProxyDiskCache(str(tmp_path / "proxy"), max_bytes=1024, max_object_bytes=512, ttl_seconds=3600),
+        transport=httpx.MockTransport(mock_s3_upstream.handler),
+    )
+    yield proxy
+    await proxy.close()
+
+
+@pytest.fixture(scope="function")
+async def app(
+    test_engine: AsyncEngine,
+    test_session: AsyncSession,
+    mock_s3: MockS3Manager,
+    storage_proxy,
+):
     """FastAPI app с подменёнными зависимостями."""
     from src.main import app as fastapi_app
     from src.database.client import get_session
-    from src.storage.s3.dependencies import get_s3_manager
+    from src.storage.s3.dependencies import get_s3_manager, get_storage_proxy
 
     async def override_get_session():
         yield test_session
 
     fastapi_app.dependency_overrides[get_session] = override_get_session
     fastapi_app.dependency_overrides[get_s3_manager] = lambda: mock_s3
+    fastapi_app.dependency_overrides[get_storage_proxy] = lambda: storage_proxy
 
     yield fastapi_app
 
+    # Фоновые миниатюры пишут в mock_s3 этого теста
+    from src.storage.s3.thumbnails import thumbnail_pipeline
+    await thumbnail_pipeline.drain()
     fastapi_app.dependency_overrides.clear()
 
 
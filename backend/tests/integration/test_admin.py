@@ -124,3 +124,79 @@ class TestAdminSubscriptions:
             params={"plan_name": "pro"}
         )
         assert r.status_code == 200
+
+    async def test_set_user_plan_refreshes_cached_usage(
+        self, client, superuser_headers, auth_headers, test_user, seed_plans
+    ):
+        """Снимок прав пользователя сбрасывается при назначении плана"""
+        r = await client.get("/api/v1/subscription/usage", headers=auth_headers)
+        assert r.json()["plan"]["name"] == "free"
+        r = await client.post(
+            f"/api/v1/admin/users/{test_user.id}/set-plan",
+            headers=superuser_headers,
+            params={"plan_name": "pro"}
+        )
+        assert r.status_code == 200
+        r = await client.get("/api/v1/subscription/usage", headers=auth_headers)
+        assert r.json()["plan"]["name"] == "pro"
+
+
+@pytest.mark.integration
+class TestAdminKeysetPagination:
+    async def _walk(self, client, headers, url, key):
+        """Пройти все страницы по next_cursor, вернуть id в порядке выдачи."""
+        seen, cursor = [], None
+        for _ in range(10):
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            r = await client.get(url, headers=headers, params=params)
+            assert r.status_code == 200
+            data = r.json()
+            seen.extend(item["id"] for item in data[key])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        return seen
+
+    async def test_ai_usage_cursor_walk(self, client, superuser_headers, test_session):
+        from datetime import datetime, timezone
+        from src.admin.models import AIUsageLogModel
+
+        same_time = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for _ in range(5):
+            test_session.add(AIUsageLogModel(
+                model="test", endpoint_type="ai_assistant", created_at=same_time
+            ))
+        await test_session.flush()
+
+        ids = await self._walk(client, superuser_headers, "/api/v1/admin/ai/usage", "items")
+        assert len(ids) == 5
+        assert ids == sorted(ids, reverse=True)
+
+    async def test_stories_cursor_header(self, client, superuser_headers, test_session, test_user, test_relative):
+        from src.family.story_repository import StoryRepository
+
+        repository = StoryRepository(test_session)
+        for i in range(3):
+            await repository.create(test_user.id, test_relative.id, f"История {i}", "Текст")
+
+        r = await client.get("/api/v1/admin/stories", headers=superuser_headers, params={"limit": 2})
+        assert len(r.json()) == 2
+        cursor = r.headers["X-Next-Cursor"]
+
+        r = await client.get(
+            "/api/v1/admin/stories", headers=superuser_headers, params={"limit": 2, "cursor": cursor}
+        )
+        assert len(r.json()) == 1
+        assert "X-Next-Cursor" not in r.headers
+
+    async def test_cursor_from_other_list_rejected(self, client, superuser_headers, test_session):
+        from src.core.pagination import encode_cursor
+
+        cursor = encode_cursor(1, 2, scope="stories")
+        r = await client.get("/api/v1/admin/audit-logs", headers=superuser_headers, params={"cursor": cursor})
+        assert r.status_code == 400
+
+        r = await client.get("/api/v1/admin/users", headers=superuser_headers, params={"cursor": "not-a-cursor"})
+        assert r.status_code == 400
@@ -28,6 +28,37 @@ class TestLogin:
         assert "access_token" in data
         assert "refresh_token" in data
 
+    async def test_login_rehashes_outdated_hash(self, client, test_user, test_session):
+        from src.users.security import hash_password, needs_rehash, verify_password
+
+        test_user.password = await hash_password("TestPassword1!", iterations=1000)
+        await test_session.flush()
+
+        r = await client.post("/api/v1/auth/login", json={
+            "username": "testuser", "email": None, "password": "TestPassword1!"
+        })
+        assert r.status_code == 200
+        await test_session.refresh(test_user)
+        assert not needs_rehash(test_user.password)
+        assert await verify_password("TestPassword1!", test_user.password)
+
+    async def test_login_succeeds_when_rehash_busy(self, client, test_user, test_session):
+        from unittest.mock import patch
+        from src.users.exceptions import PasswordHashingBusyError
+        from src.users.security import hash_password
+
+        old_hash = await hash_password("TestPassword1!", iterations=1000)
+        test_user.password = old_hash
+        await test_session.flush()
+
+        with patch("src.users.service.hash_password", side_effect=PasswordHashingBusyError()):
+            r = await client.post("/api/v1/auth/login", json={
+                "username": "testuser", "email": None, "password": "TestPassword1!"
+            })
+        assert r.status_code == 200
+        await test_session.refresh(test_user)
+        assert test_user.password == old_hash
+
     async def test_login_wrong_password(self, client, test_user):
         r = await client.post("/api/v1/auth/login", json={
             "username": "testuser", "email": None, "password": "WrongPass1!"
@@ -122,3 +153,9 @@ class TestLogout:
     async def test_logout_no_auth(self, client):
         r = await client.delete("/api/v1/auth/logout")
         assert r.status_code == 401
+
+    async def test_logout_revokes_token(self, client, auth_headers):
+        r = await client.delete("/api/v1/auth/logout", headers=auth_headers)
+        assert r.status_code == 200
+        r = await client.delete("/api/v1/auth/logout", headers=auth_headers)
+        assert r.status_code == 401
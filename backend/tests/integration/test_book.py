@@ -18,3 +18,142 @@ class TestBookGeneration:
         })
         # Может вернуть 403 (quota) или 200 (stream) или 422 (bad schema)
         assert r.status_code in (200, 403, 422, 500)
+
+
+@pytest.fixture
+async def premium_user(test_session, test_user, seed_plans):
+    from datetime import datetime, timedelta, timezone
+    from src.subscription.enums import PlanType, SubscriptionStatus
+    from src.subscription.models import UserSubscriptionModel
+
+    plan = next(p for p in seed_plans if p.name == PlanType.PREMIUM)
+    test_session.add(UserSubscriptionModel(
+        id=None,
+        user_id=test_user.id,
+        plan_id=plan.id,
+        status=SubscriptionStatus.ACTIVE,
+        expires_at=datetime.now(timezone.utc) + timedelta(days=30),
+    ))
+    await test_session.flush()
+    return test_user
+
+
+@pytest.mark.integration
+class TestBookJobs:
+    async def test_submit_creates_queued_job(self, client, auth_headers, premium_user, test_session):
+        from src.admin.models import BookGenerationModel
+        from src.book.jobs import book_job_manager
+
+        r = await client.post("/api/v1/book/jobs", headers=auth_headers, json={"include_photos": False})
+        assert r.status_code == 202
+        data = r.json()
+        assert data["status"] == "queued"
+        assert data["progress"] == 0
+        assert data["s3_url"] is None
+
+        job = await test_session.get(BookGenerationModel, data["id"])
+        assert job.user_id == premium_user.id
+        assert job.request_params["include_photos"] is False
+        # Транзакция теста не коммитится — задача не должна попасть в очередь
+        assert data["id"] not in book_job_manager._live
+
+    async def test_per_user_limit(self, client, auth_headers, premium_user):
+        r = await client.post("/api/v1/book/jobs", headers=auth_headers, json={})
+        assert r.status_code == 202
+        r = await client.post("/api/v1/book/jobs", headers=auth_headers, json={})
+        assert r.status_code == 429
+
+    async def test_blocked_on_free_plan(self, client, auth_headers, seed_plans):
+        r = await client.post("/api/v1/book/jobs", headers=auth_headers, json={})
+        assert r.status_code == 403
+
+    async def test_poll_own_job_only(self, client, auth_headers, superuser_headers, premium_user):
+        job_id = (await client.post("/api/v1/book/jobs", headers=auth_headers, json={})).json()["id"]
+
+        r = await client.get(f"/api/v1/book/jobs/{job_id}", headers=auth_headers)
+        assert r.status_code == 200
+        assert r.json()["id"] == job_id
+
+        r = await client.get(f"/api/v1/book/jobs/{job_id}", headers=superuser_headers)
+        assert r.status_code == 404
+
+    async def test_refresh_requires_artifacts(self, client, auth_headers, premium_user, completed_book, test_session):
+        r = await client.post("/api/v1/book/jobs", headers=auth_headers, json={"refresh_book_id": completed_book.id})
+        assert r.status_code == 409
+
+        completed_book.artifacts = {"version": 1, "outline": {"title": "Книга", "chapters": []}}
+        await test_session.flush()
+        r = await client.post("/api/v1/book/jobs", headers=auth_headers, json={"refresh_book_id": completed_book.id})
+        assert r.status_code == 202
+
+    async def test_refresh_unfinished_book(self, client, auth_headers, premium_user, completed_book, test_session):
+        completed_book.status = "failed"
+        await test_session.flush()
+        r = await client.post("/api/v1/book/jobs", headers=auth_headers, json={"refresh_book_id": completed_book.id})
+        assert r.status_code == 404
+
+
+@pytest.fixture
+async def completed_book(test_session, test_user, mock_s3):
+    from src.admin.models import BookGenerationModel
+
+    key, url, _ = await mock_s3.upload_bytes(b"%PDF-0123456789", "book.pdf", "application/pdf")
+    book = BookGenerationModel(
+        user_id=test_user.id, status="completed", filename="book.pdf", s3_key=key, s3_url=url,
+    )
+    test_session.add(book)
+    await test_session.flush()
+    return book
+
+
+@pytest.mark.integration
+class TestBookDownload:
+    async def test_full_download(self, client, auth_headers, completed_book):
+        r = await client.get(f"/api/v1/book/{completed_book.id}/download", headers=auth_headers)
+        assert r.status_code == 200
+        assert r.content == b"%PDF-0123456789"
+        assert r.headers["accept-ranges"] == "bytes"
+        assert r.headers["content-type"] == "application/pdf"
+
+    async def test_range_download(self, client, auth_headers, completed_book):
+        headers = {**auth_headers, "Range": "bytes=5-8"}
+        r = await client.get(f"/api/v1/book/{completed_book.id}/download", headers=headers)
+        assert r.status_code == 206
+        assert r.content == b"0123"
+        assert r.headers["content-range"] == "bytes 5-8/15"
+
+        headers["Range"] = "bytes=-4"
+        r = await client.get(f"/api/v1/book/{completed_book.id}/download", headers=headers)
+        assert r.content == b"6789"
+
+        # Некорректный диапазон игнорируется, как и в прокси S3
+        headers["Range"] = "bytes=8-5"
+        r = await client.get(f"/api/v1/book/{completed_book.id}/download", headers=headers)
+        assert r.status_code == 200
+        assert len(r.content) == 15
+
+    async def test_unsatisfiable_range(self, client, auth_headers, completed_book):
+        headers = {**auth_headers, "Range": "bytes=100-"}
+        r = await client.get(f"/api/v1/book/{completed_book.id}/download", headers=headers)
+        assert r.status_code == 416
+        assert r.headers["content-range"] == "bytes */15"
+
+    async def test_other_user_gets_404(self, client, superuser_headers, completed_book):
+        r = await client.get(f"/api/v1/book/{completed_book.id}/download", headers=superuser_headers)
+        assert r.status_code == 404
+
+    async def test_download_from_spool(self, client, auth_headers, completed_book, test_session, tmp_path):
+        from unittest.mock import patch
+        from src.book.downloads import BookSpool
+
+        completed_book.s3_key = None
+        await test_session.flush()
+        spool = BookSpool(str(tmp_path), ttl_seconds=3600)
+        await spool.write(completed_book.id, b"%PDF-spooled")
+
+        with patch("src.book.router.book_spool", spool):
+            r = await client.get(
+                f"/api/v1/book/{completed_book.id}/download", headers={**auth_headers, "Range": "bytes=5-"}
+            )
+        assert r.status_code == 206
+        assert r.content == b"spooled"
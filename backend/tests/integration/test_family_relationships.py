@@ -1,6 +1,7 @@
 """Integration тесты для family relationships endpoints."""
 import pytest
-from tests.helpers import create_test_relationship
+from src.family.enums import RelationshipType
+from tests.helpers import create_test_relationship, create_test_relative
 
 
 @pytest.mark.integration
@@ -46,6 +47,30 @@ class TestGetRelationships:
         assert r.status_code == 200
 
 
+    async def test_cursor_pages(self, client, auth_headers, test_user, test_session):
+        relatives = [await create_test_relative(test_session, test_user.id, first_name=f"R{i}") for i in range(4)]
+        for child in relatives[1:]:
+            await create_test_relationship(test_session, test_user.id, relatives[0].id, child.id)
+
+        url = f"/api/v1/family/{test_user.id}/relationships"
+        first = await client.get(url, headers=auth_headers, params={"with_details": True, "limit": 2})
+        assert len(first.json()) == 2
+        cursor = first.headers["X-Next-Cursor"]
+
+        second = await client.get(url, headers=auth_headers, params={"with_details": True, "limit": 2, "cursor": cursor})
+        ids = [r["id"] for r in first.json() + second.json()]
+        assert len(ids) == 3 == len(set(ids))
+
+    async def test_details_without_limit_returns_whole_tree(self, client, auth_headers, test_user, test_session):
+        relatives = [await create_test_relative(test_session, test_user.id, first_name=f"R{i}") for i in range(4)]
+        for child in relatives[1:]:
+            await create_test_relationship(test_session, test_user.id, relatives[0].id, child.id)
+
+        url = f"/api/v1/family/{test_user.id}/relationships"
+        r = await client.get(url, headers=auth_headers, params={"with_details": True})
+        assert len(r.json()) == 3
+        assert "X-Next-Cursor" not in r.headers
+
 @pytest.mark.integration
 class TestTraversal:
     async def test_get_children(self, client, auth_headers, test_user, test_relative, second_relative, test_session):
@@ -79,6 +104,82 @@ class TestTraversal:
         assert r.status_code == 200
 
 
+@pytest.mark.integration
+class TestKinship:
+    @pytest.fixture
+    async def family(self, test_session, test_user):
+        """Дед -> отец -> ребенок, брат ребенка, жена ребенка и ее мать."""
+        names = ["Дед", "Отец", "Ребенок", "Брат", "Жена", "Теща"]
+        people = {}
+        for name in names:
+            people[name] = await create_test_relative(test_session, test_user.id, first_name=name)
+        edges = [
+            ("Дед", "Отец", RelationshipType.FATHER),
+            ("Отец", "Ребенок", RelationshipType.FATHER),
+            ("Отец", "Брат", RelationshipType.FATHER),
+            ("Ребенок", "Жена", RelationshipType.HUSBAND),
+            ("Теща", "Жена", RelationshipType.MOTHER),
+        ]
+        for src, dst, rel_type in edges:
+            await create_test_relationship(test_session, test_user.id, people[src].id, people[dst].id, rel_type)
+        return {name: rel.id for name, rel in people.items()}
+
+    async def test_all_kinds(self, client, auth_headers, test_user, family):
+        r = await client.get(
+            f"/api/v1/family/{test_user.id}/relationships/kinship/{family['Ребенок']}",
+            headers=auth_headers
+        )
+        assert r.status_code == 200
+        found = {item["relative_id"]: item for item in r.json()}
+        assert found[family["Отец"]]["kinship"] == "ancestor"
+        assert found[family["Дед"]]["degree"] == 2
+        assert found[family["Дед"]]["path"] == [family["Ребенок"], family["Отец"], family["Дед"]]
+        assert found[family["Брат"]]["kinship"] == "sibling"
+        assert found[family["Жена"]]["kinship"] == "spouse"
+        assert found[family["Теща"]]["kinship"] == "in_law"
+        assert family["Ребенок"] not in found
+
+    async def test_filter_and_depth(self, client, auth_headers, test_user, family):
+        r = await client.get(
+            f"/api/v1/family/{test_user.id}/relationships/kinship/{family['Ребенок']}",
+            params={"kinship": "ancestor", "max_depth": 1},
+            headers=auth_headers
+        )
+        assert r.status_code == 200
+        assert [item["relative_id"] for item in r.json()] == [family["Отец"]]
+
+    async def test_descendants(self, client, auth_headers, test_user, family):
+        r = await client.get(
+            f"/api/v1/family/{test_user.id}/relationships/kinship/{family['Дед']}",
+            params={"kinship": "descendant"},
+            headers=auth_headers
+        )
+        assert {item["relative_id"] for item in r.json()} == {family["Отец"], family["Ребенок"], family["Брат"]}
+
+    async def test_sees_new_relationship(self, client, auth_headers, test_user, family, test_relative):
+        url = f"/api/v1/family/{test_user.id}/relationships/kinship/{family['Отец']}"
+        r = await client.get(url, params={"kinship": "descendant"}, headers=auth_headers)
+        assert test_relative.id not in {item["relative_id"] for item in r.json()}
+
+        r = await client.post(f"/api/v1/family/{test_user.id}/relationships", headers=auth_headers, json={
+            "from_relative_id": family["Ребенок"],
+            "to_relative_id": test_relative.id,
+            "relationship_type": "father"
+        })
+        assert r.status_code == 200
+
+        r = await client.get(url, params={"kinship": "descendant"}, headers=auth_headers)
+        assert test_relative.id in {item["relative_id"] for item in r.json()}
+
+    async def test_invalid_depth(self, client, auth_headers, test_user, test_relative):
+        r = await client.get(
+            f"/api/v1/family/{test_user.id}/relationships/kinship/{test_relative.id}",
+            params={"max_depth": 0},
+            headers=auth_headers
+        )
+        assert r.status_code == 422
+
+
 @pytest.mark.integration
 class TestFamilyTree:
     async def test_get_tree(self, client, auth_headers, test_user):
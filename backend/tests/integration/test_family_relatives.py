@@ -12,6 +12,17 @@ class TestCreateRelative:
         assert r.status_code == 200
         assert r.json()["first_name"] == "Пётр"
 
+    async def test_create_exposes_photo_thumbnails(self, client, auth_headers, test_user, seed_plans, mock_s3):
+        image_url = f"{mock_s3.base_url}/uploads/2026/01/02/abc.jpg"
+        r = await client.post(f"/api/v1/family/{test_user.id}/relatives", headers=auth_headers, json={
+            "first_name": "Фото", "image_url": image_url
+        })
+        assert r.status_code == 200
+        assert r.json()["thumbnails"]["64"] == f"{mock_s3.base_url}/thumbs/uploads/2026/01/02/abc/64.webp"
+
+        r = await client.get(f"/api/v1/family/{test_user.id}/relatives", headers=auth_headers)
+        assert r.json()[0]["thumbnails"]["1024"].endswith("/abc/1024.webp")
+
     async def test_create_minimal(self, client, auth_headers, test_user, seed_plans):
         r = await client.post(f"/api/v1/family/{test_user.id}/relatives", headers=auth_headers, json={
             "first_name": "Минимал"
@@ -81,6 +92,43 @@ class TestGetRelatives:
         assert r.status_code == 200
         assert len(r.json()) >= 1
 
+    async def test_list_defers_context(self, client, auth_headers, test_user, test_relative):
+        await client.put(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}",
+            headers=auth_headers,
+            json={"context": {"profile": {"occupation": "Инженер"}}}
+        )
+        r = await client.get(f"/api/v1/family/{test_user.id}/relatives", headers=auth_headers)
+        assert r.status_code == 200
+        item = r.json()[0]
+        assert item["context"] is None
+        assert item["first_name"] == "Иван"
+
+        r = await client.get(
+            f"/api/v1/family/{test_user.id}/relatives/search/Иван",
+            headers=auth_headers,
+            params={"include_context": True}
+        )
+        assert r.json()[0]["context"] == {"profile": {"occupation": "Инженер"}}
+
+    async def test_list_includes_stories_count(self, client, auth_headers, test_user, test_relative):
+        await client.patch(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/context",
+            headers=auth_headers,
+            json={"key": "Детство", "value": "Рос в деревне"}
+        )
+        r = await client.get(f"/api/v1/family/{test_user.id}/relatives", headers=auth_headers)
+        item = r.json()[0]
+        assert item["context"] is None
+        assert item["stories_count"] == 1
+
+        r = await client.get(
+            f"/api/v1/family/{test_user.id}/relatives",
+            headers=auth_headers,
+            params={"include_context": True}
+        )
+        assert r.json()[0]["stories_count"] == 1
+
 
 @pytest.mark.integration
 class TestUpdateRelative:
@@ -131,6 +179,22 @@ class TestContext:
             json={"key": "toremove", "value": None}
         )
         assert r.status_code == 200
+        assert "toremove" not in r.json()["context"]
+
+    async def test_context_story_keys_stored_as_stories(self, client, auth_headers, test_user, test_relative):
+        """Истории, записанные через context, видны в stories endpoints (и наоборот)"""
+        base = f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}"
+        await client.patch(f"{base}/context", headers=auth_headers, json={"key": "Детство", "value": "Текст"})
+        await client.put(base, headers=auth_headers, json={"context": {"Война": {"text": "Письма", "media": []}}})
+
+        stories = (await client.get(f"{base}/stories", headers=auth_headers)).json()
+        assert {s["title"]: s["text"] for s in stories} == {"Детство": "Текст", "Война": "Письма"}
+        r = await client.get(f"{base}/context", headers=auth_headers)
+        assert r.json()["context"]["Детство"]["text"] == "Текст"
+
+        await client.patch(f"{base}/context", headers=auth_headers, json={"key": "Детство", "value": None})
+        stories = (await client.get(f"{base}/stories", headers=auth_headers)).json()
+        assert [s["title"] for s in stories] == ["Война"]
 
 
 @pytest.mark.integration
@@ -1,4 +1,6 @@
 """Integration тесты для stories endpoints."""
+import json
+
 import pytest
 
 
@@ -35,6 +37,16 @@ class TestStories:
         assert r.status_code == 200
         assert len(r.json()) >= 1
 
+    async def test_user_stories_feed(self, client, auth_headers, test_user, test_relative):
+        await client.post(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories",
+            headers=auth_headers,
+            json={"title": "Лента", "text": "Текст"}
+        )
+        r = await client.get(f"/api/v1/family/{test_user.id}/stories", headers=auth_headers)
+        assert r.status_code == 200
+        assert [(s["relative_id"], s["title"]) for s in r.json()] == [(test_relative.id, "Лента")]
+
     async def test_get_story_not_found(self, client, auth_headers, test_user, test_relative):
         r = await client.get(
             f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories/nonexistent_key",
@@ -85,3 +97,199 @@ class TestStories:
             f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories"
         )
         assert r.status_code == 401
+
+
+@pytest.mark.integration
+class TestStoryStorage:
+    async def test_story_listed_after_create(self, client, auth_headers, test_user, test_relative):
+        await client.post(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories",
+            headers=auth_headers,
+            json={"title": "Сохранённая", "text": "Текст"}
+        )
+        r = await client.get(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories",
+            headers=auth_headers
+        )
+        assert [s["title"] for s in r.json()] == ["Сохранённая"]
+
+    async def test_interview_messages_trimmed(self, test_session, test_relative):
+        from src.family import story_repository
+        from src.family.story_repository import InterviewMessageRepository
+
+        repository = InterviewMessageRepository(test_session)
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(story_repository, "MAX_INTERVIEW_MESSAGES", 3)
+            for i in range(5):
+                await repository.add(test_relative.id, f"q{i}", f"a{i}")
+
+        messages = await repository.get_by_relative(test_relative.id)
+        assert [m.user_message for m in messages] == ["q2", "q3", "q4"]
+
+    async def test_backfill_from_context(self, test_session, test_relative):
+        from sqlalchemy import update
+        from src.family.backfill import backfill_stories_from_context
+        from src.family.models import FamilyRelationModel
+        from src.family.story_repository import StoryRepository, InterviewMessageRepository
+
+        await test_session.execute(
+            update(FamilyRelationModel)
+            .where(FamilyRelationModel.id == test_relative.id)
+            .values(context={
+                "Детство": "Рос в деревне",
+                "Война": {"text": "Служил", "media": [{"url": "u", "type": "image"}],
+                          "created_at": "2024-01-02T03:04:05"},
+                "Хобби": ["рыбалка"],
+                "interview_messages": [
+                    {"timestamp": "2024-01-01T00:00:00", "user": "Привет", "ai": "Здравствуйте"},
+                ],
+            })
+        )
+
+        stats = await backfill_stories_from_context(test_session, batch_size=1, commit=False)
+        assert stats["stories"] == 2
+        assert stats["interview_messages"] == 1
+
+        stories = await StoryRepository(test_session).get_by_relative(test_relative.id)
+        assert {s.title for s in stories} == {"Детство", "Война"}
+        assert next(s for s in stories if s.title == "Война").media[0]["url"] == "u"
+        messages = await InterviewMessageRepository(test_session).get_by_relative(test_relative.id)
+        assert messages[0].ai_response == "Здравствуйте"
+
+        await test_session.refresh(test_relative)
+        assert test_relative.context == {"Хобби": ["рыбалка"]}
+
+        # Повторный запуск ничего не дублирует
+        stats = await backfill_stories_from_context(test_session, commit=False)
+        assert stats["stories"] == 0
+
+
+@pytest.mark.integration
+class TestStoryDirectUpload:
+    def base_url(self, test_user, test_relative):
+        return f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories/Фото/media/direct-upload"
+
+    async def presign(self, client, auth_headers, url, **overrides):
+        payload = {"filename": "photo.jpg", "content_type": "image/jpeg", "size": 1024, **overrides}
+        return await client.post(url, headers=auth_headers, json=payload)
+
+    async def test_presign_and_complete(self, client, auth_headers, test_user, test_relative, seed_plans, mock_s3):
+        url = self.base_url(test_user, test_relative)
+        r = await self.presign(client, auth_headers, url)
+        assert r.status_code == 200
+        form = r.json()
+        assert form["key"].startswith(f"stories/{test_user.id}/{test_relative.id}/")
+        assert form["max_size"] == 10 * 1024 * 1024
+        assert form["fields"]["Content-Type"] == "image/jpeg"
+
+        mock_s3.put_direct(form["key"], b"\xff\xd8jpeg", "image/jpeg")
+        r = await client.post(f"{url}/complete", headers=auth_headers, json={"key": form["key"], "filename": "photo.jpg"})
+        assert r.status_code == 200
+        media = r.json()["media"]
+        assert media["url"] == form["object_url"]
+        assert media["size"] == 6
+        assert media["type"] == "image"
+        assert media["thumbnails"]["256"].endswith("/256.webp")
+
+        # Повторное подтверждение не дублирует медиа
+        r = await client.post(f"{url}/complete", headers=auth_headers, json={"key": form["key"]})
+        assert r.status_code == 200
+        story = await client.get(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories/Фото", headers=auth_headers
+        )
+        assert len(story.json()["media"]) == 1
+
+    async def test_presign_rejects_type_and_size(self, client, auth_headers, test_user, test_relative, seed_plans):
+        url = self.base_url(test_user, test_relative)
+        assert (await self.presign(client, auth_headers, url, content_type="application/x-msdownload")).status_code == 400
+        assert (await self.presign(client, auth_headers, url, size=11 * 1024 * 1024)).status_code == 400
+
+    async def test_presign_checks_storage_quota(
+        self, client, auth_headers, test_user, test_relative, seed_plans, test_session
+    ):
+        from src.subscription.quota_service import QuotaService
+        from src.subscription.repository import (
+            SubscriptionPlanRepository, UsageQuotaRepository, UserSubscriptionRepository,
+        )
+
+        quota_service = QuotaService(
+            SubscriptionPlanRepository(test_session), UserSubscriptionRepository(test_session),
+            UsageQuotaRepository(test_session), test_session,
+        )
+        quota = await quota_service.get_or_create_quota(test_user.id)
+        quota.storage_used_mb = 45
+        await test_session.flush()
+
+        r = await self.presign(client, auth_headers, self.base_url(test_user, test_relative), size=9 * 1024 * 1024)
+        assert r.status_code == 403
+
+    async def test_complete_rejects_foreign_or_missing_key(
+        self, client, auth_headers, test_user, test_relative, seed_plans, mock_s3
+    ):
+        url = f"{self.base_url(test_user, test_relative)}/complete"
+        mock_s3.put_direct("uploads/other.jpg", b"data", "image/jpeg")
+        r = await client.post(url, headers=auth_headers, json={"key": "uploads/other.jpg"})
+        assert r.status_code == 400
+
+        r = await client.post(url, headers=auth_headers, json={"key": f"stories/{test_user.id}/{test_relative.id}/missing.jpg"})
+        assert r.status_code == 400
+
+    async def test_complete_deletes_object_with_wrong_type(
+        self, client, auth_headers, test_user, test_relative, seed_plans, mock_s3
+    ):
+        url = self.base_url(test_user, test_relative)
+        form = (await self.presign(client, auth_headers, url)).json()
+        mock_s3.put_direct(form["key"], b"MZ", "application/x-msdownload")
+
+        r = await client.post(f"{url}/complete", headers=auth_headers, json={"key": form["key"]})
+        assert r.status_code == 400
+        assert form["object_url"] not in mock_s3.files
+
+    async def test_complete_rereads_story_changed_concurrently(
+        self, client, auth_headers, test_user, test_relative, seed_plans, mock_s3, test_session
+    ):
+        from sqlalchemy import text
+
+        url = self.base_url(test_user, test_relative)
+        first = (await self.presign(client, auth_headers, url)).json()
+        mock_s3.put_direct(first["key"], b"\xff\xd8one", "image/jpeg")
+        await client.post(f"{url}/complete", headers=auth_headers, json={"key": first["key"]})
+
+        # Параллельный запрос добавил медиа в обход объекта, загруженного в сессию
+        other = {"type": "image", "url": "https://s3/other.jpg", "filename": "other.jpg"}
+        story = await client.get(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories/Фото", headers=auth_headers
+        )
+        await test_session.execute(
+            text("UPDATE stories SET media = :media WHERE relative_id = :relative_id AND title = 'Фото'"),
+            {"media": json.dumps([*story.json()["media"], other]), "relative_id": test_relative.id},
+        )
+
+        second = (await self.presign(client, auth_headers, url)).json()
+        mock_s3.put_direct(second["key"], b"\xff\xd8two", "image/jpeg")
+        await client.post(f"{url}/complete", headers=auth_headers, json={"key": second["key"]})
+
+        story = await client.get(
+            f"/api/v1/family/{test_user.id}/relatives/{test_relative.id}/stories/Фото", headers=auth_headers
+        )
+        urls = [m["url"] for m in story.json()["media"]]
+        assert urls == [first["object_url"], other["url"], second["object_url"]]
+
+    async def test_sweep_removes_unconfirmed_uploads(
+        self, client, auth_headers, test_user, test_relative, seed_plans, mock_s3, test_session
+    ):
+        from src.family.story_service import sweep_orphan_uploads
+
+        url = self.base_url(test_user, test_relative)
+        confirmed = (await self.presign(client, auth_headers, url)).json()
+        abandoned = (await self.presign(client, auth_headers, url)).json()
+        mock_s3.put_direct(confirmed["key"], b"\xff\xd8one", "image/jpeg")
+        mock_s3.put_direct(abandoned["key"], b"\xff\xd8two", "image/jpeg")
+        await client.post(f"{url}/complete", headers=auth_headers, json={"key": confirmed["key"]})
+
+        # Свежие объекты не трогаем — их ещё могут подтвердить
+        assert await sweep_orphan_uploads(test_session, mock_s3, min_age_seconds=3600) == 0
+
+        assert await sweep_orphan_uploads(test_session, mock_s3, min_age_seconds=-1) == 1
+        assert confirmed["object_url"] in mock_s3.files
+        assert abandoned["object_url"] not in mock_s3.files
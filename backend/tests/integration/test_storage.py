@@ -40,3 +40,81 @@ class TestProxy:
     async def test_proxy_file_protocol(self, client):
         r = await client.get("/api/v1/storage/proxy", params={"url": "file:///etc/passwd"})
         assert r.status_code == 400
+
+
+@pytest.mark.integration
+class TestProxyStreaming:
+    URL = "https://s3.twcstorage.ru/bucket/avatar.jpg"
+
+    async def test_repeated_requests_served_from_cache(self, client, mock_s3_upstream):
+        mock_s3_upstream.put("/bucket/avatar.jpg", b"jpeg-bytes")
+
+        first = await client.get("/api/v1/storage/proxy", params={"url": self.URL})
+        assert first.status_code == 200
+        assert first.content == b"jpeg-bytes"
+        assert first.headers["content-type"] == "image/jpeg"
+        assert "x-proxy-cache" not in first.headers
+
+        second = await client.get("/api/v1/storage/proxy", params={"url": self.URL})
+        assert second.content == b"jpeg-bytes"
+        assert second.headers["x-proxy-cache"] == "HIT"
+        assert second.headers["etag"] == first.headers["etag"]
+        assert len(mock_s3_upstream.requests) == 1
+
+    async def test_if_none_match_and_range_from_cache(self, client, mock_s3_upstream):
+        mock_s3_upstream.put("/bucket/avatar.jpg", b"0123456789")
+        etag = (await client.get("/api/v1/storage/proxy", params={"url": self.URL})).headers["etag"]
+
+        r = await client.get("/api/v1/storage/proxy", params={"url": self.URL}, headers={"If-None-Match": etag})
+        assert r.status_code == 304
+        assert r.content == b""
+
+        r = await client.get("/api/v1/storage/proxy", params={"url": self.URL}, headers={"Range": "bytes=2-4"})
+        assert r.status_code == 206
+        assert r.content == b"234"
+        assert r.headers["content-range"] == "bytes 2-4/10"
+
+        r = await client.get("/api/v1/storage/proxy", params={"url": self.URL}, headers={"Range": "bytes=20-"})
+        assert r.status_code == 416
+
+    async def test_conditional_and_range_forwarded_on_miss(self, client, mock_s3_upstream):
+        mock_s3_upstream.put("/bucket/video.mp4", b"v" * 100, "video/mp4")
+        url = "https://s3.twcstorage.ru/bucket/video.mp4"
+
+        r = await client.get("/api/v1/storage/proxy", params={"url": url}, headers={"Range": "bytes=0-9"})
+        assert r.status_code == 206
+        assert r.content == b"v" * 10
+        assert mock_s3_upstream.requests[-1].headers["range"] == "bytes=0-9"
+
+        etag = r.headers["etag"]
+        r = await client.get("/api/v1/storage/proxy", params={"url": url}, headers={"If-None-Match": etag})
+        assert r.status_code == 304
+
+    async def test_large_and_missing_objects_not_cached(self, client, mock_s3_upstream):
+        mock_s3_upstream.put("/bucket/big.jpg", b"x" * 600)
+        url = "https://s3.twcstorage.ru/bucket/big.jpg"
+        for _ in range(2):
+            r = await client.get("/api/v1/storage/proxy", params={"url": url})
+            assert r.status_code == 200 and len(r.content) == 600
+        assert len(mock_s3_upstream.requests) == 2
+
+        r = await client.get("/api/v1/storage/proxy", params={"url": "https://s3.twcstorage.ru/bucket/none.jpg"})
+        assert r.status_code == 404
+        assert r.headers["cache-control"] == "no-store"
+
+
+@pytest.mark.integration
+class TestThumbnails:
+    async def test_upload_generates_thumbnails(self, client, auth_headers, seed_plans, mock_s3):
+        from PIL import Image
+        from src.storage.s3.thumbnails import thumbnail_pipeline, thumbnail_urls
+
+        image = io.BytesIO()
+        Image.new("RGB", (800, 600), (10, 20, 30)).save(image, "PNG")
+        files = {"file": ("avatar.png", io.BytesIO(image.getvalue()), "image/png")}
+        r = await client.post("/api/v1/storage/upload", headers=auth_headers, files=files)
+        assert r.status_code == 200
+        await thumbnail_pipeline.drain()
+
+        thumbnails = thumbnail_urls(r.json()["url"])
+        assert thumbnails and all(url in mock_s3.files for url in thumbnails.values())
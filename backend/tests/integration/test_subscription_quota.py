@@ -35,3 +35,61 @@ class TestQuotaEnforcement:
         })
         # Ожидаем 403 (QuotaExceeded) или 422 (validation)
         assert r.status_code in (403, 422)
+
+
+@pytest.mark.integration
+class TestAtomicQuotaCounters:
+    """UPSERT-счётчики на реальной БД (SQLite поддерживает ON CONFLICT ... RETURNING)."""
+
+    def _service(self, test_session):
+        from src.subscription.quota_service import QuotaService
+        from src.subscription.repository import (
+            SubscriptionPlanRepository, UserSubscriptionRepository, UsageQuotaRepository,
+        )
+        return QuotaService(
+            SubscriptionPlanRepository(test_session),
+            UserSubscriptionRepository(test_session),
+            UsageQuotaRepository(test_session),
+            test_session,
+        )
+
+    async def test_increment_creates_and_accumulates(self, test_session, test_user):
+        from src.subscription.enums import QuotaResource
+        svc = self._service(test_session)
+        await svc.increment_quota(test_user.id, QuotaResource.AI_REQUESTS)
+        await svc.increment_quota(test_user.id, QuotaResource.AI_REQUESTS, amount=2)
+        await svc.increment_storage(test_user.id, 5.0)
+        quota = await svc.quota_repo.get_current(test_user.id)
+        assert quota.ai_requests_used == 3
+        assert quota.storage_used_mb == 5
+        assert quota.tree_generations_used == 0
+
+    async def test_get_or_create_returns_same_row(self, test_session, test_user):
+        from src.subscription.quota_service import current_period
+        repo = self._service(test_session).quota_repo
+        first = await repo.get_or_create(test_user.id, *current_period())
+        second = await repo.get_or_create(test_user.id, *current_period())
+        assert first.id == second.id
+
+    async def test_consume_stops_at_limit(self, test_session, test_user):
+        from src.subscription.quota_service import current_period
+        repo = self._service(test_session).quota_repo
+        period = current_period()
+        results = [
+            await repo.consume(test_user.id, *period, "ai_requests_used", 1, 3)
+            for _ in range(5)
+        ]
+        assert [r is not None for r in results] == [True, True, True, False, False]
+        quota = await repo.get_current(test_user.id)
+        assert quota.ai_requests_used == 3
+
+    async def test_consume_quota_raises_on_free_limit(self, test_session, test_user, seed_plans):
+        from src.subscription.enums import QuotaResource
+        from src.subscription.exceptions import QuotaExceededError
+        svc = self._service(test_session)
+        for _ in range(10):
+            await svc.consume_quota(test_user.id, QuotaResource.AI_REQUESTS)
+        with pytest.raises(QuotaExceededError):
+            await svc.consume_quota(test_user.id, QuotaResource.AI_REQUESTS)
+        quota = await svc.quota_repo.get_current(test_user.id)
+        assert quota.ai_requests_used == 10
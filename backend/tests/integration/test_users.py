@@ -134,6 +134,27 @@ class TestSuperuserOperations:
         r = await client.delete(f"/api/v1/users/{other_user.id}", headers=auth_headers)
         assert r.status_code == 403
 
+    async def test_deactivate_invalidates_cached_user(self, client, superuser_headers, auth_headers, test_user):
+        """Кэш текущего пользователя сбрасывается при деактивации"""
+        r = await client.get("/api/v1/auth/me", headers=auth_headers)
+        assert r.status_code == 200
+        r = await client.patch(f"/api/v1/users/{test_user.id}/deactivate", headers=superuser_headers)
+        assert r.status_code == 200
+        r = await client.get("/api/v1/auth/me", headers=auth_headers)
+        assert r.status_code == 403
+
+    async def test_superuser_change_invalidates_cached_user(self, client, superuser_headers, auth_headers, test_user):
+        r = await client.get("/api/v1/admin/dashboard", headers=auth_headers)
+        assert r.status_code == 403
+        r = await client.patch(
+            f"/api/v1/users/{test_user.id}/superuser",
+            headers=superuser_headers,
+            params={"is_superuser": True}
+        )
+        assert r.status_code == 200
+        r = await client.get("/api/v1/admin/dashboard", headers=auth_headers)
+        assert r.status_code == 200
+
 
 @pytest.mark.integration
 class TestSearchUsers:
@@ -0,0 +1,109 @@
+"""Unit тесты для пакетной записи логов использования AI — отдельная in-memory БД."""
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.admin.models import AIUsageLogModel
+from src.ai.usage import AIUsageRecorder
+from src.database.base import Base
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def recorder(session_factory):
+    recorder = AIUsageRecorder(max_events=100, batch_size=3, flush_interval_ms=50, session_factory=session_factory)
+    yield recorder
+    await recorder.stop()
+
+
+def record(recorder, endpoint_type="chat", **fields):
+    return recorder.record(
+        user_id=fields.get("user_id"),
+        model="test-model",
+        prompt_tokens=10,
+        completion_tokens=5,
+        total_tokens=15,
+        endpoint_type=endpoint_type,
+        error_message=fields.get("error_message"),
+    )
+
+
+async def count_rows(session_factory) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(AIUsageLogModel))
+
+
+@pytest.mark.unit
+class TestAIUsageRecorder:
+    async def test_record_does_not_write_immediately(self, recorder, session_factory):
+        assert record(recorder) is True
+        assert recorder.stats()["pending"] == 1
+        assert await count_rows(session_factory) == 0
+
+    async def test_flush_on_batch_size(self, session_factory):
+        recorder = AIUsageRecorder(max_events=100, batch_size=3, flush_interval_ms=60_000, session_factory=session_factory)
+        for _ in range(3):
+            record(recorder)
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+            if recorder.stats()["written"] == 3:
+                break
+        assert await count_rows(session_factory) == 3
+        assert recorder.stats()["batches"] == 1
+        await recorder.stop()
+
+    async def test_flush_on_interval(self, recorder, session_factory):
+        record(recorder)
+        await asyncio.sleep(0.15)
+        assert await count_rows(session_factory) == 1
+        assert recorder.stats()["pending"] == 0
+
+    async def test_drops_when_buffer_full(self, session_factory):
+        recorder = AIUsageRecorder(max_events=2, batch_size=10, flush_interval_ms=60_000, session_factory=session_factory)
+        assert record(recorder) and record(recorder)
+        assert record(recorder) is False
+        assert recorder.stats()["dropped"] == 1
+        await recorder.stop()
+        assert await count_rows(session_factory) == 2
+
+    async def test_stop_drains_buffer(self, session_factory):
+        recorder = AIUsageRecorder(max_events=100, batch_size=2, flush_interval_ms=60_000, session_factory=session_factory)
+        recorder.start()
+        for _ in range(5):
+            record(recorder)
+        await recorder.stop()
+        assert await count_rows(session_factory) == 5
+        assert recorder.stats()["pending"] == 0
+
+    async def test_error_message_truncated(self, recorder, session_factory):
+        record(recorder, error_message="x" * 1000)
+        await recorder.flush()
+        async with session_factory() as session:
+            log = await session.scalar(select(AIUsageLogModel))
+        assert len(log.error_message) == 512
+
+    async def test_bad_row_does_not_lose_batch(self, recorder, session_factory):
+        """Строка, которую БД отвергает, не мешает записать остальные строки пакета"""
+        for _ in range(3):
+            record(recorder)
+        recorder._buffer[0]["model"] = None  # NOT NULL
+        await recorder.flush()
+        assert await count_rows(session_factory) == 2
+        stats = recorder.stats()
+        assert stats["written"] == 2
+        assert stats["failed"] == 1
@@ -0,0 +1,154 @@
+"""Unit тесты для предзагрузки изображений книги и LRU-кэша байтов."""
+from io import BytesIO
+from unittest.mock import patch
+
+import httpx
+import pytest
+from PIL import Image
+
+from src.book import images as book_images
+from src.book.images import ImageByteCache, downscale_image, prefetch_images, prepare_images, slot_pixels
+from src.book.pdf_generator import PDFBookGenerator
+from tests.factories import make_relative
+
+
+def png_bytes(color="red", size=(8, 8), mode="RGB"):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def jpeg_bytes(size):
+    buffer = BytesIO()
+    Image.new("RGB", size, "blue").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def patched_client(handler, requested):
+    real_client = httpx.AsyncClient
+
+    def factory(**kwargs):
+        def record(request):
+            requested.append(str(request.url))
+            return handler(request)
+        return real_client(transport=httpx.MockTransport(record), **kwargs)
+
+    return patch.object(book_images.httpx, "AsyncClient", factory)
+
+
+@pytest.mark.unit
+class TestImageByteCache:
+    def test_lru_eviction_by_bytes(self):
+        cache = ImageByteCache(max_bytes=10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        assert cache.get("a") == b"1234"  # "a" становится самым свежим
+        cache.put("c", b"1234")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1234"
+        assert cache.stats() == {"entries": 2, "bytes": 8, "hits": 2, "misses": 1}
+
+    def test_oversized_item_not_cached(self):
+        cache = ImageByteCache(max_bytes=3)
+        cache.put("a", b"1234")
+        assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.unit
+class TestPrefetchImages:
+    async def test_downloads_deduplicated_and_cached(self):
+        cache = ImageByteCache(max_bytes=1024)
+        requested = []
+
+        def handler(request):
+            if request.url.path == "/missing.png":
+                return httpx.Response(404)
+            return httpx.Response(200, content=b"img" + request.url.path.encode())
+
+        urls = ["https://s3/a.png", "https://s3/b.png", "https://s3/a.png", "https://s3/missing.png", None]
+        with patched_client(handler, requested):
+            result = await prefetch_images(urls, cache=cache, concurrency=2)
+            again = await prefetch_images(["https://s3/a.png", "https://s3/b.png"], cache=cache)
+
+        assert result == {"https://s3/a.png": b"img/a.png", "https://s3/b.png": b"img/b.png"}
+        assert again == result
+        assert sorted(requested) == ["https://s3/a.png", "https://s3/b.png", "https://s3/missing.png"]
+
+    async def test_network_error_skips_image(self):
+        def handler(request):
+            raise httpx.ConnectError("boom", request=request)
+
+        with patched_client(handler, []):
+            result = await prefetch_images(["https://s3/a.png"], cache=ImageByteCache(1024))
+        assert result == {}
+
+
+@pytest.mark.unit
+class TestRenderingWithoutNetwork:
+    def test_generate_uses_prefetched_images(self):
+        url = "https://s3/photo.png"
+        relatives = [make_relative(id=1, image_url=url), make_relative(id=2, image_url=url)]
+        generator = PDFBookGenerator()
+
+        with patch.object(httpx, "get", side_effect=AssertionError("network during render")):
+            pdf = generator.generate(
+                title="Книга",
+                introduction="Введение",
+                chapters=[{"title": "Глава", "content": "Текст [PHOTO:1:История:0]"}],
+                conclusion="Конец",
+                relatives=relatives,
+                relationships=[],
+                story_photos={"1:История:0": url},
+                images={url: png_bytes()},
+            )
+
+        assert pdf.startswith(b"%PDF")
+        # Одно декодирование на URL — переиспользуется карточками и главой
+        assert list(generator._image_readers) == [(url, False)]
+
+
+@pytest.mark.unit
+class TestDownscale:
+    def test_slot_pixels(self):
+        assert slot_pixels(72, dpi=150) == 150
+        assert slot_pixels(30, dpi=150) == 63
+
+    def test_large_image_downscaled_to_progressive_jpeg(self):
+        data = downscale_image(jpeg_bytes((4000, 3000)), max_pixels=800)
+
+        image = Image.open(BytesIO(data))
+        assert image.format == "JPEG"
+        assert image.size == (800, 600)
+        assert image.info.get("progressive") == 1
+
+    def test_small_jpeg_kept_as_is(self):
+        original = jpeg_bytes((100, 80))
+        assert downscale_image(original, max_pixels=800) is original
+
+    def test_transparent_png_flattened(self):
+        data = downscale_image(png_bytes((0, 0, 0, 0), size=(50, 50), mode="RGBA"), max_pixels=800)
+
+        image = Image.open(BytesIO(data))
+        assert image.mode == "RGB"
+        assert image.getpixel((0, 0)) == (255, 255, 255)
+
+    def test_undecodable_returns_none(self):
+        assert downscale_image(b"not an image", max_pixels=800) is None
+
+    async def test_prepare_images_cached_by_url_and_size(self):
+        cache = ImageByteCache(max_bytes=10 * 1024 * 1024)
+        raw = {"https://s3/big.jpg": jpeg_bytes((2000, 2000)), "https://s3/bad": b"garbage"}
+
+        with patch.object(book_images.settings, "book_image_dpi", 72):
+            prepared = await prepare_images(raw, 100, cache=cache)
+            assert Image.open(BytesIO(prepared["https://s3/big.jpg"])).size == (100, 100)
+            assert prepared["https://s3/bad"] == b"garbage"
+            assert cache.get(("https://s3/big.jpg", 100)) == prepared["https://s3/big.jpg"]
+
+            with patch.object(book_images, "downscale_image", side_effect=AssertionError("not cached")):
+                again = await prepare_images({"https://s3/big.jpg": raw["https://s3/big.jpg"]}, 100, cache=cache)
+            assert again["https://s3/big.jpg"] == prepared["https://s3/big.jpg"]
+
+            smaller = await prepare_images({"https://s3/big.jpg": raw["https://s3/big.jpg"]}, 50, cache=cache)
+            assert Image.open(BytesIO(smaller["https://s3/big.jpg"])).size == (50, 50)
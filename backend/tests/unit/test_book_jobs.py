@@ -0,0 +1,254 @@
+"""Unit тесты для фоновых задач генерации книг — отдельная in-memory БД, без LLM."""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from unittest.mock import AsyncMock
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.admin.models import BookGenerationModel
+from src.book.downloads import BookSpool, sync_book_spool
+from src.book.jobs import BookJobManager
+from src.book.schemas import BookGenerateRequestSchema
+from src.database.base import Base
+
+
+class FakeBookService:
+    def __init__(self, events=None, error=None, gate=None):
+        self.events = events or []
+        self.error = error
+        self.gate = gate
+
+    async def generate_book_events(self, user_id, request, *args):
+        for item in self.events:
+            yield item
+            if self.gate:
+                await self.gate.wait()
+        if self.error:
+            raise self.error
+
+
+PROGRESS = {"type": "progress", "stage": "writing_chapters", "progress": 50, "message": "..."}
+RESULT = {"type": "result", "filename": "book.pdf", "pdf_bytes": b"%PDF-1", "s3_key": "k", "s3_url": "https://s3/book.pdf"}
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+def make_manager(session_factory, service):
+    return BookJobManager(
+        workers=1,
+        per_user_limit=1,
+        stale_seconds=60,
+        poll_interval=0.01,
+        session_factory=session_factory,
+        s3_manager_factory=lambda: None,
+        book_service_factory=lambda: service,
+    )
+
+
+async def add_job(session_factory, **values):
+    values.setdefault("status", "queued")
+    values.setdefault("kind", "job")
+    values.setdefault("request_params", {"include_photos": False})
+    async with session_factory() as session:
+        job = BookGenerationModel(user_id=1, **values)
+        session.add(job)
+        await session.commit()
+        return job.id
+
+
+async def load_job(session_factory, job_id):
+    async with session_factory() as session:
+        return await session.get(BookGenerationModel, job_id)
+
+
+@pytest.mark.unit
+class TestBookJobManager:
+    async def test_run_job_persists_progress_and_result(self, session_factory):
+        gate = asyncio.Event()
+        manager = make_manager(session_factory, FakeBookService([PROGRESS, RESULT], gate=gate))
+        job_id = await add_job(session_factory)
+        manager._enqueue(job_id, 1)
+        await manager._queue.get()
+
+        events = []
+
+        async def listen():
+            async for item in manager.stream_events(job_id):
+                events.append(item)
+
+        listener = asyncio.create_task(listen())
+        runner = asyncio.create_task(manager.run_job(job_id))
+        await asyncio.sleep(0.05)
+
+        job = await load_job(session_factory, job_id)
+        assert (job.status, job.stage, job.progress) == ("generating", "writing_chapters", 50)
+
+        gate.set()
+        await runner
+        await listener
+
+        job = await load_job(session_factory, job_id)
+        assert job.status == "completed"
+        assert job.s3_url == "https://s3/book.pdf"
+        assert job.file_size_bytes == 6
+        assert [e["type"] for e in events] == ["progress", "progress", "result"]
+        assert events[-1] == {
+            "type": "result",
+            "filename": "book.pdf",
+            "download_url": f"/api/v1/book/{job_id}/download",
+            "s3_url": "https://s3/book.pdf",
+            "job_id": job_id,
+        }
+
+    async def test_failure_is_persisted(self, session_factory):
+        manager = make_manager(session_factory, FakeBookService([PROGRESS], error=RuntimeError("LLM down")))
+        job_id = await add_job(session_factory)
+
+        await manager.run_job(job_id)
+
+        job = await load_job(session_factory, job_id)
+        assert job.status == "failed"
+        assert job.error_message == "Ошибка генерации: LLM down"
+
+    async def test_failed_upload_spools_pdf(self, session_factory, tmp_path):
+        manager = make_manager(session_factory, FakeBookService([{**RESULT, "s3_url": None, "s3_key": None}]))
+        manager.spool = BookSpool(str(tmp_path), ttl_seconds=3600)
+        job_id = await add_job(session_factory)
+
+        await manager.run_job(job_id)
+
+        job = await load_job(session_factory, job_id)
+        assert job.status == "completed"
+        assert job.s3_key is None
+        assert manager.spool.path(job_id).read_bytes() == b"%PDF-1"
+
+    async def test_job_claimed_only_once(self, session_factory):
+        service = FakeBookService([RESULT])
+        manager = make_manager(session_factory, service)
+        job_id = await add_job(session_factory, status="generating")
+
+        await manager.run_job(job_id)
+
+        job = await load_job(session_factory, job_id)
+        assert job.status == "generating"
+
+    async def test_recover_requeues_stale_jobs(self, session_factory):
+        manager = make_manager(session_factory, FakeBookService())
+        now = datetime.now(timezone.utc)
+        stale = await add_job(session_factory, status="generating", updated_at=now - timedelta(hours=1))
+        fresh = await add_job(session_factory, status="generating", updated_at=now)
+        queued = await add_job(session_factory)
+        await add_job(session_factory, status="completed")
+
+        await manager._recover()
+
+        assert (await load_job(session_factory, stale)).status == "queued"
+        assert (await load_job(session_factory, fresh)).status == "generating"
+        assert [manager._queue.get_nowait() for _ in range(manager._queue.qsize())] == [stale, queued]
+
+    async def test_recover_skips_stream_records(self, session_factory):
+        manager = make_manager(session_factory, FakeBookService())
+        stream = await add_job(session_factory, status="generating", kind="stream", request_params=None)
+
+        await manager._recover()
+
+        assert (await load_job(session_factory, stream)).status == "generating"
+        assert manager._queue.empty()
+
+    async def test_stream_records_not_counted_in_limit(self, session_factory):
+        manager = make_manager(session_factory, FakeBookService())
+        await add_job(session_factory, status="generating", kind="stream", request_params=None)
+
+        async with session_factory() as session:
+            job = await manager.submit(session, 1, BookGenerateRequestSchema())
+            await session.commit()
+        assert job.kind == "job"
+
+    async def test_submit_locks_user_row_before_counting(self, session_factory):
+        """Лимит проверяется под FOR UPDATE строки пользователя — параллельные запросы идут по очереди"""
+        manager = make_manager(session_factory, FakeBookService())
+
+        async with session_factory() as session:
+            statements = []
+            execute = session.execute
+
+            async def spy(statement, *args, **kwargs):
+                statements.append(statement)
+                return await execute(statement, *args, **kwargs)
+
+            session.execute = spy
+            await manager.submit(session, 1, BookGenerateRequestSchema())
+            await session.commit()
+
+        lock = statements[0]
+        assert lock._for_update_arg is not None
+        assert lock.get_final_froms()[0].name == "users"
+        assert manager._queue.qsize() == 1
+
+    async def test_stream_finished_job_from_db(self, session_factory):
+        manager = make_manager(session_factory, FakeBookService())
+        job_id = await add_job(session_factory, status="completed", s3_url="https://s3/b.pdf", filename="b.pdf")
+
+        events = [item async for item in manager.stream_events(job_id)]
+        assert events[0]["type"] == "result"
+        assert events[0]["download_url"] == f"/api/v1/book/{job_id}/download"
+
+
+@pytest.mark.unit
+class TestSyncBookSpool:
+    async def test_spooled_book_uploaded_to_s3(self, session_factory, tmp_path):
+        spool = BookSpool(str(tmp_path), ttl_seconds=3600)
+        book_id = await add_job(session_factory, status="completed", filename="b.pdf")
+        await spool.write(book_id, b"%PDF-1")
+        s3_manager = AsyncMock()
+        s3_manager.upload_bytes.return_value = ("books/b.pdf", "https://s3/b.pdf", "application/pdf")
+
+        async with session_factory() as session:
+            await sync_book_spool(session, s3_manager, spool)
+
+        book = await load_job(session_factory, book_id)
+        assert (book.status, book.s3_key) == ("completed", "books/b.pdf")
+        assert spool.size(book_id) is None
+
+    async def test_expired_book_marked_failed(self, session_factory, tmp_path):
+        spool = BookSpool(str(tmp_path), ttl_seconds=60)
+        book_id = await add_job(session_factory, status="completed", filename="b.pdf")
+        await spool.write(book_id, b"%PDF-1")
+        old = datetime.now(timezone.utc).timestamp() - 120
+        os.utime(spool.path(book_id), (old, old))
+        s3_manager = AsyncMock()
+        s3_manager.upload_bytes.side_effect = RuntimeError("S3 down")
+
+        async with session_factory() as session:
+            await sync_book_spool(session, s3_manager, spool)
+
+        book = await load_job(session_factory, book_id)
+        assert book.status == "failed"
+        assert spool.size(book_id) is None
+
+    async def test_fresh_book_kept_while_s3_down(self, session_factory, tmp_path):
+        spool = BookSpool(str(tmp_path), ttl_seconds=3600)
+        book_id = await add_job(session_factory, status="completed", filename="b.pdf")
+        await spool.write(book_id, b"%PDF-1")
+        s3_manager = AsyncMock()
+        s3_manager.upload_bytes.side_effect = RuntimeError("S3 down")
+
+        async with session_factory() as session:
+            await sync_book_spool(session, s3_manager, spool)
+
+        assert (await load_job(session_factory, book_id)).status == "completed"
+        assert spool.size(book_id) == 6
@@ -0,0 +1,189 @@
+"""Unit тесты для параллельной генерации глав в BookService — без LLM и БД."""
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.book.schemas import BookGenerateRequestSchema
+from src.book.service import BookService
+from tests.factories import make_relative
+
+
+CHAPTERS = [
+    {"title": f"Глава {i}", "theme": "", "relatives_to_include": [i + 1]}
+    for i in range(4)
+]
+
+
+def parse_events(chunks):
+    return [json.loads(c[len("data: "):]) for c in chunks if c.startswith("data: ")]
+
+
+def make_service(in_flight_log):
+    service = BookService()
+    in_flight = {"now": 0}
+
+    async def write_chapter(chapter_info, *args, **kwargs):
+        in_flight["now"] += 1
+        in_flight_log.append(in_flight["now"])
+        # Первые главы пишутся дольше — завершаются в обратном порядке
+        await asyncio.sleep(0.01 * (len(CHAPTERS) - CHAPTERS.index(chapter_info)))
+        in_flight["now"] -= 1
+        return f"Текст {chapter_info['title']}"
+
+    service._generate_outline = AsyncMock(return_value={"title": "Книга", "chapters": CHAPTERS})
+    service._generate_timeline = AsyncMock(return_value=[{"year": 1950}])
+    service._write_conclusion = AsyncMock(return_value="Конец")
+    service._write_chapter = write_chapter
+    return service
+
+
+async def run_stream(service):
+    family_service = AsyncMock()
+    family_service.get_user_relatives.return_value = [make_relative(id=i, first_name=f"R{i}") for i in range(1, 5)]
+    family_service.get_user_stories.return_value = {}
+    relationship_service = AsyncMock()
+    relationship_service.get_user_relationships.return_value = []
+
+    with patch("src.book.service.book_renderer.render", AsyncMock(return_value=b"%PDF")) as render:
+        chunks = [
+            chunk async for chunk in service.generate_book_stream(
+                1, BookGenerateRequestSchema(include_photos=False), family_service, relationship_service
+            )
+        ]
+    return parse_events(chunks), vars(render.call_args.args[0])
+
+
+@pytest.mark.unit
+class TestParallelChapters:
+    async def test_chapters_reordered_by_outline(self):
+        service = make_service([])
+        events, pdf_kwargs = await run_stream(service)
+
+        assert [c["title"] for c in pdf_kwargs["chapters"]] == [c["title"] for c in CHAPTERS]
+        assert pdf_kwargs["chapters"][0]["content"] == "Текст Глава 0"
+        assert pdf_kwargs["timeline"] == [{"year": 1950}]
+        assert pdf_kwargs["conclusion"] == "Конец"
+        assert events[-1]["type"] == "done"
+        result = next(e for e in events if e["type"] == "result")
+        assert "pdf_base64" not in result
+
+    async def test_progress_per_chapter(self):
+        service = make_service([])
+        events, _ = await run_stream(service)
+
+        done = [e for e in events if e.get("stage") == "writing_chapters" and "chapter_index" in e]
+        assert [e["chapters_done"] for e in done] == [1, 2, 3, 4]
+        # Завершаются в обратном порядке, индексы сообщаются как есть
+        assert [e["chapter_index"] for e in done] == [3, 2, 1, 0]
+
+    async def test_concurrency_is_bounded(self):
+        in_flight_log = []
+        service = make_service(in_flight_log)
+        with patch("src.book.service.settings.book_chapter_concurrency", 2):
+            await run_stream(service)
+        assert max(in_flight_log) == 2
+
+    async def test_failure_waits_for_cancelled_chapters(self):
+        service = make_service([])
+        cancelled = []
+
+        async def write_chapter(chapter_info, *args, **kwargs):
+            if chapter_info is CHAPTERS[0]:
+                raise RuntimeError("LLM недоступна")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(chapter_info["title"])
+                raise
+
+        service._write_chapter = write_chapter
+        with pytest.raises(RuntimeError):
+            await run_events(service, {})
+        # Отменённые главы завершены к моменту выхода из генератора
+        assert sorted(cancelled) == ["Глава 1", "Глава 2", "Глава 3"]
+
+    def test_photos_reserved_for_first_chapter(self):
+        service = BookService()
+        relatives = [make_relative(id=1), make_relative(id=2)]
+        catalog = {
+            1: {"name": "R1", "profile_photo": "u1", "story_photos": {}},
+            2: {"name": "R2", "profile_photo": "u2", "story_photos": {"История": ["s1"]}},
+        }
+        chapters = [{"relatives_to_include": [1, 2]}, {"relatives_to_include": [2]}]
+
+        excluded = service._reserve_chapter_photos(chapters, relatives, catalog)
+        assert excluded[0] == set()
+        assert excluded[1] == {"1:profile:0", "2:profile:0", "2:История:0"}
+
+
+async def run_events(service, stories, previous_artifacts=None):
+    family_service = AsyncMock()
+    family_service.get_user_relatives.return_value = [make_relative(id=i, first_name=f"R{i}") for i in (1, 2)]
+    family_service.get_user_stories.return_value = stories
+    relationship_service = AsyncMock()
+    relationship_service.get_user_relationships.return_value = []
+
+    with patch("src.book.service.book_renderer.render", AsyncMock(return_value=b"%PDF")):
+        events = [
+            item async for item in service.generate_book_events(
+                1, BookGenerateRequestSchema(include_photos=False), family_service, relationship_service,
+                previous_artifacts=previous_artifacts,
+            )
+        ]
+    return events[-1]
+
+
+def make_refresh_service():
+    service = BookService()
+    service._generate_outline = AsyncMock(return_value={
+        "title": "Книга",
+        "chapters": [
+            {"title": "Первая", "relatives_to_include": [1]},
+            {"title": "Вторая", "relatives_to_include": [2]},
+        ],
+    })
+    service._generate_timeline = AsyncMock(return_value=[{"year": 1950}])
+    service._write_conclusion = AsyncMock(return_value="Конец")
+    service._write_chapter = AsyncMock(side_effect=lambda chapter_info, *a, **kw: f"Текст {chapter_info['title']}")
+    return service
+
+
+@pytest.mark.unit
+class TestBookRefresh:
+    async def test_artifacts_in_result(self):
+        result = await run_events(make_refresh_service(), {})
+
+        artifacts = result["artifacts"]
+        assert artifacts["outline"]["title"] == "Книга"
+        assert [c["content"] for c in artifacts["chapters"]] == ["Текст Первая", "Текст Вторая"]
+        assert all(c["fingerprint"] for c in artifacts["chapters"])
+        assert artifacts["timeline"] == [{"year": 1950}]
+
+    async def test_unchanged_tree_reuses_everything(self):
+        first = await run_events(make_refresh_service(), {})
+
+        service = make_refresh_service()
+        result = await run_events(service, {}, previous_artifacts=first["artifacts"])
+
+        service._generate_outline.assert_not_awaited()
+        service._write_chapter.assert_not_awaited()
+        service._generate_timeline.assert_not_awaited()
+        service._write_conclusion.assert_not_awaited()
+        assert result["artifacts"] == first["artifacts"]
+
+    async def test_only_changed_chapter_rewritten(self):
+        first = await run_events(make_refresh_service(), {})
+
+        service = make_refresh_service()
+        service._write_chapter.side_effect = lambda chapter_info, *a, **kw: "Новый текст"
+        story = SimpleNamespace(title="Война", text="Новая история о втором родственнике", media=[])
+        result = await run_events(service, {2: [story]}, previous_artifacts=first["artifacts"])
+
+        service._generate_outline.assert_not_awaited()
+        service._write_chapter.assert_awaited_once()
+        assert service._write_chapter.await_args.args[0]["title"] == "Вторая"
+        assert [c["content"] for c in result["artifacts"]["chapters"]] == ["Текст Первая", "Новый текст"]
+        # История попала в контекст семьи — хронология пересчитана
+        service._generate_timeline.assert_awaited_once()
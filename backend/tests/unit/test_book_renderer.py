@@ -0,0 +1,122 @@
+"""Unit тесты для рендеринга книги в пуле процессов."""
+import asyncio
+import pickle
+import time
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+
+from src.book.exceptions import BookRenderTimeoutError
+from src.book.pdf_generator import PDFBookGenerator
+from src.book.renderer import BookRenderer, BookSpec, RelativeSnapshot
+from src.book.schemas import BookStyle, BookTheme
+from tests.factories import make_relative
+
+
+def hang(spec):
+    """Зависший рендер; функция модуля, чтобы её можно было передать в spawn-процесс"""
+    time.sleep(60)
+
+
+def make_spec(**kwargs):
+    relative = make_relative(id=1, birth_date=date(1950, 1, 1), generation=1)
+    return BookSpec(
+        title="Книга",
+        introduction="Введение",
+        chapters=[{"title": "Глава", "content": "Текст главы"}],
+        conclusion="Конец",
+        timeline=[{"year": 1950, "event": "Рождение"}],
+        relatives=[RelativeSnapshot.from_model(relative)],
+        **kwargs,
+    )
+
+
+@pytest.mark.unit
+class TestBookRenderer:
+    def test_spec_is_picklable(self):
+        spec = make_spec(images={"u": b"bytes"})
+        restored = pickle.loads(pickle.dumps(spec))
+        assert restored == spec
+        assert restored.relatives[0].first_name == "Иван"
+
+    async def test_render_in_process_pool(self):
+        renderer = BookRenderer(workers=1, timeout=120)
+        try:
+            pdf = await renderer.render(make_spec())
+        finally:
+            renderer.shutdown()
+        assert pdf.startswith(b"%PDF")
+
+    async def test_event_loop_not_blocked(self):
+        renderer = BookRenderer(workers=0, timeout=5)
+        ticks = []
+
+        def slow_render(spec):
+            time.sleep(0.2)
+            return b"%PDF"
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+
+        with patch("src.book.renderer.render_book", slow_render):
+            pdf, _ = await asyncio.gather(renderer.render(make_spec()), ticker())
+        renderer.shutdown()
+
+        assert pdf == b"%PDF"
+        assert len(ticks) == 5
+
+    async def test_timeout(self):
+        renderer = BookRenderer(workers=0, timeout=0.05)
+
+        with patch("src.book.renderer.render_book", lambda spec: time.sleep(0.3)):
+            with pytest.raises(BookRenderTimeoutError) as exc:
+                await renderer.render(make_spec())
+
+        assert exc.value.status_code == 504
+        assert renderer._executor is None
+
+    async def test_timeout_terminates_stuck_process(self):
+        renderer = BookRenderer(workers=1, timeout=1)
+
+        async def render_later():
+            await asyncio.sleep(0.5)
+            return await renderer.render(make_spec())
+
+        with patch("src.book.renderer.render_book", hang):
+            first = asyncio.ensure_future(renderer.render(make_spec()))
+            await asyncio.sleep(0)
+            processes = list(renderer._executor._processes.values())
+            stuck, queued = await asyncio.gather(first, render_later(), return_exceptions=True)
+
+        # Зависший рендер — таймаут, рендер из очереди того же пула — обычная ошибка, не отмена
+        assert isinstance(stuck, BookRenderTimeoutError)
+        assert isinstance(queued, BrokenProcessPool)
+        assert renderer._executor is None
+        for process in processes:
+            process.join(timeout=5)
+            assert not process.is_alive()
+
+
+@pytest.mark.unit
+class TestGeneratorSetupCache:
+    def test_fonts_registered_once(self):
+        from src.book import pdf_generator
+
+        PDFBookGenerator()
+        with patch.object(pdf_generator, "_register_fonts", side_effect=AssertionError("fonts resolved again")):
+            generator = PDFBookGenerator(style=BookStyle.MODERN)
+        assert generator.base_font == pdf_generator.get_book_fonts().base_font
+
+    def test_style_sheet_shared_per_style_and_theme(self):
+        first = PDFBookGenerator(style=BookStyle.VINTAGE, theme=BookTheme.DARK)
+        second = PDFBookGenerator(style=BookStyle.VINTAGE, theme=BookTheme.DARK)
+        light = PDFBookGenerator(style=BookStyle.VINTAGE, theme=BookTheme.LIGHT)
+
+        assert first.styles is second.styles
+        assert first.config is second.config
+        assert light.styles is not first.styles
+        assert light.config["page_bg"] != first.config["page_bg"]
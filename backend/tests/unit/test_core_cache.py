@@ -0,0 +1,38 @@
+"""Unit тесты для общего кэша с TTL и версиями ключей."""
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.core.cache import VersionedTTLCache
+
+
+class WordCache(VersionedTTLCache[str, str]):
+    def _key(self, value: str) -> str:
+        return value[0]
+
+    def _size(self, value: str) -> int:
+        return len(value)
+
+
+@pytest.mark.unit
+class TestVersionedTTLCache:
+    async def test_none_not_cached(self):
+        cache = WordCache(ttl_seconds=60, max_size=10)
+        loader = AsyncMock(return_value=None)
+        assert await cache.get_or_load("a", loader) is None
+        assert await cache.get_or_load("a", loader) is None
+        assert loader.await_count == 2
+
+    def test_size_limit_evicts_lru(self):
+        cache = WordCache(ttl_seconds=60, max_size=6)
+        cache.put("abc")
+        cache.put("bcd")
+        cache.get("a")
+        cache.put("cd")
+        assert cache.get("b") is None
+        assert cache.get("a") == "abc" and cache.get("c") == "cd"
+
+    def test_oversized_value_skipped(self):
+        cache = WordCache(ttl_seconds=60, max_size=2)
+        cache.put("abc")
+        assert cache.stats()["entries"] == 0
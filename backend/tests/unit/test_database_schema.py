@@ -0,0 +1,58 @@
+"""Unit тесты для обновления схемы существующей БД при старте."""
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.database.schema import ensure_schema
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.unit
+class TestEnsureSchema:
+    async def test_adds_new_columns_to_existing_table(self, engine):
+        # book_generations в том виде, в каком она была до фоновых задач
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                "CREATE TABLE book_generations ("
+                "id INTEGER PRIMARY KEY, user_id INTEGER, status VARCHAR(32), filename VARCHAR(255), "
+                "s3_key VARCHAR(512), s3_url VARCHAR(1024), file_size_bytes BIGINT, "
+                "error_message VARCHAR(512), created_at DATETIME, completed_at DATETIME)"
+            ))
+            await conn.execute(text("INSERT INTO book_generations (id, user_id, status) VALUES (1, 1, 'completed')"))
+
+        await ensure_schema(engine)
+        # Повторный запуск ничего не меняет
+        await ensure_schema(engine)
+
+        async with engine.connect() as conn:
+            columns = await conn.run_sync(
+                lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns("book_generations")}
+            )
+            indexes = await conn.run_sync(
+                lambda sync_conn: {i["name"] for i in inspect(sync_conn).get_indexes("book_generations")}
+            )
+            row = (await conn.execute(text(
+                "SELECT status, kind, progress, stage, updated_at FROM book_generations WHERE id = 1"
+            ))).one()
+
+        assert {"kind", "stage", "progress", "request_params", "artifacts", "updated_at"} <= columns
+        assert "ix_book_generations_id" in indexes
+        assert tuple(row) == ("completed", "stream", 0, None, None)
+
+    async def test_creates_missing_tables(self, engine):
+        await ensure_schema(engine)
+
+        async with engine.connect() as conn:
+            tables = await conn.run_sync(lambda sync_conn: set(inspect(sync_conn).get_table_names()))
+        assert {"book_generations", "stories", "revoked_tokens"} <= tables
@@ -0,0 +1,119 @@
+"""Unit тесты для кэша тарифов и прав пользователей."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.subscription.entitlements import Entitlements, EntitlementsCache, PlanCache
+from src.subscription.enums import PlanType
+from tests.factories import make_plan, make_quota
+
+
+def make_entitlements(user_id: int = 1, **usage) -> Entitlements:
+    quota = make_quota(user_id=user_id, **usage)
+    return Entitlements.from_models(user_id, make_plan(), quota)
+
+
+@pytest.mark.unit
+class TestEntitlements:
+    def test_from_models(self):
+        entitlements = make_entitlements(ai_requests_used=3, storage_used_mb=7)
+        assert entitlements.used("ai_requests_used") == 3
+        assert entitlements.used("storage_used_mb") == 7
+        assert entitlements.limit("max_ai_requests_month") == 10
+        assert entitlements.period_end.tzinfo is not None
+
+    def test_naive_period_treated_as_utc(self):
+        quota = make_quota()
+        quota.period_end = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=1)
+        entitlements = Entitlements.from_models(1, make_plan(), quota)
+        assert entitlements.is_current()
+
+
+@pytest.mark.unit
+class TestEntitlementsCache:
+    async def test_hit_after_load(self):
+        cache = EntitlementsCache(ttl_seconds=60, max_entries=10)
+        loader = AsyncMock(return_value=make_entitlements())
+        await cache.get_or_load(1, loader)
+        await cache.get_or_load(1, loader)
+        assert loader.await_count == 1
+        assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    async def test_ttl_expiry(self):
+        cache = EntitlementsCache(ttl_seconds=0.01, max_entries=10)
+        cache.put(make_entitlements())
+        await asyncio.sleep(0.02)
+        assert cache.get(1) is None
+
+    async def test_past_period_not_returned(self):
+        cache = EntitlementsCache(ttl_seconds=60, max_entries=10)
+        entitlements = make_entitlements()
+        entitlements.period_end = datetime.now(timezone.utc) - timedelta(seconds=1)
+        cache.put(entitlements)
+        assert cache.get(1) is None
+
+    async def test_update_usage(self):
+        cache = EntitlementsCache(ttl_seconds=60, max_entries=10)
+        cache.put(make_entitlements(ai_requests_used=1))
+        cache.update_usage(1, make_quota(ai_requests_used=3, storage_used_mb=4))
+        assert cache.get(1).used("ai_requests_used") == 3
+        assert cache.get(1).used("storage_used_mb") == 4
+
+    async def test_invalidate_during_load_skips_put(self):
+        cache = EntitlementsCache(ttl_seconds=60, max_entries=10)
+
+        async def loader():
+            cache.invalidate(1)
+            return make_entitlements()
+
+        await cache.get_or_load(1, loader)
+        assert cache.get(1) is None
+
+    async def test_invalidate_on_commit(self, test_session):
+        """Снимок, загруженный до коммита смены подписки, сбрасывается после коммита"""
+        cache = EntitlementsCache(ttl_seconds=60, max_entries=10)
+        cache.invalidate_on_commit(test_session, 1)
+        cache.put(make_entitlements())
+        await test_session.commit()
+        assert cache.get(1) is None
+
+    async def test_lru_limit(self):
+        cache = EntitlementsCache(ttl_seconds=60, max_entries=1)
+        cache.put(make_entitlements(user_id=1))
+        cache.put(make_entitlements(user_id=2))
+        assert cache.get(1) is None
+        assert cache.get(2) is not None
+
+
+@pytest.mark.unit
+class TestPlanCache:
+    async def test_get_by_name_cached(self):
+        cache = PlanCache(ttl_seconds=60)
+        repo = AsyncMock()
+        repo.get_by_name.return_value = make_plan(name=PlanType.FREE)
+        first = await cache.get_by_name(repo, PlanType.FREE)
+        second = await cache.get_by_name(repo, PlanType.FREE)
+        assert first is second
+        assert first.name == PlanType.FREE
+        repo.get_by_name.assert_awaited_once()
+
+    async def test_missing_plan_not_cached(self):
+        cache = PlanCache(ttl_seconds=60)
+        repo = AsyncMock()
+        repo.get_by_name.return_value = None
+        assert await cache.get_by_name(repo, PlanType.PRO) is None
+        assert await cache.get_by_name(repo, PlanType.PRO) is None
+        assert repo.get_by_name.await_count == 2
+
+    async def test_get_all_active_and_clear(self):
+        cache = PlanCache(ttl_seconds=60)
+        repo = AsyncMock()
+        repo.get_all_active.return_value = [make_plan(name=PlanType.FREE), make_plan(id=2, name=PlanType.PRO)]
+        plans = await cache.get_all_active(repo)
+        assert [p.name for p in plans] == [PlanType.FREE, PlanType.PRO]
+        await cache.get_all_active(repo)
+        cache.clear()
+        await cache.get_all_active(repo)
+        assert repo.get_all_active.await_count == 2
@@ -0,0 +1,124 @@
+"""Unit тесты для FamilyGraph и FamilyGraphCache — обход и кэш без БД."""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.family.enums import Gender, KinshipType, RelationshipType
+from src.family.graph import FamilyGraph, FamilyGraphCache
+from tests.factories import make_relative, make_relationship
+
+
+def build_graph(user_id: int = 1) -> FamilyGraph:
+    """Дед(1) -> отец(2) -> сын(3), дочь(4); сын женат на 5, мать жены — 6; 7 — сын дочери."""
+    relatives = [
+        make_relative(id=i, user_id=user_id, first_name=f"R{i}")
+        for i in range(1, 8)
+    ]
+    relatives[4].gender = Gender.FEMALE
+    edges = [
+        (1, 2, RelationshipType.FATHER),
+        (2, 3, RelationshipType.FATHER),
+        (2, 4, RelationshipType.FATHER),
+        (3, 5, RelationshipType.HUSBAND),
+        (6, 5, RelationshipType.MOTHER),
+        (4, 7, RelationshipType.MOTHER),
+    ]
+    relationships = [
+        make_relationship(id=n, user_id=user_id, from_relative_id=a, to_relative_id=b, relationship_type=t)
+        for n, (a, b, t) in enumerate(edges, start=1)
+    ]
+    return FamilyGraph.from_models(user_id, relatives, relationships, {1: ["История"]})
+
+
+@pytest.mark.unit
+class TestFamilyGraphKinship:
+    def test_classifies_all_kinds(self):
+        kinds = {hit["relative_id"]: hit["kinship"] for hit in build_graph().kinship(3)}
+        assert kinds == {
+            2: KinshipType.ANCESTOR,
+            1: KinshipType.ANCESTOR,
+            4: KinshipType.SIBLING,
+            5: KinshipType.SPOUSE,
+            6: KinshipType.IN_LAW,
+            7: KinshipType.COLLATERAL,
+        }
+
+    def test_path_and_degree(self):
+        hits = {hit["relative_id"]: hit for hit in build_graph().kinship(3)}
+        assert hits[7]["path"] == [3, 2, 4, 7]
+        assert hits[7]["degree"] == 3
+        assert (hits[7]["generations_up"], hits[7]["generations_down"]) == (1, 2)
+
+    def test_filter_and_depth(self):
+        graph = build_graph()
+        assert [h["relative_id"] for h in graph.kinship(1, KinshipType.DESCENDANT, max_depth=1)] == [2]
+        assert {h["relative_id"] for h in graph.kinship(1, KinshipType.DESCENDANT)} == {2, 3, 4, 7}
+
+    def test_unknown_relative(self):
+        assert build_graph().kinship(999) == []
+
+    def test_statistics(self):
+        graph = build_graph()
+        relatives_stats = graph.relatives_statistics()
+        assert relatives_stats["total_relatives"] == 7
+        assert relatives_stats["gender_distribution"]["female"] == 1
+        assert relatives_stats["total_stories"] == 1
+        relationships_stats = graph.relationships_statistics()
+        assert relationships_stats["total_relationships"] == 6
+        assert relationships_stats["relationship_types_count"] == 3
+
+
+@pytest.mark.unit
+class TestFamilyGraphCache:
+    async def test_hit_and_invalidate(self):
+        cache = FamilyGraphCache(max_bytes=10 ** 6, ttl_seconds=60)
+        loads = []
+
+        async def loader():
+            loads.append(1)
+            return build_graph()
+
+        await cache.get_or_load(1, loader)
+        await cache.get_or_load(1, loader)
+        assert len(loads) == 1
+        assert cache.stats()["hits"] == 1
+
+        cache.invalidate(1)
+        await cache.get_or_load(1, loader)
+        assert len(loads) == 2
+
+    async def test_invalidate_during_load_skips_store(self):
+        cache = FamilyGraphCache(max_bytes=10 ** 6, ttl_seconds=60)
+
+        async def loader():
+            cache.invalidate(1)
+            return build_graph()
+
+        await cache.get_or_load(1, loader)
+        assert cache.get(1) is None
+
+    async def test_invalidate_on_commit_drops_graph_loaded_before_commit(self, test_session):
+        """Граф, загруженный между записью и коммитом, сбрасывается после коммита"""
+        cache = FamilyGraphCache(max_bytes=10 ** 6, ttl_seconds=60)
+        cache.invalidate_on_commit(test_session, 1)
+        await cache.get_or_load(1, AsyncMock(return_value=build_graph()))
+        assert cache.get(1) is not None
+        await test_session.commit()
+        assert cache.get(1) is None
+
+    def test_memory_cap_evicts_lru(self):
+        graph_size = build_graph().size_bytes
+        cache = FamilyGraphCache(max_bytes=graph_size * 2, ttl_seconds=60)
+        cache.put(build_graph(1))
+        cache.put(build_graph(2))
+        cache.get(1)
+        cache.put(build_graph(3))
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert cache.stats()["bytes"] <= cache.max_bytes
+
+    def test_ttl_expiry(self):
+        cache = FamilyGraphCache(max_bytes=10 ** 6, ttl_seconds=10)
+        with patch("src.core.cache.time.monotonic", return_value=100.0):
+            cache.put(build_graph())
+        with patch("src.core.cache.time.monotonic", return_value=111.0):
+            assert cache.get(1) is None
@@ -8,7 +8,7 @@ from src.auth.security import (
     create_access_token_for_user,
     create_refresh_token_for_user,
     revoke_token,
-    REVOKED_TOKENS,
+    is_token_revoked,
     verify_telegram_auth,
     security,
 )
@@ -38,13 +38,23 @@ class TestJWTTokens:
 
     async def test_revoke_token(self):
         token = create_access_token_for_user(user_id=1)
-        revoke_token(token)
-        assert token in REVOKED_TOKENS
-        REVOKED_TOKENS.discard(token)
+        await revoke_token(token)
+        assert is_token_revoked(token) is True
 
     async def test_unrevoked_token_not_in_blocklist(self):
         token = create_access_token_for_user(user_id=999)
-        assert token not in REVOKED_TOKENS
+        assert is_token_revoked(token) is False
+
+    async def test_revocation_is_per_jti(self):
+        """Отзыв одного токена не затрагивает другой токен того же пользователя"""
+        first = create_access_token_for_user(user_id=7)
+        second = create_access_token_for_user(user_id=7)
+        await revoke_token(first)
+        assert is_token_revoked(first) is True
+        assert is_token_revoked(second) is False
+
+    async def test_garbage_token_not_revoked(self):
+        assert is_token_revoked("not-a-jwt") is False
 
 
 @pytest.mark.unit
@@ -0,0 +1,136 @@
+"""Unit тесты для кэша ответов LLM — отдельная in-memory БД, без обращений к AI."""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.ai.cache import LLMResponseCache
+from src.ai.models import LLMResponseCacheModel
+from src.book.exceptions import BookTextNotCachedError
+from src.book.schemas import BookStyle, BookTextMode
+from src.book.service import BookService
+from src.database.base import Base
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+@pytest.fixture
+def cache(session_factory):
+    return LLMResponseCache(ttl_seconds=3600, max_bytes=10_000, session_factory=session_factory)
+
+
+def llm_response(content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+    )
+
+
+@pytest.mark.unit
+class TestLLMResponseCache:
+    def test_key_depends_on_all_inputs(self):
+        key = LLMResponseCache.make_key("m", "prompt", 0.7, 100)
+        assert key == LLMResponseCache.make_key("m", "prompt", 0.7, 100)
+        assert key != LLMResponseCache.make_key("m", "prompt!", 0.7, 100)
+        assert key != LLMResponseCache.make_key("m", "prompt", 0.3, 100)
+        assert key != LLMResponseCache.make_key("m2", "prompt", 0.7, 100)
+
+    async def test_put_get_roundtrip(self, cache, session_factory):
+        assert await cache.get("k") is None
+        await cache.put("k", "m", "Глава")
+        assert await cache.get("k") == "Глава"
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+        async with session_factory() as session:
+            entry = await session.get(LLMResponseCacheModel, "k")
+        assert entry.hits == 1
+        assert entry.size_bytes == len("Глава".encode("utf-8"))
+
+    async def test_expired_entry_ignored_and_pruned(self, cache, session_factory):
+        await cache.put("k", "m", "old")
+        async with session_factory() as session:
+            entry = await session.get(LLMResponseCacheModel, "k")
+            entry.created_at = datetime.now(timezone.utc) - timedelta(hours=2)
+            await session.commit()
+
+        assert await cache.get("k") is None
+        assert await cache.prune() == 1
+
+    async def test_prune_evicts_least_recently_used(self, cache, session_factory):
+        cache.max_bytes = 10
+        now = datetime.now(timezone.utc)
+        for i, key in enumerate(["a", "b", "c"]):
+            await cache.put(key, "m", "x" * 5)
+            async with session_factory() as session:
+                entry = await session.get(LLMResponseCacheModel, key)
+                entry.last_used_at = now - timedelta(minutes=10 - i)
+                await session.commit()
+
+        assert await cache.prune() == 1
+        assert await cache.get("a") is None
+        assert await cache.get("b") == "xxxxx"
+
+    async def test_disabled_cache(self, session_factory):
+        cache = LLMResponseCache(ttl_seconds=3600, max_bytes=10_000, enabled=False, session_factory=session_factory)
+        await cache.put("k", "m", "text")
+        assert await cache.get("k") is None
+
+
+@pytest.mark.unit
+class TestBookTextModes:
+    @pytest.fixture
+    def service(self, cache):
+        service = BookService()
+        service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=AsyncMock(return_value=llm_response("Текст главы"))
+        )))
+        with patch("src.book.service.llm_response_cache", cache), \
+                patch("src.book.service._save_ai_usage", AsyncMock()) as save_usage:
+            service.save_usage = save_usage
+            yield service
+
+    async def test_cached_mode_calls_llm_once(self, service):
+        first = await service._complete("prompt", 0.7, 100)
+        second = await service._complete("prompt", 0.7, 100)
+
+        assert first == second == "Текст главы"
+        service.client.chat.completions.create.assert_awaited_once()
+        service.save_usage.assert_awaited_once()
+
+    async def test_fresh_mode_bypasses_and_overwrites(self, service):
+        await service._complete("prompt", 0.7, 100)
+        service.client.chat.completions.create.return_value = llm_response("Новый текст")
+
+        assert await service._complete("prompt", 0.7, 100, BookTextMode.FRESH) == "Новый текст"
+        assert await service._complete("prompt", 0.7, 100) == "Новый текст"
+        assert service.client.chat.completions.create.await_count == 2
+
+    async def test_reuse_mode_never_calls_llm(self, service):
+        with pytest.raises(BookTextNotCachedError):
+            await service._complete("prompt", 0.7, 100, BookTextMode.REUSE)
+        service.client.chat.completions.create.assert_not_awaited()
+
+        await service._complete("prompt", 0.7, 100)
+        assert await service._complete("prompt", 0.7, 100, BookTextMode.REUSE) == "Текст главы"
+
+    async def test_invalid_outline_not_cached(self, service):
+        service.client.chat.completions.create.return_value = llm_response("не JSON")
+
+        outline = await service._generate_outline("контекст", "ru", BookStyle.CLASSIC, "")
+        assert outline["title"] == "История нашей семьи"
+        await service._generate_outline("контекст", "ru", BookStyle.CLASSIC, "")
+        assert service.client.chat.completions.create.await_count == 2
@@ -40,3 +40,61 @@ class TestPasswordHashing:
         assert await verify_password("test", "not$a$valid$hash") is False
         assert await verify_password("test", "") is False
         assert await verify_password("test", "random_string") is False
+
+
+@pytest.mark.unit
+class TestPasswordHasher:
+    async def test_event_loop_not_blocked(self):
+        import asyncio
+        import time
+        from src.users.security import PasswordHasher
+
+        hasher = PasswordHasher(workers=2, max_queue=4, iterations=600000)
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        try:
+            await asyncio.gather(hasher.hash("Password1!"), hasher.hash("Password2!"))
+        finally:
+            task.cancel()
+            hasher.shutdown()
+        # Пока считаются хеши, loop продолжает обслуживать другие корутины
+        assert len(ticks) > 3
+        assert max(b - a for a, b in zip(ticks, ticks[1:])) < 0.1
+
+    async def test_queue_limit_rejects_excess(self):
+        import asyncio
+        from src.users.exceptions import PasswordHashingBusyError
+        from src.users.security import PasswordHasher
+
+        hasher = PasswordHasher(workers=1, max_queue=1, iterations=50000)
+        try:
+            results = await asyncio.gather(
+                *(hasher.hash(f"Password{i}!") for i in range(4)), return_exceptions=True
+            )
+        finally:
+            hasher.shutdown()
+        assert sum(isinstance(r, PasswordHashingBusyError) for r in results) == 2
+        stats = hasher.stats()
+        assert stats["rejected"] == 2
+        assert stats["max_pending"] == 2
+        assert stats["completed"] == 2
+        assert stats["pending"] == 0
+
+    async def test_needs_rehash_on_iterations_change(self):
+        from src.users.security import PasswordHasher
+
+        hasher = PasswordHasher(workers=1, max_queue=0, iterations=1000)
+        hashed = await hasher.hash("Password1!")
+        assert not hasher.needs_rehash(hashed)
+
+        hasher.iterations = 2000
+        assert hasher.needs_rehash(hashed)
+        assert await hasher.verify("Password1!", hashed)
+        assert not hasher.needs_rehash("garbage")
+        hasher.shutdown()
@@ -0,0 +1,88 @@
+"""Unit тесты для кэша текущего пользователя."""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.users.cache import PrincipalCache
+from src.users.models import UserModel
+
+
+def make_user(user_id: int = 1, **fields) -> UserModel:
+    values = dict(id=user_id, username=f"user{user_id}", password="pbkdf2$hash", is_active=True, is_superuser=False)
+    values.update(fields)
+    return UserModel(**values)
+
+
+@pytest.mark.unit
+class TestPrincipalCache:
+    async def test_miss_then_hit(self):
+        cache = PrincipalCache(ttl_seconds=60, max_entries=10)
+        loader = AsyncMock(return_value=make_user())
+        first = await cache.get_or_load(1, loader)
+        second = await cache.get_or_load(1, loader)
+        assert loader.await_count == 1
+        assert second.username == first.username
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    async def test_returns_copies_without_password(self):
+        cache = PrincipalCache(ttl_seconds=60, max_entries=10)
+        cache.put(make_user())
+        first = cache.get(1)
+        first.is_active = False
+        second = cache.get(1)
+        assert second is not first
+        assert second.is_active is True
+        assert second.password is None
+
+    async def test_ttl_expiry(self):
+        cache = PrincipalCache(ttl_seconds=0.01, max_entries=10)
+        cache.put(make_user())
+        await asyncio.sleep(0.02)
+        assert cache.get(1) is None
+
+    async def test_disabled_with_zero_ttl(self):
+        cache = PrincipalCache(ttl_seconds=0, max_entries=10)
+        cache.put(make_user())
+        assert cache.get(1) is None
+
+    async def test_lru_limit(self):
+        cache = PrincipalCache(ttl_seconds=60, max_entries=2)
+        for user_id in (1, 2):
+            cache.put(make_user(user_id))
+        cache.get(1)
+        cache.put(make_user(3))
+        assert cache.get(2) is None
+        assert cache.get(1) is not None and cache.get(3) is not None
+
+    async def test_invalidate(self):
+        cache = PrincipalCache(ttl_seconds=60, max_entries=10)
+        cache.put(make_user())
+        cache.invalidate(1)
+        assert cache.get(1) is None
+
+    async def test_invalidate_during_load_skips_put(self):
+        """Пользователь, загруженный до инвалидации, не попадает в кэш"""
+        cache = PrincipalCache(ttl_seconds=60, max_entries=10)
+
+        async def loader():
+            cache.invalidate(1)
+            return make_user()
+
+        await cache.get_or_load(1, loader)
+        assert cache.get(1) is None
+
+    async def test_loader_error_not_cached(self):
+        cache = PrincipalCache(ttl_seconds=60, max_entries=10)
+        with pytest.raises(LookupError):
+            await cache.get_or_load(1, AsyncMock(side_effect=LookupError))
+        assert cache.stats()["entries"] == 0
+
+    async def test_invalidate_on_commit(self, test_session):
+        """Пользователь, закэшированный до коммита деактивации, сбрасывается после коммита"""
+        cache = PrincipalCache(ttl_seconds=60, max_entries=10)
+        cache.invalidate_on_commit(test_session, 1)
+        cache.put(make_user())
+        await test_session.commit()
+        assert cache.get(1) is None
@@ -2,7 +2,7 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 
-from src.subscription.quota_service import QuotaService
+from src.subscription.quota_service import QuotaService, current_period
 from src.subscription.enums import QuotaResource, PlanType
 from src.subscription.exceptions import QuotaExceededError
 from tests.factories import make_plan, make_quota
@@ -129,28 +129,77 @@ class TestEnforceQuota:
 
 @pytest.mark.unit
 class TestIncrementQuota:
-    async def test_increment_updates_field(self):
-        quota = make_quota(ai_requests_used=5)
+    async def test_increment_is_single_upsert(self):
         quota_repo = AsyncMock()
-        quota_repo.get_current.return_value = quota
+        quota_repo.increment.return_value = make_quota(ai_requests_used=6)
 
         svc = QuotaService(AsyncMock(), AsyncMock(), quota_repo, AsyncMock())
         await svc.increment_quota(1, QuotaResource.AI_REQUESTS)
 
-        quota_repo.update.assert_called_once()
-        call_kwargs = quota_repo.update.call_args[1]
-        assert call_kwargs["ai_requests_used"] == 6
+        quota_repo.increment.assert_awaited_once()
+        assert quota_repo.increment.call_args[1] == {"ai_requests_used": 1}
+        quota_repo.get_current.assert_not_called()
+        quota_repo.update.assert_not_called()
 
     async def test_increment_custom_amount(self):
-        quota = make_quota(tree_generations_used=2)
         quota_repo = AsyncMock()
-        quota_repo.get_current.return_value = quota
+        quota_repo.increment.return_value = make_quota(tree_generations_used=5)
 
         svc = QuotaService(AsyncMock(), AsyncMock(), quota_repo, AsyncMock())
         await svc.increment_quota(1, QuotaResource.TREE_GENERATIONS, amount=3)
 
-        call_kwargs = quota_repo.update.call_args[1]
-        assert call_kwargs["tree_generations_used"] == 5
+        assert quota_repo.increment.call_args[1] == {"tree_generations_used": 3}
+
+    async def test_increment_period_is_current_month(self):
+        quota_repo = AsyncMock()
+        quota_repo.increment.return_value = make_quota()
+
+        svc = QuotaService(AsyncMock(), AsyncMock(), quota_repo, AsyncMock())
+        await svc.increment_quota(7, QuotaResource.AI_REQUESTS)
+
+        user_id, period_start, period_end = quota_repo.increment.call_args[0]
+        assert user_id == 7
+        assert period_start == current_period()[0]
+        assert period_end == current_period()[1]
+
+
+@pytest.mark.unit
+class TestConsumeQuota:
+    def _make_service(self, plan, consumed=None):
+        sub_repo = AsyncMock()
+        sub_repo.get_active_by_user.return_value = None
+        plan_repo = AsyncMock()
+        plan_repo.get_by_name.return_value = plan
+        quota_repo = AsyncMock()
+        quota_repo.get_current.return_value = make_quota(ai_requests_used=9)
+        quota_repo.consume.return_value = consumed
+        return QuotaService(plan_repo, sub_repo, quota_repo, AsyncMock())
+
+    async def test_consume_passes_limit_to_statement(self):
+        svc = self._make_service(make_plan(max_ai_requests_month=10), consumed=make_quota(ai_requests_used=10))
+        await svc.consume_quota(1, QuotaResource.AI_REQUESTS)
+        args = svc.quota_repo.consume.call_args[0]
+        assert args[0] == 1
+        assert args[3:] == ("ai_requests_used", 1, 10)
+        svc.quota_repo.increment.assert_not_called()
+
+    async def test_consume_rejected_raises(self):
+        svc = self._make_service(make_plan(max_ai_requests_month=10), consumed=None)
+        with pytest.raises(QuotaExceededError):
+            await svc.consume_quota(1, QuotaResource.AI_REQUESTS)
+
+    async def test_consume_unlimited_increments(self):
+        svc = self._make_service(make_plan(max_ai_requests_month=-1))
+        svc.quota_repo.increment.return_value = make_quota()
+        await svc.consume_quota(1, QuotaResource.AI_REQUESTS)
+        svc.quota_repo.consume.assert_not_called()
+        svc.quota_repo.increment.assert_awaited_once()
+
+    async def test_consume_absolute_limit_only_checks(self):
+        svc = self._make_service(make_plan(max_relatives=-1))
+        await svc.consume_quota(1, QuotaResource.RELATIVES)
+        svc.quota_repo.consume.assert_not_called()
+        svc.quota_repo.increment.assert_not_called()
 
 
 @pytest.mark.unit
@@ -181,6 +230,21 @@ class TestStorageLimit:
         svc = QuotaService(plan_repo, sub_repo, quota_repo, AsyncMock())
         assert await svc.check_storage_limit(1, 10.0) is False
 
+    async def test_enforce_storage_limit_raises(self):
+        plan = make_plan(max_storage_mb=50)
+        quota = make_quota(storage_used_mb=45)
+        sub_repo = AsyncMock()
+        sub_repo.get_active_by_user.return_value = None
+        plan_repo = AsyncMock()
+        plan_repo.get_by_name.return_value = plan
+        quota_repo = AsyncMock()
+        quota_repo.get_current.return_value = quota
+
+        svc = QuotaService(plan_repo, sub_repo, quota_repo, AsyncMock())
+        await svc.enforce_storage_limit(1, 5.0)
+        with pytest.raises(QuotaExceededError):
+            await svc.enforce_storage_limit(1, 10.0)
+
     async def test_storage_unlimited(self):
         plan = make_plan(max_storage_mb=-1)
         sub_repo = AsyncMock()
@@ -208,9 +272,46 @@ class TestGetOrCreateQuota:
         new_quota = make_quota()
         quota_repo = AsyncMock()
         quota_repo.get_current.return_value = None
-        quota_repo.create.return_value = new_quota
+        quota_repo.get_or_create.return_value = new_quota
 
         svc = QuotaService(AsyncMock(), AsyncMock(), quota_repo, AsyncMock())
         result = await svc.get_or_create_quota(1)
         assert result == new_quota
-        quota_repo.create.assert_called_once()
+        quota_repo.get_or_create.assert_awaited_once_with(1, *current_period())
+
+
+@pytest.mark.unit
+class TestEntitlementsCaching:
+    def _make_service(self, plan=None, quota=None):
+        sub_repo = AsyncMock()
+        sub_repo.get_active_by_user.return_value = None
+        plan_repo = AsyncMock()
+        plan_repo.get_by_name.return_value = plan or make_plan()
+        quota_repo = AsyncMock()
+        quota_repo.get_current.return_value = quota or make_quota()
+        return QuotaService(plan_repo, sub_repo, quota_repo, AsyncMock())
+
+    async def test_repeated_enforce_uses_snapshot(self):
+        svc = self._make_service(plan=make_plan(max_ai_requests_month=10))
+        await svc.enforce_quota(1, QuotaResource.AI_REQUESTS)
+        await svc.enforce_quota(1, QuotaResource.AI_REQUESTS)
+        await svc.check_storage_limit(1, 1.0)
+        assert svc.subscription_repo.get_active_by_user.await_count == 1
+        assert svc.quota_repo.get_current.await_count == 1
+
+    async def test_free_plan_cached_across_services(self):
+        first = self._make_service()
+        second = self._make_service()
+        await first.get_user_plan(1)
+        await second.get_user_plan(2)
+        second.plan_repo.get_by_name.assert_not_called()
+
+    async def test_increment_updates_snapshot(self):
+        plan = make_plan(max_ai_requests_month=2)
+        svc = self._make_service(plan=plan, quota=make_quota(ai_requests_used=1))
+        svc.quota_repo.increment.return_value = make_quota(ai_requests_used=2)
+        await svc.enforce_quota(1, QuotaResource.AI_REQUESTS)
+        await svc.increment_quota(1, QuotaResource.AI_REQUESTS)
+        with pytest.raises(QuotaExceededError):
+            await svc.enforce_quota(1, QuotaResource.AI_REQUESTS)
+        assert svc.quota_repo.get_current.await_count == 1
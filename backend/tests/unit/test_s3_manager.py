@@ -0,0 +1,266 @@
+"""Unit тесты для S3Manager — фейковый клиент вместо aiobotocore."""
+import asyncio
+import hashlib
+import io
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import pytest
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from src.storage.s3.exceptions import FileTooLargeError
+from src.storage.s3.manager import S3Manager
+
+
+class FakeS3Client:
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.calls = []
+        self.parts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def put_object(self, **kwargs):
+        self.calls.append(("put_object", kwargs["Key"]))
+
+    async def create_multipart_upload(self, **kwargs):
+        self.calls.append(("create_multipart_upload", kwargs["ContentType"]))
+        return {"UploadId": "upload-1"}
+
+    async def upload_part(self, PartNumber, Body, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if PartNumber == self.fail_part:
+                raise ConnectionError("part failed")
+            self.parts[PartNumber] = Body
+            return {"ETag": f"etag-{PartNumber}"}
+        finally:
+            self.in_flight -= 1
+
+    async def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.calls.append(("complete_multipart_upload", MultipartUpload["Parts"]))
+
+    async def abort_multipart_upload(self, UploadId, **kwargs):
+        self.calls.append(("abort_multipart_upload", UploadId))
+
+    async def delete_object(self, Key, **kwargs):
+        self.calls.append(("delete_object", Key))
+
+    async def delete_objects(self, Delete, **kwargs):
+        keys = [item["Key"] for item in Delete["Objects"]]
+        self.calls.append(("delete_objects", keys))
+        return {"Errors": [{"Key": key, "Code": "AccessDenied"} for key in keys if "locked" in key]}
+
+
+def make_manager(client, part_size=4, part_concurrency=2):
+    manager = S3Manager(
+        access_key_id="k",
+        secret_access_key="s",
+        endpoint_url="https://s3.example.com",
+        bucket_name="bucket",
+        part_size=part_size,
+        part_concurrency=part_concurrency,
+    )
+
+    @asynccontextmanager
+    async def fake_client():
+        yield client
+
+    manager._client = fake_client
+    return manager
+
+
+def make_file(data: bytes, filename="video.mp4", content_type="video/mp4"):
+    return UploadFile(file=io.BytesIO(data), filename=filename, headers=Headers({"content-type": content_type}))
+
+
+def call_names(client):
+    return [name for name, _ in client.calls]
+
+
+@pytest.mark.unit
+class TestStreamingUpload:
+    async def test_small_file_single_put(self):
+        client = FakeS3Client()
+        result = await make_manager(client).upload_stream(make_file(b"abc"))
+
+        assert call_names(client) == ["put_object"]
+        assert result.size == 3
+        assert result.sha256 == hashlib.sha256(b"abc").hexdigest()
+        assert result.url == f"https://s3.example.com/bucket/{result.key}"
+        assert result.content_type == "video/mp4"
+
+    async def test_multipart_parts_in_order(self):
+        client = FakeS3Client()
+        data = b"0123456789abcdefghij-"
+        result = await make_manager(client).upload_stream(make_file(data))
+
+        assert call_names(client) == ["create_multipart_upload", "complete_multipart_upload"]
+        parts = client.calls[-1][1]
+        assert [p["PartNumber"] for p in parts] == [1, 2, 3, 4, 5, 6]
+        assert [p["ETag"] for p in parts] == [f"etag-{i}" for i in range(1, 7)]
+        assert b"".join(client.parts[i] for i in range(1, 7)) == data
+        assert client.max_in_flight == 2
+        assert result.size == len(data)
+        assert result.sha256 == hashlib.sha256(data).hexdigest()
+
+    async def test_failed_part_aborts_upload(self):
+        client = FakeS3Client(fail_part=2)
+        with pytest.raises(ConnectionError):
+            await make_manager(client).upload_stream(make_file(b"x" * 40))
+
+        assert call_names(client) == ["create_multipart_upload", "abort_multipart_upload"]
+
+    async def test_size_limit_enforced_while_streaming(self):
+        client = FakeS3Client()
+        with pytest.raises(FileTooLargeError) as exc_info:
+            await make_manager(client).upload_stream(make_file(b"x" * 40), max_size=10)
+
+        assert exc_info.value.max_size == 10
+        assert call_names(client) == ["create_multipart_upload", "abort_multipart_upload"]
+
+    async def test_legacy_upload_returns_tuple(self):
+        client = FakeS3Client()
+        key, url, content_type = await make_manager(client).upload(make_file(b"img", "a.png", "image/png"))
+
+        assert key.endswith(".png")
+        assert url.endswith(key)
+        assert content_type == "image/png"
+
+
+@pytest.mark.unit
+class TestBatchOperations:
+    async def test_delete_many_batches_and_reports_failures(self):
+        client = FakeS3Client()
+        manager = make_manager(client)
+        urls = [f"https://s3.example.com/bucket/uploads/{i}.jpg" for i in range(1500)]
+        urls.append("https://s3.example.com/bucket/uploads/locked.jpg")
+
+        with patch("src.storage.s3.manager.DELETE_BATCH_SIZE", 1000):
+            failed = await manager.delete_many(urls + urls[:3])
+
+        batches = [keys for name, keys in client.calls if name == "delete_objects"]
+        assert [len(b) for b in batches] == [1000, 501]
+        assert batches[0][0] == "uploads/0.jpg"
+        assert failed == ["https://s3.example.com/bucket/uploads/locked.jpg"]
+
+    async def test_upload_many_keeps_order(self):
+        client = FakeS3Client()
+        results = await make_manager(client).upload_many([
+            (b"a", "a.png", "image/png"),
+            (b"b", "b.pdf", "application/pdf"),
+        ])
+
+        assert [ct for _, _, ct in results] == ["image/png", "application/pdf"]
+        assert results[1][0].endswith(".pdf")
+        assert call_names(client) == ["put_object", "put_object"]
+
+    async def test_upload_many_cleans_up_on_failure(self):
+        client = FakeS3Client()
+        manager = make_manager(client)
+        real_upload = manager.upload_bytes
+
+        async def flaky(data, filename, content_type):
+            if filename == "bad.png":
+                raise ConnectionError("put failed")
+            return await real_upload(data, filename, content_type)
+
+        manager.upload_bytes = flaky
+        with pytest.raises(ConnectionError):
+            await manager.upload_many([(b"a", "a.png", "image/png"), (b"b", "bad.png", "image/png")])
+
+        deleted = [keys for name, keys in client.calls if name == "delete_objects"]
+        assert len(deleted) == 1 and deleted[0][0].endswith(".png")
+
+
+@pytest.mark.unit
+class TestSharedClient:
+    async def test_client_reused_between_start_and_close(self):
+        manager = S3Manager(
+            access_key_id="k", secret_access_key="s", endpoint_url="https://s3.example.com", bucket_name="b",
+        )
+        opened, closed = [], []
+
+        @asynccontextmanager
+        async def create_client(*args, **kwargs):
+            client = FakeS3Client()
+            opened.append(client)
+            yield client
+            closed.append(client)
+
+        with patch.object(manager._session, "create_client", create_client):
+            await manager.start()
+            await manager.upload_bytes(b"1", "a.txt", "text/plain")
+            await manager.delete("https://s3.example.com/b/a.txt")
+            assert len(opened) == 1 and not closed
+
+            await manager.close()
+            assert closed == opened
+
+            # Без долгоживущего клиента — клиент на вызов
+            await manager.upload_bytes(b"1", "a.txt", "text/plain")
+            assert len(opened) == 2
+
+
+@pytest.mark.unit
+class TestDirectUpload:
+    async def test_presigned_post_policy(self):
+        import base64
+        import json
+
+        # Подпись считается локально — настоящий клиент без обращений к сети
+        manager = S3Manager(
+            access_key_id="k",
+            secret_access_key="s",
+            endpoint_url="https://s3.example.com",
+            bucket_name="bucket",
+            region_name="ru-1",
+        )
+        upload = await manager.presign_upload("a.JPG", "image/jpeg", 1000, prefix="stories/1/2", expires_in=60)
+
+        assert upload.key.startswith("stories/1/2/") and upload.key.endswith(".jpg")
+        assert upload.object_url == f"https://s3.example.com/bucket/{upload.key}"
+        assert upload.fields["key"] == upload.key
+        policy = json.loads(base64.b64decode(upload.fields["policy"]))
+        assert ["content-length-range", 1, 1000] in policy["conditions"]
+        assert {"Content-Type": "image/jpeg"} in policy["conditions"]
+
+    async def test_head_missing_object(self):
+        from botocore.exceptions import ClientError
+
+        class HeadClient(FakeS3Client):
+            async def head_object(self, Key, **kwargs):
+                if Key == "missing":
+                    raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+                return {"ContentLength": 7, "ContentType": "image/png"}
+
+        manager = make_manager(HeadClient())
+        assert await manager.head("missing") is None
+        info = await manager.head("stories/1/2/a.png")
+        assert (info.size, info.content_type) == (7, "image/png")
+        assert info.url == "https://s3.example.com/bucket/stories/1/2/a.png"
+
+    async def test_list_objects_follows_continuation(self):
+        from datetime import datetime, timezone
+
+        modified = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        class ListClient(FakeS3Client):
+            async def list_objects_v2(self, Prefix, ContinuationToken=None, **kwargs):
+                self.calls.append(("list_objects_v2", Prefix, ContinuationToken))
+                if ContinuationToken is None:
+                    return {
+                        "Contents": [{"Key": "stories/1/2/a.jpg", "Size": 3, "LastModified": modified}],
+                        "IsTruncated": True,
+                        "NextContinuationToken": "next",
+                    }
+                return {"Contents": [{"Key": "stories/1/2/b.jpg", "Size": 4, "LastModified": modified}]}
+
+        client = ListClient()
+        objects = await make_manager(client).list_objects("stories/")
+        assert [o.key for o in objects] == ["stories/1/2/a.jpg", "stories/1/2/b.jpg"]
+        assert objects[1].url == "https://s3.example.com/bucket/stories/1/2/b.jpg"
+        assert client.calls == [("list_objects_v2", "stories/", None), ("list_objects_v2", "stories/", "next")]
@@ -0,0 +1,97 @@
+"""Unit тесты для дискового кэша и разбора заголовков прокси S3."""
+import os
+import time
+
+import pytest
+
+from src.core.ranges import RangeNotSatisfiableError, parse_range
+from src.storage.s3.proxy import STALE_FILE_SECONDS, ProxyDiskCache, etag_matches
+
+
+async def store(cache, url, data):
+    writer = cache.writer(url, size=len(data), content_type="image/jpeg", etag='"e"', last_modified=None)
+    await writer.write(data)
+    await writer.commit()
+
+
+@pytest.mark.unit
+class TestHeaders:
+    def test_parse_range(self):
+        assert parse_range(None, 10) is None
+        assert parse_range("bytes=2-4", 10) == (2, 4)
+        assert parse_range("bytes=5-", 10) == (5, 9)
+        assert parse_range("bytes=-3", 10) == (7, 9)
+        assert parse_range("bytes=8-100", 10) == (8, 9)
+        assert parse_range("bytes=0-1,4-5", 10) is None
+        assert parse_range("items=0-1", 10) is None
+        # last < first — некорректный диапазон, отдаётся весь объект
+        assert parse_range("bytes=5-2", 10) is None
+        with pytest.raises(RangeNotSatisfiableError):
+            parse_range("bytes=10-", 10)
+        with pytest.raises(RangeNotSatisfiableError):
+            parse_range("bytes=-0", 10)
+
+    def test_etag_matches(self):
+        assert etag_matches('"a", W/"b"', '"b"')
+        assert etag_matches("*", '"a"')
+        assert not etag_matches('"a"', '"b"')
+        assert not etag_matches('"a"', None)
+
+
+@pytest.mark.unit
+class TestProxyDiskCache:
+    async def test_lru_eviction_by_bytes(self, tmp_path):
+        cache = ProxyDiskCache(str(tmp_path), max_bytes=10, max_object_bytes=10, ttl_seconds=60)
+        await store(cache, "a", b"aaaa")
+        await store(cache, "b", b"bbbb")
+        assert cache.get("a") is not None
+        await store(cache, "c", b"cccc")
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.stats()["bytes"] == 8
+        assert len(list(tmp_path.glob("*.bin"))) == 2
+
+    async def test_incomplete_object_not_cached(self, tmp_path):
+        cache = ProxyDiskCache(str(tmp_path), max_bytes=100, max_object_bytes=100, ttl_seconds=60)
+        writer = cache.writer("a", size=10, content_type="image/jpeg", etag=None, last_modified=None)
+        await writer.write(b"12345")
+        await writer.commit()
+
+        assert cache.get("a") is None
+        assert list(tmp_path.iterdir()) == []
+        assert cache.writer("big", size=101, content_type="image/jpeg", etag=None, last_modified=None) is None
+
+    async def test_index_restored_after_restart(self, tmp_path):
+        cache = ProxyDiskCache(str(tmp_path), max_bytes=100, max_object_bytes=100, ttl_seconds=60)
+        await store(cache, "a", b"data")
+        old = time.time() - STALE_FILE_SECONDS - 1
+        for name in ("orphan.bin", f"k.{os.getpid() + 1}.abandoned.tmp"):
+            (tmp_path / name).write_bytes(b"x")
+            os.utime(tmp_path / name, (old, old))
+        (tmp_path / f"k.{os.getpid()}.own.tmp").write_bytes(b"x")
+
+        restored = ProxyDiskCache(str(tmp_path), max_bytes=100, max_object_bytes=100, ttl_seconds=60)
+        entry = restored.get("a")
+        assert entry.size == 4 and entry.etag == '"e"'
+        with restored.open(entry) as f:
+            assert f.read() == b"data"
+        assert sorted(p.suffix for p in tmp_path.iterdir()) == [".bin", ".json"]
+
+    async def test_other_workers_writes_kept_on_start(self, tmp_path):
+        """Незавершённые записи других воркеров в общем каталоге не удаляются"""
+        other_tmp = tmp_path / f"k.{os.getpid() + 1}.writing.tmp"
+        other_tmp.write_bytes(b"x")
+        (tmp_path / "k.bin").write_bytes(b"x")
+
+        cache = ProxyDiskCache(str(tmp_path), max_bytes=100, max_object_bytes=100, ttl_seconds=60)
+        assert cache.get("a") is None
+        assert other_tmp.exists() and (tmp_path / "k.bin").exists()
+
+    async def test_tmp_name_scoped_to_process(self, tmp_path):
+        cache = ProxyDiskCache(str(tmp_path), max_bytes=100, max_object_bytes=100, ttl_seconds=60)
+        writer = cache.writer("a", size=4, content_type="image/jpeg", etag=None, last_modified=None)
+        await writer.write(b"da")
+        [tmp] = tmp_path.glob("*.tmp")
+        assert tmp.name.split(".")[1] == str(os.getpid())
+        await writer.abort()
@@ -0,0 +1,108 @@
+"""Unit тесты для миниатюр фото — Pillow без сети, S3 — MockS3Manager."""
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from src.config import settings
+from src.storage.s3.thumbnails import (
+    ThumbnailPipeline, render_thumbnails, thumbnail_key, thumbnail_urls, urls_with_thumbnails,
+)
+
+
+def make_jpeg(width, height):
+    output = BytesIO()
+    Image.new("RGB", (width, height), (120, 80, 40)).save(output, "JPEG")
+    return output.getvalue()
+
+
+@pytest.mark.unit
+class TestThumbnailKeys:
+    def test_deterministic_key(self):
+        assert thumbnail_key("uploads/2026/01/02/abc.jpg", 256) == "thumbs/uploads/2026/01/02/abc/256.webp"
+
+    def test_urls_only_for_own_bucket_images(self):
+        base = f"{settings.endpoint_url.rstrip('/')}/{settings.bucket_name}"
+        urls = thumbnail_urls(f"{base}/uploads/a.PNG")
+        assert urls == {
+            "64": f"{base}/thumbs/uploads/a/64.webp",
+            "256": f"{base}/thumbs/uploads/a/256.webp",
+            "1024": f"{base}/thumbs/uploads/a/1024.webp",
+        }
+        assert thumbnail_urls(f"{base}/uploads/video.mp4") is None
+        assert thumbnail_urls(f"{base}/thumbs/uploads/a/64.webp") is None
+        assert thumbnail_urls("https://example.com/photo.jpg") is None
+        assert thumbnail_urls(None) is None
+        assert len(urls_with_thumbnails([f"{base}/uploads/a.jpg", f"{base}/uploads/v.mp4"])) == 5
+
+
+@pytest.mark.unit
+class TestRenderThumbnails:
+    def test_sizes_and_format(self):
+        result = render_thumbnails(make_jpeg(2000, 1000), (64, 256, 1024), quality=80)
+
+        for size, data in result.items():
+            with Image.open(BytesIO(data)) as image:
+                assert image.format == "WEBP"
+                assert max(image.size) == size
+        with Image.open(BytesIO(result[256])) as image:
+            assert image.size == (256, 128)
+
+    def test_small_image_not_upscaled(self):
+        result = render_thumbnails(make_jpeg(100, 50), (64, 256), quality=80)
+        with Image.open(BytesIO(result[256])) as image:
+            assert image.size == (100, 50)
+
+
+@pytest.mark.unit
+class TestThumbnailPipeline:
+    async def test_generate_uploads_under_deterministic_keys(self, mock_s3):
+        key, _, _ = await mock_s3.upload_bytes(make_jpeg(1200, 900), "photo.jpg", "image/jpeg")
+        pipeline = ThumbnailPipeline(workers=0)
+        try:
+            urls = await pipeline.generate(key, mock_s3)
+        finally:
+            await pipeline.shutdown()
+
+        assert set(urls) == {64, 256, 1024}
+        for size, url in urls.items():
+            assert url == f"{mock_s3.base_url}/{thumbnail_key(key, size)}"
+            assert url in mock_s3.files
+
+    async def test_schedule_logs_failures(self, mock_s3):
+        key, _, _ = await mock_s3.upload_bytes(b"not an image", "photo.jpg", "image/jpeg")
+        pipeline = ThumbnailPipeline(workers=0)
+        pipeline.schedule(key, mock_s3)
+        pipeline.schedule("uploads/video.mp4", mock_s3)
+        await pipeline.drain()
+        await pipeline.shutdown()
+
+        assert pipeline.stats() == {"pending": 0, "generated": 0, "failed": 1}
+
+
+@pytest.mark.unit
+class TestThumbnailBackfill:
+    async def test_generates_missing_thumbnails_once(self, mock_s3, test_session, test_relative):
+        from src.family.story_repository import StoryRepository
+        from src.storage.s3.thumbnails_backfill import backfill_thumbnails
+
+        profile_key, profile_url, _ = await mock_s3.upload_bytes(make_jpeg(300, 300), "face.jpg", "image/jpeg")
+        story_key, story_url, _ = await mock_s3.upload_bytes(make_jpeg(300, 200), "story.png", "image/png")
+        test_relative.image_url = profile_url
+        await StoryRepository(test_session).create(
+            test_relative.user_id, test_relative.id, "Фото", "",
+            [{"type": "image", "url": story_url}, {"type": "video", "url": f"{mock_s3.base_url}/v.mp4"}],
+        )
+        await test_session.flush()
+
+        pipeline = ThumbnailPipeline(workers=0)
+        try:
+            stats = await backfill_thumbnails(test_session, mock_s3, pipeline, batch_size=1)
+            again = await backfill_thumbnails(test_session, mock_s3, pipeline, batch_size=1)
+        finally:
+            await pipeline.shutdown()
+
+        assert stats == {"images": 2, "generated": 2, "existing": 0, "failed": 0}
+        assert again == {"images": 2, "generated": 0, "existing": 2, "failed": 0}
+        for key in (profile_key, story_key):
+            assert f"{mock_s3.base_url}/{thumbnail_key(key, 64)}" in mock_s3.files
@@ -0,0 +1,190 @@
+"""Unit тесты для хранилищ отозванных токенов — отдельная in-memory БД."""
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from src.auth.models import RevokedTokenModel
+from src.auth.revocation import (
+    DatabaseRevocationStore,
+    MemoryRevocationStore,
+    RevocationStore,
+    create_revocation_store,
+    token_revocation_key,
+)
+from src.auth.security import create_access_token_for_user
+from src.database.base import Base
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+async def count_rows(session_factory) -> int:
+    async with session_factory() as session:
+        return (await session.execute(select(func.count()).select_from(RevokedTokenModel))).scalar_one()
+
+
+@pytest.mark.unit
+class TestTokenRevocationKey:
+    def test_key_is_jti_and_exp(self):
+        token = create_access_token_for_user(user_id=1)
+        claims = jwt.decode(token, options={"verify_signature": False})
+        assert token_revocation_key(token) == (claims["jti"], float(claims["exp"]))
+
+    def test_invalid_token(self):
+        assert token_revocation_key("garbage") is None
+
+    def test_token_without_jti_uses_token_hash(self):
+        token = jwt.encode({"sub": "1"}, "secret", algorithm="HS256")
+        jti, exp = token_revocation_key(token)
+        assert jti == hashlib.sha256(token.encode()).hexdigest()
+        assert exp > time.time()
+
+    def test_long_jti_is_hashed(self):
+        token = jwt.encode({"sub": "1", "jti": "x" * 100}, "secret", algorithm="HS256")
+        jti, _ = token_revocation_key(token)
+        assert len(jti) == 64
+
+
+@pytest.mark.unit
+class TestMemoryRevocationStore:
+    async def test_revoke_and_lookup(self):
+        store = MemoryRevocationStore()
+        await store.revoke("a", time.time() + 60)
+        assert store.is_revoked("a") is True
+        assert store.is_revoked("b") is False
+
+    async def test_expired_entry_dropped_on_lookup(self):
+        store = MemoryRevocationStore()
+        store._entries["a"] = time.time() - 1
+        assert store.is_revoked("a") is False
+        assert len(store) == 0
+
+    async def test_already_expired_not_stored(self):
+        store = MemoryRevocationStore()
+        await store.revoke("a", time.time() - 1)
+        assert len(store) == 0
+
+    async def test_over_limit_drops_only_expired(self):
+        store = MemoryRevocationStore(max_entries=2)
+        store._entries["old"] = time.time() - 1
+        for jti in ("a", "b"):
+            await store.revoke(jti, time.time() + 60)
+        assert "old" not in store._entries
+
+        # Действующие отзывы не вытесняются даже сверх предела
+        for jti in ("c", "d", "e"):
+            await store.revoke(jti, time.time() + 60)
+        assert all(store.is_revoked(jti) for jti in ("a", "b", "c", "d", "e"))
+        assert store.stats()["overflows"] == 1
+
+    def test_base_store_is_abstract(self):
+        with pytest.raises(TypeError):
+            RevocationStore()
+
+    async def test_cleanup_in_batches(self):
+        store = MemoryRevocationStore(cleanup_batch_size=2)
+        for i in range(5):
+            store._entries[f"old{i}"] = time.time() - 1
+        await store.revoke("live", time.time() + 60)
+        assert await store.cleanup() == 5
+        assert len(store) == 1
+        assert store.is_revoked("live")
+
+
+@pytest.mark.unit
+class TestDatabaseRevocationStore:
+    async def test_revoke_writes_row_and_local_copy(self, session_factory):
+        store = DatabaseRevocationStore(session_factory=session_factory)
+        await store.revoke("a", time.time() + 60)
+        assert store.is_revoked("a") is True
+        assert await count_rows(session_factory) == 1
+
+    async def test_revoke_twice_single_row(self, session_factory):
+        store = DatabaseRevocationStore(session_factory=session_factory)
+        await store.revoke("a", time.time() + 60)
+        await store.revoke("a", time.time() + 60)
+        assert await count_rows(session_factory) == 1
+
+    async def test_sync_shares_revocations_between_workers(self, session_factory):
+        first = DatabaseRevocationStore(session_factory=session_factory)
+        second = DatabaseRevocationStore(session_factory=session_factory)
+        await second.sync()
+        await first.revoke("a", time.time() + 60)
+        assert second.is_revoked("a") is False
+        assert await second.sync() == 1
+        assert second.is_revoked("a") is True
+        # Повторная синхронизация не добавляет уже известные записи
+        assert await second.sync() == 0
+
+    async def test_sync_skips_expired_rows(self, session_factory):
+        async with session_factory() as session:
+            session.add(RevokedTokenModel(
+                jti="old",
+                expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
+                revoked_at=datetime.now(timezone.utc) - timedelta(hours=1),
+            ))
+            await session.commit()
+        store = DatabaseRevocationStore(session_factory=session_factory)
+        assert await store.sync() == 0
+        assert store.is_revoked("old") is False
+
+    async def test_cleanup_deletes_expired_rows_in_batches(self, session_factory):
+        now = datetime.now(timezone.utc)
+        async with session_factory() as session:
+            for i in range(5):
+                session.add(RevokedTokenModel(
+                    jti=f"old{i}", expires_at=now - timedelta(seconds=1), revoked_at=now - timedelta(hours=1)
+                ))
+            await session.commit()
+        store = DatabaseRevocationStore(session_factory=session_factory, cleanup_batch_size=2)
+        await store.revoke("live", time.time() + 60)
+        assert await store.cleanup() == 5
+        assert await count_rows(session_factory) == 1
+        assert store.is_revoked("live")
+
+    async def test_write_error_keeps_local_revocation(self):
+        def broken_factory():
+            raise RuntimeError("db down")
+
+        store = DatabaseRevocationStore(session_factory=broken_factory)
+        await store.revoke("a", time.time() + 60)
+        assert store.is_revoked("a") is True
+        assert store.stats()["write_errors"] == 1
+
+    async def test_start_loads_existing_and_stop(self, session_factory):
+        writer = DatabaseRevocationStore(session_factory=session_factory)
+        await writer.revoke("a", time.time() + 60)
+        store = DatabaseRevocationStore(session_factory=session_factory, sync_interval=3600)
+        await store.start()
+        try:
+            assert store.is_revoked("a") is True
+        finally:
+            await store.stop()
+        assert store._task is None
+
+
+@pytest.mark.unit
+class TestCreateRevocationStore:
+    def test_backends(self):
+        assert isinstance(create_revocation_store("memory"), MemoryRevocationStore)
+        assert isinstance(create_revocation_store("database"), DatabaseRevocationStore)
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_revocation_store("redis")
@@ -18,7 +18,7 @@ import {
 } from 'lucide-react'
 import {
   streamGenerateBook,
-  downloadPdfFromBase64,
+  downloadBookPdf,
   BookStyle,
   BookTheme,
 } from '@/lib/api/book'
@@ -38,7 +38,7 @@ interface BookSessionState {
   progress: number
   statusMessage: string
   currentChapter: string | null
-  pdfBase64: string | null
+  downloadUrl: string | null
   pdfFilename: string
   errorMessage: string | null
 }
@@ -74,7 +74,7 @@ export default function BookGeneratorPage() {
     if (typeof window === 'undefined') return 'idle'
     const saved = loadBookSession()
     if (saved) {
-      if (saved.status === 'completed' && saved.pdfBase64) return 'completed'
+      if (saved.status === 'completed' && saved.downloadUrl) return 'completed'
       if (saved.status === 'generating') return 'error' // generation interrupted
     }
     return 'idle'
@@ -101,10 +101,10 @@ export default function BookGeneratorPage() {
   })
 
   // PDF result
-  const [pdfBase64, setPdfBase64] = useState<string | null>(() => {
+  const [downloadUrl, setDownloadUrl] = useState<string | null>(() => {
     if (typeof window === 'undefined') return null
     const saved = loadBookSession()
-    return saved?.pdfBase64 ?? null
+    return saved?.downloadUrl ?? null
   })
   const [pdfFilename, setPdfFilename] = useState<string>(() => {
     if (typeof window === 'undefined') return 'family_book.pdf'
@@ -149,19 +149,19 @@ export default function BookGeneratorPage() {
     setStatusMessage('Начинаем генерацию...')
     setCurrentChapter(null)
     setErrorMessage(null)
-    setPdfBase64(null)
+    setDownloadUrl(null)
 
     saveBookSession({
       status: 'generating',
       progress: 0,
       statusMessage: 'Начинаем генерацию...',
       currentChapter: null,
-      pdfBase64: null,
+      downloadUrl: null,
       pdfFilename: 'family_book.pdf',
       errorMessage: null,
     })
 
-    let resultPdfBase64: string | null = null
+    let resultDownloadUrl: string | null = null
 
     try {
       const generator = streamGenerateBook(
@@ -189,13 +189,13 @@ export default function BookGeneratorPage() {
             progress: chunk.progress,
             statusMessage: chunk.message,
             currentChapter: chunk.current_chapter || null,
-            pdfBase64: null,
+            downloadUrl: null,
             pdfFilename: 'family_book.pdf',
             errorMessage: null,
           })
         } else if (chunk.type === 'result') {
-          resultPdfBase64 = chunk.pdf_base64
-          setPdfBase64(chunk.pdf_base64)
+          resultDownloadUrl = chunk.download_url
+          setDownloadUrl(chunk.download_url)
           setPdfFilename(chunk.filename)
           setGenerationStatus('completed')
           setStatusMessage('Книга успешно сгенерирована!')
@@ -205,7 +205,7 @@ export default function BookGeneratorPage() {
             progress: 100,
             statusMessage: 'Книга успешно сгенерирована!',
             currentChapter: null,
-            pdfBase64: chunk.pdf_base64,
+            downloadUrl: chunk.download_url,
             pdfFilename: chunk.filename,
             errorMessage: null,
           })
@@ -218,12 +218,12 @@ export default function BookGeneratorPage() {
             progress: 0,
             statusMessage: '',
             currentChapter: null,
-            pdfBase64: null,
+            downloadUrl: null,
             pdfFilename: 'family_book.pdf',
             errorMessage: chunk.message,
           })
         } else if (chunk.type === 'done') {
-          if (!resultPdfBase64) {
+          if (!resultDownloadUrl) {
             setGenerationStatus('error')
             setErrorMessage('Генерация завершилась без результата')
           }
@@ -251,10 +251,15 @@ export default function BookGeneratorPage() {
     abortControllerRef.current?.abort()
   }
 
-  const handleDownloadPdf = () => {
-    if (pdfBase64) {
-      downloadPdfFromBase64(pdfBase64, pdfFilename)
+  const handleDownloadPdf = async () => {
+    if (downloadUrl) {
       toast.success('PDF скачивается...')
+      try {
+        await downloadBookPdf(downloadUrl, pdfFilename)
+      } catch (error) {
+        console.error('Book download error:', error)
+        toast.error('Не удалось скачать книгу')
+      }
     }
   }
 
@@ -264,7 +269,7 @@ export default function BookGeneratorPage() {
     setStatusMessage('')
     setCurrentChapter(null)
     setErrorMessage(null)
-    setPdfBase64(null)
+    setDownloadUrl(null)
     clearBookSession()
   }
 
@@ -475,7 +480,7 @@ export default function BookGeneratorPage() {
                   </div>
                 )}
 
-                {generationStatus === 'completed' && pdfBase64 && (
+                {generationStatus === 'completed' && downloadUrl && (
                   <div className="mt-6 p-4 rounded-xl bg-green-900/20 border border-green-700/30">
                     <p className="text-muted-foreground mb-4">
                       Ваша семейная книга готова! Нажмите кнопку ниже, чтобы скачать PDF.
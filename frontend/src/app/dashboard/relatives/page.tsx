@@ -62,11 +62,6 @@ function calculateAge(birthDate: string, deathDate?: string | null): number | nu
   return age
 }
 
-function getStoriesCount(relative: FamilyRelative): number {
-  if (!relative.context) return 0
-  return Object.keys(relative.context).filter((k) => k !== 'interview_messages').length
-}
-
 export default function RelativesPage() {
   const { user, refreshStats } = useUser()
   const isMobile = useIsMobile()
@@ -138,8 +133,8 @@ export default function RelativesPage() {
     if (!user || !selectedRelative) return
     try {
       const updated = await familyApi.updateRelative(user.id, selectedRelative.id, data)
-      setRelatives((prev) => prev.map((r) => (r.id === updated.id ? { ...updated, context: selectedRelative.context } : r)))
-      setSelectedRelative({ ...updated, context: selectedRelative.context })
+      setRelatives((prev) => prev.map((r) => (r.id === updated.id ? { ...r, ...updated, context: r.context } : r)))
+      setSelectedRelative({ ...selectedRelative, ...updated, context: selectedRelative.context })
       toast.success('Данные обновлены')
       refreshStats()
     } catch (error) {
@@ -285,7 +280,7 @@ export default function RelativesPage() {
             const fullName = [rel.first_name, rel.last_name].filter(Boolean).join(' ') || 'Без имени'
             const age = rel.birth_date ? calculateAge(rel.birth_date, rel.death_date) : null
             const isDeceased = !!rel.death_date
-            const stories = getStoriesCount(rel)
+            const stories = rel.stories_count ?? 0
             const relCount = relationships.filter(
               (r) => r.from_relative_id === rel.id || r.to_relative_id === rel.id
             ).length
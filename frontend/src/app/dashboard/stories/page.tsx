@@ -9,7 +9,7 @@ import {
   Search,
   Filter,
 } from 'lucide-react'
-import { familyApi } from '@/lib/api/family'
+import { familyApi, storiesApi } from '@/lib/api/family'
 import { FamilyRelative, StoryMedia } from '@/types'
 import { getProxiedImageUrl } from '@/lib/utils'
 import { Image as ImageIcon } from 'lucide-react'
@@ -166,41 +166,25 @@ export default function StoriesPage() {
 
     const fetchData = async () => {
       try {
-        const relativesData = await familyApi.getRelatives(user.id)
+        const [relativesData, storiesData] = await Promise.all([
+          familyApi.getRelatives(user.id),
+          storiesApi.getUserStories(user.id),
+        ])
         setRelatives(relativesData)
 
-        const allStories: Story[] = []
-        relativesData.forEach((relative) => {
-          if (relative.context && typeof relative.context === 'object') {
-            Object.entries(relative.context).forEach(([key, value]) => {
-              if (key === 'interview_messages') return
-
-              if (value !== null && value !== undefined) {
-                let content = ''
-                let media: StoryMedia[] = []
-
-                if (typeof value === 'string') {
-                  content = value
-                } else if (typeof value === 'object' && 'text' in value) {
-                  content = (value as { text?: string }).text || ''
-                  media = (value as { media?: StoryMedia[] }).media || []
-                } else {
-                  return
-                }
-
-                if (content.trim()) {
-                  allStories.push({
-                    title: key,
-                    content,
-                    media,
-                    relativeName: `${relative.first_name} ${relative.last_name}`,
-                    relativeId: relative.id,
-                  })
-                }
-              }
-            })
-          }
-        })
+        const relativesById = new Map(relativesData.map((r) => [r.id, r]))
+        const allStories: Story[] = storiesData
+          .filter((story) => (story.text || '').trim())
+          .map((story) => {
+            const relative = relativesById.get(story.relative_id)
+            return {
+              title: story.title,
+              content: story.text || '',
+              media: story.media || [],
+              relativeName: relative ? `${relative.first_name} ${relative.last_name}` : '',
+              relativeId: story.relative_id,
+            }
+          })
         setStories(allStories)
         setFilteredStories(allStories)
       } catch (error) {
@@ -51,6 +51,7 @@ import {
   FamilyRelationship,
   FamilyRelativeCreate,
   FamilyRelationshipCreate,
+  Story,
   StoryMedia,
 } from '@/types'
 import { isAuthenticated, clearAuthTokens, getErrorMessage, getProxiedImageUrl } from '@/lib/utils'
@@ -69,6 +70,19 @@ const GENDER_LABELS: Record<string, string> = {
 }
 
 // Card dimensions: desktop defaults (overridden per-device inside component)
+// Story as shown in the sidebar and stories modal
+interface StoryItem {
+  key: string
+  value: string
+  media?: StoryMedia[]
+}
+
+const toStoryItem = (story: Story): StoryItem => ({
+  key: story.title,
+  value: story.text || '',
+  media: story.media || [],
+})
+
 const DESKTOP_CARD_WIDTH = 208  // w-52 = 13rem = 208px
 const DESKTOP_CARD_HEIGHT = 280 // Fixed height for medium cards
 const DESKTOP_HORIZONTAL_GAP = 60
@@ -245,10 +259,10 @@ function TreePageInner() {
   const [fileList, setFileList] = useState<UploadFile[]>([])
 
   // Stories state (key-value pairs with media)
-  const [stories, setStories] = useState<Array<{ key: string; value: string; media?: StoryMedia[] }>>([])
+  const [stories, setStories] = useState<StoryItem[]>([])
   const [newStoryKey, setNewStoryKey] = useState('')
   const [newStoryValue, setNewStoryValue] = useState('')
-  const [viewingStory, setViewingStory] = useState<{ key: string; value: string; media?: StoryMedia[] } | null>(null)
+  const [viewingStory, setViewingStory] = useState<StoryItem | null>(null)
   const [uploadingPhoto, setUploadingPhoto] = useState(false)
 
   // Filter state
@@ -408,12 +422,10 @@ function TreePageInner() {
       if (filterAlive === true && r.death_date) return false
       if (filterAlive === false && !r.death_date) return false
       if (filterHasStories === true) {
-        const hasStories = r.context && Object.keys(r.context).length > 0
-        if (!hasStories) return false
+        if (!r.stories_count) return false
       }
       if (filterHasStories === false) {
-        const hasStories = r.context && Object.keys(r.context).length > 0
-        if (hasStories) return false
+        if (r.stories_count) return false
       }
       if (searchTerm) {
         const fullName = `${r.first_name || ''} ${r.last_name || ''} ${r.middle_name || ''}`.toLowerCase()
@@ -887,9 +899,9 @@ function TreePageInner() {
         image_url: fileList[0]?.response?.url || fileList[0]?.url || selectedRelative.image_url || null,
       }
       const updated = await familyApi.updateRelative(user.id, selectedRelative.id, data)
-      setRelatives((prev) => prev.map((r) => (r.id === updated.id ? updated : r)))
-      // Update selectedRelative but preserve context
-      setSelectedRelative({ ...updated, context: selectedRelative.context })
+      setRelatives((prev) => prev.map((r) => (r.id === updated.id ? { ...r, ...updated } : r)))
+      // Update selectedRelative but preserve context and stories_count
+      setSelectedRelative({ ...selectedRelative, ...updated, context: selectedRelative.context })
       message.success('Данные обновлены')
       setEditRelativeModal(false)
       editForm.resetFields()
@@ -997,30 +1009,44 @@ function TreePageInner() {
     setEditRelativeModal(true)
   }
 
-  // Open stories modal and load existing stories
+  // Load stories of the selected relative
+  const selectedRelativeId = selectedRelative?.id
+  useEffect(() => {
+    if (!user || !selectedRelativeId) {
+      setStories([])
+      return
+    }
+    let cancelled = false
+    storiesApi
+      .getStories(user.id, selectedRelativeId)
+      .then((data) => {
+        if (!cancelled) setStories(data.map(toStoryItem))
+      })
+      .catch((error) => {
+        if (!cancelled) message.error(getErrorMessage(error as ApiError))
+      })
+    return () => {
+      cancelled = true
+    }
+  }, [user, selectedRelativeId])
+
+  // Open stories modal
   const openStoriesModal = () => {
     if (!selectedRelative) return
-    // Convert context object to stories array (support both old and new formats)
-    const contextObj = selectedRelative.context || {}
-    const storiesArray = Object.entries(contextObj).map(([key, value]) => {
-      if (typeof value === 'object' && value !== null && 'text' in value) {
-        // New format with media
-        return {
-          key,
-          value: (value as { text?: string }).text || '',
-          media: (value as { media?: StoryMedia[] }).media || [],
-        }
-      }
-      // Old format - just text
-      return { key, value: String(value), media: [] }
-    })
-    setStories(storiesArray)
     setNewStoryKey('')
     setNewStoryValue('')
     setViewingStory(null)
     setStoriesModal(true)
   }
 
+  // Keep the stories badge and filter in sync without reloading the list
+  const adjustStoriesCount = (relativeId: number, delta: number) => {
+    const apply = (r: FamilyRelative) =>
+      r.id === relativeId ? { ...r, stories_count: Math.max((r.stories_count ?? 0) + delta, 0) } : r
+    setRelatives((prev) => prev.map(apply))
+    setSelectedRelative((prev) => (prev ? apply(prev) : prev))
+  }
+
   // Add a new story
   const handleAddStory = async () => {
     if (!user || !selectedRelative || !newStoryKey.trim() || !newStoryValue.trim()) {
@@ -1029,14 +1055,12 @@ function TreePageInner() {
     }
 
     try {
-      await familyApi.updateContext(user.id, selectedRelative.id, newStoryKey.trim(), newStoryValue.trim())
-      // Update local state
-      setStories((prev) => [...prev, { key: newStoryKey.trim(), value: newStoryValue.trim() }])
-      // Update selected relative context
-      const updatedContext = { ...(selectedRelative.context || {}), [newStoryKey.trim()]: newStoryValue.trim() }
-      const updatedRelative = { ...selectedRelative, context: updatedContext }
-      setSelectedRelative(updatedRelative)
-      setRelatives((prev) => prev.map((r) => (r.id === selectedRelative.id ? updatedRelative : r)))
+      const story = await storiesApi.createStory(user.id, selectedRelative.id, {
+        title: newStoryKey.trim(),
+        text: newStoryValue.trim(),
+      })
+      setStories((prev) => [...prev, toStoryItem(story)])
+      adjustStoriesCount(selectedRelative.id, 1)
       setNewStoryKey('')
       setNewStoryValue('')
       message.success('История добавлена')
@@ -1046,23 +1070,15 @@ function TreePageInner() {
     }
   }
 
-  // Remove a story (set empty value via API to remove)
+  // Remove a story
   const handleRemoveStory = async (keyToRemove: string) => {
     if (!user || !selectedRelative) return
 
     try {
-      // Update context by removing the key (set to empty or use update API)
-      const updatedContext = { ...(selectedRelative.context || {}) }
-      delete updatedContext[keyToRemove]
-
-      // Update the relative with new context
-      await familyApi.updateRelative(user.id, selectedRelative.id, { context: updatedContext })
-
-      // Update local state
+      await storiesApi.deleteStory(user.id, selectedRelative.id, keyToRemove)
       setStories((prev) => prev.filter((s) => s.key !== keyToRemove))
-      const updatedRelative = { ...selectedRelative, context: updatedContext }
-      setSelectedRelative(updatedRelative)
-      setRelatives((prev) => prev.map((r) => (r.id === selectedRelative.id ? updatedRelative : r)))
+      adjustStoriesCount(selectedRelative.id, -1)
+      if (viewingStory && viewingStory.key === keyToRemove) setViewingStory(null)
       message.success('История удалена')
     } catch (error) {
       const apiError = error as ApiError
@@ -1091,16 +1107,6 @@ function TreePageInner() {
           prev ? { ...prev, media: [...(prev.media || []), response.media] } : prev
         )
       }
-      // Update selected relative context
-      const updatedContext = { ...(selectedRelative.context || {}) }
-      const storyData = updatedContext[storyKey]
-      if (typeof storyData === 'object' && storyData !== null) {
-        (storyData as { media?: StoryMedia[] }).media = [
-          ...((storyData as { media?: StoryMedia[] }).media || []),
-          response.media,
-        ]
-      }
-      setSelectedRelative({ ...selectedRelative, context: updatedContext })
       message.success('Фото загружено')
     } catch (error) {
       const apiError = error as ApiError
@@ -1130,15 +1136,6 @@ function TreePageInner() {
           prev ? { ...prev, media: (prev.media || []).filter((m) => m.url !== mediaUrl) } : prev
         )
       }
-      // Update selected relative context
-      const updatedContext = { ...(selectedRelative.context || {}) }
-      const storyData = updatedContext[storyKey]
-      if (typeof storyData === 'object' && storyData !== null) {
-        (storyData as { media?: StoryMedia[] }).media = (
-          (storyData as { media?: StoryMedia[] }).media || []
-        ).filter((m) => m.url !== mediaUrl)
-      }
-      setSelectedRelative({ ...selectedRelative, context: updatedContext })
       message.success('Фото удалено')
     } catch (error) {
       const apiError = error as ApiError
@@ -1954,17 +1951,13 @@ function TreePageInner() {
                     Управление
                   </Button>
                 </div>
-                {selectedRelative.context && Object.keys(selectedRelative.context).length > 0 ? (
+                {stories.length > 0 ? (
                   <div className="space-y-1.5">
-                    {Object.entries(selectedRelative.context).map(([key, value]) => {
-                      // Извлекаем текст и media из истории (поддержка обоих форматов)
-                      const storyData = typeof value === 'object' && value !== null && 'text' in value
-                        ? { key, value: (value as { text?: string }).text || '', media: (value as { media?: StoryMedia[] }).media || [] }
-                        : { key, value: String(value), media: [] as StoryMedia[] }
-                      const photoCount = storyData.media.filter((m) => m.type === 'image').length
+                    {stories.map((storyData) => {
+                      const photoCount = (storyData.media || []).filter((m) => m.type === 'image').length
                       return (
                         <div
-                          key={key}
+                          key={storyData.key}
                           className="p-2 rounded-lg bg-muted cursor-pointer hover:bg-accent transition-colors flex items-center gap-2"
                           onClick={() => {
                             setViewingStory(storyData)
@@ -1972,7 +1965,7 @@ function TreePageInner() {
                           }}
                         >
                           <BookOpen className="w-3 h-3 text-azure flex-shrink-0" />
-                          <p className="text-xs font-medium text-foreground truncate flex-1">{key}</p>
+                          <p className="text-xs font-medium text-foreground truncate flex-1">{storyData.key}</p>
                           {photoCount > 0 && (
                             <span className="flex items-center gap-0.5 text-xs text-muted-foreground flex-shrink-0">
                               <ImageIcon className="w-3 h-3" />
@@ -58,11 +58,6 @@ function formatDateRu(dateStr: string): string {
   return d.toLocaleDateString('ru-RU', { day: 'numeric', month: 'long', year: 'numeric' })
 }
 
-function getStoriesCount(relative: FamilyRelative): number {
-  if (!relative.context) return 0
-  return Object.keys(relative.context).filter((k) => k !== 'interview_messages').length
-}
-
 interface RelativeDetailSheetProps {
   relative: FamilyRelative | null
   relationships: FamilyRelationship[]
@@ -100,7 +95,7 @@ export default function RelativeDetailSheet({
   const proxiedUrl = getProxiedImageUrl(relative.image_url)
   const age = relative.birth_date ? calculateAge(relative.birth_date, relative.death_date) : null
   const isDeceased = !!relative.death_date
-  const storiesCount = getStoriesCount(relative)
+  const storiesCount = relative.stories_count ?? 0
 
   // Relationships involving this relative
   const relatedRels = relationships.filter(
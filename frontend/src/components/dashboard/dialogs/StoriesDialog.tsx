@@ -14,8 +14,8 @@ import { Separator } from '@/components/ui/separator'
 import { ScrollArea } from '@/components/ui/scroll-area'
 import { ArrowLeft, BookOpen, Plus, Trash2, Upload, Image as ImageIcon } from 'lucide-react'
 import { toast } from 'sonner'
-import { FamilyRelative, StoryMedia, ApiError } from '@/types'
-import { familyApi, storiesApi } from '@/lib/api/family'
+import { FamilyRelative, Story, StoryMedia, ApiError } from '@/types'
+import { storiesApi } from '@/lib/api/family'
 import { getErrorMessage, getProxiedImageUrl } from '@/lib/utils'
 
 interface StoryItem {
@@ -32,6 +32,12 @@ interface StoriesDialogProps {
   onRelativeUpdate: (relative: FamilyRelative) => void
 }
 
+const toStoryItem = (story: Story): StoryItem => ({
+  key: story.title,
+  value: story.text || '',
+  media: story.media || [],
+})
+
 export default function StoriesDialog({
   open,
   onOpenChange,
@@ -46,33 +52,27 @@ export default function StoriesDialog({
   const [newText, setNewText] = useState('')
   const [uploadingPhoto, setUploadingPhoto] = useState(false)
 
+  const relativeId = relative?.id
   useEffect(() => {
-    if (open && relative) {
-      const contextObj = relative.context || {}
-      const arr = Object.entries(contextObj)
-        .filter(([key]) => key !== 'interview_messages')
-        .map(([key, value]) => {
-          if (typeof value === 'object' && value !== null && 'text' in value) {
-            return {
-              key,
-              value: (value as { text?: string }).text || '',
-              media: (value as { media?: StoryMedia[] }).media || [],
-            }
-          }
-          return { key, value: String(value), media: [] }
-        })
-      setStories(arr)
-      setViewingStory(null)
-      setNewTitle('')
-      setNewText('')
-    }
-  }, [open, relative])
+    if (!open || !relativeId) return
+    setStories([])
+    setViewingStory(null)
+    setNewTitle('')
+    setNewText('')
 
-  const updateRelativeContext = (updatedContext: Record<string, unknown>) => {
-    if (!relative) return
-    const updated = { ...relative, context: updatedContext }
-    onRelativeUpdate(updated)
-  }
+    let cancelled = false
+    storiesApi
+      .getStories(userId, relativeId)
+      .then((data) => {
+        if (!cancelled) setStories(data.map(toStoryItem))
+      })
+      .catch((error) => {
+        if (!cancelled) toast.error(getErrorMessage(error as ApiError))
+      })
+    return () => {
+      cancelled = true
+    }
+  }, [open, relativeId, userId])
 
   const handleAddStory = async () => {
     if (!relative || !newTitle.trim() || !newText.trim()) {
@@ -81,11 +81,12 @@ export default function StoriesDialog({
     }
 
     try {
-      await familyApi.updateContext(userId, relative.id, newTitle.trim(), newText.trim())
-      const newStory = { key: newTitle.trim(), value: newText.trim(), media: [] }
-      setStories((prev) => [...prev, newStory])
-      const updatedContext = { ...(relative.context || {}), [newTitle.trim()]: newText.trim() }
-      updateRelativeContext(updatedContext)
+      const story = await storiesApi.createStory(userId, relative.id, {
+        title: newTitle.trim(),
+        text: newText.trim(),
+      })
+      setStories((prev) => [...prev, toStoryItem(story)])
+      onRelativeUpdate({ ...relative, stories_count: (relative.stories_count ?? 0) + 1 })
       setNewTitle('')
       setNewText('')
       toast.success('История добавлена')
@@ -98,12 +99,10 @@ export default function StoriesDialog({
     if (!relative) return
 
     try {
-      const updatedContext = { ...(relative.context || {}) }
-      delete updatedContext[keyToRemove]
-      await familyApi.updateRelative(userId, relative.id, { context: updatedContext })
+      await storiesApi.deleteStory(userId, relative.id, keyToRemove)
       setStories((prev) => prev.filter((s) => s.key !== keyToRemove))
+      onRelativeUpdate({ ...relative, stories_count: Math.max((relative.stories_count ?? 1) - 1, 0) })
       if (viewingStory?.key === keyToRemove) setViewingStory(null)
-      updateRelativeContext(updatedContext)
       toast.success('История удалена')
     } catch (error) {
       toast.error(getErrorMessage(error as ApiError))
@@ -128,15 +127,6 @@ export default function StoriesDialog({
           prev ? { ...prev, media: [...(prev.media || []), response.media] } : prev
         )
       }
-      const updatedContext = { ...(relative.context || {}) }
-      const storyData = updatedContext[storyKey]
-      if (typeof storyData === 'object' && storyData !== null) {
-        (storyData as { media?: StoryMedia[] }).media = [
-          ...((storyData as { media?: StoryMedia[] }).media || []),
-          response.media,
-        ]
-      }
-      updateRelativeContext(updatedContext)
       toast.success('Фото загружено')
     } catch (error) {
       toast.error(getErrorMessage(error as ApiError))
@@ -163,14 +153,6 @@ export default function StoriesDialog({
           prev ? { ...prev, media: (prev.media || []).filter((m) => m.url !== mediaUrl) } : prev
         )
       }
-      const updatedContext = { ...(relative.context || {}) }
-      const storyData = updatedContext[storyKey]
-      if (typeof storyData === 'object' && storyData !== null) {
-        (storyData as { media?: StoryMedia[] }).media = (
-          (storyData as { media?: StoryMedia[] }).media || []
-        ).filter((m) => m.url !== mediaUrl)
-      }
-      updateRelativeContext(updatedContext)
       toast.success('Фото удалено')
     } catch (error) {
       toast.error(getErrorMessage(error as ApiError))
@@ -2,8 +2,9 @@
 
 import { FamilyRelative } from '@/types'
 import { Heart, BookOpen } from 'lucide-react'
-import { getProxiedImageUrl } from '@/lib/utils'
+import { getProxiedImageUrl, getThumbnailUrl } from '@/lib/utils'
 import Image from 'next/image'
+import { useState } from 'react'
 
 // Warm pastel palette for card styling - soft and elegant
 const GENDER_COLORS: Record<string, {
@@ -71,9 +72,14 @@ function formatYear(dateString: string): string {
 
 export default function RelativeCard({ relative, isSelected, onClick, size = 'medium' }: RelativeCardProps) {
   const colors = GENDER_COLORS[relative.gender || 'other']
+  // Thumbnails exist only for photos uploaded after they were introduced — fall back to the original
+  const [thumbnailFailed, setThumbnailFailed] = useState(false)
+  const photoUrl = thumbnailFailed
+    ? getProxiedImageUrl(relative.image_url)
+    : getThumbnailUrl(relative.image_url, relative.thumbnails, 256)
   const age = relative.birth_date ? calculateAge(relative.birth_date, relative.death_date) : null
   const isDeceased = !!relative.death_date
-  const hasStories = relative.context && Object.keys(relative.context).length > 0
+  const hasStories = (relative.stories_count ?? 0) > 0
   const generationLabel = relative.generation ?? '—'
   const middleName = relative.middle_name?.trim()
   const genderLabel =
@@ -151,8 +157,9 @@ export default function RelativeCard({ relative, isSelected, onClick, size = 'me
         <div className={`${photoSizes[size]} rounded-xl overflow-hidden bg-muted dark:bg-[#2a2640] relative`}>
           {relative.image_url ? (
             <Image
-              src={getProxiedImageUrl(relative.image_url) || ''}
+              src={photoUrl || ''}
               alt={relative.first_name || 'Родственник'}
+              onError={() => setThumbnailFailed(true)}
               fill
               className={`object-cover ${isDeceased ? 'grayscale' : ''}`}
               unoptimized
@@ -4,6 +4,7 @@ const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 
 export type BookStyle = 'classic' | 'modern' | 'vintage' | 'custom'
 export type BookTheme = 'light' | 'dark'
+export type BookTextMode = 'cached' | 'fresh' | 'reuse'
 
 export interface BookGenerateRequest {
   style?: BookStyle
@@ -13,6 +14,8 @@ export interface BookGenerateRequest {
   include_stories?: boolean
   include_timeline?: boolean
   language?: string
+  text_mode?: BookTextMode
+  refresh_book_id?: number
 }
 
 export interface BookProgressChunk {
@@ -25,8 +28,10 @@ export interface BookProgressChunk {
 
 export interface BookResultChunk {
   type: 'result'
-  pdf_base64: string
+  book_id?: number
+  download_url: string
   filename: string
+  s3_url?: string
 }
 
 export interface BookErrorChunk {
@@ -59,6 +64,12 @@ export async function* streamGenerateBook(
   if (options.custom_style_description) {
     payload.custom_style_description = options.custom_style_description
   }
+  if (options.text_mode) {
+    payload.text_mode = options.text_mode
+  }
+  if (options.refresh_book_id) {
+    payload.refresh_book_id = options.refresh_book_id
+  }
 
   const response = await fetch(`${API_URL}/api/v1/book/generate/stream`, {
     method: 'POST',
@@ -112,14 +123,17 @@ export async function* streamGenerateBook(
   }
 }
 
-// Helper function to download PDF from base64
-export function downloadPdfFromBase64(base64: string, filename: string) {
-  const binaryString = atob(base64)
-  const bytes = new Uint8Array(binaryString.length)
-  for (let i = 0; i < binaryString.length; i++) {
-    bytes[i] = binaryString.charCodeAt(i)
+// Helper function to download generated PDF (streamed by the backend)
+export async function downloadBookPdf(downloadUrl: string, filename: string) {
+  const token = getAccessToken()
+  const response = await fetch(`${API_URL}${downloadUrl}`, {
+    headers: { 'Authorization': token ? `Bearer ${token}` : '' },
+    credentials: 'include',
+  })
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`)
   }
-  const blob = new Blob([bytes], { type: 'application/pdf' })
+  const blob = await response.blob()
   const url = URL.createObjectURL(blob)
 
   const link = document.createElement('a')
@@ -134,5 +148,5 @@ export function downloadPdfFromBase64(base64: string, filename: string) {
 
 export const bookApi = {
   streamGenerateBook,
-  downloadPdfFromBase64,
+  downloadBookPdf,
 }
@@ -8,9 +8,11 @@ import {
   FamilyRelationshipUpdate,
   FamilyStatistics,
   Story,
+  RelativeStory,
   StoryCreate,
   StoryUpdate,
   StoryMediaUploadResponse,
+  StoryMediaPresignResponse,
   InvitationResponse,
 } from '@/types'
 
@@ -216,6 +218,13 @@ export const statisticsApi = {
 
 // Stories API
 export const storiesApi = {
+  // Get stories of all active relatives of the user
+  getUserStories: (userId: number): Promise<RelativeStory[]> =>
+    apiRequest({
+      method: 'GET',
+      url: `/api/v1/family/${userId}/stories`,
+    }),
+
   // Get all stories for a relative
   getStories: (userId: number, relativeId: number): Promise<Story[]> =>
     apiRequest({
@@ -280,6 +289,35 @@ export const storiesApi = {
     return response.data
   },
 
+  // Upload media directly to S3 via presigned form (file bypasses the API server)
+  uploadMediaDirect: async (
+    userId: number,
+    relativeId: number,
+    storyKey: string,
+    file: File
+  ): Promise<StoryMediaUploadResponse> => {
+    const base = `/api/v1/family/${userId}/relatives/${relativeId}/stories/${encodeURIComponent(storyKey)}/media/direct-upload`
+    const { data: form } = await apiClient.post<StoryMediaPresignResponse>(base, {
+      filename: file.name,
+      content_type: file.type,
+      size: file.size,
+    })
+
+    const formData = new FormData()
+    Object.entries(form.fields).forEach(([name, value]) => formData.append(name, value))
+    formData.append('file', file)
+    const upload = await fetch(form.url, { method: 'POST', body: formData })
+    if (!upload.ok) {
+      throw new Error(`S3 upload failed: ${upload.status}`)
+    }
+
+    const response = await apiClient.post<StoryMediaUploadResponse>(`${base}/complete`, {
+      key: form.key,
+      filename: file.name,
+    })
+    return response.data
+  },
+
   // Delete media from story
   deleteMedia: (
     userId: number,
@@ -217,3 +217,15 @@ export function getProxiedImageUrl(url: string | null | undefined): string | nul
   // Return original URL if not from S3
   return url
 }
+
+/**
+ * Proxied URL of a photo thumbnail (WebP, size px on the longer side), or of the original
+ * when the backend exposes no thumbnails for it.
+ */
+export function getThumbnailUrl(
+  imageUrl: string | null | undefined,
+  thumbnails: Record<string, string> | null | undefined,
+  size: 64 | 256 | 1024
+): string | null {
+  return getProxiedImageUrl(thumbnails?.[String(size)] || imageUrl)
+}
@@ -112,6 +112,7 @@ export interface FamilyRelative {
   id: number
   user_id: number
   image_url?: string | null
+  thumbnails?: Record<string, string> | null
   first_name?: string | null
   last_name?: string | null
   middle_name?: string | null
@@ -125,6 +126,7 @@ export interface FamilyRelative {
   is_activated: boolean
   activated_at?: string | null
   context?: Record<string, unknown> | null
+  stories_count?: number
   generation?: number | null
   created_at: string
   updated_at: string
@@ -228,6 +230,7 @@ export interface StoryMedia {
   content_type?: string | null
   size?: number | null
   duration?: number | null
+  thumbnails?: Record<string, string> | null
 }
 
 export interface Story {
@@ -238,6 +241,10 @@ export interface Story {
   updated_at?: string | null
 }
 
+export interface RelativeStory extends Story {
+  relative_id: number
+}
+
 export interface StoryCreate {
   title: string
   text?: string | null
@@ -254,6 +261,15 @@ export interface StoryMediaUploadResponse {
   message: string
 }
 
+export interface StoryMediaPresignResponse {
+  key: string
+  url: string
+  fields: Record<string, string>
+  object_url: string
+  expires_in: number
+  max_size: number
+}
+
 // Invitation types
 export interface InvitationResponse {
   invitation_url: string